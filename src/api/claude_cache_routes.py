@@ -20,7 +20,7 @@ router = APIRouter(prefix="/api/admin", tags=["Claude Cache Management"])
 @router.get("/claude-cache/stats")
 async def get_cache_stats(user_id: str = Depends(get_current_user)):
     """
-    获取 Claude Prompt 缓存统计信息
+    获取 Claude Prompt 缓存统计信息 (所有 worker 进程汇总)
 
     Returns:
         缓存统计数据，包含：
@@ -32,7 +32,7 @@ async def get_cache_stats(user_id: str = Depends(get_current_user)):
     """
     try:
         cache_manager = get_claude_cache_manager()
-        stats = cache_manager.get_cache_stats()
+        stats = await cache_manager.get_shared_cache_stats()
 
         return {
             "success": True,
@@ -70,7 +70,7 @@ async def get_cost_analysis(
 
         if user_id:
             # 获取特定用户的成本统计
-            user_summary = cost_tracker.get_user_summary(user_id)
+            user_summary = await cost_tracker.get_shared_user_summary(user_id)
             return {
                 "success": True,
                 "data": user_summary,
@@ -78,8 +78,8 @@ async def get_cost_analysis(
             }
         else:
             # 获取总体成本统计
-            summary = cost_tracker.get_summary()
-            daily_summary = cost_tracker.get_daily_summary(days_back=days_back)
+            summary = await cost_tracker.get_shared_summary()
+            daily_summary = await cost_tracker.get_shared_daily_summary(days_back=days_back)
             estimate = cost_tracker.estimate_monthly_cost()
 
             return {
@@ -135,7 +135,7 @@ async def clear_cache(
     user_id: str = Depends(get_current_user),
 ):
     """
-    清除 Claude Prompt 缓存
+    清除 Claude Prompt 缓存 (通知所有 worker 进程)
 
     Query Parameters:
         cache_type: 缓存类型 ("all", "system", "context", "query") (默认: "all")
@@ -145,7 +145,7 @@ async def clear_cache(
     """
     try:
         cache_manager = get_claude_cache_manager()
-        cache_manager.clear_cache(cache_type=cache_type)
+        await cache_manager.clear_cache_everywhere(cache_type=cache_type)
 
         return {
             "success": True,
@@ -169,8 +169,8 @@ async def get_cache_health(user_id: str = Depends(get_current_user)):
         cache_manager = get_claude_cache_manager()
         cost_tracker = get_cost_tracker()
 
-        stats = cache_manager.get_cache_stats()
-        cost_summary = cost_tracker.get_summary()
+        stats = await cache_manager.get_shared_cache_stats()
+        cost_summary = await cost_tracker.get_shared_summary()
 
         # 健康检查逻辑
         is_healthy = True
@@ -8,22 +8,28 @@ from pydantic import BaseModel
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.api.routing import SharedBodyRoute
 from src.db.config import get_async_session
+from src.services.agent_service import AgentService
 from src.services.conversation_service import ConversationService
+from src.services.conversation_summarization_service import apply_summary
 from src.services.cached_rag import get_rag_service
+from src.services.memory_service import get_memory_service
+from src.services.summarization_worker import get_summarization_worker
 from src.schemas.conversation_schema import (
     CreateConversationRequest,
     UpdateConversationRequest,
     ConversationResponse,
     ConversationListResponse,
     SendMessageRequest,
+    PrefetchDraftRequest,
     ConversationHistoryResponse,
     ConversationContextResponse,
 )
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/v1/conversations", tags=["Conversations"])
+router = APIRouter(prefix="/api/v1/conversations", tags=["Conversations"], route_class=SharedBodyRoute)
 
 
 # ============================================================================
@@ -396,19 +402,26 @@ async def get_conversation_messages(
 async def send_message(
     conversation_id: UUID,
     request_data: SendMessageRequest,
+    request: Request,
     session: AsyncSession = Depends(get_async_session),
     user_id: str = Depends(get_current_user),
 ):
     """
     Send a message to a conversation.
 
+    History and RAG context are loaded by MemoryInjectionMiddleware
+    (``request.state.memory_context``) before the handler runs and passed to
+    the agent; they are only loaded here if the middleware had no
+    authenticated user.
+
     **Parameters:**
     - **conversation_id**: Conversation UUID
     - **content**: Message content
     - **include_rag**: Whether to include RAG search (default: true)
 
     **Returns:**
-    - Agent response with any tool results
+    - The saved user message (message_id, role, content, created_at)
+    - Agent response (assistant_message_id, response) with any tool results
     """
     try:
         service = ConversationService(session)
@@ -428,14 +441,69 @@ async def send_message(
             content=request_data.content,
         )
 
-        # TODO: Call agent service to process message
-        # For now, just return the user message
+        # Memory context injected by MemoryInjectionMiddleware
+        memory_context = getattr(request.state, "memory_context", None) or {}
+        if "conversation_history" not in memory_context:
+            memory_context = await get_memory_service().load(
+                str(conversation_id),
+                user_id,
+                request_data.content,
+                include_rag=request_data.include_rag,
+            )
+
+        # The running summary replaces the messages it covers
+        summary, history = apply_summary(
+            conversation, memory_context["conversation_history"]
+        )
+        message_history = [
+            {
+                "role": msg["role"],
+                "content": msg["content"],
+                "tokens_used": msg.get("tokens_used"),
+            }
+            for msg in history
+            if msg["id"] != str(user_message.id)
+        ]
+
+        result = await AgentService(session).process_message(
+            user_id=user_id,
+            conversation_id=str(conversation_id),
+            user_message=request_data.content,
+            system_prompt=conversation.system_prompt,
+            message_history=message_history,
+            context_documents=memory_context["rag_context"],
+            summary=summary,
+        )
+        if result.get("error"):
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="Agent failed to process message",
+            )
+
+        # Save assistant message
+        assistant_message = await service.add_message(
+            conversation_id=conversation_id,
+            role="assistant",
+            content=result["agent_response"],
+            tool_calls=result.get("tool_calls"),
+            tool_results=result.get("tool_results"),
+            # LLM usage covers the whole prompt; the message itself is counted at insert
+            metadata={"usage_tokens": result.get("tokens_used")},
+        )
+
+        # Summarize in the background once enough tokens were added
+        get_summarization_worker().schedule(conversation_id)
 
         return {
             "message_id": str(user_message.id),
             "role": user_message.role,
             "content": user_message.content,
             "created_at": user_message.created_at,
+            "assistant_message_id": str(assistant_message.id),
+            "response": assistant_message.content,
+            "tool_calls": result.get("tool_calls"),
+            "tool_results": result.get("tool_results"),
+            "tokens_used": result.get("tokens_used", 0),
         }
 
     except HTTPException:
@@ -448,6 +516,42 @@ async def send_message(
         )
 
 
+@router.post("/{conversation_id}/prefetch", status_code=status.HTTP_202_ACCEPTED)
+async def prefetch_draft(
+    conversation_id: UUID,
+    request_data: PrefetchDraftRequest,
+    session: AsyncSession = Depends(get_async_session),
+    user_id: str = Depends(get_current_user),
+):
+    """
+    Start RAG retrieval for a message that is still being typed.
+
+    The draft is debounced and searched in the background against the user's
+    documents; the next message sent to this conversation reuses the results
+    if it is similar enough to the draft. WebSocket clients send
+    ``{"type": "draft"}`` messages instead.
+
+    **Parameters:**
+    - **conversation_id**: Conversation UUID
+    - **draft**: Current message text
+
+    **Returns:**
+    - Whether a search was scheduled (short or unchanged drafts are ignored)
+    """
+    # Verify user owns the conversation (searches run against their documents)
+    service = ConversationService(session)
+    if not await service.conv_repo.get_user_conversation(user_id, conversation_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found",
+        )
+
+    scheduled = get_memory_service().prefetcher.submit(
+        conversation_id, user_id, request_data.draft
+    )
+    return {"scheduled": scheduled}
+
+
 # ============================================================================
 # Cached RAG Endpoints (Phase 1 Optimization)
 # ============================================================================
@@ -8,6 +8,8 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.api.responses import StructuredJSONResponse
+from src.api.routing import SharedBodyRoute
 from src.db.config import get_async_session
 from src.services.document_service import DocumentService
 from src.services.embedding_service import EmbeddingService
@@ -23,7 +25,12 @@ from src.utils.file_handler import FileHandler, validate_file_upload
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/documents", tags=["Documents"])
+router = APIRouter(
+    prefix="/api/documents",
+    tags=["Documents"],
+    route_class=SharedBodyRoute,
+    default_response_class=StructuredJSONResponse,
+)
 
 
 def get_user_id(request) -> str:
@@ -8,12 +8,20 @@ from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
 
+from src.api.responses import StructuredJSONResponse
+from src.api.routing import SharedBodyRoute
 from src.db.config import get_async_session
 from src.repositories.message import MessageRepository
+from src.services.memory_service import get_memory_service
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/conversations", tags=["Messages"])
+router = APIRouter(
+    prefix="/api/conversations",
+    tags=["Messages"],
+    route_class=SharedBodyRoute,
+    default_response_class=StructuredJSONResponse,
+)
 
 
 class MessageDetailResponse(BaseModel):
@@ -264,6 +272,7 @@ async def delete_message(
 
         # Delete the message
         await msg_repo.delete(message_id)
+        await get_memory_service().invalidate(conversation_id)
 
         logger.info(f"Deleted message {message_id} from conversation {conversation_id}")
 
@@ -0,0 +1,65 @@
+"""Response classes that apply the standard API envelope at the route level."""
+
+from typing import Any
+
+import orjson
+from fastapi import Request
+from starlette.responses import JSONResponse
+from starlette.types import Receive, Scope, Send
+
+from src.middleware.response_structuring_middleware import (
+    STRUCTURE_PENDING_KEY,
+    ResponseStructuringMiddleware,
+)
+
+
+class StructuredJSONResponse(JSONResponse):
+    """
+    JSON response serialized once with orjson and wrapped in the API envelope.
+
+    The payload is rendered when the handler returns. When the response is
+    sent, and only if ResponseStructuringMiddleware is waiting to structure
+    this request, the small envelope prefix/suffix (request_id, timings,
+    metadata) is spliced around the already-serialized bytes and the
+    middleware is told to forward the result untouched. Payloads that already
+    carry a "success" field, error statuses and bodiless statuses are sent as
+    rendered and left to the middleware.
+
+    Example:
+        router = APIRouter(
+            prefix="/api/documents",
+            default_response_class=StructuredJSONResponse,
+        )
+    """
+
+    pre_structured = False
+
+    def render(self, content: Any) -> bytes:
+        self.pre_structured = isinstance(content, dict) and "success" in content
+        return orjson.dumps(content)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        state = scope.get("state") or {}
+        body = self.body
+        headers = self.raw_headers
+
+        if (
+            state.get(STRUCTURE_PENDING_KEY)
+            and body
+            and 200 <= self.status_code < 400
+            and self.status_code not in (204, 304)
+        ):
+            state[STRUCTURE_PENDING_KEY] = False
+            if not self.pre_structured:
+                prefix, suffix = ResponseStructuringMiddleware.envelope_parts(
+                    Request(scope), success=True
+                )
+                body = b"".join((prefix, body, suffix))
+                headers = [(k, v) for k, v in headers if k != b"content-length"]
+                headers.append((b"content-length", str(len(body)).encode("latin-1")))
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,50 @@
+"""Route class that reuses the request body parsed by the middleware stack."""
+
+from typing import Any, Callable
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from src.middleware.request_body import peek_request_body
+
+
+class SharedBodyRequest(Request):
+    """
+    Request that serves ``body()``/``json()`` from ``request.state.request_body``.
+
+    Falls back to the normal Starlette behaviour when no middleware read the
+    body (e.g. multipart uploads).
+    """
+
+    async def body(self) -> bytes:
+        request_body = peek_request_body(self.scope)
+        if request_body is not None:
+            return request_body.body
+        return await super().body()
+
+    async def json(self) -> Any:
+        request_body = peek_request_body(self.scope)
+        if request_body is not None:
+            return request_body.parse_json()
+        return await super().json()
+
+
+class SharedBodyRoute(APIRoute):
+    """
+    APIRoute whose handlers receive a SharedBodyRequest.
+
+    FastAPI then validates the already-parsed object with Pydantic instead of
+    parsing the raw bytes a second time.
+
+    Example:
+        router = APIRouter(prefix="/api/v1/conversations", route_class=SharedBodyRoute)
+    """
+
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def shared_body_route_handler(request: Request) -> Response:
+            request = SharedBodyRequest(request.scope, request.receive)
+            return await original_route_handler(request)
+
+        return shared_body_route_handler
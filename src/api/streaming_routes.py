@@ -1,35 +1,56 @@
 """Server-Sent Events (SSE) streaming routes for real-time AI conversations.
 
 Provides NDJSON (newline-delimited JSON) streaming responses for real-time
-message processing, tool execution tracking, and agent state updates.
+message processing, tool execution tracking, and agent state updates. Clients
+sending ``Accept: text/event-stream`` receive the same events as SSE.
 """
 
 import asyncio
 import json
 import logging
 import os
-from typing import AsyncGenerator, Optional, Dict, Any
+import time
+from typing import AsyncGenerator, AsyncIterator, Callable, Optional, Dict, Any
 from uuid import UUID
 
+import orjson
 from fastapi import APIRouter, HTTPException, Depends, status, Header
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.api.routing import SharedBodyRoute
 from src.db.config import get_async_session
-from src.repositories.message import MessageRepository
-from src.services.conversation_service import ConversationService
-from src.services.agent_service import AgentService
+from src.infrastructure.cache_metrics import (
+    stream_emitted_bytes_total,
+    stream_flushes_total,
+    stream_frames_total,
+)
 from src.middleware.auth_middleware import verify_jwt_token
+from src.models.streaming_models import (
+    CompleteStateEvent,
+    MessageChunk,
+    MessageChunkEvent,
+    StreamEvent,
+    ToolCallEvent,
+    ToolResultEvent,
+)
+from src.services.streaming_chat_service import StreamingChatService
 from src.schemas.message_schema import MessageCreate
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/v1", tags=["Streaming"])
+router = APIRouter(prefix="/api/v1", tags=["Streaming"], route_class=SharedBodyRoute)
+
+# Wire format of a message_chunk event, orjson.dumps(event.to_dict()) with
+# only the variable parts encoded (content, tokens, metadata)
+MESSAGE_CHUNK_TEMPLATE = b'{"type":"message_chunk","content":%b,"tokens":%d,"metadata":%b}'
 
 
 class StreamingEvent:
     """Represents a streaming event in NDJSON format."""
 
+    __slots__ = ("event_type", "content", "tokens", "metadata")
+
     TYPE_MESSAGE_CHUNK = "message_chunk"
     TYPE_TOOL_CALL = "tool_call"
     TYPE_TOOL_RESULT = "tool_result"
@@ -58,58 +79,272 @@ class StreamingEvent:
         self.tokens = tokens
         self.metadata = metadata or {}
 
-    def to_ndjson(self) -> str:
-        """Convert event to NDJSON format (JSON + newline)."""
-        event_data = {
+    def to_dict(self) -> Dict[str, Any]:
+        """Event payload."""
+        return {
             "type": self.event_type,
             "content": self.content,
             "tokens": self.tokens,
             "metadata": self.metadata,
         }
-        return json.dumps(event_data) + "\n"
+
+    def to_ndjson(self) -> str:
+        """Convert event to NDJSON format (JSON + newline)."""
+        return json.dumps(self.to_dict()) + "\n"
+
+    def to_sse(self) -> str:
+        """Convert event to Server-Sent Events format."""
+        return f"event: {self.event_type}\ndata: {json.dumps(self.to_dict())}\n\n"
+
+    def to_json_bytes(self) -> bytes:
+        """
+        Event payload encoded with orjson (compact separators).
+
+        message_chunk events, sent once per flush of model tokens, are
+        filled into MESSAGE_CHUNK_TEMPLATE instead of building the payload
+        dict first.
+        """
+        if self.event_type == self.TYPE_MESSAGE_CHUNK and type(self.tokens) is int:
+            return MESSAGE_CHUNK_TEMPLATE % (
+                orjson.dumps(self.content), self.tokens, orjson.dumps(self.metadata)
+            )
+        return orjson.dumps(self.to_dict())
+
+    def to_ndjson_bytes(self) -> bytes:
+        """NDJSON line encoded with orjson, ready to write."""
+        return self.to_json_bytes() + b"\n"
+
+    def to_sse_bytes(self) -> bytes:
+        """Server-Sent Event encoded with orjson, ready to write."""
+        return b"event: %b\ndata: %b\n\n" % (self.event_type.encode(), self.to_json_bytes())
 
 
 class StreamingManager:
-    """Manages streaming responses with buffering and backpressure handling."""
+    """
+    Coalesces streaming events under a time/size flush policy, with backpressure.
+
+    The first message chunk is sent at once, so the client sees the first
+    token as soon as the model produces it. Later chunks are merged into one
+    message_chunk event until the flush deadline has passed since the oldest
+    buffered chunk, or buffer_size chunks or max_bytes UTF-8 bytes are
+    buffered, whichever comes first. Tool calls, tool results and other
+    events flush the buffer and are sent immediately, in order.
+
+    The deadline adapts to the client: stream() measures how long the
+    consumer takes to take each event (the time the response needs to write
+    it), and while that drain time exceeds flush_interval, the deadline
+    follows it (up to max_flush_interval) and the byte threshold grows in
+    proportion. Flushing faster than the client drains would only queue more,
+    smaller frames; a fast client keeps the short deadline.
+
+    stream() reads the source through a bounded queue: when the client reads
+    slowly, the queue fills up and reading of the agent (LLM) stream pauses
+    instead of buffering the whole answer in memory.
+
+    Configuration via environment variables:
+    - STREAM_FLUSH_INTERVAL_MS: Max delay of a buffered chunk for a fast
+      client (default: 50)
+    - STREAM_FLUSH_MAX_INTERVAL_MS: Max delay for a slow client (default: 250)
+    - STREAM_FLUSH_MAX_CHUNKS: Chunks buffered before a flush (default: 100)
+    - STREAM_FLUSH_MAX_BYTES: Bytes buffered before a flush for a fast
+      client (default: 256)
+    - STREAM_QUEUE_SIZE: Events read ahead of the client (default: 64)
+    """
+
+    # Weight of the latest drain time in its moving average
+    DRAIN_SMOOTHING = 0.3
 
-    def __init__(self, buffer_size: int = 100, flush_interval: float = 0.1):
+    _END_OF_STREAM = object()
+
+    def __init__(
+        self,
+        buffer_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        max_flush_interval: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
         """
         Initialize streaming manager.
 
         Args:
-            buffer_size: Maximum events in buffer before flushing
-            flush_interval: Time interval (seconds) to flush buffered events
+            buffer_size: Maximum chunks in buffer before flushing
+            flush_interval: Time interval (seconds) to flush buffered chunks
+            max_bytes: Maximum buffered bytes before flushing
+            queue_size: Maximum events read ahead of the client
+            max_flush_interval: Longest flush interval for a slow client (seconds)
+            clock: Monotonic clock (injectable for tests)
         """
-        self.buffer_size = buffer_size
-        self.flush_interval = flush_interval
+        self.buffer_size = int(buffer_size or os.getenv("STREAM_FLUSH_MAX_CHUNKS", "100"))
+        self.flush_interval = (
+            float(os.getenv("STREAM_FLUSH_INTERVAL_MS", "50")) / 1000.0
+            if flush_interval is None else flush_interval
+        )
+        self.max_flush_interval = max(
+            self.flush_interval,
+            float(os.getenv("STREAM_FLUSH_MAX_INTERVAL_MS", "250")) / 1000.0
+            if max_flush_interval is None else max_flush_interval,
+        )
+        self.max_bytes = int(max_bytes or os.getenv("STREAM_FLUSH_MAX_BYTES", "256"))
+        self.queue_size = int(queue_size or os.getenv("STREAM_QUEUE_SIZE", "64"))
+        self._clock = clock
         self.event_buffer: list[StreamingEvent] = []
         self.total_tokens = 0
+        self._buffered_bytes = 0
+        self._flush_at: Optional[float] = None
+        self._first_chunk_sent = False
+        self._drain_time: Optional[float] = None
 
-    async def add_event(self, event: StreamingEvent):
+    async def add_event(self, event: StreamingEvent) -> list[StreamingEvent]:
         """
         Add event to buffer.
 
         Args:
             event: StreamingEvent to add
+
+        Returns:
+            Events due to be sent now, in order (empty if the event was buffered)
         """
+        if event.event_type != StreamingEvent.TYPE_MESSAGE_CHUNK:
+            return await self.flush() + [event]
+
+        self.total_tokens += event.tokens
+        if not self._first_chunk_sent:
+            self._first_chunk_sent = True
+            stream_flushes_total.labels(reason="first_token").inc()
+            return [event]
+
+        content = event.content
         self.event_buffer.append(event)
-        if event.event_type == StreamingEvent.TYPE_MESSAGE_CHUNK:
-            self.total_tokens += event.tokens
+        self._buffered_bytes += len(content) if content.isascii() else len(content.encode())
+        if self._flush_at is None:
+            self._flush_at = self._clock() + self.current_flush_interval()
 
         # Auto-flush if buffer is full
-        if len(self.event_buffer) >= self.buffer_size:
-            await self.flush()
+        if (
+            len(self.event_buffer) >= self.buffer_size
+            or self._buffered_bytes >= self.current_max_bytes()
+        ):
+            return await self.flush(reason="size")
+        return []
 
-    async def flush(self) -> list[StreamingEvent]:
+    async def flush(self, reason: str = "event") -> list[StreamingEvent]:
         """
-        Flush buffered events.
+        Flush buffered chunks.
+
+        Args:
+            reason: Flush trigger, for metrics (deadline, size, event, end)
 
         Returns:
-            List of buffered events
+            Buffered chunks merged into one message_chunk event (or empty list)
         """
-        events = self.event_buffer[:]
+        chunks = self.event_buffer
         self.event_buffer = []
-        return events
+        self._buffered_bytes = 0
+        self._flush_at = None
+        if chunks:
+            stream_flushes_total.labels(reason=reason).inc()
+        if len(chunks) <= 1:
+            return chunks
+
+        content = "".join(chunk.content for chunk in chunks)
+        return [
+            StreamingEvent(
+                StreamingEvent.TYPE_MESSAGE_CHUNK,
+                content,
+                tokens=sum(chunk.tokens for chunk in chunks),
+                metadata={"chunk_size": len(content), "chunks": len(chunks)},
+            )
+        ]
+
+    def record_drain(self, seconds: float) -> None:
+        """
+        Record how long the client took to take one event.
+
+        Args:
+            seconds: Time between handing an event out and the next request
+        """
+        if self._drain_time is None:
+            self._drain_time = seconds
+        else:
+            self._drain_time += self.DRAIN_SMOOTHING * (seconds - self._drain_time)
+
+    def current_flush_interval(self) -> float:
+        """Flush deadline for the measured drain time of the client."""
+        if self._drain_time is None:
+            return self.flush_interval
+        return min(self.max_flush_interval, max(self.flush_interval, self._drain_time))
+
+    def current_max_bytes(self) -> int:
+        """Byte threshold, grown with the flush deadline for a slow client."""
+        interval = self.current_flush_interval()
+        if self.flush_interval <= 0 or interval <= self.flush_interval:
+            return self.max_bytes
+        return int(self.max_bytes * interval / self.flush_interval)
+
+    def time_until_flush(self) -> Optional[float]:
+        """Seconds until buffered chunks are due, or None if nothing is buffered."""
+        if self._flush_at is None:
+            return None
+        return max(0.0, self._flush_at - self._clock())
+
+    async def stream(
+        self, events: AsyncIterator[StreamingEvent]
+    ) -> AsyncGenerator[StreamingEvent, None]:
+        """
+        Coalesce a stream of events under the flush policy.
+
+        Args:
+            events: Source events (read through a bounded queue)
+
+        Yields:
+            Events to send to the client
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        producer = asyncio.create_task(self._produce(events, queue))
+        try:
+            while True:
+                timeout = self.time_until_flush()
+                if timeout == 0:
+                    due = await self.flush(reason="deadline")
+                else:
+                    if not queue.empty():
+                        # Source is ahead of the client: no wait_for task per event
+                        item = queue.get_nowait()
+                    else:
+                        try:
+                            item = await asyncio.wait_for(queue.get(), timeout)
+                        except asyncio.TimeoutError:
+                            continue  # flushed at the top of the loop
+
+                    if item is self._END_OF_STREAM:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    due = await self.add_event(item)
+
+                for event in due:
+                    handed_out = self._clock()
+                    yield event
+                    # Resumed once the client has taken the event
+                    self.record_drain(self._clock() - handed_out)
+
+            for event in await self.flush(reason="end"):
+                yield event
+        finally:
+            # Client gone or stream done: stop reading the agent stream
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+    async def _produce(self, events: AsyncIterator[StreamingEvent], queue: asyncio.Queue):
+        """Read source events into the queue (blocks while the queue is full)."""
+        try:
+            async for event in events:
+                await queue.put(event)
+        except Exception as e:
+            await queue.put(e)
+        await queue.put(self._END_OF_STREAM)
 
     def get_total_tokens(self) -> int:
         """Get total token count processed so far."""
@@ -119,6 +354,57 @@ class StreamingManager:
         """Reset manager state."""
         self.event_buffer = []
         self.total_tokens = 0
+        self._buffered_bytes = 0
+        self._flush_at = None
+        self._first_chunk_sent = False
+        self._drain_time = None
+
+
+def _to_streaming_event(event: StreamEvent | MessageChunk) -> StreamingEvent:
+    """Convert a StreamingChatService event to the NDJSON/SSE wire event."""
+    if isinstance(event, (MessageChunk, MessageChunkEvent)):
+        return StreamingEvent(
+            StreamingEvent.TYPE_MESSAGE_CHUNK,
+            event.content,
+            tokens=event.token_count,
+            metadata={"chunk_size": len(event.content)},
+        )
+    if isinstance(event, ToolCallEvent):
+        return StreamingEvent(
+            StreamingEvent.TYPE_TOOL_CALL,
+            {"tool_name": event.tool_name, "args": event.tool_input, "call_id": event.call_id},
+            metadata={"timestamp": event.timestamp},
+        )
+    if isinstance(event, ToolResultEvent):
+        return StreamingEvent(
+            StreamingEvent.TYPE_TOOL_RESULT,
+            {
+                "tool_name": event.tool_name,
+                "call_id": event.call_id,
+                "result": event.result,
+                "success": not event.is_error,
+                "error": event.result if event.is_error else None,
+            },
+            metadata={"execution_time": event.execution_time_ms},
+        )
+    if isinstance(event, CompleteStateEvent):
+        return StreamingEvent(
+            StreamingEvent.TYPE_COMPLETE_STATE,
+            {
+                "message": event.final_message,
+                "message_id": event.message_id,
+                "tool_calls_count": event.tool_calls_count,
+                "total_tokens": event.total_tokens,
+            },
+            metadata={"status": "completed", "elapsed_time": event.elapsed_time},
+        )
+    return StreamingEvent(
+        StreamingEvent.TYPE_ERROR,
+        {
+            "message": getattr(event, "error_message", "Streaming error"),
+            "error_type": getattr(event, "error_code", "STREAM_PROCESSING_ERROR"),
+        },
+    )
 
 
 async def stream_agent_response(
@@ -126,161 +412,48 @@ async def stream_agent_response(
     message_content: str,
     user_id: str,
     db: AsyncSession,
-) -> AsyncGenerator[str, None]:
+    sse: bool = False,
+) -> AsyncGenerator[bytes, None]:
     """
-    Stream agent response as NDJSON events.
+    Stream agent response as NDJSON (or SSE) events.
 
-    This is the core streaming function that processes messages through the agent
-    and yields events as they occur.
+    Token deltas from the model are forwarded as they arrive, and tool calls
+    and tool results are interleaved as they happen; StreamingManager
+    coalesces chunks and applies backpressure. Events are encoded to bytes
+    with orjson, so the response writes them without another encoding step.
 
     Args:
         conversation_id: ID of conversation
         message_content: User message content
         user_id: ID of user
         db: Database session
+        sse: Format events as Server-Sent Events instead of NDJSON
 
     Yields:
-        NDJSON-formatted event strings
+        NDJSON- or SSE-formatted events
     """
+    encode = StreamingEvent.to_sse_bytes if sse else StreamingEvent.to_ndjson_bytes
     manager = StreamingManager()
+    chat_service = StreamingChatService(db)
+    logger.info(f"Starting agent stream for conversation {conversation_id}")
 
-    try:
-        # Get services
-        conversation_service = ConversationService(db)
-        agent_service = AgentService(db)
-
-        # Verify conversation exists and user has access
-        conversation = await conversation_service.get_conversation(conversation_id, user_id)
-        if not conversation:
-            event = StreamingEvent(
-                StreamingEvent.TYPE_ERROR,
-                {"message": "Conversation not found"},
-            )
-            yield event.to_ndjson()
-            return
-
-        # Create and save user message
-        message_repo = MessageRepository(db)
-        user_message = await message_repo.create(
-            {
-                "conversation_id": conversation_id,
-                "content": message_content,
-                "role": "user",
-                "metadata": {"source": "api", "stream": True},
-            }
-        )
-
-        # Initialize agent state
-        logger.info(f"Starting agent stream for conversation {conversation_id}")
-
-        # Stream agent response
-        message_buffer = ""
-        tool_calls = []
-
-        async for token in agent_service.stream_agent_response(
-            message_content=message_content,
-            conversation_id=str(conversation_id),
+    async def events() -> AsyncIterator[StreamingEvent]:
+        async for event in chat_service.stream_conversation_response(
+            conversation_id=conversation_id,
             user_id=user_id,
-            db=db,
+            user_message=message_content,
         ):
-            # Handle different token types
-            if token.get("type") == "message_chunk":
-                # Stream message chunk
-                chunk_text = token.get("content", "")
-                message_buffer += chunk_text
-                tokens = token.get("tokens", 1)
-
-                event = StreamingEvent(
-                    StreamingEvent.TYPE_MESSAGE_CHUNK,
-                    chunk_text,
-                    tokens=tokens,
-                    metadata={"chunk_size": len(chunk_text)},
-                )
-                await manager.add_event(event)
-
-                # Flush on interval basis
-                if len(manager.event_buffer) >= manager.buffer_size:
-                    for buffered_event in await manager.flush():
-                        yield buffered_event.to_ndjson()
-
-            elif token.get("type") == "tool_call":
-                # Streaming tool call
-                tool_name = token.get("tool_name")
-                tool_args = token.get("args", {})
-
-                event = StreamingEvent(
-                    StreamingEvent.TYPE_TOOL_CALL,
-                    {
-                        "tool_name": tool_name,
-                        "args": tool_args,
-                        "call_id": token.get("call_id"),
-                    },
-                    metadata={"timestamp": token.get("timestamp")},
-                )
-                await manager.add_event(event)
-                tool_calls.append({"tool": tool_name, "args": tool_args})
-
-                # Flush immediately for tool calls
-                for buffered_event in await manager.flush():
-                    yield buffered_event.to_ndjson()
-
-            elif token.get("type") == "tool_result":
-                # Tool execution result
-                tool_name = token.get("tool_name")
-                result = token.get("result")
-                success = token.get("success", True)
-
-                event = StreamingEvent(
-                    StreamingEvent.TYPE_TOOL_RESULT,
-                    {
-                        "tool_name": tool_name,
-                        "result": result,
-                        "success": success,
-                        "error": token.get("error"),
-                    },
-                    metadata={"execution_time": token.get("execution_time")},
-                )
-                await manager.add_event(event)
-
-                # Flush immediately for tool results
-                for buffered_event in await manager.flush():
-                    yield buffered_event.to_ndjson()
-
-        # Flush any remaining buffered events
-        for buffered_event in await manager.flush():
-            yield buffered_event.to_ndjson()
-
-        # Save agent response message
-        if message_buffer:
-            agent_message = await message_repo.create(
-                {
-                    "conversation_id": conversation_id,
-                    "content": message_buffer,
-                    "role": "assistant",
-                    "metadata": {
-                        "source": "agent",
-                        "stream": True,
-                        "tokens": manager.get_total_tokens(),
-                        "tool_calls": tool_calls,
-                    },
-                }
-            )
-            logger.info(f"Agent response saved: {agent_message.id}")
+            streaming_event = _to_streaming_event(event)
+            if streaming_event.event_type == StreamingEvent.TYPE_COMPLETE_STATE:
+                streaming_event.metadata["conversation_id"] = str(conversation_id)
+            yield streaming_event
 
-        # Send completion event
-        completion_event = StreamingEvent(
-            StreamingEvent.TYPE_COMPLETE_STATE,
-            {
-                "message": message_buffer,
-                "tool_calls": tool_calls,
-                "total_tokens": manager.get_total_tokens(),
-            },
-            metadata={
-                "conversation_id": str(conversation_id),
-                "status": "completed",
-            },
-        )
-        yield completion_event.to_ndjson()
+    try:
+        async for event in manager.stream(events()):
+            data = encode(event)
+            stream_frames_total.labels(event_type=event.event_type).inc()
+            stream_emitted_bytes_total.inc(len(data))
+            yield data
 
         logger.info(
             f"Agent streaming completed: conversation={conversation_id}, "
@@ -298,7 +471,7 @@ async def stream_agent_response(
                 "error_type": type(e).__name__,
             },
         )
-        yield error_event.to_ndjson()
+        yield encode(error_event)
 
 
 @router.post("/conversations/{conversation_id}/stream")
@@ -306,6 +479,7 @@ async def stream_conversation_message(
     conversation_id: UUID,
     request: MessageCreate,
     authorization: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_async_session),
 ) -> StreamingResponse:
     """
@@ -320,12 +494,14 @@ async def stream_conversation_message(
     - error: Any errors that occurred during processing
 
     The response format is NDJSON (newline-delimited JSON) for easy streaming
-    and progressive parsing.
+    and progressive parsing, or SSE if the client accepts text/event-stream.
+    Tokens are sent as the model generates them.
 
     Args:
         conversation_id: ID of the conversation
         request: MessageCreate with message content
         authorization: JWT authorization token
+        accept: Accept header (text/event-stream selects SSE)
         db: Database session
 
     Returns:
@@ -360,14 +536,16 @@ async def stream_conversation_message(
             user_id = "dev-user-default"
 
         # Create streaming response
+        sse = "text/event-stream" in (accept or "")
         return StreamingResponse(
             stream_agent_response(
                 conversation_id=conversation_id,
                 message_content=request.content,
                 user_id=user_id,
                 db=db,
+                sse=sse,
             ),
-            media_type="application/x-ndjson",
+            media_type="text/event-stream" if sse else "application/x-ndjson",
             headers={
                 "Cache-Control": "no-cache",
                 "Connection": "keep-alive",
@@ -395,6 +573,7 @@ async def stream_conversation_message_debug(
     conversation_id: UUID,
     request: MessageCreate,
     authorization: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_async_session),
 ) -> StreamingResponse:
     """
@@ -407,6 +586,7 @@ async def stream_conversation_message_debug(
         conversation_id: ID of the conversation
         request: MessageCreate with message content
         authorization: JWT authorization token
+        accept: Accept header (text/event-stream selects SSE)
         db: Database session
 
     Returns:
@@ -416,6 +596,7 @@ async def stream_conversation_message_debug(
         conversation_id=conversation_id,
         request=request,
         authorization=authorization,
+        accept=accept,
         db=db,
     )
 
@@ -433,6 +614,7 @@ async def health_check_stream() -> Dict[str, Any]:
         "streaming": {
             "enabled": True,
             "format": "application/x-ndjson",
+            "formats": ["application/x-ndjson", "text/event-stream"],
             "endpoints": [
                 "/api/v1/conversations/{conversation_id}/stream",
                 "/api/v1/conversations/{conversation_id}/stream-debug",
@@ -13,6 +13,7 @@ from typing import Optional, Dict, Any
 from uuid import UUID
 import logging
 
+from src.api.routing import SharedBodyRoute
 from src.db.config import get_async_session
 from src.models.conversation import ConversationORM
 from src.models.epic4_models import AgentCheckpoint, ToolCall
@@ -20,7 +21,7 @@ from src.models.message import MessageORM
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/v1", tags=["threads"])
+router = APIRouter(prefix="/api/v1", tags=["threads"], route_class=SharedBodyRoute)
 
 
 # Pydantic Models for Request/Response
@@ -8,12 +8,19 @@ from fastapi import APIRouter, Depends, HTTPException, status, Header
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
 
+from src.api.responses import StructuredJSONResponse
+from src.api.routing import SharedBodyRoute
 from src.db.config import get_async_session
 from src.services.agent_service import AgentService
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/tools", tags=["Tools"])
+router = APIRouter(
+    prefix="/api/tools",
+    tags=["Tools"],
+    route_class=SharedBodyRoute,
+    default_response_class=StructuredJSONResponse,
+)
 
 
 class ToolSchema(BaseModel):
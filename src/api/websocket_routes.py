@@ -3,95 +3,386 @@
 import asyncio
 import json
 import logging
-from typing import Optional, Dict, Any
+import os
+import time
+from typing import Optional, Dict, Any, Set
 from uuid import UUID
 
+import orjson
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.websockets import WebSocketState
 
 from src.db.config import get_async_session
+from src.infrastructure.cache_metrics import (
+    websocket_connections_active,
+    websocket_send_latency_ms,
+    websocket_send_queue_depth,
+    websocket_slow_consumers_total,
+)
+from src.infrastructure.websocket_router import WebSocketRouter
 from src.services.conversation_service import ConversationService
+from src.services.conversation_summarization_service import apply_summary
 from src.services.agent_service import AgentService
+from src.services.memory_service import get_memory_service
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["WebSocket"])
 
 
+class WebSocketConnection:
+    """
+    A registered WebSocket with a bounded send queue drained by a writer task.
+
+    Messages are queued as already-serialized text, so a broadcast encodes a
+    message once for all recipients, and a slow client only fills its own
+    queue instead of stalling delivery to the others.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        conversation_id: str,
+        user_id: str,
+        queue_size: int,
+        send_timeout: float,
+        slow_consumer_policy: str,
+    ):
+        """
+        Initialize connection.
+
+        Args:
+            websocket: Accepted WebSocket
+            conversation_id: Conversation ID
+            user_id: User ID
+            queue_size: Max messages waiting to be sent
+            send_timeout: Seconds a single send may block before the client is
+                treated as a slow consumer
+            slow_consumer_policy: "disconnect" or "drop" when the queue is full
+        """
+        self.websocket = websocket
+        self.conversation_id = conversation_id
+        self.user_id = user_id
+        self.send_timeout = send_timeout
+        self.slow_consumer_policy = slow_consumer_policy
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+        self._writer: Optional[asyncio.Task] = None
+        self._closing: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the writer task."""
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, payload: str) -> bool:
+        """
+        Queue a serialized message without waiting for the socket.
+
+        Args:
+            payload: JSON text frame
+
+        Returns:
+            True if queued; False if the connection is closed or too slow
+        """
+        if self.closed:
+            return False
+
+        websocket_send_queue_depth.observe(self.queue.qsize())
+        try:
+            self.queue.put_nowait((payload, time.perf_counter()))
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.slow_consumer_policy == "drop":
+            websocket_slow_consumers_total.labels(action="dropped").inc()
+            logger.warning(
+                f"WebSocket send queue full, dropping message: user={self.user_id}, "
+                f"conversation={self.conversation_id}"
+            )
+        else:
+            websocket_slow_consumers_total.labels(action="disconnected").inc()
+            logger.warning(
+                f"WebSocket send queue full, disconnecting slow consumer: user={self.user_id}, "
+                f"conversation={self.conversation_id}"
+            )
+            self._closing = asyncio.create_task(self.close(code=status.WS_1013_TRY_AGAIN_LATER))
+        return False
+
+    async def _write_loop(self) -> None:
+        """Send queued messages in order until the connection closes."""
+        try:
+            while True:
+                payload, queued_at = await self.queue.get()
+                await asyncio.wait_for(
+                    self.websocket.send_text(payload), timeout=self.send_timeout
+                )
+                websocket_send_latency_ms.observe((time.perf_counter() - queued_at) * 1000)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            websocket_slow_consumers_total.labels(action="disconnected").inc()
+            logger.warning(
+                f"WebSocket send timed out, disconnecting slow consumer: user={self.user_id}, "
+                f"conversation={self.conversation_id}"
+            )
+            self._writer = None  # close() must not cancel this task
+            await self.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        except Exception as e:
+            logger.info(f"WebSocket send failed, closing connection: {str(e)}")
+            self._writer = None
+            await self.close()
+
+    async def close(self, code: int = status.WS_1000_NORMAL_CLOSURE) -> None:
+        """Stop the writer and close the socket (the receive loop then exits)."""
+        if self.closed:
+            return
+        self.closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+
 class ConnectionManager:
     """
     Manages WebSocket connections for real-time communication.
 
-    Handles connection lifecycle, message broadcasting, and cleanup.
+    Handles connection lifecycle, message broadcasting, and cleanup. Every
+    connection has its own bounded send queue and writer task; a broadcast
+    serializes the message once and queues the same text for each recipient
+    without awaiting any socket. A client whose queue is full (or whose send
+    blocks longer than the send timeout) is a slow consumer: it is
+    disconnected (it reconnects and reloads the conversation), or, with the
+    "drop" policy, the message is dropped for it.
+
+    Participants of a conversation may be connected to other replicas: a
+    broadcast is also published once through the WebSocketRouter (Redis
+    pub/sub with STATE_BACKEND=redis), which queues the same text for the
+    connections on the other nodes and tracks presence.
+
+    Configuration via environment variables:
+    - WS_SEND_QUEUE_SIZE: Max messages queued per connection (default: 256)
+    - WS_SEND_TIMEOUT_MS: Max time a single send may block (default: 5000)
+    - WS_SLOW_CONSUMER_POLICY: "disconnect" or "drop" (default: disconnect)
     """
 
-    def __init__(self):
-        """Initialize connection manager."""
-        # Active connections: {conversation_id: {user_id: websocket}}
-        self.active_connections: Dict[str, Dict[str, WebSocket]] = {}
+    def __init__(
+        self,
+        queue_size: Optional[int] = None,
+        send_timeout: Optional[float] = None,
+        slow_consumer_policy: Optional[str] = None,
+        router: Optional[WebSocketRouter] = None,
+    ):
+        """
+        Initialize connection manager.
 
-    async def connect(self, websocket: WebSocket, conversation_id: str, user_id: str):
+        Args:
+            queue_size: Max messages queued per connection
+            send_timeout: Seconds a single send may block
+            slow_consumer_policy: "disconnect" or "drop"
+            router: Cross-node router (default: one on the global state backend)
         """
-        Accept and register a new WebSocket connection.
+        self.queue_size = int(queue_size or os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+        self.send_timeout = (
+            float(os.getenv("WS_SEND_TIMEOUT_MS", "5000")) / 1000.0
+            if send_timeout is None else send_timeout
+        )
+        self.slow_consumer_policy = (
+            slow_consumer_policy or os.getenv("WS_SLOW_CONSUMER_POLICY", "disconnect")
+        ).lower()
+        # Active connections: {conversation_id: {user_id: connection}}
+        self.active_connections: Dict[str, Dict[str, WebSocketConnection]] = {}
+        self.router = router if router is not None else WebSocketRouter(self.deliver_local)
+        self._routing_tasks: Set[asyncio.Task] = set()
+
+    async def connect(
+        self, websocket: WebSocket, conversation_id: str, user_id: str
+    ) -> WebSocketConnection:
+        """
+        Accept (if not yet accepted) and register a new WebSocket connection.
 
         Args:
             websocket: WebSocket connection
             conversation_id: Conversation ID
             user_id: User ID
+
+        Returns:
+            Registered connection
         """
-        await websocket.accept()
+        if websocket.client_state == WebSocketState.CONNECTING:
+            await websocket.accept()
 
         if conversation_id not in self.active_connections:
             self.active_connections[conversation_id] = {}
 
-        self.active_connections[conversation_id][user_id] = websocket
+        previous = self.active_connections[conversation_id].get(user_id)
+        if previous is not None:
+            # Reconnect from the same user replaces the old socket
+            await previous.close()
+            websocket_connections_active.dec()
+
+        connection = WebSocketConnection(
+            websocket,
+            conversation_id,
+            user_id,
+            queue_size=self.queue_size,
+            send_timeout=self.send_timeout,
+            slow_consumer_policy=self.slow_consumer_policy,
+        )
+        connection.start()
+        self.active_connections[conversation_id][user_id] = connection
+        websocket_connections_active.inc()
+        await self.router.join(conversation_id, user_id)
 
         logger.info(f"WebSocket connected: user={user_id}, conversation={conversation_id}")
+        return connection
 
-    def disconnect(self, conversation_id: str, user_id: str):
+    def disconnect(self, conversation_id: str, user_id: str, websocket: Optional[WebSocket] = None):
         """
         Remove a WebSocket connection.
 
         Args:
             conversation_id: Conversation ID
             user_id: User ID
+            websocket: Only remove the connection if it is this socket (a
+                replaced socket must not remove its successor)
         """
-        if conversation_id in self.active_connections:
-            if user_id in self.active_connections[conversation_id]:
-                del self.active_connections[conversation_id][user_id]
+        connections = self.active_connections.get(conversation_id)
+        if connections is None:
+            return
+
+        connection = connections.get(user_id)
+        if connection is not None and (websocket is None or connection.websocket is websocket):
+            del connections[user_id]
+            connection.closed = True
+            if connection._writer is not None:
+                connection._writer.cancel()
+            websocket_connections_active.dec()
+            logger.info(f"WebSocket disconnected: user={user_id}, conversation={conversation_id}")
+            self._leave(conversation_id, user_id)
+
+        # Clean up empty conversation
+        if not connections:
+            del self.active_connections[conversation_id]
+
+    def _leave(self, conversation_id: str, user_id: str) -> None:
+        """Update routing and presence in the background (disconnect does not wait)."""
+        if not self.router.distributed:
+            return
+        task = asyncio.create_task(
+            self.router.leave(
+                conversation_id,
+                user_id,
+                lambda: self.active_connections.get(conversation_id, {}),
+            )
+        )
+        self._routing_tasks.add(task)
+        task.add_done_callback(self._routing_tasks.discard)
 
-            # Clean up empty conversation
-            if not self.active_connections[conversation_id]:
-                del self.active_connections[conversation_id]
+    def get_connection(self, conversation_id: str, user_id: str) -> Optional[WebSocketConnection]:
+        """Registered connection of a user in a conversation, if any."""
+        return self.active_connections.get(conversation_id, {}).get(user_id)
 
-        logger.info(f"WebSocket disconnected: user={user_id}, conversation={conversation_id}")
+    @staticmethod
+    def serialize(message: dict) -> str:
+        """Encode a message as a JSON text frame."""
+        return orjson.dumps(message).decode()
 
     async def send_message(self, websocket: WebSocket, message: dict):
         """
         Send a message to a specific WebSocket.
 
+        Queued behind earlier messages if the socket is registered; sent
+        directly otherwise (e.g. errors before registration).
+
         Args:
             websocket: WebSocket connection
             message: Message dict to send
         """
+        for connections in self.active_connections.values():
+            for connection in connections.values():
+                if connection.websocket is websocket:
+                    connection.enqueue(self.serialize(message))
+                    return
         try:
-            await websocket.send_json(message)
+            await websocket.send_text(self.serialize(message))
         except Exception as e:
             logger.error(f"Error sending WebSocket message: {str(e)}")
 
-    async def broadcast_to_conversation(self, conversation_id: str, message: dict):
+    async def send_to_user(self, conversation_id: str, user_id: str, message: dict) -> bool:
         """
-        Broadcast a message to all connections in a conversation.
+        Queue a message for one user's connection in a conversation.
+
+        Args:
+            conversation_id: Conversation ID
+            user_id: User ID
+            message: Message dict to send
+
+        Returns:
+            True if queued
+        """
+        connection = self.get_connection(conversation_id, user_id)
+        if connection is None:
+            return False
+        return connection.enqueue(self.serialize(message))
+
+    async def broadcast_to_conversation(self, conversation_id: str, message: dict) -> int:
+        """
+        Broadcast a message to all connections in a conversation, on every node.
+
+        The message is serialized once, queued for every local connection and
+        published once for the other nodes; this does not wait for any client.
 
         Args:
             conversation_id: Conversation ID
             message: Message dict to broadcast
+
+        Returns:
+            Number of local connections the message was queued for
         """
-        if conversation_id not in self.active_connections:
-            return
+        payload = self.serialize(message)
+        queued = self.deliver_local(conversation_id, payload)
+        await self.router.publish(conversation_id, payload)
+        return queued
+
+    def deliver_local(self, conversation_id: str, payload: str) -> int:
+        """
+        Queue a serialized message for this node's connections in a conversation.
+
+        Args:
+            conversation_id: Conversation ID
+            payload: JSON text frame
+
+        Returns:
+            Number of connections the message was queued for
+        """
+        connections = self.active_connections.get(conversation_id)
+        if not connections:
+            return 0
+        return sum(connection.enqueue(payload) for connection in list(connections.values()))
+
+    async def get_presence(self, conversation_id: str) -> Dict[str, str]:
+        """
+        Users connected to a conversation, on this node or another one.
+
+        Args:
+            conversation_id: Conversation ID
 
-        for user_id, websocket in self.active_connections[conversation_id].items():
-            await self.send_message(websocket, message)
+        Returns:
+            Node ID per user ID
+        """
+        node_id = self.router.backend.node_id
+        local_users = self.active_connections.get(conversation_id, {})
+        presence = {user_id: node_id for user_id in local_users}
+        try:
+            presence.update(await self.router.presence(conversation_id))
+        except Exception as e:
+            logger.warning(f"Presence unavailable for {conversation_id}, showing this node: {e}")
+        return presence
 
 
 # Global connection manager
@@ -132,6 +423,17 @@ async def websocket_conversation(
     }
     ```
 
+    **Client -> Server (draft, while typing):**
+    ```json
+    {
+        "type": "draft",
+        "content": "Partial message text"
+    }
+    ```
+    Drafts are debounced and searched in the background; the RAG context of
+    the next message reuses that search if the message is similar enough.
+    No reply is sent.
+
     **Client -> Server (ping):**
     ```json
     {
@@ -259,27 +561,19 @@ async def websocket_conversation(
         # Register connection
         await manager.connect(websocket, str(conversation_id), user_id)
 
-        # Load conversation context
-        messages, total_tokens = await conv_service.msg_repo.get_messages_with_tokens(
+        # Load conversation stats (history for the agent is loaded per message
+        # by the memory service; the token total is kept on the conversation)
+        message_count = await conv_service.msg_repo.get_conversation_message_count(
             conversation_id
         )
 
-        # Format message history for agent
-        message_history = [
-            {
-                "role": msg.role,
-                "content": msg.content,
-            }
-            for msg in messages[-20:]  # Last 20 messages for context
-        ]
-
         # Send ready message
-        await websocket.send_json({
+        await manager.send_message(websocket, {
             "type": "ready",
             "conversation_id": str(conversation_id),
             "message": "Connected to conversation",
-            "message_count": len(messages),
-            "total_tokens": total_tokens,
+            "message_count": message_count,
+            "total_tokens": conversation.total_tokens or 0,
         })
 
         # Start heartbeat task
@@ -297,7 +591,14 @@ async def websocket_conversation(
 
                 if message_type == "ping":
                     # Respond to ping
-                    await websocket.send_json({"type": "pong"})
+                    await manager.send_message(websocket, {"type": "pong"})
+                    continue
+
+                elif message_type == "draft":
+                    # Prefetch RAG context while the user is typing
+                    get_memory_service().prefetcher.submit(
+                        conversation_id, user_id, data.get("content", "")
+                    )
                     continue
 
                 elif message_type == "message":
@@ -310,20 +611,10 @@ async def websocket_conversation(
                         user_message=data.get("content", ""),
                         include_rag=data.get("include_rag", True),
                         conversation=conversation,
-                        message_history=message_history,
                     )
 
-                    # Reload message history after processing
-                    messages, total_tokens = await conv_service.msg_repo.get_messages_with_tokens(
-                        conversation_id
-                    )
-                    message_history = [
-                        {"role": msg.role, "content": msg.content}
-                        for msg in messages[-20:]
-                    ]
-
                 else:
-                    await websocket.send_json({
+                    await manager.send_message(websocket, {
                         "type": "error",
                         "error": f"Unknown message type: {message_type}",
                     })
@@ -340,18 +631,16 @@ async def websocket_conversation(
 
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}", exc_info=True)
-        try:
-            await websocket.send_json({
-                "type": "error",
-                "error": f"Internal error: {str(e)}",
-            })
-        except:
-            pass
+        await manager.send_message(websocket, {
+            "type": "error",
+            "error": f"Internal error: {str(e)}",
+        })
 
     finally:
         # Clean up
         if user_id:
-            manager.disconnect(str(conversation_id), user_id)
+            manager.disconnect(str(conversation_id), user_id, websocket)
+            get_memory_service().prefetcher.discard(conversation_id, user_id)
 
         if session:
             await session.close()
@@ -365,11 +654,15 @@ async def process_user_message(
     user_message: str,
     include_rag: bool,
     conversation: Any,
-    message_history: list,
 ):
     """
     Process a user message and stream agent response.
 
+    Recent history (Redis history window, database fallback) and RAG context
+    are loaded by the memory service concurrently with saving the message.
+    Agent output is broadcast to every connection in the conversation; the
+    acknowledgment and errors go to the sender only.
+
     Args:
         websocket: WebSocket connection
         conversation_id: Conversation ID
@@ -378,34 +671,70 @@ async def process_user_message(
         user_message: User's message content
         include_rag: Whether to include RAG search
         conversation: Conversation object
-        message_history: Recent message history
     """
+    async def broadcast(message: dict):
+        await manager.broadcast_to_conversation(str(conversation_id), message)
+
     try:
         conv_service = ConversationService(session)
         agent_service = AgentService(session)
 
-        # Save user message
-        user_msg = await conv_service.add_message(
-            conversation_id=conversation_id,
-            role="user",
-            content=user_message,
+        # Save user message while loading memory context
+        memory_task = asyncio.create_task(
+            get_memory_service().load(
+                str(conversation_id), user_id, user_message, include_rag=include_rag
+            )
         )
+        try:
+            user_msg = await conv_service.add_message(
+                conversation_id=conversation_id,
+                role="user",
+                content=user_message,
+                deferred=True,
+            )
+        except BaseException:
+            memory_task.cancel()
+            raise
 
         logger.info(f"Saved user message {user_msg.id} in conversation {conversation_id}")
 
         # Send acknowledgment
-        await websocket.send_json({
+        await manager.send_message(websocket, {
             "type": "message_received",
             "message_id": str(user_msg.id),
         })
 
         # Send agent thinking indicator
-        await websocket.send_json({
+        await broadcast({
             "type": "agent_thinking",
             "content": "Processing your message...",
             "done": False,
         })
 
+        # Pick up the summary and token total written since the last turn
+        # (the deferred save above does not use this session)
+        try:
+            await session.refresh(conversation, ["summary", "meta", "total_tokens"])
+        except BaseException:
+            memory_task.cancel()
+            raise
+
+        memory_context = await memory_task
+        # The running summary replaces the messages it covers; the window may
+        # already contain the message saved above
+        summary, history = apply_summary(
+            conversation, memory_context["conversation_history"]
+        )
+        message_history = [
+            {
+                "role": msg["role"],
+                "content": msg["content"],
+                "tokens_used": msg.get("tokens_used"),
+            }
+            for msg in history
+            if msg["id"] != str(user_msg.id)
+        ]
+
         final_state = None
 
         async for event in agent_service.stream_message(
@@ -414,24 +743,26 @@ async def process_user_message(
             user_message=user_message,
             system_prompt=conversation.system_prompt,
             message_history=message_history,
+            context_documents=memory_context["rag_context"],
+            summary=summary,
         ):
             event_type = event.get("type")
 
             if event_type == "content":
-                await websocket.send_json({
+                await broadcast({
                     "type": "response",
                     "content": event.get("content", ""),
                     "done": False,
                 })
             elif event_type == "tool_call":
-                await websocket.send_json({
+                await broadcast({
                     "type": "tool_call",
                     "tool_name": event.get("tool_name"),
                     "tool_input": event.get("tool_input"),
                     "call_id": event.get("call_id"),
                 })
             elif event_type == "tool_result":
-                await websocket.send_json({
+                await broadcast({
                     "type": "tool_result",
                     "call_id": event.get("call_id"),
                     "result": event.get("result"),
@@ -439,9 +770,9 @@ async def process_user_message(
             elif event_type == "complete_state":
                 final_state = event
             elif event_type == "error":
-                await websocket.send_json(event)
+                await manager.send_message(websocket, event)
 
-        await websocket.send_json({
+        await broadcast({
             "type": "agent_thinking",
             "content": "Generating response...",
             "done": True,
@@ -457,11 +788,13 @@ async def process_user_message(
             content=final_state.get("response", "I processed your message."),
             tool_calls=final_state.get("tool_calls"),
             tool_results=final_state.get("tool_results"),
-            tokens_used=final_state.get("tokens_used"),
+            # LLM usage covers the whole prompt; the message itself is counted at insert
+            metadata={"usage_tokens": final_state.get("tokens_used")},
+            deferred=True,
         )
 
         # Send completion
-        await websocket.send_json({
+        await broadcast({
             "type": "complete",
             "message_id": str(assistant_msg.id),
             "tokens_used": final_state.get("tokens_used", 0),
@@ -471,7 +804,7 @@ async def process_user_message(
 
     except Exception as e:
         logger.error(f"Error processing user message: {str(e)}", exc_info=True)
-        await websocket.send_json({
+        await manager.send_message(websocket, {
             "type": "error",
             "error": f"Failed to process message: {str(e)}",
         })
@@ -490,13 +823,16 @@ async def heartbeat_loop(websocket: WebSocket, conversation_id: str, user_id: st
         while True:
             await asyncio.sleep(30)  # Send heartbeat every 30 seconds
 
-            try:
-                await websocket.send_json({"type": "heartbeat"})
-            except:
-                # Connection closed
-                logger.info(f"Heartbeat failed for conversation {conversation_id}, closing")
-                manager.disconnect(conversation_id, user_id)
+            connection = manager.get_connection(conversation_id, user_id)
+            if connection is None or connection.websocket is not websocket or connection.closed:
+                # Connection closed or replaced
+                logger.info(f"Heartbeat stopped for conversation {conversation_id}")
                 break
+            connection.enqueue(manager.serialize({"type": "heartbeat"}))
+            try:
+                await manager.router.touch(conversation_id, user_id)
+            except Exception as e:
+                logger.debug(f"Presence refresh failed for {conversation_id}: {e}")
 
     except asyncio.CancelledError:
         logger.info(f"Heartbeat loop cancelled for conversation {conversation_id}")
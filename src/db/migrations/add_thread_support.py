@@ -4,6 +4,9 @@ This script adds the following changes to the database:
 1. Creates tool_calls table for tracking tool execution
 2. Creates agent_checkpoints table for LangGraph state snapshots
 3. Creates appropriate indexes for performance
+4. Adds tool_calls.cache_hit (tool result cache) to existing tables
+5. Adds conversations.total_tokens (running token count) and backfills it
+6. Creates api_cost_records table for persisted Claude API cost records
 """
 
 import asyncio
@@ -34,11 +37,12 @@ class Migration:
         if self.engine:
             await self.engine.dispose()
 
-    async def execute(self, query: str):
-        """Execute raw SQL query"""
+    async def execute(self, *queries: str):
+        """Execute raw SQL queries in one transaction"""
         async with self.async_session() as session:
             try:
-                await session.execute(text(query))
+                for query in queries:
+                    await session.execute(text(query))
                 await session.commit()
             except Exception as e:
                 await session.rollback()
@@ -61,6 +65,7 @@ class Migration:
             is_error BOOLEAN DEFAULT FALSE,
             error_message TEXT,
             execution_time_ms FLOAT,
+            cache_hit BOOLEAN DEFAULT FALSE,
             user_confirmed BOOLEAN DEFAULT FALSE,
             created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
             completed_at TIMESTAMP WITH TIME ZONE,
@@ -71,6 +76,75 @@ class Migration:
         await self.execute(query)
         logger.info("✓ Created tool_calls table")
 
+    async def column_exists(self, table: str, column: str) -> bool:
+        """Check whether a column is already present"""
+        async with self.async_session() as session:
+            result = await session.execute(
+                text("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = :table AND column_name = :column
+                """),
+                {"table": table, "column": column},
+            )
+            return result.first() is not None
+
+    async def add_tool_calls_cache_hit_column(self):
+        """Add cache_hit column to tool_calls tables created before it existed"""
+        query = """
+        ALTER TABLE tool_calls ADD COLUMN IF NOT EXISTS cache_hit BOOLEAN DEFAULT FALSE;
+        """
+        await self.execute(query)
+        logger.info("✓ Added tool_calls.cache_hit column")
+
+    async def add_conversations_total_tokens_column(self):
+        """Add the running token total to conversations and backfill it once"""
+        # Once the column exists the application maintains it; backfilling
+        # again would overwrite live counters
+        if await self.column_exists("conversations", "total_tokens"):
+            logger.info("✓ conversations.total_tokens already present, backfill skipped")
+            return
+
+        # Messages written before token counts were stored get an estimate
+        # (about 4 characters per token). Column and backfill commit together.
+        await self.execute(
+            """
+            UPDATE messages SET tokens_used = CEIL(CHAR_LENGTH(content) / 4.0)
+            WHERE tokens_used IS NULL;
+            """,
+            """
+            ALTER TABLE conversations ADD COLUMN total_tokens INTEGER NOT NULL DEFAULT 0;
+            """,
+            """
+            UPDATE conversations c SET total_tokens = COALESCE(
+                (SELECT SUM(m.tokens_used) FROM messages m WHERE m.conversation_id = c.id), 0
+            );
+            """,
+        )
+        logger.info("✓ Added conversations.total_tokens column and backfilled it")
+
+    async def create_api_cost_records_table(self):
+        """Create api_cost_records table (batches written by the cost tracker)"""
+        query = """
+        CREATE TABLE IF NOT EXISTS api_cost_records (
+            id BIGSERIAL PRIMARY KEY,
+            created_at TIMESTAMP NOT NULL,
+            model VARCHAR(100) NOT NULL,
+            conversation_id VARCHAR(255),
+            user_id VARCHAR(255),
+            query_tokens INTEGER NOT NULL DEFAULT 0,
+            cache_read_tokens INTEGER NOT NULL DEFAULT 0,
+            cache_write_tokens INTEGER NOT NULL DEFAULT 0,
+            cache_hit BOOLEAN NOT NULL DEFAULT FALSE,
+            total_cost DOUBLE PRECISION NOT NULL DEFAULT 0
+        );
+        """
+        await self.execute(query)
+        await self.execute("""
+        CREATE INDEX IF NOT EXISTS idx_api_cost_records_user_created
+        ON api_cost_records(user_id, created_at);
+        """)
+        logger.info("✓ Created api_cost_records table")
+
     async def create_agent_checkpoints_table(self):
         """Create agent_checkpoints table"""
         query = """
@@ -123,11 +197,23 @@ class Migration:
             logger.info("\nStep 3: Creating performance indexes...")
             await self.create_indexes()
 
+            logger.info("\nStep 4: Adding tool_calls.cache_hit column...")
+            await self.add_tool_calls_cache_hit_column()
+
+            logger.info("\nStep 5: Adding conversations.total_tokens column...")
+            await self.add_conversations_total_tokens_column()
+
+            logger.info("\nStep 6: Creating api_cost_records table...")
+            await self.create_api_cost_records_table()
+
             logger.info("\n=== Migration Completed Successfully ===\n")
             logger.info("Summary:")
             logger.info("  - tool_calls table: ✓ Created")
             logger.info("  - agent_checkpoints table: ✓ Created")
             logger.info("  - Performance indexes: ✓ Created (7 total)")
+            logger.info("  - tool_calls.cache_hit column: ✓ Added")
+            logger.info("  - conversations.total_tokens column: ✓ Added")
+            logger.info("  - api_cost_records table: ✓ Created")
 
         except Exception as e:
             logger.error(f"\n✗ Migration failed: {str(e)}")
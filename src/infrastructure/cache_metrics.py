@@ -123,6 +123,177 @@ llm_cached_responses_served = Counter(
     registry=cache_registry,
 )
 
+# ============================================================================
+# JWT Verification Cache Metrics
+# ============================================================================
+
+auth_token_cache_lookups_total = Counter(
+    name="auth_token_cache_lookups_total",
+    documentation="JWT verification cache lookups by result (hit, redis_hit, miss)",
+    labelnames=["result"],
+    registry=cache_registry,
+)
+
+auth_token_cache_evictions_total = Counter(
+    name="auth_token_cache_evictions_total",
+    documentation="JWT verification cache entries evicted to stay within the size bound",
+    registry=cache_registry,
+)
+
+auth_token_cache_entries = Gauge(
+    name="auth_token_cache_entries",
+    documentation="Current number of entries in the in-process JWT verification cache",
+    registry=cache_registry,
+)
+
+# ============================================================================
+# RAG Prefetch Metrics
+# ============================================================================
+
+rag_prefetch_searches_total = Counter(
+    name="rag_prefetch_searches_total",
+    documentation="Background RAG searches for message drafts by outcome "
+                  "(completed, failed, cancelled)",
+    labelnames=["outcome"],
+    registry=cache_registry,
+)
+
+rag_prefetch_lookups_total = Counter(
+    name="rag_prefetch_lookups_total",
+    documentation="Prefetched RAG results looked up by a sent message, by result "
+                  "(hit, pending_hit, dissimilar, expired, miss)",
+    labelnames=["result"],
+    registry=cache_registry,
+)
+
+# ============================================================================
+# Tool Result Cache Metrics
+# ============================================================================
+
+tool_result_cache_lookups_total = Counter(
+    name="tool_result_cache_lookups_total",
+    documentation="Agent tool result cache lookups by tool and result (hit, redis_hit, miss)",
+    labelnames=["tool", "result"],
+    registry=cache_registry,
+)
+
+# ============================================================================
+# Web Search Metrics
+# ============================================================================
+
+web_search_backend_requests_total = Counter(
+    name="web_search_backend_requests_total",
+    documentation="Web search backend requests by backend and outcome "
+                  "(success, error, cancelled by a faster hedged request)",
+    labelnames=["backend", "outcome"],
+    registry=cache_registry,
+)
+
+web_search_cache_lookups_total = Counter(
+    name="web_search_cache_lookups_total",
+    documentation="Web search result cache lookups by result (hit, miss)",
+    labelnames=["result"],
+    registry=cache_registry,
+)
+
+# ============================================================================
+# WebSocket Fan-out Metrics
+# ============================================================================
+
+websocket_connections_active = Gauge(
+    name="websocket_connections_active",
+    documentation="Registered WebSocket connections with a send queue",
+    registry=cache_registry,
+)
+
+websocket_send_queue_depth = Histogram(
+    name="websocket_send_queue_depth",
+    documentation="Per-connection WebSocket send queue depth when a message is queued",
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 500),
+    registry=cache_registry,
+)
+
+websocket_send_latency_ms = Histogram(
+    name="websocket_send_latency_ms",
+    documentation="Time from queueing a WebSocket message to the frame being sent",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000),
+    registry=cache_registry,
+)
+
+websocket_slow_consumers_total = Counter(
+    name="websocket_slow_consumers_total",
+    documentation="Messages for slow WebSocket consumers by action (dropped, disconnected)",
+    labelnames=["action"],
+    registry=cache_registry,
+)
+
+websocket_routed_messages_total = Counter(
+    name="websocket_routed_messages_total",
+    documentation="WebSocket messages routed between nodes (published, received, failed)",
+    labelnames=["direction"],
+    registry=cache_registry,
+)
+
+# ============================================================================
+# Message Persistence Metrics
+# ============================================================================
+
+message_persist_pending = Gauge(
+    name="message_persist_pending",
+    documentation="Chat messages queued for write-behind persistence",
+    registry=cache_registry,
+)
+
+message_persist_batch_size = Histogram(
+    name="message_persist_batch_size",
+    documentation="Messages written per write-behind batch",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+    registry=cache_registry,
+)
+
+message_persist_writes_total = Counter(
+    name="message_persist_writes_total",
+    documentation="Chat messages persisted by outcome (written, failed, retried, dropped)",
+    labelnames=["outcome"],
+    registry=cache_registry,
+)
+
+# ============================================================================
+# Conversation Summarization Metrics
+# ============================================================================
+
+summarization_jobs_total = Counter(
+    name="summarization_jobs_total",
+    documentation="Background conversation summary jobs by outcome "
+                  "(queued, deduplicated, dropped, updated, unchanged, failed)",
+    labelnames=["outcome"],
+    registry=cache_registry,
+)
+
+# ============================================================================
+# Streaming Response Metrics
+# ============================================================================
+
+stream_emitted_bytes_total = Counter(
+    name="stream_emitted_bytes_total",
+    documentation="Encoded bytes written to NDJSON/SSE streaming responses",
+    registry=cache_registry,
+)
+
+stream_frames_total = Counter(
+    name="stream_frames_total",
+    documentation="Events written to NDJSON/SSE streaming responses by event type",
+    labelnames=["event_type"],
+    registry=cache_registry,
+)
+
+stream_flushes_total = Counter(
+    name="stream_flushes_total",
+    documentation="Streaming chunk flushes by trigger (first_token, deadline, size, event, end)",
+    labelnames=["reason"],
+    registry=cache_registry,
+)
+
 # ============================================================================
 # Metric Recording Functions
 # ============================================================================
@@ -1,16 +1,39 @@
 """
 Claude API 成本追踪
 
-追踪和分析 Claude API 的使用成本和节省额度。
+追踪和分析 Claude API 的使用成本和节省额度。摘要由增量维护的汇总计算,
+不随调用次数变慢。
 """
 
-from typing import Dict, List, Optional
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+import asyncio
 import logging
+import os
+
+from sqlalchemy import text
+
+from src.infrastructure.state_backend import SharedCounters
 
 logger = logging.getLogger(__name__)
 
+# 共享状态中的汇总键
+TOTALS_KEY = "cost:totals"
+USER_KEY = "cost:user:{}"
+HOUR_KEY = "cost:hour:{:%Y%m%d%H}"
+
+INSERT_COST_RECORD = text("""
+INSERT INTO api_cost_records (
+    created_at, model, conversation_id, user_id, query_tokens,
+    cache_read_tokens, cache_write_tokens, cache_hit, total_cost
+) VALUES (
+    :created_at, :model, :conversation_id, :user_id, :query_tokens,
+    :cache_read_tokens, :cache_write_tokens, :cache_hit, :total_cost
+)
+""")
+
 
 @dataclass
 class CostRecord:
@@ -58,13 +81,122 @@ class CostRecord:
         return 0.0
 
 
+@dataclass
+class CostTotals:
+    """增量维护的成本汇总"""
+    calls: int = 0
+    cache_hits: int = 0
+    tokens: int = 0
+    cost: float = 0.0
+    cost_without_cache: float = 0.0
+
+    @staticmethod
+    def deltas(record: CostRecord) -> Dict[str, Any]:
+        """一条记录对各汇总字段的增量"""
+        return {
+            "calls": 1,
+            "cache_hits": 1 if record.cache_hit else 0,
+            "tokens": record.query_tokens + record.cache_read_tokens + record.cache_write_tokens,
+            "cost": record.total_cost,
+            "cost_without_cache": record.cost_without_cache,
+        }
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, float]) -> "CostTotals":
+        """由共享状态中的哈希字段构建"""
+        return cls(
+            calls=int(fields.get("calls", 0)),
+            cache_hits=int(fields.get("cache_hits", 0)),
+            tokens=int(fields.get("tokens", 0)),
+            cost=fields.get("cost", 0.0),
+            cost_without_cache=fields.get("cost_without_cache", 0.0),
+        )
+
+    def add(self, record: CostRecord) -> None:
+        """累加一条记录"""
+        self.merge(CostTotals(**self.deltas(record)))
+
+    def merge(self, other: "CostTotals") -> None:
+        """累加另一个汇总"""
+        self.calls += other.calls
+        self.cache_hits += other.cache_hits
+        self.tokens += other.tokens
+        self.cost += other.cost
+        self.cost_without_cache += other.cost_without_cache
+
+    @property
+    def saved(self) -> float:
+        """节省的成本"""
+        return self.cost_without_cache - self.cost
+
+
 class ClaudeApiCostTracker:
-    """Claude API 成本追踪器"""
+    """
+    Claude API 成本追踪器
+
+    最近的调用记录保存在固定大小的环形缓冲区中; 摘要由记录时增量维护的
+    汇总 (全部, 按用户, 按小时) 计算, 与调用次数无关, 内存也不会随运行
+    时间增长。按天的摘要由小时汇总求和, 窗口精确到小时。
+
+    汇总同时写入共享状态 (src.infrastructure.state_backend), 多个 worker
+    进程的汇总由 get_shared_* 方法读取; get_summary 等只反映本进程。
+
+    可选地把记录分批写入 Postgres 表 api_cost_records (见
+    src/db/migrations/add_thread_support.py), 供长期分析使用。
+
+    Configuration via environment variables:
+    - COST_TRACKER_MAX_RECORDS: 内存中保留的最近记录数 (default: 10000)
+    - COST_TRACKER_RETENTION_DAYS: 小时汇总的保留天数 (default: 90)
+    - COST_TRACKER_PERSIST: 是否写入数据库 (default: false)
+    - COST_TRACKER_PERSIST_BATCH_SIZE: 每批写入的记录数 (default: 100)
+    """
+
+    def __init__(
+        self,
+        max_records: Optional[int] = None,
+        retention_days: Optional[int] = None,
+        persist: Optional[bool] = None,
+        persist_batch_size: Optional[int] = None,
+        session_factory: Optional[Callable[[], Any]] = None,
+        counters: Optional[SharedCounters] = None,
+    ):
+        """
+        初始化成本追踪器
+
+        Args:
+            max_records: 内存中保留的最近记录数
+            retention_days: 小时汇总的保留天数
+            persist: 是否写入数据库
+            persist_batch_size: 每批写入的记录数
+            session_factory: 返回新 AsyncSession 的函数 (默认 AsyncSessionLocal)
+            counters: 共享计数器 (默认使用全局状态后端)
+        """
+        self.max_records = int(max_records or os.getenv("COST_TRACKER_MAX_RECORDS", "10000"))
+        self.retention = timedelta(
+            days=int(retention_days or os.getenv("COST_TRACKER_RETENTION_DAYS", "90"))
+        )
+        self.persist = (
+            os.getenv("COST_TRACKER_PERSIST", "false").lower() == "true"
+            if persist is None else persist
+        )
+        self.persist_batch_size = int(
+            persist_batch_size or os.getenv("COST_TRACKER_PERSIST_BATCH_SIZE", "100")
+        )
+        self._session_factory = session_factory
+        self._counters = counters if counters is not None else SharedCounters()
 
-    def __init__(self):
-        self.records: List[CostRecord] = []
+        self.records: Deque[CostRecord] = deque(maxlen=self.max_records)
         self.start_time = datetime.utcnow()
 
+        self._totals = CostTotals()
+        self._user_totals: Dict[str, CostTotals] = {}
+        # 按时间顺序插入, 最早的小时在前
+        self._hourly_totals: Dict[datetime, CostTotals] = {}
+
+        # 待写入数据库的记录 (数据库不可用时只保留最近的 max_records 条)
+        self._unpersisted: Deque[CostRecord] = deque(maxlen=self.max_records)
+        self._flush_task: Optional[asyncio.Task] = None
+
     def record_api_call(
         self,
         query_tokens: int,
@@ -74,10 +206,11 @@ class ClaudeApiCostTracker:
         conversation_id: Optional[str] = None,
         user_id: Optional[str] = None,
         cache_hit: bool = False,
+        timestamp: Optional[datetime] = None,
     ) -> CostRecord:
         """记录一次 API 调用"""
         record = CostRecord(
-            timestamp=datetime.utcnow(),
+            timestamp=timestamp or datetime.utcnow(),
             query_tokens=query_tokens,
             cache_read_tokens=cache_read_tokens,
             cache_write_tokens=cache_write_tokens,
@@ -87,11 +220,90 @@ class ClaudeApiCostTracker:
             cache_hit=cache_hit,
         )
         self.records.append(record)
+
+        self._totals.add(record)
+        if user_id is not None:
+            self._user_totals.setdefault(user_id, CostTotals()).add(record)
+        hour = record.timestamp.replace(minute=0, second=0, microsecond=0)
+        self._hourly_totals.setdefault(hour, CostTotals()).add(record)
+        self._prune_hourly_totals(hour)
+
+        deltas = CostTotals.deltas(record)
+        self._counters.add(TOTALS_KEY, deltas)
+        if user_id is not None:
+            self._counters.add(USER_KEY.format(user_id), deltas)
+        self._counters.add(
+            HOUR_KEY.format(hour), deltas, ttl=int(self.retention.total_seconds())
+        )
+
+        if self.persist:
+            self._unpersisted.append(record)
+            if len(self._unpersisted) >= self.persist_batch_size:
+                self._schedule_flush()
         return record
 
     def get_summary(self) -> Dict:
-        """获取成本摘要"""
-        if not self.records:
+        """获取本进程的成本摘要"""
+        return self._summary(self._totals)
+
+    def get_daily_summary(self, days_back: int = 1) -> Dict:
+        """获取本进程指定天数的日均成本"""
+        cutoff = self._window_start(days_back)
+        recent = CostTotals()
+        for hour, totals in self._hourly_totals.items():
+            if hour >= cutoff:
+                recent.merge(totals)
+        return self._daily_summary(recent, days_back)
+
+    def get_user_summary(self, user_id: str) -> Dict:
+        """获取本进程中特定用户的成本摘要"""
+        return self._user_summary(user_id, self._user_totals.get(user_id))
+
+    async def get_shared_summary(self) -> Dict:
+        """获取所有 worker 进程的成本摘要 (共享状态不可用时为本进程)"""
+        try:
+            [fields] = await self._counters.read(TOTALS_KEY)
+        except Exception as e:
+            logger.warning(f"Shared cost totals unavailable, using this process: {e}")
+            return self.get_summary()
+        return self._summary(CostTotals.from_fields(fields))
+
+    async def get_shared_daily_summary(self, days_back: int = 1) -> Dict:
+        """获取所有 worker 进程指定天数的日均成本"""
+        hour = self._window_start(days_back)
+        now = datetime.utcnow()
+        keys = []
+        while hour <= now:
+            keys.append(HOUR_KEY.format(hour))
+            hour += timedelta(hours=1)
+        try:
+            hourly = await self._counters.read(*keys)
+        except Exception as e:
+            logger.warning(f"Shared cost totals unavailable, using this process: {e}")
+            return self.get_daily_summary(days_back)
+
+        recent = CostTotals()
+        for fields in hourly:
+            recent.merge(CostTotals.from_fields(fields))
+        return self._daily_summary(recent, days_back)
+
+    async def get_shared_user_summary(self, user_id: str) -> Dict:
+        """获取所有 worker 进程中特定用户的成本摘要"""
+        try:
+            [fields] = await self._counters.read(USER_KEY.format(user_id))
+        except Exception as e:
+            logger.warning(f"Shared cost totals unavailable, using this process: {e}")
+            return self.get_user_summary(user_id)
+        return self._user_summary(user_id, CostTotals.from_fields(fields))
+
+    def _window_start(self, days_back: int) -> datetime:
+        """按天窗口的第一个小时 (不早于保留期)"""
+        cutoff = datetime.utcnow() - min(timedelta(days=days_back), self.retention)
+        return cutoff.replace(minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def _summary(totals: CostTotals) -> Dict:
+        if not totals.calls:
             return {
                 "total_calls": 0,
                 "total_cost": 0.0,
@@ -99,43 +311,36 @@ class ClaudeApiCostTracker:
                 "savings_percent": 0.0,
             }
 
-        total_calls = len(self.records)
-        total_cost = sum(r.total_cost for r in self.records)
-        cost_without_cache = sum(r.cost_without_cache for r in self.records)
-        total_saved = cost_without_cache - total_cost
-
-        cache_hits = sum(1 for r in self.records if r.cache_hit)
-        cache_hit_rate = (cache_hits / total_calls * 100) if total_calls > 0 else 0
+        cache_hit_rate = totals.cache_hits / totals.calls * 100
+        cost_without_cache = totals.cost_without_cache
 
         return {
-            "total_calls": total_calls,
-            "cache_hits": cache_hits,
-            "cache_misses": total_calls - cache_hits,
+            "total_calls": totals.calls,
+            "cache_hits": totals.cache_hits,
+            "cache_misses": totals.calls - totals.cache_hits,
             "cache_hit_rate_percent": round(cache_hit_rate, 2),
-            "total_tokens": sum(r.query_tokens + r.cache_read_tokens + r.cache_write_tokens for r in self.records),
-            "total_cost": round(total_cost, 4),
+            "total_tokens": totals.tokens,
+            "total_cost": round(totals.cost, 4),
             "cost_without_cache": round(cost_without_cache, 4),
-            "total_saved": round(total_saved, 4),
-            "savings_percent": round((total_saved / cost_without_cache * 100) if cost_without_cache > 0 else 0, 2),
+            "total_saved": round(totals.saved, 4),
+            "savings_percent": round(
+                (totals.saved / cost_without_cache * 100) if cost_without_cache > 0 else 0, 2
+            ),
         }
 
-    def get_daily_summary(self, days_back: int = 1) -> Dict:
-        """获取指定天数的日均成本"""
-        cutoff = datetime.utcnow() - timedelta(days=days_back)
-        recent_records = [r for r in self.records if r.timestamp >= cutoff]
-
-        if not recent_records:
+    @staticmethod
+    def _daily_summary(recent: CostTotals, days_back: int) -> Dict:
+        if not recent.calls:
             return {}
 
         summary = {
             "period_days": days_back,
-            "total_calls": len(recent_records),
-            "daily_avg_calls": len(recent_records) / max(1, days_back),
+            "total_calls": recent.calls,
+            "daily_avg_calls": recent.calls / max(1, days_back),
         }
 
-        total_cost = sum(r.total_cost for r in recent_records)
-        cost_without_cache = sum(r.cost_without_cache for r in recent_records)
-        total_saved = cost_without_cache - total_cost
+        total_cost = recent.cost
+        total_saved = recent.saved
 
         summary.update({
             "total_cost": round(total_cost, 4),
@@ -148,29 +353,90 @@ class ClaudeApiCostTracker:
 
         return summary
 
-    def get_user_summary(self, user_id: str) -> Dict:
-        """获取特定用户的成本摘要"""
-        user_records = [r for r in self.records if r.user_id == user_id]
-
-        if not user_records:
+    @staticmethod
+    def _user_summary(user_id: str, totals: Optional[CostTotals]) -> Dict:
+        if not totals or not totals.calls:
             return {
                 "user_id": user_id,
                 "total_calls": 0,
                 "total_cost": 0.0,
             }
 
-        total_cost = sum(r.total_cost for r in user_records)
-        cost_without_cache = sum(r.cost_without_cache for r in user_records)
-        total_saved = cost_without_cache - total_cost
-
         return {
             "user_id": user_id,
-            "total_calls": len(user_records),
-            "total_cost": round(total_cost, 4),
-            "total_saved": round(total_saved, 4),
-            "avg_cost_per_call": round(total_cost / len(user_records), 4) if user_records else 0.0,
+            "total_calls": totals.calls,
+            "total_cost": round(totals.cost, 4),
+            "total_saved": round(totals.saved, 4),
+            "avg_cost_per_call": round(totals.cost / totals.calls, 4),
         }
 
+    async def flush(self) -> int:
+        """
+        把待写入的记录批量写入数据库
+
+        写入失败的记录保留到下一次写入。
+
+        Returns:
+            写入的记录数
+        """
+        written = 0
+        while self._unpersisted:
+            batch = [
+                self._unpersisted.popleft()
+                for _ in range(min(self.persist_batch_size, len(self._unpersisted)))
+            ]
+            try:
+                await self._write_batch(batch)
+            except Exception as e:
+                logger.error(f"Failed to persist {len(batch)} cost records: {e}")
+                self._unpersisted = deque(batch + list(self._unpersisted), maxlen=self.max_records)
+                break
+            written += len(batch)
+        return written
+
+    async def _write_batch(self, batch: List[CostRecord]) -> None:
+        """一次 executemany INSERT 写入一批记录"""
+        session_factory = self._session_factory
+        if session_factory is None:
+            from src.db.config import AsyncSessionLocal
+            session_factory = AsyncSessionLocal
+
+        async with session_factory() as session:
+            await session.execute(INSERT_COST_RECORD, [
+                {
+                    "created_at": record.timestamp,
+                    "model": record.model,
+                    "conversation_id": record.conversation_id,
+                    "user_id": record.user_id,
+                    "query_tokens": record.query_tokens,
+                    "cache_read_tokens": record.cache_read_tokens,
+                    "cache_write_tokens": record.cache_write_tokens,
+                    "cache_hit": record.cache_hit,
+                    "total_cost": record.total_cost,
+                }
+                for record in batch
+            ])
+            await session.commit()
+
+    def _schedule_flush(self) -> None:
+        """在后台写入 (没有运行中的事件循环时留到下一次)"""
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._flush_task = loop.create_task(self.flush())
+
+    def _prune_hourly_totals(self, now: datetime) -> None:
+        """丢弃超过保留期的小时汇总"""
+        cutoff = now - self.retention
+        while self._hourly_totals:
+            oldest = next(iter(self._hourly_totals))
+            if oldest >= cutoff:
+                break
+            del self._hourly_totals[oldest]
+
     def estimate_monthly_cost(self, avg_calls_per_day: int = 33, cache_hit_rate: float = 0.6) -> Dict:
         """
         估算月度成本
@@ -227,3 +493,12 @@ def get_cost_tracker() -> ClaudeApiCostTracker:
         _cost_tracker = ClaudeApiCostTracker()
         logger.info("Initialized Claude API Cost Tracker")
     return _cost_tracker
+
+
+async def close_cost_tracker() -> None:
+    """写入剩余的成本记录和共享汇总并重置全局成本追踪器 (关闭时调用)"""
+    global _cost_tracker
+    if _cost_tracker is not None:
+        await _cost_tracker.flush()
+        await _cost_tracker._counters.flush()
+        _cost_tracker = None
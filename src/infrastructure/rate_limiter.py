@@ -0,0 +1,231 @@
+"""
+Rate limiting engine (GCRA) with a bounded in-process table and a Redis mirror.
+
+The Generic Cell Rate Algorithm stores a single number per key - the
+"theoretical arrival time" (TAT) - so every check is O(1) in time and memory,
+unlike timestamp lists that are filtered on each request.
+
+- In-process: an LRU-bounded OrderedDict of key -> TAT (monotonic clock).
+  Requests the local table already rejects never touch Redis.
+- Redis: the same algorithm runs atomically in a Lua script using the Redis
+  server clock, so limits are shared across workers and containers. The key
+  expires as soon as it no longer constrains anything.
+- Redis errors fail open to the in-process decision.
+
+Example:
+    >>> limiter = get_rate_limiter()
+    >>> result = await limiter.check("user:alice", limit=100, period=60)
+    >>> if not result.allowed:
+    ...     retry_in = result.retry_after
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# KEYS[1] = bucket key
+# ARGV[1] = emission interval (ms), ARGV[2] = period / burst window (ms)
+# Returns {allowed, retry_after_ms, tat_offset_ms}
+GCRA_LUA = """
+local emission = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+local new_tat = tat + emission
+local allow_at = new_tat - period
+if now < allow_at then
+    return {0, math.ceil(allow_at - now), math.ceil(tat - now)}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.max(1, math.ceil(new_tat - now)))
+return {1, 0, math.ceil(new_tat - now)}
+"""
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    """
+    Outcome of a rate limit check.
+
+    Attributes:
+        allowed: Whether the request may proceed
+        remaining: Requests still available in the current burst
+        retry_after: Seconds until the next request would be allowed (0 if allowed)
+    """
+
+    allowed: bool
+    remaining: int
+    retry_after: float = 0.0
+
+
+class RateLimiter:
+    """
+    GCRA rate limiter: ``limit`` requests per ``period`` seconds per key.
+
+    Bursts of up to ``limit`` requests are allowed, after which requests are
+    admitted at a steady rate of one per ``period / limit`` seconds.
+
+    Configuration via environment variables:
+    - RATE_LIMIT_MAX_KEYS: Max keys kept in process memory (LRU, default: 100000)
+    - RATE_LIMIT_BACKEND: "redis" (mirror to Redis when available) or "memory"
+    - RATE_LIMIT_KEY_PREFIX: Redis key prefix (default: "rl:")
+    """
+
+    def __init__(
+        self,
+        max_keys: Optional[int] = None,
+        backend: Optional[str] = None,
+        redis_cache: Any = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize rate limiter.
+
+        Args:
+            max_keys: Max keys kept in process memory
+            backend: "redis" or "memory"
+            redis_cache: RedisCache to mirror to (default: global instance)
+            clock: Monotonic clock (injectable for tests)
+        """
+        self.max_keys = int(max_keys or os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+        self.backend = (backend or os.getenv("RATE_LIMIT_BACKEND", "redis")).lower()
+        self.key_prefix = os.getenv("RATE_LIMIT_KEY_PREFIX", "rl:")
+        self._redis_cache = redis_cache
+        self._clock = clock
+
+        # key -> theoretical arrival time (seconds on self._clock)
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+        self._script = None
+        self._script_owner = None
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def check_local(self, key: str, limit: int, period: float) -> RateLimitResult:
+        """
+        Check and consume against the in-process table only.
+
+        Args:
+            key: Bucket key (e.g., "user:alice", "ip:10.0.0.1")
+            limit: Requests allowed per period
+            period: Period in seconds
+
+        Returns:
+            RateLimitResult
+        """
+        now = self._clock()
+        emission = period / limit
+
+        tat = self._tat.get(key)
+        if tat is None or tat < now:
+            tat = now
+
+        new_tat = tat + emission
+        allow_at = new_tat - period
+        if now < allow_at:
+            self._touch(key, tat)
+            return RateLimitResult(False, 0, allow_at - now)
+
+        self._touch(key, new_tat)
+        return RateLimitResult(True, int((period - (new_tat - now)) / emission), 0.0)
+
+    async def check(self, key: str, limit: int, period: float) -> RateLimitResult:
+        """
+        Check and consume one request for ``key``.
+
+        The local table answers first; if it allows the request and Redis is
+        available, the cluster-wide bucket in Redis decides, and its state is
+        mirrored back into the local table.
+
+        Args:
+            key: Bucket key
+            limit: Requests allowed per period
+            period: Period in seconds
+
+        Returns:
+            RateLimitResult
+        """
+        local = self.check_local(key, limit, period)
+        if not local.allowed:
+            return local
+
+        script = self._get_script()
+        if script is None:
+            return local
+
+        emission_ms = max(1, int(period * 1000 / limit))
+        try:
+            allowed, retry_after_ms, tat_offset_ms = await script(
+                keys=[f"{self.key_prefix}{key}"],
+                args=[emission_ms, int(period * 1000)],
+            )
+        except Exception as e:
+            logger.warning(f"Redis rate limit check failed for {key}, using local state: {e}")
+            return local
+
+        # Mirror the cluster-wide state locally
+        self._touch(key, self._clock() + tat_offset_ms / 1000.0)
+
+        if not allowed:
+            return RateLimitResult(False, 0, retry_after_ms / 1000.0)
+        remaining = int((period * 1000 - tat_offset_ms) / emission_ms)
+        return RateLimitResult(True, max(0, remaining), 0.0)
+
+    def reset(self, key: Optional[str] = None) -> None:
+        """Forget local state for one key (or all keys)."""
+        if key is None:
+            self._tat.clear()
+        else:
+            self._tat.pop(key, None)
+
+    def _touch(self, key: str, tat: float) -> None:
+        """Store a TAT and keep the table within max_keys (least recently used out)."""
+        self._tat[key] = tat
+        self._tat.move_to_end(key)
+        if len(self._tat) > self.max_keys:
+            self._tat.popitem(last=False)
+
+    def _get_script(self):
+        """Registered GCRA script for the active Redis cache, or None."""
+        if self.backend != "redis":
+            return None
+
+        cache = self._redis_cache
+        if cache is None:
+            from src.infrastructure.redis_cache import get_redis_cache
+
+            cache = get_redis_cache()
+        if cache is None or not cache._initialized:
+            return None
+
+        if self._script is None or self._script_owner is not cache:
+            self._script = cache.register_script(GCRA_LUA)
+            self._script_owner = cache
+        return self._script
+
+
+# Global singleton instance
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get global rate limiter instance."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
+
+
+def reset_rate_limiter() -> None:
+    """Reset global rate limiter (for tests)."""
+    global _rate_limiter
+    _rate_limiter = None
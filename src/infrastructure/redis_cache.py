@@ -104,6 +104,8 @@ class RedisCache:
 
         self._pool: Optional[ConnectionPool] = None
         self._client: Optional[aioredis.Redis] = None
+        self._raw_pool: Optional[ConnectionPool] = None
+        self._raw_client: Optional[aioredis.Redis] = None
         self._initialized = False
 
     async def initialize(self) -> bool:
@@ -129,6 +131,19 @@ class RedisCache:
             # Create Redis client
             self._client = aioredis.Redis(connection_pool=self._pool)
 
+            # Binary-safe client for raw payloads (e.g. cached HTTP bodies)
+            self._raw_pool = ConnectionPool(
+                host=self.host,
+                port=self.port,
+                db=self.db,
+                password=self.password,
+                max_connections=self.max_connections,
+                socket_timeout=self.socket_timeout,
+                socket_connect_timeout=self.socket_connect_timeout,
+                decode_responses=False,
+            )
+            self._raw_client = aioredis.Redis(connection_pool=self._raw_pool)
+
             # Test connection
             await self._client.ping()
 
@@ -154,6 +169,10 @@ class RedisCache:
             await self._client.close()
         if self._pool:
             await self._pool.disconnect()
+        if self._raw_client:
+            await self._raw_client.close()
+        if self._raw_pool:
+            await self._raw_pool.disconnect()
         self._initialized = False
         logger.info("Redis cache closed")
 
@@ -295,6 +314,142 @@ class RedisCache:
             logger.warning(f"Cache EXPIRE error for key '{key}': {e}")
             return False
 
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        """
+        Get raw bytes from cache (no decoding or JSON parsing).
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Stored bytes or None
+        """
+        if not self._initialized or not self._raw_client:
+            return None
+
+        try:
+            return await self._raw_client.get(key)
+        except RedisError as e:
+            logger.warning(f"Cache GET (raw) error for key '{key}': {e}")
+            return None
+
+    async def set_bytes(self, key: str, value: bytes, ttl: Optional[int] = None) -> bool:
+        """
+        Store raw bytes in cache (no encoding or JSON serialization).
+
+        Args:
+            key: Cache key
+            value: Bytes to store
+            ttl: Time-to-live in seconds (optional)
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if not self._initialized or not self._raw_client:
+            return False
+
+        try:
+            if ttl:
+                await self._raw_client.setex(key, ttl, value)
+            else:
+                await self._raw_client.set(key, value)
+            return True
+        except RedisError as e:
+            logger.warning(f"Cache SET (raw) error for key '{key}': {e}")
+            return False
+
+    async def get_many_bytes(self, keys: List[str]) -> List[Optional[bytes]]:
+        """
+        Get raw bytes for several keys in one round trip (MGET).
+
+        Args:
+            keys: Cache keys
+
+        Returns:
+            Stored bytes (or None) per key, in order
+        """
+        if not self._initialized or not self._raw_client:
+            return [None] * len(keys)
+
+        try:
+            return await self._raw_client.mget(keys)
+        except RedisError as e:
+            logger.warning(f"Cache MGET (raw) error for {len(keys)} keys: {e}")
+            return [None] * len(keys)
+
+    async def incr(self, key: str, ttl: Optional[int] = None) -> Optional[int]:
+        """
+        Increment an integer counter, creating it at 1.
+
+        Args:
+            key: Counter key
+            ttl: Time-to-live in seconds, refreshed on every increment (optional)
+
+        Returns:
+            New counter value, or None on error
+        """
+        if not self._initialized:
+            return None
+
+        try:
+            async with self._client.pipeline(transaction=True) as pipe:
+                pipe.incr(key)
+                if ttl:
+                    pipe.expire(key, ttl)
+                value, *_ = await pipe.execute()
+            return value
+        except RedisError as e:
+            logger.warning(f"Cache INCR error for key '{key}': {e}")
+            return None
+
+    async def incr_many(self, keys: List[str], ttl: Optional[int] = None) -> bool:
+        """
+        Increment several integer counters in one round trip.
+
+        Args:
+            keys: Counter keys
+            ttl: Time-to-live in seconds, refreshed on every increment (optional)
+
+        Returns:
+            True if all counters were incremented
+        """
+        if not self._initialized or not keys:
+            return False
+
+        try:
+            async with self._client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.incr(key)
+                    if ttl:
+                        pipe.expire(key, ttl)
+                await pipe.execute()
+            return True
+        except RedisError as e:
+            logger.warning(f"Cache INCR error for {len(keys)} keys: {e}")
+            return False
+
+    @property
+    def client(self) -> Optional[aioredis.Redis]:
+        """Decoded Redis client for commands without a helper (None if not initialized)"""
+        if not self._initialized:
+            return None
+        return self._client
+
+    def register_script(self, script: str):
+        """
+        Register a Lua script for atomic server-side execution.
+
+        Args:
+            script: Lua source
+
+        Returns:
+            Awaitable script object (``await script(keys=[...], args=[...])``,
+            EVALSHA with automatic EVAL fallback), or None if not initialized
+        """
+        if not self._initialized:
+            return None
+        return self._client.register_script(script)
+
     # ================== Conversation Caching ==================
 
     async def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
@@ -352,6 +507,11 @@ class RedisCache:
         key = f"{self.PREFIX_MESSAGE}{conversation_id}"
         return await self.set(key, messages, ttl or self.TTL_MESSAGE)
 
+    async def delete_conversation_messages(self, conversation_id: str) -> bool:
+        """Delete cached conversation messages."""
+        key = f"{self.PREFIX_MESSAGE}{conversation_id}"
+        return await self.delete(key)
+
     async def append_message(
         self,
         conversation_id: str,
@@ -0,0 +1,464 @@
+"""
+Shared state for components that must agree across worker processes.
+
+The Claude prompt cache manager and the API cost tracker used to keep their
+counters in per-process singletons: with several uvicorn workers each one
+counted its own slice of the traffic, and the /claude-cache endpoints
+reported whichever worker served the request. They now write to a
+StateBackend:
+
+- memory: process-local dictionaries (single worker, tests)
+- redis: hashes updated with HINCRBY/HINCRBYFLOAT in one MULTI/EXEC per
+  flush, shared by all workers; pub/sub carries invalidation messages
+
+Counters are updated from synchronous hot paths, so SharedCounters buffers
+the deltas in process and writes them in one pipelined transaction per
+flush interval instead of one round trip per call. Reads flush the local
+buffer first, so a worker always sees its own updates.
+
+Messages published by a node are delivered to the subscribers of every
+other node, not back to the publisher, which applies its own changes
+directly. A message is framed as "<node id>\n<text>", so text that is
+already serialized (e.g. a WebSocket frame) is published and delivered
+without being encoded again.
+
+Example:
+    >>> counters = SharedCounters()
+    >>> counters.add("claude_cache:stats", {"cache_hit_count": 1})
+    >>> [stats] = await counters.read("claude_cache:stats")
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# Hash of counter deltas per key, e.g. {"cost:totals": {"calls": 1, "cost": 0.002}}
+CounterUpdates = Dict[str, Dict[str, float]]
+
+
+class StateBackendError(Exception):
+    """Raised when the shared state store is unavailable"""
+    pass
+
+
+class StateBackend(ABC):
+    """Counters, hashes and pub/sub shared by all worker processes."""
+
+    def __init__(self, node_id: Optional[str] = None):
+        """
+        Initialize state backend.
+
+        Args:
+            node_id: Identifier of this process (default: random)
+        """
+        self.node_id = node_id or uuid4().hex
+
+    @abstractmethod
+    async def increment(
+        self, updates: CounterUpdates, ttls: Optional[Dict[str, int]] = None
+    ) -> None:
+        """
+        Atomically add deltas to hash fields.
+
+        Args:
+            updates: Deltas per hash key and field
+            ttls: Expiry in seconds per hash key (refreshed on every update)
+        """
+
+    @abstractmethod
+    async def read_hashes(self, keys: List[str]) -> List[Dict[str, str]]:
+        """
+        Read several hashes in one round trip.
+
+        Args:
+            keys: Hash keys
+
+        Returns:
+            Field values per key (empty dict for a missing key)
+        """
+
+    @abstractmethod
+    async def set_fields(
+        self, key: str, mapping: Dict[str, str], ttl: Optional[int] = None
+    ) -> None:
+        """Set hash fields, optionally (re)setting the hash's expiry."""
+
+    @abstractmethod
+    async def delete_fields(self, key: str, *fields: str) -> None:
+        """Delete hash fields."""
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> int:
+        """Send a JSON message to the subscribers of the other nodes."""
+        return await self.publish_text(channel, json.dumps(message))
+
+    @abstractmethod
+    async def publish_text(self, channel: str, text: str) -> int:
+        """
+        Send already serialized text to the subscribers of the other nodes.
+
+        Returns:
+            Number of subscribed nodes the message reached (including this one)
+        """
+
+    @abstractmethod
+    async def subscribe(
+        self, channel: str, handler: Callable[[Any], Any], raw: bool = False
+    ) -> None:
+        """
+        Call a handler (sync or async) for each message from another node.
+
+        Args:
+            channel: Channel name
+            handler: Called with the decoded JSON message, or the text if raw
+            raw: Pass the published text without decoding it
+        """
+
+    @abstractmethod
+    async def unsubscribe(self, channel: str) -> None:
+        """Remove every handler of a channel."""
+
+    async def close(self) -> None:
+        """Release connections and stop listeners."""
+
+
+class InMemoryStateBackend(StateBackend):
+    """Process-local state; there are no other nodes to publish to."""
+
+    def __init__(self, node_id: Optional[str] = None):
+        super().__init__(node_id)
+        self._hashes: Dict[str, Dict[str, float]] = {}
+
+    def increment_now(self, updates: CounterUpdates) -> None:
+        """Apply deltas synchronously (no I/O involved)."""
+        for key, deltas in updates.items():
+            fields = self._hashes.setdefault(key, {})
+            for field, delta in deltas.items():
+                fields[field] = fields.get(field, 0) + delta
+
+    async def increment(
+        self, updates: CounterUpdates, ttls: Optional[Dict[str, int]] = None
+    ) -> None:
+        self.increment_now(updates)
+
+    async def read_hashes(self, keys: List[str]) -> List[Dict[str, str]]:
+        return [
+            {field: str(value) for field, value in self._hashes.get(key, {}).items()}
+            for key in keys
+        ]
+
+    async def set_fields(
+        self, key: str, mapping: Dict[str, str], ttl: Optional[int] = None
+    ) -> None:
+        self._hashes.setdefault(key, {}).update(mapping)
+
+    async def delete_fields(self, key: str, *fields: str) -> None:
+        hash_ = self._hashes.get(key, {})
+        for field in fields:
+            hash_.pop(field, None)
+
+    async def publish_text(self, channel: str, text: str) -> int:
+        return 0
+
+    async def subscribe(
+        self, channel: str, handler: Callable[[Any], Any], raw: bool = False
+    ) -> None:
+        pass
+
+    async def unsubscribe(self, channel: str) -> None:
+        pass
+
+
+class RedisStateBackend(StateBackend):
+    """
+    State shared through Redis hashes and pub/sub.
+
+    Configuration via environment variables:
+    - STATE_KEY_PREFIX: Prefix of every key and channel (default: "state:")
+    """
+
+    def __init__(
+        self,
+        client: Any = None,
+        key_prefix: Optional[str] = None,
+        node_id: Optional[str] = None,
+    ):
+        """
+        Initialize Redis state backend.
+
+        Args:
+            client: redis.asyncio client with decoded responses
+                (default: client of the global RedisCache, resolved per call)
+            key_prefix: Prefix of every key and channel
+            node_id: Identifier of this process (default: random)
+        """
+        super().__init__(node_id)
+        self.key_prefix = key_prefix or os.getenv("STATE_KEY_PREFIX", "state:")
+        self._client = client
+        # channel -> [(handler, raw)]
+        self._handlers: Dict[str, List[Tuple[Callable[[Any], Any], bool]]] = {}
+        self._pubsub: Any = None
+        self._listener: Optional[asyncio.Task] = None
+
+    def _get_client(self) -> Any:
+        client = self._client
+        if client is None:
+            from src.infrastructure.redis_cache import get_redis_cache
+            cache = get_redis_cache()
+            client = cache.client if cache is not None else None
+        if client is None:
+            raise StateBackendError("Redis is not available")
+        return client
+
+    async def increment(
+        self, updates: CounterUpdates, ttls: Optional[Dict[str, int]] = None
+    ) -> None:
+        pipe = self._get_client().pipeline(transaction=True)
+        for key, deltas in updates.items():
+            name = self.key_prefix + key
+            for field, delta in deltas.items():
+                if isinstance(delta, int):
+                    pipe.hincrby(name, field, delta)
+                else:
+                    pipe.hincrbyfloat(name, field, delta)
+            if ttls and key in ttls:
+                pipe.expire(name, ttls[key])
+        await pipe.execute()
+
+    async def read_hashes(self, keys: List[str]) -> List[Dict[str, str]]:
+        if not keys:
+            return []
+        pipe = self._get_client().pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(self.key_prefix + key)
+        return await pipe.execute()
+
+    async def set_fields(
+        self, key: str, mapping: Dict[str, str], ttl: Optional[int] = None
+    ) -> None:
+        pipe = self._get_client().pipeline(transaction=True)
+        pipe.hset(self.key_prefix + key, mapping=mapping)
+        if ttl:
+            pipe.expire(self.key_prefix + key, ttl)
+        await pipe.execute()
+
+    async def delete_fields(self, key: str, *fields: str) -> None:
+        if fields:
+            await self._get_client().hdel(self.key_prefix + key, *fields)
+
+    async def publish_text(self, channel: str, text: str) -> int:
+        return await self._get_client().publish(
+            self.key_prefix + channel, f"{self.node_id}\n{text}"
+        )
+
+    async def subscribe(
+        self, channel: str, handler: Callable[[Any], Any], raw: bool = False
+    ) -> None:
+        name = self.key_prefix + channel
+        if self._pubsub is None:
+            self._pubsub = self._get_client().pubsub()
+        if name not in self._handlers:
+            await self._pubsub.subscribe(name)
+        self._handlers.setdefault(name, []).append((handler, raw))
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def unsubscribe(self, channel: str) -> None:
+        name = self.key_prefix + channel
+        if self._handlers.pop(name, None) is not None and self._pubsub is not None:
+            await self._pubsub.unsubscribe(name)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception as e:
+                logger.debug(f"Error closing state pub/sub: {e}")
+            self._pubsub = None
+        self._handlers = {}
+
+    async def _listen(self) -> None:
+        """Dispatch pub/sub messages from other nodes to their handlers."""
+        while True:
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"State pub/sub receive failed: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if message is None:
+                continue
+
+            origin, _, text = message["data"].partition("\n")
+            if origin == self.node_id:
+                continue
+
+            decoded = None
+            for handler, raw in self._handlers.get(message["channel"], []):
+                try:
+                    if raw:
+                        result = handler(text)
+                    else:
+                        if decoded is None:
+                            decoded = json.loads(text)
+                        result = handler(decoded)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    logger.error(f"State message handler failed: {e}", exc_info=True)
+
+
+class SharedCounters:
+    """
+    Counter hashes updated in process and flushed to the state backend.
+
+    Configuration via environment variables:
+    - STATE_FLUSH_INTERVAL_MS: Max time a delta waits before it is written
+      (default: 1000)
+    """
+
+    def __init__(
+        self,
+        backend: Optional[StateBackend] = None,
+        flush_interval: Optional[float] = None,
+    ):
+        """
+        Initialize shared counters.
+
+        Args:
+            backend: State backend (default: global instance, resolved per call)
+            flush_interval: Seconds a delta may wait before it is written
+        """
+        self._backend = backend
+        self.flush_interval = (
+            float(os.getenv("STATE_FLUSH_INTERVAL_MS", "1000")) / 1000.0
+            if flush_interval is None else flush_interval
+        )
+        self._pending: CounterUpdates = {}
+        self._ttls: Dict[str, int] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def backend(self) -> StateBackend:
+        return self._backend if self._backend is not None else get_state_backend()
+
+    def add(self, key: str, deltas: Dict[str, float], ttl: Optional[int] = None) -> None:
+        """
+        Add deltas to a counter hash without waiting for I/O.
+
+        Args:
+            key: Hash key
+            deltas: Delta per field
+            ttl: Expiry of the hash in seconds
+        """
+        backend = self.backend
+        if isinstance(backend, InMemoryStateBackend):
+            backend.increment_now({key: deltas})
+            return
+
+        _merge(self._pending, {key: deltas})
+        if ttl:
+            self._ttls[key] = ttl
+        self._schedule_flush()
+
+    async def flush(self) -> None:
+        """Write the buffered deltas; on failure they are kept for the next flush."""
+        if not self._pending:
+            return
+        updates, self._pending = self._pending, {}
+        ttls = {key: self._ttls.pop(key) for key in updates if key in self._ttls}
+        try:
+            await self.backend.increment(updates, ttls)
+        except Exception as e:
+            logger.warning(f"Failed to write shared counters: {e}")
+            _merge(self._pending, updates)
+            self._ttls.update(ttls)
+
+    async def read(self, *keys: str) -> List[Dict[str, float]]:
+        """
+        Read counter hashes as seen by all nodes.
+
+        Args:
+            keys: Hash keys
+
+        Returns:
+            Field values per key
+
+        Raises:
+            StateBackendError: If the backend is unavailable
+        """
+        await self.flush()
+        hashes = await self.backend.read_hashes(list(keys))
+        return [{field: float(value) for field, value in hash_.items()} for hash_ in hashes]
+
+    def _schedule_flush(self) -> None:
+        """Flush after the interval (left for the next read without an event loop)."""
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+
+def _merge(target: CounterUpdates, updates: CounterUpdates) -> None:
+    for key, deltas in updates.items():
+        fields = target.setdefault(key, {})
+        for field, delta in deltas.items():
+            fields[field] = fields.get(field, 0) + delta
+
+
+# Global singleton instance (one backend and node ID per process)
+_state_backend: Optional[StateBackend] = None
+
+
+def get_state_backend() -> StateBackend:
+    """
+    Get global state backend instance.
+
+    Configuration via environment variables:
+    - STATE_BACKEND: "redis" (shared by all workers; requires the global
+      RedisCache) or "memory" (default: memory)
+    """
+    global _state_backend
+    if _state_backend is None:
+        backend = os.getenv("STATE_BACKEND", "memory").lower()
+        if backend == "redis":
+            _state_backend = RedisStateBackend()
+        else:
+            _state_backend = InMemoryStateBackend()
+        logger.info(f"Initialized {backend} state backend (node {_state_backend.node_id})")
+    return _state_backend
+
+
+def set_state_backend(backend: Optional[StateBackend]) -> None:
+    """Set the global state backend (None resets it)."""
+    global _state_backend
+    _state_backend = backend
+
+
+async def close_state_backend() -> None:
+    """Close and reset the global state backend (on shutdown)."""
+    global _state_backend
+    if _state_backend is not None:
+        await _state_backend.close()
+        _state_backend = None
@@ -0,0 +1,288 @@
+"""
+Bounded JWT verification cache shared by every authentication path.
+
+Verifying a JWT (signature + claims) is a per-request CPU cost. Results are
+cached under the SHA-256 digest of the token, never the token itself or
+Python's per-process ``hash()``:
+
+- In-process: an LRU-bounded OrderedDict of digest -> (user_id, expires_at).
+  Entries expire at the token's ``exp`` claim (capped by a max TTL), so a
+  cached result never outlives the token.
+- Redis (optional): the same entries under ``auth:token:{hexdigest}`` with a
+  matching TTL, so a token verified by one worker is accepted by the others
+  without decoding it again. Redis lookups are bounded by a short timeout and
+  treated as misses on error. Only enable this when Redis is as trusted as the
+  JWT secret: anyone who can write these keys can authenticate requests.
+
+Hit/miss/eviction counts are exported to Prometheus (cache_metrics) and
+available from ``stats()``.
+
+Example:
+    >>> cache = get_token_cache()
+    >>> user_id = await cache.aget(token)
+    >>> if user_id is None:
+    ...     user_id, exp = decode(token)
+    ...     await cache.aset(token, user_id, exp)
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.infrastructure.cache_metrics import (
+    auth_token_cache_entries,
+    auth_token_cache_evictions_total,
+    auth_token_cache_lookups_total,
+)
+
+logger = logging.getLogger(__name__)
+
+_HIT = auth_token_cache_lookups_total.labels(result="hit")
+_REDIS_HIT = auth_token_cache_lookups_total.labels(result="redis_hit")
+_MISS = auth_token_cache_lookups_total.labels(result="miss")
+
+
+class TokenVerificationCache:
+    """
+    LRU + TTL cache of verified JWTs with an optional Redis tier.
+
+    Configuration via environment variables:
+    - AUTH_TOKEN_CACHE_MAX_ENTRIES: Max tokens kept in process memory (default: 10000)
+    - AUTH_TOKEN_CACHE_MAX_TTL: Max seconds a result is cached, even if the
+      token's exp is later (default: 300)
+    - AUTH_TOKEN_CACHE_REDIS: Share results through Redis (default: false)
+    - AUTH_TOKEN_CACHE_REDIS_TIMEOUT_MS: Redis lookup timeout (default: 10)
+    """
+
+    KEY_PREFIX = "auth:token:"
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_ttl: Optional[float] = None,
+        redis_enabled: Optional[bool] = None,
+        redis_cache: Any = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Initialize token cache.
+
+        Args:
+            max_entries: Max tokens kept in process memory
+            max_ttl: Max seconds a verification result is cached
+            redis_enabled: Share results through Redis
+            redis_cache: RedisCache to use (default: global instance)
+            clock: Wall clock, comparable with the exp claim (injectable for tests)
+        """
+        self.max_entries = int(
+            max_entries or os.getenv("AUTH_TOKEN_CACHE_MAX_ENTRIES", "10000")
+        )
+        self.max_ttl = float(max_ttl or os.getenv("AUTH_TOKEN_CACHE_MAX_TTL", "300"))
+        if redis_enabled is None:
+            redis_enabled = os.getenv("AUTH_TOKEN_CACHE_REDIS", "false").lower() == "true"
+        self.redis_enabled = redis_enabled
+        self.redis_timeout = float(os.getenv("AUTH_TOKEN_CACHE_REDIS_TIMEOUT_MS", "10")) / 1000.0
+        self._redis_cache = redis_cache
+        self._clock = clock
+
+        # digest -> (user_id, expires_at)
+        self._entries: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._hits = 0
+        self._redis_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        """SHA-256 digest identifying a token."""
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[str]:
+        """
+        Look up a token in process memory only.
+
+        Args:
+            token: Raw JWT
+
+        Returns:
+            Cached user ID, or None on a miss (or if the entry expired)
+        """
+        user_id = self._get_local(self.digest(token))
+        if user_id is not None:
+            self._hits += 1
+            _HIT.inc()
+        else:
+            self._misses += 1
+            _MISS.inc()
+        return user_id
+
+    async def aget(self, token: str) -> Optional[str]:
+        """
+        Look up a token in process memory, then in Redis.
+
+        A Redis hit is copied into process memory.
+
+        Args:
+            token: Raw JWT
+
+        Returns:
+            Cached user ID, or None on a miss
+        """
+        digest = self.digest(token)
+        user_id = self._get_local(digest)
+        if user_id is not None:
+            self._hits += 1
+            _HIT.inc()
+            return user_id
+
+        cache = self._get_redis()
+        if cache is not None:
+            try:
+                entry = await asyncio.wait_for(
+                    cache.get(self.KEY_PREFIX + digest.hex()), timeout=self.redis_timeout
+                )
+            except Exception as e:
+                logger.debug(f"Token cache Redis lookup failed: {e}")
+                entry = None
+            if entry and entry.get("exp", 0) > self._clock():
+                self._set_local(digest, entry["sub"], entry["exp"])
+                self._redis_hits += 1
+                _REDIS_HIT.inc()
+                return entry["sub"]
+
+        self._misses += 1
+        _MISS.inc()
+        return None
+
+    def set(self, token: str, user_id: str, exp: float) -> None:
+        """
+        Cache a verified token in process memory.
+
+        Args:
+            token: Raw JWT
+            user_id: Verified subject
+            exp: Token expiry (Unix timestamp, from the exp claim)
+        """
+        self._set_local(self.digest(token), user_id, self._expires_at(exp))
+
+    async def aset(self, token: str, user_id: str, exp: float) -> None:
+        """
+        Cache a verified token in process memory and, if enabled, in Redis.
+
+        Args:
+            token: Raw JWT
+            user_id: Verified subject
+            exp: Token expiry (Unix timestamp, from the exp claim)
+        """
+        digest = self.digest(token)
+        expires_at = self._expires_at(exp)
+        self._set_local(digest, user_id, expires_at)
+
+        cache = self._get_redis()
+        if cache is None:
+            return
+        ttl = int(expires_at - self._clock())
+        if ttl < 1:
+            return
+        try:
+            await asyncio.wait_for(
+                cache.set(
+                    self.KEY_PREFIX + digest.hex(),
+                    {"sub": user_id, "exp": expires_at},
+                    ttl=ttl,
+                ),
+                timeout=self.redis_timeout,
+            )
+        except Exception as e:
+            logger.debug(f"Token cache Redis store failed: {e}")
+
+    def invalidate(self, token: str) -> None:
+        """Forget a token in process memory."""
+        self._entries.pop(self.digest(token), None)
+        auth_token_cache_entries.set(len(self._entries))
+
+    def clear(self) -> None:
+        """Forget all tokens in process memory."""
+        self._entries.clear()
+        auth_token_cache_entries.set(0)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dict with entries, hits, redis_hits, misses, evictions and hit_rate
+        """
+        lookups = self._hits + self._redis_hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self._hits,
+            "redis_hits": self._redis_hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "hit_rate": (self._hits + self._redis_hits) / lookups if lookups else 0.0,
+        }
+
+    def _expires_at(self, exp: float) -> float:
+        """Cache expiry: the token's exp, capped at max_ttl from now."""
+        return min(float(exp), self._clock() + self.max_ttl)
+
+    def _get_local(self, digest: bytes) -> Optional[str]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        user_id, expires_at = entry
+        if self._clock() >= expires_at:
+            del self._entries[digest]
+            return None
+        self._entries.move_to_end(digest)
+        return user_id
+
+    def _set_local(self, digest: bytes, user_id: str, expires_at: float) -> None:
+        """Store an entry, evicting the least recently used beyond max_entries."""
+        self._entries[digest] = (user_id, expires_at)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+            auth_token_cache_evictions_total.inc()
+        auth_token_cache_entries.set(len(self._entries))
+
+    def _get_redis(self):
+        """Active RedisCache, or None if the Redis tier is disabled or unavailable."""
+        if not self.redis_enabled:
+            return None
+        cache = self._redis_cache
+        if cache is None:
+            from src.infrastructure.redis_cache import get_redis_cache
+
+            cache = get_redis_cache()
+        if cache is None or not cache._initialized:
+            return None
+        return cache
+
+
+# Global singleton instance
+_token_cache: Optional[TokenVerificationCache] = None
+
+
+def get_token_cache() -> TokenVerificationCache:
+    """Get global token verification cache instance."""
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = TokenVerificationCache()
+    return _token_cache
+
+
+def reset_token_cache() -> None:
+    """Reset global token verification cache (for tests)."""
+    global _token_cache
+    _token_cache = None
@@ -0,0 +1,195 @@
+"""
+Cross-node routing of WebSocket messages.
+
+A ConnectionManager only holds the sockets of its own process, so a
+broadcast used to miss participants connected to another replica (and
+deployments needed sticky sessions). The router connects the replicas
+through the state backend's pub/sub (src.infrastructure.state_backend):
+
+- Each conversation with local participants is subscribed on this node, on
+  the channel ``ws:conversation:{conversation_id}``; the subscription is
+  dropped when the last local participant leaves.
+- A broadcast is fanned out to the local connections directly and published
+  once on the conversation's channel. Other nodes enqueue the published
+  text for their own connections; the message is serialized once, by the
+  sender, and never decoded on the way.
+- Presence: ``ws:presence:{conversation_id}`` maps each connected user to
+  the node holding the socket. Entries are refreshed by the connection
+  heartbeat and ignored once older than WS_PRESENCE_TTL, so a node that
+  dies without cleaning up drops out of presence on its own.
+
+With the in-memory backend (a single process) there are no other nodes and
+the router does nothing.
+
+Example:
+    >>> router = WebSocketRouter(deliver=manager.deliver_local)
+    >>> await router.join(conversation_id, user_id)
+    >>> await router.publish(conversation_id, payload)
+"""
+
+import json
+import logging
+import os
+import time
+from functools import partial
+from typing import Callable, Container, Dict, Optional, Set
+
+from src.infrastructure.cache_metrics import websocket_routed_messages_total
+from src.infrastructure.state_backend import (
+    InMemoryStateBackend,
+    StateBackend,
+    get_state_backend,
+)
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "ws:conversation:{}"
+PRESENCE_KEY = "ws:presence:{}"
+
+
+class WebSocketRouter:
+    """
+    Pub/sub routing and presence for conversations spread over nodes.
+
+    Configuration via environment variables:
+    - WS_PRESENCE_TTL: Seconds a presence entry stays valid without a
+      heartbeat (default: 90)
+    """
+
+    def __init__(
+        self,
+        deliver: Callable[[str, str], int],
+        backend: Optional[StateBackend] = None,
+        presence_ttl: Optional[int] = None,
+    ):
+        """
+        Initialize WebSocket router.
+
+        Args:
+            deliver: Queues a serialized message for the local connections of
+                a conversation (conversation_id, payload) -> recipients
+            backend: State backend (default: global instance, resolved per call)
+            presence_ttl: Seconds a presence entry stays valid without a heartbeat
+        """
+        self._deliver = deliver
+        self._backend = backend
+        self.presence_ttl = int(presence_ttl or os.getenv("WS_PRESENCE_TTL", "90"))
+        self._subscribed: Set[str] = set()
+
+    @property
+    def backend(self) -> StateBackend:
+        return self._backend if self._backend is not None else get_state_backend()
+
+    @property
+    def distributed(self) -> bool:
+        """Whether other nodes can hold connections (not the in-memory backend)."""
+        return not isinstance(self.backend, InMemoryStateBackend)
+
+    async def join(self, conversation_id: str, user_id: str) -> None:
+        """
+        Route the conversation's messages to this node and record presence.
+
+        Args:
+            conversation_id: Conversation ID
+            user_id: User connected on this node
+        """
+        if not self.distributed:
+            return
+        try:
+            if conversation_id not in self._subscribed:
+                self._subscribed.add(conversation_id)
+                await self.backend.subscribe(
+                    CHANNEL.format(conversation_id),
+                    partial(self._on_message, conversation_id),
+                    raw=True,
+                )
+            await self.touch(conversation_id, user_id)
+        except Exception as e:
+            self._subscribed.discard(conversation_id)
+            logger.warning(f"Cross-node routing unavailable for {conversation_id}: {e}")
+
+    async def leave(
+        self,
+        conversation_id: str,
+        user_id: str,
+        local_users: Callable[[], Container[str]],
+    ) -> None:
+        """
+        Remove presence and, after the last local participant, the subscription.
+
+        Runs in the background after a disconnect, so participants are read
+        when each step runs: a user who reconnected meanwhile keeps presence
+        and the subscription.
+
+        Args:
+            conversation_id: Conversation ID
+            user_id: User who disconnected from this node
+            local_users: Users currently connected to the conversation on this node
+        """
+        if not self.distributed:
+            return
+        try:
+            if user_id not in local_users():
+                await self.backend.delete_fields(PRESENCE_KEY.format(conversation_id), user_id)
+            if not local_users() and conversation_id in self._subscribed:
+                self._subscribed.discard(conversation_id)
+                await self.backend.unsubscribe(CHANNEL.format(conversation_id))
+        except Exception as e:
+            logger.warning(f"Failed to leave conversation {conversation_id}: {e}")
+
+    async def touch(self, conversation_id: str, user_id: str) -> None:
+        """Refresh a user's presence on this node (connect and heartbeat)."""
+        if not self.distributed:
+            return
+        entry = json.dumps({"node": self.backend.node_id, "seen": time.time()})
+        await self.backend.set_fields(
+            PRESENCE_KEY.format(conversation_id), {user_id: entry}, ttl=self.presence_ttl
+        )
+
+    async def publish(self, conversation_id: str, payload: str) -> int:
+        """
+        Send a serialized message to the other nodes of a conversation.
+
+        Args:
+            conversation_id: Conversation ID
+            payload: JSON text frame (sent as is)
+
+        Returns:
+            Number of nodes subscribed to the conversation (including this one)
+        """
+        if not self.distributed:
+            return 0
+        try:
+            nodes = await self.backend.publish_text(CHANNEL.format(conversation_id), payload)
+        except Exception as e:
+            websocket_routed_messages_total.labels(direction="failed").inc()
+            logger.warning(f"Failed to route message for {conversation_id}: {e}")
+            return 0
+        websocket_routed_messages_total.labels(direction="published").inc()
+        return nodes
+
+    async def presence(self, conversation_id: str) -> Dict[str, str]:
+        """
+        Users connected to a conversation on any node.
+
+        Args:
+            conversation_id: Conversation ID
+
+        Returns:
+            Node ID per user ID (local users only with the in-memory backend)
+        """
+        if not self.distributed:
+            return {}
+        [entries] = await self.backend.read_hashes([PRESENCE_KEY.format(conversation_id)])
+        cutoff = time.time() - self.presence_ttl
+        presence = {}
+        for user_id, raw in entries.items():
+            entry = json.loads(raw)
+            if entry["seen"] >= cutoff:
+                presence[user_id] = entry["node"]
+        return presence
+
+    def _on_message(self, conversation_id: str, payload: str) -> None:
+        """Fan a message published by another node out to local connections."""
+        websocket_routed_messages_total.labels(direction="received").inc()
+        self._deliver(conversation_id, payload)
@@ -19,6 +19,7 @@ load_dotenv()
 from src.db.config import engine
 from src.db.migrations import init_db
 from src.exceptions import APIException
+from src.infrastructure.redis_cache import RedisCache, get_redis_cache, set_redis_cache
 from src.infrastructure.shutdown import get_shutdown_manager
 from src.services.semantic_cache import SemanticCacheService, set_cache_service
 
@@ -85,6 +86,34 @@ async def lifespan(app: FastAPI):
                 logger.error(f"Failed to initialize semantic cache: {e}", exc_info=True)
                 logger.warning("⚠️ Semantic cache initialization failed - running without cache")
 
+        # Initialize Redis cache (HTTP response cache, conversation caches)
+        if os.getenv("REDIS_CACHE_ENABLED", "true").lower() == "true":
+            redis_cache = RedisCache()
+            if await redis_cache.initialize():
+                set_redis_cache(redis_cache)
+                logger.info("✅ Redis cache initialized successfully")
+            else:
+                logger.warning("⚠️ Redis cache initialization failed - running without cache")
+
+        # Messages are written behind the request (MESSAGE_DURABILITY); cached
+        # conversation responses are invalidated and summaries checked once
+        # each batch is committed
+        from src.services.conversation_service import invalidate_committed_conversations
+        from src.services.message_persister import get_message_persister
+        from src.services.summarization_worker import get_summarization_worker
+        persister = get_message_persister()
+        persister.add_commit_listener(invalidate_committed_conversations)
+        persister.add_commit_listener(
+            lambda messages: get_summarization_worker().on_messages_committed(messages)
+        )
+
+        # Shared state (STATE_BACKEND): cross-worker stats and cache invalidation
+        try:
+            from src.services.claude_cache_manager import subscribe_cache_invalidations
+            await subscribe_cache_invalidations()
+        except Exception as e:
+            logger.warning(f"⚠️ Cache invalidation subscription failed: {e}")
+
         # Setup graceful shutdown
         shutdown_manager = get_shutdown_manager()
         await shutdown_manager.setup_signal_handlers()
@@ -107,6 +136,28 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error stopping cache stats updater: {e}")
 
+    # Stop background summaries (queued conversations retry on their next turn)
+    try:
+        from src.services.summarization_worker import close_summarization_worker
+        await close_summarization_worker()
+    except Exception as e:
+        logger.error(f"Error stopping summarization worker: {e}")
+
+    # Write cost records not yet persisted (COST_TRACKER_PERSIST)
+    try:
+        from src.infrastructure.claude_cost_tracker import close_cost_tracker
+        await close_cost_tracker()
+    except Exception as e:
+        logger.error(f"Error flushing cost records: {e}")
+
+    # Write messages still queued by the write-behind persister
+    try:
+        from src.services.message_persister import close_message_persister
+        await close_message_persister()
+        logger.info("Pending messages flushed")
+    except Exception as e:
+        logger.error(f"Error flushing pending messages: {e}")
+
     # Close asyncpg pool if it exists
     if hasattr(app.state, "db_pool") and app.state.db_pool:
         try:
@@ -115,6 +166,30 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.error(f"Error closing asyncpg pool: {e}")
 
+    # Close shared web search connections and threads
+    try:
+        from src.services.web_search import close_web_search_client
+        await close_web_search_client()
+    except Exception as e:
+        logger.error(f"Error closing web search client: {e}")
+
+    # Write buffered shared counters and stop the state pub/sub listener
+    try:
+        from src.services.claude_cache_manager import get_claude_cache_manager
+        from src.infrastructure.state_backend import close_state_backend
+        await get_claude_cache_manager().flush_stats()
+        await close_state_backend()
+    except Exception as e:
+        logger.error(f"Error closing state backend: {e}")
+
+    # Close Redis cache if it was initialized
+    redis_cache = get_redis_cache()
+    if redis_cache:
+        try:
+            await redis_cache.close()
+        except Exception as e:
+            logger.error(f"Error closing Redis cache: {e}")
+
     shutdown_manager = get_shutdown_manager()
     try:
         await shutdown_manager.shutdown()
@@ -148,9 +223,15 @@ app.add_middleware(
 )
 
 # Add custom middleware stack (in REVERSE order - last added executes first in request processing)
-# Execution order: Authentication → ContentModeration → MemoryInjection → ResponseStructuring → AuditLogging
+# All layers are pure ASGI and share one parsed request body via scope["state"]
+# Execution order: Authentication → ContentModeration → BodyParsing → MemoryInjection
+#                  → ResponseStructuring → Cache → AuditLogging
+# The cache sits inside the rate limiter (hits and 304s are still counted) and
+# inside the response envelope (stored bytes and ETags exclude request_id/timings)
 logger.info("Registering middleware stack...")
 from src.middleware.audit_logging_middleware import AuditLoggingMiddleware
+from src.middleware.body_parsing_middleware import BodyParsingMiddleware
+from src.middleware.cache_middleware import CacheMiddleware
 from src.middleware.response_structuring_middleware import ResponseStructuringMiddleware
 from src.middleware.content_moderation_middleware import ContentModerationMiddleware
 from src.middleware.memory_injection_middleware import MemoryInjectionMiddleware
@@ -158,8 +239,10 @@ from src.middleware.auth_middleware import AuthenticationMiddleware
 
 # Add in REVERSE order (last added = first executed in request processing)
 app.add_middleware(AuditLoggingMiddleware)  # Last in execution (logs everything)
-app.add_middleware(ResponseStructuringMiddleware)  # 4th in execution (structures response)
-app.add_middleware(MemoryInjectionMiddleware)  # 3rd in execution (injects memory/context)
+app.add_middleware(CacheMiddleware, default_ttl=int(os.getenv("HTTP_CACHE_TTL", "300")))  # 6th (ETag/304)
+app.add_middleware(ResponseStructuringMiddleware)  # 5th in execution (structures response)
+app.add_middleware(MemoryInjectionMiddleware)  # 4th in execution (injects memory/context)
+app.add_middleware(BodyParsingMiddleware)  # 3rd in execution (reads/parses JSON body once)
 app.add_middleware(ContentModerationMiddleware)  # 2nd in execution (rate limiting, content check)
 app.add_middleware(AuthenticationMiddleware)  # First in execution (auth check)
 logger.info("Middleware stack registered successfully")
@@ -6,6 +6,8 @@ from src.middleware.content_moderation_middleware import ContentModerationMiddle
 from src.middleware.response_structuring_middleware import ResponseStructuringMiddleware
 from src.middleware.audit_logging_middleware import AuditLoggingMiddleware
 from src.middleware.base_middleware import BaseMiddleware, FallbackStrategy
+from src.middleware.body_parsing_middleware import BodyParsingMiddleware
+from src.middleware.request_body import RequestBody, get_request_body
 
 __all__ = [
     "AuthenticationMiddleware",
@@ -13,6 +15,9 @@ __all__ = [
     "ContentModerationMiddleware",
     "ResponseStructuringMiddleware",
     "AuditLoggingMiddleware",
+    "BodyParsingMiddleware",
     "BaseMiddleware",
     "FallbackStrategy",
+    "RequestBody",
+    "get_request_body",
 ]
@@ -7,14 +7,15 @@ import time
 from typing import Optional, Dict, Any
 
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from starlette.types import Message, Receive, Scope, Send
+
+from src.middleware.base_middleware import BaseMiddleware
 
 logger = logging.getLogger(__name__)
 audit_logger = logging.getLogger("audit")
 
 
-class AuditLoggingMiddleware(BaseHTTPMiddleware):
+class AuditLoggingMiddleware(BaseMiddleware):
     """
     Middleware for audit logging and comprehensive performance tracking.
 
@@ -44,29 +45,29 @@ class AuditLoggingMiddleware(BaseHTTPMiddleware):
             os.getenv("PERFORMANCE_ERROR_THRESHOLD_MS", "5000")
         )
 
-    async def dispatch(self, request: Request, call_next) -> Response:
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
         Process request with comprehensive audit logging.
 
         Args:
-            request: FastAPI request
-            call_next: Next middleware/handler
-
-        Returns:
-            Response with logged metrics
+            scope: ASGI scope
+            receive: ASGI receive callable
+            send: ASGI send callable
         """
         if not self.audit_enabled:
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
         # Start timer
         start_time = time.time()
 
         # Get request info
+        request = Request(scope)
         user_id = getattr(request.state, "user_id", "anonymous")
         request_id = getattr(request.state, "request_id", "unknown")
-        method = request.method
-        path = request.url.path
-        query_params = dict(request.query_params)
+        method = scope["method"]
+        path = scope["path"]
+        query_params = dict(request.query_params) if scope.get("query_string") else None
 
         # Extract conversation ID from path
         conversation_id = self._extract_conversation_id(path)
@@ -81,41 +82,17 @@ class AuditLoggingMiddleware(BaseHTTPMiddleware):
             query_params=query_params,
         )
 
-        # Process request
-        try:
-            response = await call_next(request)
-
-            # Calculate elapsed time and breakdowns
-            elapsed_ms = (time.time() - start_time) * 1000
-
-            # Extract middleware timings from request state
-            performance_metrics = self._extract_performance_metrics(request, elapsed_ms)
+        status_code = 500
 
-            # Log request completion
-            self.log_request_completion(
-                request_id=request_id,
-                user_id=user_id,
-                method=method,
-                path=path,
-                conversation_id=conversation_id,
-                status_code=response.status_code,
-                elapsed_ms=elapsed_ms,
-                metrics=performance_metrics,
-            )
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
 
-            # Check performance thresholds
-            if elapsed_ms > self.performance_error_ms:
-                logger.error(
-                    f"Slow request (ERROR): {method} {path} took {elapsed_ms:.2f}ms "
-                    f"(threshold: {self.performance_error_ms}ms)"
-                )
-            elif elapsed_ms > self.performance_warning_ms:
-                logger.warning(
-                    f"Slow request (WARN): {method} {path} took {elapsed_ms:.2f}ms "
-                    f"(threshold: {self.performance_warning_ms}ms)"
-                )
-
-            return response
+        # Process request
+        try:
+            await self.app(scope, receive, send_wrapper)
 
         except Exception as e:
             elapsed_ms = (time.time() - start_time) * 1000
@@ -134,6 +111,36 @@ class AuditLoggingMiddleware(BaseHTTPMiddleware):
 
             raise
 
+        # Calculate elapsed time and breakdowns
+        elapsed_ms = (time.time() - start_time) * 1000
+
+        # Extract middleware timings from request state
+        performance_metrics = self._extract_performance_metrics(request, elapsed_ms)
+
+        # Log request completion
+        self.log_request_completion(
+            request_id=request_id,
+            user_id=user_id,
+            method=method,
+            path=path,
+            conversation_id=conversation_id,
+            status_code=status_code,
+            elapsed_ms=elapsed_ms,
+            metrics=performance_metrics,
+        )
+
+        # Check performance thresholds
+        if elapsed_ms > self.performance_error_ms:
+            logger.error(
+                f"Slow request (ERROR): {method} {path} took {elapsed_ms:.2f}ms "
+                f"(threshold: {self.performance_error_ms}ms)"
+            )
+        elif elapsed_ms > self.performance_warning_ms:
+            logger.warning(
+                f"Slow request (WARN): {method} {path} took {elapsed_ms:.2f}ms "
+                f"(threshold: {self.performance_warning_ms}ms)"
+            )
+
     def log_request_start(
         self,
         request_id: str,
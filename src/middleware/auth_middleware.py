@@ -4,23 +4,30 @@ import asyncio
 import logging
 import os
 import time
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from functools import lru_cache
 
 import jwt
 from fastapi import HTTPException, Request, status, Depends
 from jwt import ExpiredSignatureError, InvalidTokenError
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
 from starlette.responses import JSONResponse
+from starlette.types import Receive, Scope, Send
+
+from src.infrastructure.token_cache import TokenVerificationCache, get_token_cache
+from src.middleware.base_middleware import BaseMiddleware
 
 logger = logging.getLogger(__name__)
 
 
-class AuthenticationMiddleware(BaseHTTPMiddleware):
+class AuthenticationMiddleware(BaseMiddleware):
     """
     Middleware for JWT authentication with performance optimization.
 
     Verifies JWT tokens in Authorization header with caching and timeouts.
+    Verification results are cached in the shared TokenVerificationCache
+    (bounded LRU, expiry from the token's exp, optional Redis tier), so a
+    token is decoded once rather than on every request.
     Performance target: <10ms per auth check
     """
 
@@ -42,7 +49,7 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
         "/api/v1/health",  # Health check
     }
 
-    def __init__(self, app):
+    def __init__(self, app, token_cache: Optional[TokenVerificationCache] = None):
         """Initialize middleware with configuration."""
         super().__init__(app)
         self.secret_key = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
@@ -55,40 +62,34 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
         self.expected_issuer = os.getenv("JWT_ISSUER")
         self.auth_timeout_ms = float(os.getenv("AUTH_TIMEOUT_MS", "50"))
 
-        # Token cache: {token_hash: (user_id, expiry_time)}
-        self._token_cache = {}
-        self._cache_ttl = 300  # 5 minutes cache validity
-        self._cache_cleanup_interval = 300  # Cleanup every 5 minutes
-        self._last_cleanup = time.time()
+        # Verification cache (shared by all instances unless one is injected)
+        self.token_cache = token_cache if token_cache is not None else get_token_cache()
 
-    async def dispatch(self, request: Request, call_next):
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
         Process request and verify authentication with timeout protection.
 
         Args:
-            request: FastAPI request
-            call_next: Next middleware/handler
-
-        Returns:
-            Response
+            scope: ASGI scope
+            receive: ASGI receive callable
+            send: ASGI send callable
 
-        Raises:
-            JSONResponse: 401 for authentication failures
+        Responds with 401 for authentication failures.
         """
-        # Allow CORS preflight requests (OPTIONS) to pass through
-        if request.method == "OPTIONS":
-            return await call_next(request)
+        path = scope["path"]
 
+        # Allow CORS preflight requests (OPTIONS) to pass through
         # Skip authentication for public endpoints
-        if self._is_public_endpoint(request.url.path):
-            return await call_next(request)
+        if scope["method"] == "OPTIONS" or self._is_public_endpoint(path):
+            await self.app(scope, receive, send)
+            return
 
         # Get authorization header
-        auth_header = request.headers.get("Authorization", "")
+        auth_header = Headers(scope=scope).get("authorization", "")
 
         if not auth_header.startswith("Bearer "):
-            logger.warning(f"Missing or invalid Authorization header for {request.url.path}")
-            return JSONResponse(
+            logger.warning(f"Missing or invalid Authorization header for {path}")
+            response = JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 content={
                     "success": False,
@@ -96,6 +97,8 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
                     "error_code": "UNAUTHORIZED",
                 },
             )
+            await response(scope, receive, send)
+            return
 
         token = auth_header.split(" ", 1)[1] if " " in auth_header else ""
 
@@ -107,28 +110,9 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
                 timeout=self.auth_timeout_ms / 1000.0
             )
             elapsed_ms = (time.time() - start_time) * 1000
-
-            if not user_id:
-                logger.warning(f"Invalid token for {request.url.path}")
-                return JSONResponse(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    content={
-                        "success": False,
-                        "error": "Invalid token",
-                        "error_code": "INVALID_TOKEN",
-                    },
-                )
-
-            # Add user_id to request state for downstream middleware
-            request.state.user_id = user_id
-            request.state.auth_time_ms = elapsed_ms
-
-            response = await call_next(request)
-            return response
-
         except asyncio.TimeoutError:
-            logger.error(f"Authentication timeout for {request.url.path}")
-            return JSONResponse(
+            logger.error(f"Authentication timeout for {path}")
+            response = JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 content={
                     "success": False,
@@ -136,10 +120,32 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
                     "error_code": "AUTH_TIMEOUT",
                 },
             )
+            await response(scope, receive, send)
+            return
+
+        if not user_id:
+            logger.warning(f"Invalid token for {path}")
+            response = JSONResponse(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                content={
+                    "success": False,
+                    "error": "Invalid token",
+                    "error_code": "INVALID_TOKEN",
+                },
+            )
+            await response(scope, receive, send)
+            return
+
+        # Add user_id to request state for downstream middleware
+        state = self.get_state(scope)
+        state["user_id"] = user_id
+        state["auth_time_ms"] = elapsed_ms
+
+        await self.app(scope, receive, send)
 
     async def _async_verify_token(self, token: str) -> Optional[str]:
         """
-        Async wrapper for token verification.
+        Verify JWT token, consulting the shared cache (including Redis) first.
 
         Args:
             token: JWT token
@@ -147,16 +153,26 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
         Returns:
             User ID if valid, None otherwise
         """
-        return self.verify_token(token)
+        if not token:
+            return None
+
+        user_id = await self.token_cache.aget(token)
+        if user_id is not None:
+            return user_id
+
+        decoded = self._decode_token(token)
+        if decoded is None:
+            return None
+        user_id, exp = decoded
+        await self.token_cache.aset(token, user_id, exp)
+        return user_id
 
     def verify_token(self, token: str) -> Optional[str]:
         """
         Verify JWT token and extract user ID with caching.
 
-        Performance optimizations:
-        - Token cache to avoid repeated verification
-        - Cache cleanup to prevent memory leaks
-        - Fast path for cached tokens
+        Synchronous form for callers outside the middleware; only the
+        in-process tier of the cache is consulted.
 
         Args:
             token: JWT token
@@ -167,20 +183,27 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
         if not token:
             return None
 
-        # Check cache first
-        token_hash = hash(token)
-        if token_hash in self._token_cache:
-            user_id, expiry_time = self._token_cache[token_hash]
-            if time.time() < expiry_time:
-                return user_id
-            else:
-                # Cache expired, remove it
-                del self._token_cache[token_hash]
+        user_id = self.token_cache.get(token)
+        if user_id is not None:
+            return user_id
+
+        decoded = self._decode_token(token)
+        if decoded is None:
+            return None
+        user_id, exp = decoded
+        self.token_cache.set(token, user_id, exp)
+        return user_id
+
+    def _decode_token(self, token: str) -> Optional[Tuple[str, float]]:
+        """
+        Decode and validate a JWT.
 
-        # Periodic cache cleanup
-        if time.time() - self._last_cleanup > self._cache_cleanup_interval:
-            self._cleanup_token_cache()
+        Args:
+            token: JWT token
 
+        Returns:
+            Tuple (user_id, exp) if valid, None otherwise
+        """
         try:
             decode_kwargs = {
                 "algorithms": self.algorithms,
@@ -197,12 +220,7 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
                 logger.error("JWT missing subject claim")
                 return None
 
-            # Cache the result
-            token_hash = hash(token)
-            cache_expiry = time.time() + self._cache_ttl
-            self._token_cache[token_hash] = (str(user_id), cache_expiry)
-
-            return str(user_id)
+            return str(user_id), float(payload["exp"])
 
         except ExpiredSignatureError:
             logger.warning("JWT token expired")
@@ -214,20 +232,6 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
             logger.error(f"Token verification error: {exc}")
             return None
 
-    def _cleanup_token_cache(self) -> None:
-        """Remove expired entries from token cache."""
-        current_time = time.time()
-        expired_tokens = [
-            token_hash
-            for token_hash, (_, expiry_time) in self._token_cache.items()
-            if current_time >= expiry_time
-        ]
-        for token_hash in expired_tokens:
-            del self._token_cache[token_hash]
-        self._last_cleanup = time.time()
-        if expired_tokens:
-            logger.debug(f"Cleaned up {len(expired_tokens)} expired tokens from cache")
-
     def _is_public_endpoint(self, path: str) -> bool:
         """Check if endpoint is public (no auth required)."""
         public_paths = {
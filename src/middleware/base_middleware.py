@@ -1,4 +1,9 @@
-"""Base middleware class with common error handling and utilities."""
+"""Base middleware class with common error handling and utilities.
+
+Middleware in this package are pure ASGI callables rather than
+``BaseHTTPMiddleware`` subclasses: no per-request task or response-stream
+wrapping, and streaming responses pass through untouched.
+"""
 
 import asyncio
 import logging
@@ -6,9 +11,8 @@ from abc import ABC, abstractmethod
 from enum import Enum
 from typing import Any, Dict, Optional
 
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response, JSONResponse
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 logger = logging.getLogger(__name__)
 
@@ -22,9 +26,12 @@ class FallbackStrategy(str, Enum):
     RETURN_ERROR = "return_error"  # Return 400/500 error
 
 
-class BaseMiddleware(BaseHTTPMiddleware, ABC):
+class BaseMiddleware(ABC):
     """
-    Base middleware class with common error handling patterns.
+    Base pure-ASGI middleware class with common error handling patterns.
+
+    Non-HTTP scopes (WebSocket, lifespan) are passed straight through;
+    HTTP requests are handed to ``handle``.
 
     Provides:
     - Timeout protection with asyncio.wait_for
@@ -36,7 +43,7 @@ class BaseMiddleware(BaseHTTPMiddleware, ABC):
 
     def __init__(
         self,
-        app,
+        app: ASGIApp,
         timeout_ms: float = 5000,
         fallback_strategy: FallbackStrategy = FallbackStrategy.RETURN_ERROR,
         max_retries: int = 1,
@@ -52,27 +59,37 @@ class BaseMiddleware(BaseHTTPMiddleware, ABC):
             max_retries: Maximum retry attempts
             backoff_factor: Exponential backoff multiplier
         """
-        super().__init__(app)
+        self.app = app
         self.timeout_ms = timeout_ms
         self.fallback_strategy = fallback_strategy
         self.max_retries = max_retries
         self.backoff_factor = backoff_factor
         self.logger = logging.getLogger(self.__class__.__name__)
 
-    async def dispatch(self, request: Request, call_next) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """ASGI entry point."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        await self.handle(scope, receive, send)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
-        Dispatch request with error handling.
+        Handle an HTTP request.
 
         Subclasses should override this method.
 
         Args:
-            request: FastAPI request
-            call_next: Next middleware/handler
-
-        Returns:
-            Response
+            scope: ASGI scope (``scope["state"]`` is shared with request.state)
+            receive: ASGI receive callable
+            send: ASGI send callable
         """
-        return await call_next(request)
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def get_state(scope: Scope) -> Dict[str, Any]:
+        """Per-request state dict (backs ``request.state`` downstream)."""
+        return scope.setdefault("state", {})
 
     async def execute_with_timeout(
         self,
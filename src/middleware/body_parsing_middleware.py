@@ -0,0 +1,62 @@
+"""Body parsing middleware: read and parse the request body once per request."""
+
+import logging
+import os
+
+from starlette.datastructures import Headers
+from starlette.types import Receive, Scope, Send
+
+from src.middleware.base_middleware import BaseMiddleware
+from src.middleware.request_body import get_request_body, wrap_receive
+
+logger = logging.getLogger(__name__)
+
+
+class BodyParsingMiddleware(BaseMiddleware):
+    """
+    Middleware that reads and parses JSON request bodies exactly once.
+
+    The result is stored as ``request.state.request_body`` (a RequestBody with
+    ``body``, ``text()`` and ``json()``). Later middleware reuse it, and routes
+    using ``SharedBodyRoute`` hand the pre-parsed object to FastAPI/Pydantic
+    instead of calling ``json.loads`` again.
+
+    Only JSON bodies on POST/PUT/PATCH are pre-read; uploads and other content
+    types keep streaming to the endpoint.
+
+    Configuration via environment variables:
+    - BODY_PARSING_ENABLED: Enable/disable eager parsing
+    """
+
+    BODY_METHODS = frozenset({"POST", "PUT", "PATCH"})
+
+    def __init__(self, app):
+        """Initialize middleware."""
+        super().__init__(app)
+        self.enabled = os.getenv("BODY_PARSING_ENABLED", "true").lower() == "true"
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Read and parse the JSON body, then continue with a replaying receive.
+
+        Args:
+            scope: ASGI scope
+            receive: ASGI receive callable
+            send: ASGI send callable
+        """
+        if self.enabled and scope["method"] in self.BODY_METHODS:
+            content_type = Headers(scope=scope).get("content-type", "")
+            if self._is_json(content_type):
+                request_body = await get_request_body(scope, receive)
+                # Parse once up front; errors surface to the handler as a 422
+                request_body.json()
+
+        await self.app(scope, wrap_receive(scope, receive), send)
+
+    @staticmethod
+    def _is_json(content_type: str) -> bool:
+        """Check for application/json or any application/*+json media type."""
+        media_type = content_type.split(";", 1)[0].strip().lower()
+        return media_type == "application/json" or (
+            media_type.startswith("application/") and media_type.endswith("+json")
+        )
@@ -24,13 +24,14 @@ Example:
 import hashlib
 import json
 import logging
+import os
 from functools import wraps
-from typing import Optional, Callable, Any
+from typing import Optional, Callable, Any, Iterable
 from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.datastructures import Headers
 
 from src.infrastructure.redis_cache import get_redis_cache
+from src.middleware.response_structuring_middleware import STRUCTURE_PENDING_KEY
 
 logger = logging.getLogger(__name__)
 
@@ -199,15 +200,186 @@ def invalidate_cache_pattern(pattern: str):
     return decorator
 
 
-class CacheMiddleware(BaseHTTPMiddleware):
+def compute_etag(body: bytes) -> str:
     """
-    Middleware for automatic HTTP response caching.
+    Compute a strong ETag from the exact response bytes.
 
-    This middleware caches GET requests based on URL patterns.
-    Supports cache-control headers and conditional requests.
+    Args:
+        body: Response body as sent to the client
+
+    Returns:
+        Quoted entity tag (e.g., '"3b1f...c9"')
+    """
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Check an If-None-Match header against an entity tag.
+
+    Uses the weak comparison required by RFC 9110 for If-None-Match,
+    so ``W/"abc"`` matches ``"abc"``.
+
+    Args:
+        if_none_match: Raw If-None-Match header value
+        etag: Current entity tag
+
+    Returns:
+        True if the client's copy is still current
+    """
+    if not if_none_match or not etag:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    current = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == current:
+            return True
+    return False
+
+
+def get_cache_scope(request: Request) -> str:
+    """
+    Derive the per-user cache namespace for a request.
+
+    Prefers the user resolved by AuthenticationMiddleware, then falls back to
+    a digest of the Authorization header and finally the X-User-ID header,
+    so cached bodies are never shared across users.
+
+    Args:
+        request: Incoming request
+
+    Returns:
+        Cache scope string
+    """
+    user_id = getattr(request.state, "user_id", None)
+    if user_id:
+        return f"u:{user_id}"
+
+    authorization = request.headers.get("Authorization")
+    if authorization:
+        return f"a:{hashlib.sha256(authorization.encode()).hexdigest()[:16]}"
+
+    return f"h:{request.headers.get('X-User-ID', 'anonymous')}"
+
+
+def generation_key(name: str) -> str:
+    """Key of the generation counter that cached entries of ``name`` are stamped with."""
+    return f"{CacheMiddleware.KEY_PREFIX}gen:{name}"
+
+
+async def invalidate_http_cache(path_prefix: str) -> bool:
+    """
+    Invalidate cached HTTP responses (all users) under a cacheable path prefix.
+
+    Use this for writes that bypass HTTP, e.g. messages saved over WebSocket,
+    so ETag revalidation does not keep confirming a stale body. Bumps the
+    prefix's generation counter (one INCR); entries stamped with an older
+    generation are treated as misses and expire on their own.
+
+    Args:
+        path_prefix: Cacheable path prefix, as listed in HTTP_CACHE_PATHS
+            (e.g., "/api/v1/conversations")
+
+    Returns:
+        True if the generation was bumped
+    """
+    cache = get_redis_cache()
+    if not cache or not cache._initialized:
+        return False
+
+    try:
+        generation = await cache.incr(
+            generation_key(f"path:{path_prefix}"), ttl=CacheMiddleware.GENERATION_TTL
+        )
+        return generation is not None
+    except Exception as e:
+        logger.warning(f"HTTP cache invalidation failed for {path_prefix}: {e}")
+        return False
+
+
+async def invalidate_resource_cache(
+    resource_ids: Iterable[Any], scopes: Iterable[str] = ()
+) -> bool:
+    """
+    Invalidate cached HTTP responses of specific resources and callers.
+
+    Use this for writes that bypass HTTP, e.g. messages committed by the
+    write-behind persister: only entries under ``{prefix}/{resource_id}``
+    (for every caller) and the entries of the given cache scopes (e.g. the
+    owner's conversation list) are dropped; everyone else keeps their cached
+    responses and validators. One pipelined INCR per counter.
+
+    Args:
+        resource_ids: First path segment after a cacheable prefix
+            (e.g., conversation IDs)
+        scopes: Cache scopes as returned by get_cache_scope (e.g., "u:alice")
+
+    Returns:
+        True if the generations were bumped
+    """
+    cache = get_redis_cache()
+    if not cache or not cache._initialized:
+        return False
+
+    keys = [generation_key(f"res:{resource_id}") for resource_id in resource_ids]
+    keys.extend(generation_key(scope) for scope in scopes)
+    try:
+        return await cache.incr_many(keys, ttl=CacheMiddleware.GENERATION_TTL)
+    except Exception as e:
+        logger.warning(f"HTTP cache invalidation failed for {len(keys)} generations: {e}")
+        return False
+
+
+class CacheMiddleware:
+    """
+    Pure-ASGI middleware for automatic HTTP response caching.
+
+    This middleware caches GET requests under an allowlist of path prefixes
+    (conversation list and message polling by default); other paths such as
+    /health and /metrics always reach their handler. Supports cache-control
+    headers and conditional requests.
+
+    Register it inside ResponseStructuringMiddleware and the rate limiter:
+    the stored bytes and their ETag cover the un-enveloped payload (the
+    envelope, with its per-request request_id and timings, is applied around
+    fresh and cached bodies alike), and cache hits still count against the
+    rate limit.
+
+    Raw response bytes and headers are stored as-is and replayed without any
+    decoding or re-encoding. The response stream is teed as it passes through;
+    streaming responses (SSE, NDJSON, or anything without a Content-Length)
+    are bypassed automatically and never buffered.
+
+    Each cached response carries a strong ETag (SHA-256 of the body). The tag
+    is also stored under its own small key so that a revalidation request
+    (``If-None-Match``) is answered with ``304 Not Modified`` straight from
+    Redis, without running the handler or loading the cached body.
+
+    Entries are stamped with generation counters: one per cache scope (user),
+    one per cacheable path prefix and, for paths below a prefix, one per
+    resource (the first segment after the prefix, e.g. a conversation ID).
+    Successful writes (POST/PUT/PATCH/DELETE) bump the caller's counter,
+    invalidate_http_cache() bumps a prefix's counter and
+    invalidate_resource_cache() bumps resource and scope counters, so
+    invalidation is a single INCR per counter; entries with an older stamp are
+    misses. POSTs that change no stored data (draft prefetch, sent on every
+    keystroke) invalidate nothing. The counters are read together with the
+    entry (one MGET), before the handler runs, so a response rendered
+    concurrently with a write is never stored as current.
 
     Configuration:
         - CACHE_ENABLED: Enable/disable caching (env var)
+        - HTTP_CACHE_PATHS: Comma-separated cacheable path prefixes
+          (default: "/api/v1/conversations,/api/conversations")
+        - HTTP_CACHE_CONTROL: Cache-Control sent on cacheable responses
+          (default: "private, no-cache" - clients always revalidate)
+        - HTTP_CACHE_MAX_BODY_BYTES: Largest body that is cached (default: 1MB)
         - Default TTL: 3600 seconds (1 hour)
         - Cache Control: Honors Cache-Control headers
 
@@ -216,89 +388,328 @@ class CacheMiddleware(BaseHTTPMiddleware):
         app.add_middleware(CacheMiddleware)
     """
 
-    def __init__(self, app, default_ttl: int = 3600):
-        super().__init__(app)
+    KEY_PREFIX = "http:"
+    DEFAULT_CACHEABLE_PATHS = "/api/v1/conversations,/api/conversations"
+    # Lifetime of generation counters; entries never outlive it
+    GENERATION_TTL = 86400
+    VARY = "Authorization, X-User-ID"
+    MUTATING_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+    # Writes that leave every cached resource unchanged
+    NON_MUTATING_SUFFIXES = ("/prefetch",)
+    STREAMING_CONTENT_TYPES = (
+        "text/event-stream", "application/x-ndjson", "application/stream+json"
+    )
+    VALIDATOR_HEADERS = frozenset({b"etag", b"cache-control", b"vary"})
+
+    def __init__(
+        self,
+        app,
+        default_ttl: int = 3600,
+        cache_control: Optional[str] = None,
+        cacheable_paths: Optional[Iterable[str]] = None,
+    ):
+        self.app = app
         self.default_ttl = default_ttl
-
-    async def dispatch(self, request: Request, call_next):
+        self.enabled = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+        self.cache_control = cache_control or os.getenv("HTTP_CACHE_CONTROL", "private, no-cache")
+        self.max_body_bytes = int(os.getenv("HTTP_CACHE_MAX_BODY_BYTES", str(1024 * 1024)))
+        if cacheable_paths is None:
+            cacheable_paths = os.getenv("HTTP_CACHE_PATHS", self.DEFAULT_CACHEABLE_PATHS).split(",")
+        self.cacheable_paths = tuple(p.strip().rstrip("/") for p in cacheable_paths if p.strip())
+
+    def _cacheable_prefix(self, path: str) -> Optional[str]:
+        """Allowlisted prefix covering a path, or None if the path is never cached."""
+        for prefix in self.cacheable_paths:
+            if path == prefix or path.startswith(prefix + "/"):
+                return prefix
+        return None
+
+    @staticmethod
+    def _resource_id(prefix: str, path: str) -> Optional[str]:
+        """First path segment below the cacheable prefix, if any."""
+        resource = path[len(prefix) + 1:].split("/", 1)[0]
+        return resource or None
+
+    def _cache_keys(self, cache_scope: str, path: str, query: bytes) -> tuple[str, str]:
+        """Build the (body key, etag key) pair for a request."""
+        resource = path
+        if query:
+            resource += ":" + hashlib.md5(query).hexdigest()[:8]
+        return (
+            f"{self.KEY_PREFIX}{cache_scope}:body:{resource}",
+            f"{self.KEY_PREFIX}{cache_scope}:etag:{resource}",
+        )
+
+    def _validator_headers(
+        self, etag: str, cache_control: Optional[str] = None
+    ) -> list[tuple[bytes, bytes]]:
+        """Headers shared by 200 and 304 responses for a cached resource."""
+        return [
+            (b"etag", etag.encode("latin-1")),
+            (b"cache-control", (cache_control or self.cache_control).encode("latin-1")),
+            (b"vary", self.VARY.encode("latin-1")),
+        ]
+
+    async def _send_not_modified(
+        self, send, etag: str, cache_control: Optional[str] = None
+    ) -> None:
+        """Send a bodiless 304 response."""
+        await send({
+            "type": "http.response.start",
+            "status": 304,
+            "headers": self._validator_headers(etag, cache_control),
+        })
+        await send({"type": "http.response.body", "body": b""})
+
+    def _is_cacheable(self, status: int, headers: Headers) -> bool:
+        """Decide from the response head whether the body may be teed into the cache."""
+        if not 200 <= status < 300:
+            return False
+
+        content_type = headers.get("content-type", "")
+        if content_type.startswith(self.STREAMING_CONTENT_TYPES):
+            return False
+
+        # Responses without a declared length are streams; never buffer them
+        content_length = headers.get("content-length")
+        if content_length is None or not content_length.isdigit():
+            return False
+        if int(content_length) > self.max_body_bytes:
+            return False
+
+        return "no-store" not in headers.get("cache-control", "")
+
+    def _ttl_for(self, cache_control: str) -> int:
+        """Determine TTL from response Cache-Control or use default."""
+        if "max-age=" in cache_control:
+            try:
+                return int(cache_control.split("max-age=")[1].split(",")[0])
+            except (ValueError, IndexError):
+                pass
+        return self.default_ttl
+
+    @staticmethod
+    def _encode_entry(meta: dict, body: bytes) -> bytes:
+        """Frame an entry as one JSON header line followed by the raw body."""
+        return json.dumps(meta, separators=(",", ":")).encode() + b"\n" + body
+
+    @staticmethod
+    def _decode_entry(entry: bytes) -> tuple[dict, memoryview]:
+        """Split a stored entry into its metadata and a zero-copy body view."""
+        newline = entry.index(b"\n")
+        return json.loads(entry[:newline]), memoryview(entry)[newline + 1:]
+
+    async def __call__(self, scope, receive, send):
         """Process request with caching logic."""
-
-        # Only cache GET requests
-        if request.method != "GET":
-            return await call_next(request)
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
         # Check if caching is enabled
         cache = get_redis_cache()
-        if not cache or not cache._initialized:
-            return await call_next(request)
+        if not self.enabled or not cache or not cache._initialized:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        cache_scope = get_cache_scope(Request(scope))
 
-        # Generate cache key from request URL
-        cache_key = f"http:{request.url.path}:{request.url.query}"
+        if method in self.MUTATING_METHODS:
+            if scope["path"].endswith(self.NON_MUTATING_SUFFIXES):
+                await self.app(scope, receive, send)
+                return
+            await self._call_and_invalidate(cache, cache_scope, scope, receive, send)
+            return
+
+        # Only cache GET requests on allowlisted paths
+        prefix = self._cacheable_prefix(scope["path"]) if method == "GET" else None
+        if prefix is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
 
         # Check Cache-Control header
-        cache_control = request.headers.get("Cache-Control", "")
+        cache_control = request_headers.get("cache-control", "")
         if "no-cache" in cache_control or "no-store" in cache_control:
             # Client requested no cache
-            return await call_next(request)
-
-        # Try to get from cache
-        cached_data = await cache.get(cache_key)
-        if cached_data:
-            logger.debug(f"HTTP Cache HIT: {request.url.path}")
-
-            # Return cached response
-            return Response(
-                content=json.dumps(cached_data["body"]),
-                status_code=cached_data["status_code"],
-                headers=dict(cached_data["headers"]),
-                media_type=cached_data.get("media_type", "application/json"),
-            )
-
-        # Cache miss - process request
-        logger.debug(f"HTTP Cache MISS: {request.url.path}")
-        response = await call_next(request)
+            await self.app(scope, receive, send)
+            return
+
+        body_key, etag_key = self._cache_keys(cache_scope, scope["path"], scope["query_string"])
+        if_none_match = request_headers.get("if-none-match", "")
+
+        # Read the entry together with the current generations (one round trip).
+        # Conditional requests only need the small stored tag.
+        generation_keys = [generation_key(f"path:{prefix}"), generation_key(cache_scope)]
+        resource_id = self._resource_id(prefix, scope["path"])
+        if resource_id:
+            generation_keys.append(generation_key(f"res:{resource_id}"))
+        stored, *generations = await cache.get_many_bytes(
+            [etag_key if if_none_match else body_key, *generation_keys]
+        )
+        generation = ".".join(str(int(value or 0)) for value in generations)
+
+        if if_none_match and stored:
+            cached_etag = json.loads(stored)
+            if cached_etag.get("generation") != generation:
+                stored = None  # invalidated: the body carries the same stamp
+            elif etag_matches(if_none_match, cached_etag["etag"]):
+                logger.debug(f"HTTP Cache 304: {scope['path']}")
+                await self._send_not_modified(
+                    send, cached_etag["etag"], cached_etag.get("cache_control")
+                )
+                return
+            else:
+                stored = await cache.get_bytes(body_key)
 
-        # Cache successful responses only (200-299)
-        if 200 <= response.status_code < 300:
+        if stored:
             try:
-                # Read response body
-                body = b""
-                async for chunk in response.body_iterator:
-                    body += chunk
-
-                # Parse response
-                response_data = {
-                    "status_code": response.status_code,
-                    "headers": dict(response.headers),
-                    "body": json.loads(body.decode()),
-                    "media_type": response.media_type,
-                }
-
-                # Determine TTL from response headers or use default
-                ttl = self.default_ttl
-                cache_control_header = response.headers.get("Cache-Control", "")
-                if "max-age=" in cache_control_header:
-                    try:
-                        max_age = int(cache_control_header.split("max-age=")[1].split(",")[0])
-                        ttl = max_age
-                    except (ValueError, IndexError):
-                        pass
-
-                # Cache the response
-                await cache.set(cache_key, response_data, ttl=ttl)
-
-                # Return new response with cached body
-                return Response(
-                    content=body,
-                    status_code=response.status_code,
-                    headers=dict(response.headers),
-                    media_type=response.media_type,
-                )
+                meta, body = self._decode_entry(stored)
+            except ValueError as e:
+                logger.warning(f"Discarding corrupt HTTP cache entry {body_key}: {e}")
+            else:
+                if meta.get("generation") == generation:
+                    logger.debug(f"HTTP Cache HIT: {scope['path']}")
+                    await self._replay(meta, body, send)
+                    return
 
+        # Cache miss - process request
+        logger.debug(f"HTTP Cache MISS: {scope['path']}")
+        await self._call_and_store(
+            cache, scope, receive, send, body_key, etag_key, if_none_match, generation
+        )
+
+    async def _replay(self, meta: dict, body: memoryview, send) -> None:
+        """Send a cached response exactly as it was stored."""
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in meta["headers"]]
+        headers.extend(self._validator_headers(meta["etag"], meta.get("cache_control")))
+        await send({"type": "http.response.start", "status": meta["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": bytes(body)})
+
+    async def _call_and_invalidate(self, cache, cache_scope: str, scope, receive, send) -> None:
+        """Run a write request and drop the caller's cached entries if it succeeded."""
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+        if 200 <= status_code < 300:
+            # Writes invalidate everything cached for this caller
+            try:
+                await cache.incr(generation_key(cache_scope), ttl=self.GENERATION_TTL)
             except Exception as e:
-                logger.warning(f"Failed to cache HTTP response: {e}")
-
-        return response
+                logger.warning(f"HTTP cache invalidation failed: {e}")
+
+    async def _call_and_store(
+        self,
+        cache,
+        scope,
+        receive,
+        send,
+        body_key: str,
+        etag_key: str,
+        if_none_match: str,
+        generation: str,
+    ) -> None:
+        """Run the app, teeing a cacheable response body into Redis."""
+        start_message = None
+        cacheable = False
+        streamed = False
+        chunks: list[bytes] = []
+
+        # Keep route-level envelopes (StructuredJSONResponse) off the stored
+        # bytes; ResponseStructuringMiddleware wraps the response outside.
+        state = scope.setdefault("state", {})
+        structure_pending = state.pop(STRUCTURE_PENDING_KEY, None)
+
+        async def send_wrapper(message):
+            nonlocal start_message, cacheable, streamed
+
+            if message["type"] == "http.response.start":
+                if structure_pending is not None:
+                    state[STRUCTURE_PENDING_KEY] = structure_pending
+                cacheable = self._is_cacheable(message["status"], Headers(raw=message["headers"]))
+                if not cacheable:
+                    await send(message)
+                    return
+                # Hold the head until the body is known so the ETag can be attached
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or not cacheable:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if not streamed and not more_body and not chunks:
+                # Single-chunk response (the common case): no copying at all
+                chunks.append(body)
+                return
+
+            # Multi-chunk response: forward each chunk as it arrives and tee it
+            if not streamed:
+                streamed = True
+                await send(start_message)
+                for held in chunks:
+                    await send({"type": "http.response.body", "body": held, "more_body": True})
+            chunks.append(body)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+        if not cacheable or start_message is None:
+            return
+
+        body = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+        etag = compute_etag(body)
+        response_headers = Headers(raw=start_message["headers"])
+        response_cache_control = response_headers.get("cache-control") or None
+        ttl = min(self._ttl_for(response_cache_control or ""), self.GENERATION_TTL)
+
+        if not streamed:
+            if etag_matches(if_none_match, etag):
+                await self._send_not_modified(send, etag, response_cache_control)
+            else:
+                headers = [
+                    (k, v) for k, v in start_message["headers"]
+                    if k.lower() not in self.VALIDATOR_HEADERS
+                ]
+                headers.extend(self._validator_headers(etag, response_cache_control))
+                await send({**start_message, "headers": headers})
+                await send({"type": "http.response.body", "body": body})
+
+        if ttl <= 0:
+            return
+
+        meta = {
+            "status": start_message["status"],
+            "headers": [
+                (k.decode("latin-1"), v.decode("latin-1"))
+                for k, v in start_message["headers"]
+                if k.lower() not in self.VALIDATOR_HEADERS
+            ],
+            "etag": etag,
+            "cache_control": response_cache_control,
+            "generation": generation,
+        }
+        try:
+            # Cache the response
+            await cache.set_bytes(body_key, self._encode_entry(meta, body), ttl=ttl)
+            await cache.set(
+                etag_key,
+                {"etag": etag, "cache_control": response_cache_control, "generation": generation},
+                ttl=ttl,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to cache HTTP response: {e}")
 
 
 class CacheWarmup:
@@ -2,26 +2,35 @@
 
 import asyncio
 import logging
+import math
 import os
-import re
-import time
-from typing import Dict, Optional, Tuple
+from typing import Optional, Tuple
 
 from fastapi import Request, status
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse, Response
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import Receive, Scope, Send
+
+from src.infrastructure.rate_limiter import RateLimiter, get_rate_limiter
+from src.middleware.base_middleware import BaseMiddleware
+from src.middleware.content_scanner import ContentScanner
+from src.middleware.request_body import RequestBody, get_request_body, wrap_receive
 
 logger = logging.getLogger(__name__)
 
 
-class ContentModerationMiddleware(BaseHTTPMiddleware):
+class ContentModerationMiddleware(BaseMiddleware):
     """
     Middleware for content moderation and rate limiting.
 
     Provides:
-    - Rate limiting per user (100 req/min) and IP (1000 req/min)
-    - SQL injection detection
-    - XSS/prompt injection detection
+    - Rate limiting per user (100 req/min) and IP (1000 req/min), enforced by
+      the shared GCRA engine (O(1) per check, bounded memory, cluster-wide
+      via Redis when available). Draft prefetches, posted while the user
+      types, have their own per-user bucket (RATE_LIMIT_PREFETCH) instead
+      of using up the request limit.
+    - SQL injection and XSS/prompt injection detection in a single linear
+      pass over the string fields of the parsed JSON body (ContentScanner)
     - Content safety checks
     - Request/response size validation
     - Performance target: <100ms
@@ -31,6 +40,7 @@ class ContentModerationMiddleware(BaseHTTPMiddleware):
     - RATE_LIMIT_ENABLED: Enable/disable rate limiting
     - RATE_LIMIT_USER: User rate limit (req/min)
     - RATE_LIMIT_IP: IP rate limit (req/min)
+    - RATE_LIMIT_PREFETCH: Draft prefetch rate limit per user (req/min)
     - MAX_REQUEST_SIZE: Max request body size (bytes)
     - MAX_RESPONSE_SIZE: Max response size (bytes)
     - MODERATION_TIMEOUT_MS: Moderation check timeout
@@ -40,254 +50,230 @@ class ContentModerationMiddleware(BaseHTTPMiddleware):
     RATE_LIMIT_USER = 100  # requests per minute per user
     RATE_LIMIT_IP = 1000  # requests per minute per IP
     WINDOW_SIZE = 60  # seconds
+    RATE_LIMIT_PREFETCH = 300  # draft prefetches per minute per user
+    # Keystroke-rate drafts, limited by their own per-user bucket
+    PREFETCH_SUFFIX = "/prefetch"
 
     # Content constraints
     MAX_REQUEST_SIZE = 10000  # characters
     MAX_RESPONSE_SIZE = 50000  # characters
 
-    # SQL injection patterns
-    SQL_INJECTION_PATTERNS = [
-        r"(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|EXECUTE)\b)",
-        r"('|\")\s*(OR|AND)\s*('|\")?",
-        r"--\s*$",
-        r"/\*.*\*/",
-        r";\s*(DROP|DELETE|TRUNCATE|UPDATE)",
-    ]
-
-    # XSS/Prompt injection patterns
-    INJECTION_PATTERNS = [
-        r"<script[^>]*>.*?</script>",
-        r"javascript:",
-        r"on\w+\s*=",
-        r"eval\s*\(",
-        r"__import__",
-        r"exec\s*\(",
-    ]
-
-    def __init__(self, app):
+    def __init__(self, app, rate_limiter: Optional[RateLimiter] = None):
         """Initialize middleware with rate limiting and security checks."""
         super().__init__(app)
         self.moderation_enabled = os.getenv("CONTENT_MODERATION_ENABLED", "true").lower() == "true"
         self.rate_limit_enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
         self.rate_limit_user = int(os.getenv("RATE_LIMIT_USER", self.RATE_LIMIT_USER))
         self.rate_limit_ip = int(os.getenv("RATE_LIMIT_IP", self.RATE_LIMIT_IP))
+        self.rate_limit_prefetch = int(
+            os.getenv("RATE_LIMIT_PREFETCH", self.RATE_LIMIT_PREFETCH)
+        )
         self.max_request_size = int(os.getenv("MAX_REQUEST_SIZE", self.MAX_REQUEST_SIZE))
         self.max_response_size = int(os.getenv("MAX_RESPONSE_SIZE", self.MAX_RESPONSE_SIZE))
         self.moderation_timeout_ms = float(os.getenv("MODERATION_TIMEOUT_MS", "100"))
 
-        # Rate limit tracking: {user_id or ip: [timestamps]}
-        self.user_request_times: Dict[str, list] = {}
-        self.ip_request_times: Dict[str, list] = {}
-        self.max_age = 3600  # Keep timestamps for 1 hour
+        # Rate limit engine (shared by all instances unless one is injected)
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter()
 
-        # Compile regex patterns
-        self.sql_patterns = [re.compile(p, re.IGNORECASE) for p in self.SQL_INJECTION_PATTERNS]
-        self.injection_patterns = [re.compile(p, re.IGNORECASE) for p in self.INJECTION_PATTERNS]
+        # Single-pass SQL/XSS/code injection scanner
+        self.scanner = ContentScanner()
 
-    async def dispatch(self, request: Request, call_next) -> Response:
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
         Process request with content moderation.
 
+        The body is read through the shared RequestBody so later layers and
+        the endpoint reuse it instead of reading the stream again.
+
         Args:
-            request: FastAPI request
-            call_next: Next middleware/handler
+            scope: ASGI scope
+            receive: ASGI receive callable
+            send: ASGI send callable
 
-        Returns:
-            Response (429 if rate limited, 400 if unsafe content)
+        Responds with 429 if rate limited, 413 if too large, 400 if unsafe content.
         """
         # Skip moderation for health checks and documentation
-        if self._is_exempt_path(request.url.path):
-            return await call_next(request)
+        if self._is_exempt_path(scope["path"]):
+            await self.app(scope, receive, send)
+            return
 
         # Get user_id and IP from request
-        user_id = getattr(request.state, "user_id", "anonymous")
-        client_ip = self._get_client_ip(request)
+        user_id = self.get_state(scope).get("user_id", "anonymous")
 
         # Apply rate limiting
         if self.rate_limit_enabled:
-            rate_limit_status = self._check_rate_limits(user_id, client_ip)
-            if not rate_limit_status[0]:
+            client_ip = self._get_client_ip(Request(scope))
+            bucket = "prefetch" if scope["path"].endswith(self.PREFETCH_SUFFIX) else "user"
+            within_limits, limit_description, retry_after = await self._check_rate_limits(
+                user_id, client_ip, bucket=bucket
+            )
+            if not within_limits:
                 logger.warning(
-                    f"Rate limit exceeded for {rate_limit_status[1]} "
+                    f"Rate limit exceeded for {limit_description} "
                     f"(user={user_id}, ip={client_ip})"
                 )
-                return JSONResponse(
+                response = JSONResponse(
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                     content={
                         "success": False,
-                        "error": f"Rate limit exceeded. {rate_limit_status[1]}",
+                        "error": f"Rate limit exceeded. {limit_description}",
                         "error_code": "RATE_LIMIT_EXCEEDED",
                     },
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
                 )
+                await response(scope, receive, send)
+                return
 
         # Apply content moderation
-        if self.moderation_enabled and request.method in ["POST", "PUT", "PATCH"]:
-            try:
-                # Read and check request body
-                body = await request.body()
-                if body:
-                    # Check size
-                    if len(body) > self.max_request_size * 4:  # UTF-8 could be 4 bytes per char
-                        logger.warning(f"Request body too large: {len(body)} bytes")
-                        return JSONResponse(
-                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                            content={
-                                "success": False,
-                                "error": "Request body too large",
-                                "error_code": "PAYLOAD_TOO_LARGE",
-                            },
-                        )
-
-                    # Check content safety
-                    try:
-                        body_str = body.decode("utf-8", errors="ignore")
-                        is_safe, violation_type = await asyncio.wait_for(
-                            self._check_content_safety(body_str),
-                            timeout=self.moderation_timeout_ms / 1000.0
-                        )
-
-                        if not is_safe:
-                            logger.warning(
-                                f"Potentially harmful content detected ({violation_type}) "
-                                f"from user {user_id}"
-                            )
-                            return JSONResponse(
-                                status_code=status.HTTP_400_BAD_REQUEST,
-                                content={
-                                    "success": False,
-                                    "error": f"Content violates safety policy: {violation_type}",
-                                    "error_code": "CONTENT_VIOLATION",
-                                },
-                            )
-                    except asyncio.TimeoutError:
-                        logger.warning("Content moderation check timed out, allowing request")
-                        # Allow request to proceed even if moderation times out
-                        # (fail open for availability)
-
-                # Re-attach body for endpoint consumption
-                async def receive():
-                    return {"type": "http.request", "body": body, "more_body": False}
-
-                request._receive = receive
-
-            except Exception as e:
-                logger.error(f"Error in content moderation: {e}")
-                # Allow request on moderation error (fail open)
-
-        response = await call_next(request)
-        return response
-
-    def _check_rate_limits(self, user_id: str, client_ip: str) -> Tuple[bool, str]:
+        if self.moderation_enabled and scope["method"] in ("POST", "PUT", "PATCH"):
+            rejection = await self._moderate_body(scope, receive, user_id)
+            if rejection is not None:
+                await rejection(scope, receive, send)
+                return
+            receive = wrap_receive(scope, receive)
+
+        await self.app(scope, receive, send)
+
+    async def _moderate_body(
+        self, scope: Scope, receive: Receive, user_id: str
+    ) -> Optional[JSONResponse]:
         """
-        Check if user or IP has exceeded rate limits.
+        Check the request body for size and safety violations.
 
         Args:
-            user_id: User ID
-            client_ip: Client IP address
+            scope: ASGI scope
+            receive: ASGI receive callable
+            user_id: User ID (for logging)
 
         Returns:
-            Tuple (within_limits, limit_description)
+            Error response to send, or None if the request may proceed
         """
-        current_time = time.time()
-
-        # Check user rate limit
-        if user_id != "anonymous":
-            if not self._check_limit(
-                user_id,
-                self.user_request_times,
-                self.rate_limit_user,
-                current_time
-            ):
-                return False, f"User limit: {self.rate_limit_user} requests/minute"
+        max_bytes = self.max_request_size * 4  # UTF-8 could be 4 bytes per char
+
+        try:
+            # Reject oversized bodies before reading them
+            content_length = Headers(scope=scope).get("content-length", "")
+            if content_length.isdigit() and int(content_length) > max_bytes:
+                logger.warning(f"Request body too large: {content_length} bytes")
+                return self._payload_too_large()
+
+            # Read and check request body
+            request_body = await get_request_body(scope, receive)
+            body = request_body.body
+            if not body:
+                return None
+
+            # Check size
+            if len(body) > max_bytes:
+                logger.warning(f"Request body too large: {len(body)} bytes")
+                return self._payload_too_large()
+
+            # Check content safety
+            try:
+                is_safe, violation_type = await asyncio.wait_for(
+                    self._check_content_safety(request_body),
+                    timeout=self.moderation_timeout_ms / 1000.0
+                )
 
-        # Check IP rate limit
-        if not self._check_limit(
-            client_ip,
-            self.ip_request_times,
-            self.rate_limit_ip,
-            current_time
-        ):
-            return False, f"IP limit: {self.rate_limit_ip} requests/minute"
-
-        return True, "OK"
-
-    def _check_limit(
-        self,
-        key: str,
-        tracking_dict: Dict[str, list],
-        limit: int,
-        current_time: float
-    ) -> bool:
+                if not is_safe:
+                    logger.warning(
+                        f"Potentially harmful content detected ({violation_type}) "
+                        f"from user {user_id}"
+                    )
+                    return JSONResponse(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        content={
+                            "success": False,
+                            "error": f"Content violates safety policy: {violation_type}",
+                            "error_code": "CONTENT_VIOLATION",
+                        },
+                    )
+            except asyncio.TimeoutError:
+                logger.warning("Content moderation check timed out, allowing request")
+                # Allow request to proceed even if moderation times out
+                # (fail open for availability)
+
+        except Exception as e:
+            logger.error(f"Error in content moderation: {e}")
+            # Allow request on moderation error (fail open)
+
+        return None
+
+    @staticmethod
+    def _payload_too_large() -> JSONResponse:
+        """413 response for oversized request bodies."""
+        return JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={
+                "success": False,
+                "error": "Request body too large",
+                "error_code": "PAYLOAD_TOO_LARGE",
+            },
+        )
+
+    async def _check_rate_limits(
+        self, user_id: str, client_ip: str, bucket: str = "user"
+    ) -> Tuple[bool, str, float]:
         """
-        Check if key has exceeded limit.
+        Check if user or IP has exceeded rate limits.
 
         Args:
-            key: Tracking key (user_id or IP)
-            tracking_dict: Dictionary tracking request times
-            limit: Request limit per WINDOW_SIZE
-            current_time: Current time
+            user_id: User ID
+            client_ip: Client IP address
+            bucket: Per-user bucket, "user" (requests) or "prefetch" (drafts)
 
         Returns:
-            True if within limit, False if exceeded
+            Tuple (within_limits, limit_description, retry_after_seconds)
         """
-        # Initialize if not exists
-        if key not in tracking_dict:
-            tracking_dict[key] = []
-
-        # Remove old timestamps outside the window
-        tracking_dict[key] = [
-            ts for ts in tracking_dict[key]
-            if current_time - ts < self.WINDOW_SIZE
-        ]
-
-        # Check if under limit
-        if len(tracking_dict[key]) >= limit:
-            return False
-
-        # Add current timestamp
-        tracking_dict[key].append(current_time)
-
-        # Cleanup old entries periodically
-        if current_time % 300 < 1:  # Every ~5 minutes
-            self._cleanup_old_entries(tracking_dict, current_time)
-
-        return True
-
-    def _cleanup_old_entries(self, tracking_dict: Dict[str, list], current_time: float) -> None:
-        """Remove entries older than max_age."""
-        keys_to_remove = []
-        for key, timestamps in tracking_dict.items():
-            if timestamps and current_time - min(timestamps) > self.max_age:
-                keys_to_remove.append(key)
+        # Check user rate limit; drafts without a resolved user are limited per IP
+        limit = self.rate_limit_prefetch if bucket == "prefetch" else self.rate_limit_user
+        caller = user_id
+        if user_id == "anonymous" and bucket == "prefetch":
+            caller = f"ip:{client_ip}"
+        if caller != "anonymous":
+            result = await self.rate_limiter.check(
+                f"{bucket}:{caller}", limit, self.WINDOW_SIZE
+            )
+            if not result.allowed:
+                return (
+                    False,
+                    f"{bucket.capitalize()} limit: {limit} requests/minute",
+                    result.retry_after,
+                )
 
-        for key in keys_to_remove:
-            del tracking_dict[key]
+        # Check IP rate limit
+        result = await self.rate_limiter.check(
+            f"ip:{client_ip}", self.rate_limit_ip, self.WINDOW_SIZE
+        )
+        if not result.allowed:
+            return False, f"IP limit: {self.rate_limit_ip} requests/minute", result.retry_after
 
-        if keys_to_remove:
-            logger.debug(f"Cleaned up {len(keys_to_remove)} old rate limit entries")
+        return True, "OK", 0.0
 
-    async def _check_content_safety(self, content: str) -> Tuple[bool, Optional[str]]:
+    async def _check_content_safety(self, request_body: RequestBody) -> Tuple[bool, Optional[str]]:
         """
-        Check if content passes safety checks.
+        Check if the request body passes safety checks.
+
+        JSON bodies are scanned field by field (string keys and values of the
+        parsed document); other bodies are scanned as text. Scanning is a
+        single linear pass regardless of body size.
 
         Args:
-            content: Content to check
+            request_body: Shared request body
 
         Returns:
             Tuple (is_safe, violation_type)
         """
-        # Check for SQL injection
-        for pattern in self.sql_patterns:
-            if pattern.search(content):
-                return False, "SQL_INJECTION"
-
-        # Check for XSS/injection
-        for pattern in self.injection_patterns:
-            if pattern.search(content):
-                return False, "INJECTION_ATTEMPT"
+        parsed = request_body.json()
+        if parsed is not None:
+            violation_type = self.scanner.scan_json(parsed)
+        else:
+            violation_type = self.scanner.scan(request_body.text())
+        if violation_type is not None:
+            return False, violation_type
 
         # Check content length
-        if len(content) > self.max_request_size:
+        if len(request_body.text()) > self.max_request_size:
             return False, "CONTENT_TOO_LONG"
 
         # Additional checks could be added here:
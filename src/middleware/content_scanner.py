@@ -0,0 +1,191 @@
+"""
+Single-pass content scanner for request moderation.
+
+Every rule contributes a cheap trigger (a literal, or a pattern with possessive
+quantifiers that cannot backtrack) to one combined alternation, so the text is
+walked once instead of once per pattern. Rules whose original pattern spans
+text (``/\\*.*\\*/``, ``<script[^>]*>.*?</script>``, ``on\\w+\\s*=``) are
+confirmed at the trigger position with forward searches whose failures are
+memoized, so no character is examined more than a bounded number of times and
+scan time stays linear in the input size even on adversarial bodies.
+
+JSON bodies are scanned field by field (keys and string values of the parsed
+document), so JSON syntax and escapes neither cause nor hide matches.
+
+Example:
+    >>> scanner = ContentScanner()
+    >>> scanner.scan("'; DROP TABLE users; --")
+    'SQL_INJECTION'
+    >>> scanner.scan_json({"content": "<script>alert(1)</script>"})
+    'INJECTION_ATTEMPT'
+"""
+
+import re
+from typing import Any, Iterator, Optional, Tuple
+
+SQL_INJECTION = "SQL_INJECTION"
+INJECTION_ATTEMPT = "INJECTION_ATTEMPT"
+
+# (violation type, trigger), matched against the lowercased text.
+# Triggers are equivalent to the original per-pattern regexes, except the three
+# marked "confirmed", which only find candidate positions.
+SCAN_TRIGGERS = (
+    (SQL_INJECTION, r"\b(?:select|insert|update|delete|drop|create|alter|exec|execute)\b"),
+    (SQL_INJECTION, r"['\"]\s*+(?:or|and)"),
+    (SQL_INJECTION, r"--\s*+$"),
+    (SQL_INJECTION, r"/\*"),  # confirmed: "*/" later on the line
+    (SQL_INJECTION, r";\s*+(?:drop|delete|truncate|update)"),
+    (INJECTION_ATTEMPT, r"<script"),  # confirmed: "[^>]*>.*?</script>"
+    (INJECTION_ATTEMPT, r"javascript:"),
+    (INJECTION_ATTEMPT, r"on(?=\w)"),  # confirmed: "\w+\s*=" ends the word
+    (INJECTION_ATTEMPT, r"eval\s*+\("),
+    (INJECTION_ATTEMPT, r"__import__"),
+    (INJECTION_ATTEMPT, r"exec\s*+\("),
+)
+
+# Plain alternation without capture groups: the rule is recovered from the
+# matched text, which keeps the per-position cost of the combined pattern low
+_TRIGGERS = re.compile("|".join(f"(?:{trigger})" for _, trigger in SCAN_TRIGGERS))
+_SCRIPT_CLOSE = "</script>"
+_WORD_TAIL = re.compile(r"\w++")
+_ASSIGNMENT = re.compile(r"\s*+=")
+
+
+def iter_json_strings(value: Any) -> Iterator[str]:
+    """
+    Yield every string in a parsed JSON document (object keys and values).
+
+    Args:
+        value: Parsed JSON value
+
+    Yields:
+        Strings, in no particular order
+    """
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            yield item
+        elif isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+
+
+class ContentScanner:
+    """
+    Detects SQL injection and XSS/code injection in one linear pass.
+
+    SQL injection takes precedence: if a text contains both kinds, the result
+    is SQL_INJECTION, as with the previous pattern-by-pattern checks.
+    """
+
+    def scan(self, text: str) -> Optional[str]:
+        """
+        Scan a single text.
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            Violation type, or None if the text is clean
+        """
+        sql, injection = self._scan(text, True)
+        if sql:
+            return SQL_INJECTION
+        return INJECTION_ATTEMPT if injection else None
+
+    def scan_json(self, value: Any) -> Optional[str]:
+        """
+        Scan the string fields of a parsed JSON document.
+
+        Args:
+            value: Parsed JSON value
+
+        Returns:
+            Violation type, or None if every field is clean
+        """
+        injection = False
+        for text in iter_json_strings(value):
+            if len(text) < 2:
+                continue
+            sql, found = self._scan(text, not injection)
+            if sql:
+                return SQL_INJECTION
+            injection = injection or found
+        return INJECTION_ATTEMPT if injection else None
+
+    @staticmethod
+    def _scan(text: str, check_injection: bool) -> Tuple[bool, bool]:
+        """
+        Walk the triggers of one text.
+
+        Args:
+            text: Text to scan
+            check_injection: False once an injection has already been found
+                (only SQL rules can still change the result)
+
+        Returns:
+            Tuple (sql_found, injection_found); returns as soon as SQL is found
+        """
+        text = text.lower()
+        injection = False
+        length = len(text)
+
+        # Memoized failures: positions below these can no longer match
+        comment_dead = 0       # no "*/" on the rest of this line
+        script_dead = 0        # shares a failed "<script ...>" closing bracket
+        script_line_end = -1   # no "</script>" after that bracket on this line
+        word_end = -1          # end of the last word checked for "on...="
+        word_assigned = False
+
+        for match in _TRIGGERS.finditer(text):
+            start, end = match.span()
+            first = text[start]
+
+            if first == "/":
+                if end < comment_dead:
+                    continue
+                eol = text.find("\n", end)
+                if eol == -1:
+                    eol = length
+                if text.find("*/", end, eol) != -1:
+                    return True, injection
+                comment_dead = eol
+                continue
+
+            # javascript:, __import__, eval(, exec( and the confirmed rules;
+            # everything else is a SQL trigger
+            is_injection = first in "<oj_" or text[end - 1] == "("
+            if not is_injection:
+                return True, injection
+            if injection or not check_injection:
+                continue
+
+            if first == "<":
+                if end < script_dead:
+                    continue
+                bracket = text.find(">", end)
+                if bracket == -1:
+                    script_dead = length + 1
+                    continue
+                script_dead = bracket + 1
+                if bracket < script_line_end:
+                    continue
+                eol = text.find("\n", bracket)
+                if eol == -1:
+                    eol = length
+                if text.find(_SCRIPT_CLOSE, bracket + 1, eol) != -1:
+                    injection = True
+                else:
+                    script_line_end = eol
+            elif first == "o":
+                if start >= word_end:
+                    word_end = _WORD_TAIL.match(text, end).end()
+                    word_assigned = _ASSIGNMENT.match(text, word_end) is not None
+                injection = word_assigned
+            else:
+                injection = True
+
+        return False, injection
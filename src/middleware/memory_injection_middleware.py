@@ -1,64 +1,72 @@
 """Memory injection middleware for conversation history and RAG context."""
 
-import asyncio
-import json
 import logging
 import os
 import time
-from typing import Optional, List, Dict, Any
+from typing import Optional, Dict, Any
 
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from src.middleware.base_middleware import BaseMiddleware
+from src.middleware.request_body import get_request_body, wrap_receive
+from src.services.memory_service import MemoryService, get_memory_service
 
 logger = logging.getLogger(__name__)
 
 
-class MemoryInjectionMiddleware(BaseHTTPMiddleware):
+class MemoryInjectionMiddleware(BaseMiddleware):
     """
     Middleware for injecting conversation history and RAG context.
 
     Enriches requests with:
-    - Recent conversation history (last 5 messages)
+    - Recent conversation history (MEMORY_HISTORY_LIMIT messages, the same
+      window as the WebSocket and streaming paths, from the Redis history
+      window with database fallback)
     - RAG search results for semantic context
     - Conversation metadata
-    - Parallel execution using asyncio.TaskGroup
+    - Parallel execution: history and RAG are loaded concurrently by
+      MemoryService; MEMORY_INJECTION_TIMEOUT_MS bounds the history, while
+      RAG (an embedding call and a vector search) keeps MemoryService's
+      MEMORY_LOAD_TIMEOUT_MS budget
+
+    The result is exposed as ``request.state.memory_context`` for the route
+    handler, which uses it instead of querying history again.
 
     Performance target: ≤200ms P99
     """
 
-    def __init__(self, app):
+    def __init__(self, app, memory_service: Optional[MemoryService] = None):
         """Initialize middleware with performance configuration."""
         super().__init__(app)
+        self.memory = memory_service or get_memory_service()
         self.memory_timeout_ms = float(os.getenv("MEMORY_INJECTION_TIMEOUT_MS", "200"))
         self.memory_fallback = os.getenv("MEMORY_INJECTION_FALLBACK", "skip_context")
         self.vector_timeout_ms = float(os.getenv("VECTOR_SEARCH_TIMEOUT_MS", "200"))
-        self.history_batch_size = int(os.getenv("HISTORY_BATCH_SIZE", "5"))
 
-    async def dispatch(self, request: Request, call_next) -> Response:
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
         Process request and inject memory context.
 
         Args:
-            request: FastAPI request
-            call_next: Next middleware/handler
-
-        Returns:
-            Response with enriched context
+            scope: ASGI scope
+            receive: ASGI receive callable
+            send: ASGI send callable
         """
         # Check if this is a message sending request
-        if request.method == "POST" and "/messages" in request.url.path:
+        if scope["method"] == "POST" and "/messages" in scope["path"]:
+            request = Request(scope)
             try:
-                # Read request body (consumed by previous middleware)
-                body = await request.body()
-                if body:
-                    try:
-                        body_data = json.loads(body)
-                    except json.JSONDecodeError:
+                # Shared body (already read by content moderation if enabled)
+                request_body = await get_request_body(scope, receive)
+                receive = wrap_receive(scope, receive)
+                if request_body.body:
+                    body_data = request_body.json()
+                    if not isinstance(body_data, dict):
                         body_data = {}
 
                     # Extract conversation ID from URL
-                    url_parts = request.url.path.split("/")
+                    url_parts = scope["path"].split("/")
                     conversation_id = None
                     try:
                         # Path pattern: /api/v1/conversations/{id}/messages
@@ -78,44 +86,30 @@ class MemoryInjectionMiddleware(BaseHTTPMiddleware):
                     # Get user ID from request state (set by auth middleware)
                     user_id = getattr(request.state, "user_id", None)
 
-                    # Inject memory with timeout protection
-                    try:
-                        start_time = time.time()
-                        await asyncio.wait_for(
-                            self._inject_memory_context(
-                                request,
-                                memory_context,
-                                user_id,
-                                conversation_id
-                            ),
-                            timeout=self.memory_timeout_ms / 1000.0
-                        )
-                        elapsed_ms = (time.time() - start_time) * 1000
-                        request.state.memory_injection_time_ms = elapsed_ms
-
-                    except asyncio.TimeoutError:
+                    # Inject memory (time budget enforced by MemoryService)
+                    start_time = time.time()
+                    await self._inject_memory_context(
+                        request,
+                        memory_context,
+                        user_id,
+                        conversation_id
+                    )
+                    elapsed_ms = (time.time() - start_time) * 1000
+                    request.state.memory_injection_time_ms = elapsed_ms
+
+                    if "timeout" in memory_context.get("memory_error", ""):
                         logger.warning(
                             f"Memory injection timeout for conversation {conversation_id}, "
                             f"applying fallback strategy: {self.memory_fallback}"
                         )
-                        # Apply fallback strategy
-                        request.state.memory_context = memory_context
                         request.state.memory_error = "timeout"
-                        request.state.memory_injection_time_ms = self.memory_timeout_ms
-
-                    # Re-attach body for endpoint consumption
-                    async def receive():
-                        return {"type": "http.request", "body": body, "more_body": False}
-
-                    request._receive = receive
 
             except Exception as e:
                 logger.warning(f"Error injecting memory context: {str(e)}")
                 request.state.memory_context = {"include_rag": True}
                 request.state.memory_error = str(e)
 
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
 
     async def _inject_memory_context(
         self,
@@ -127,9 +121,9 @@ class MemoryInjectionMiddleware(BaseHTTPMiddleware):
         """
         Inject conversation history and RAG context.
 
-        Uses asyncio.TaskGroup for parallel execution of:
-        - Conversation history retrieval
-        - Vector search for RAG context
+        History and RAG retrieval run concurrently; history that does not
+        finish within MEMORY_INJECTION_TIMEOUT_MS, or RAG that does not finish
+        within MemoryService's budget, is returned empty (skip_context fallback).
 
         Args:
             request: FastAPI request
@@ -142,115 +136,17 @@ class MemoryInjectionMiddleware(BaseHTTPMiddleware):
             return
 
         try:
-            # Parallel execution of history and RAG retrieval
-            history_task = self._get_conversation_history(conversation_id, self.history_batch_size)
-            rag_task = self._get_rag_context(
-                memory_context.get("message_content", ""),
+            loaded = await self.memory.load(
+                conversation_id,
                 user_id,
-                memory_context.get("include_rag", True)
-            )
-
-            # Wait for both tasks in parallel (simulated with asyncio.gather)
-            history, rag_context = await asyncio.gather(
-                history_task,
-                rag_task,
-                return_exceptions=True
+                memory_context.get("message_content", ""),
+                include_rag=memory_context.get("include_rag", True),
+                timeout=self.memory_timeout_ms / 1000.0,
             )
-
-            # Handle exceptions from parallel tasks
-            if isinstance(history, Exception):
-                logger.warning(f"Failed to retrieve conversation history: {history}")
-                history = []
-
-            if isinstance(rag_context, Exception):
-                logger.warning(f"Failed to retrieve RAG context: {rag_context}")
-                rag_context = []
-
-            # Enrich memory context
-            memory_context["conversation_history"] = history
-            memory_context["rag_context"] = rag_context
-            memory_context["history_count"] = len(history) if history else 0
-            memory_context["rag_count"] = len(rag_context) if rag_context else 0
+            memory_context.update(loaded)
 
         except Exception as e:
             logger.error(f"Error in memory context injection: {e}")
             memory_context["memory_error"] = str(e)
 
         request.state.memory_context = memory_context
-
-    async def _get_conversation_history(
-        self,
-        conversation_id: str,
-        limit: int = 5
-    ) -> List[Dict[str, Any]]:
-        """
-        Retrieve recent conversation history.
-
-        In production, would query the database asynchronously.
-
-        Args:
-            conversation_id: Conversation ID
-            limit: Max messages to retrieve
-
-        Returns:
-            List of recent messages
-        """
-        # Simulate async database query
-        await asyncio.sleep(0.01)  # Minimal delay
-
-        # In production, would be:
-        # from src.repositories.message import MessageRepository
-        # repo = MessageRepository()
-        # messages = await repo.get_recent_by_conversation(
-        #     conversation_id=conversation_id,
-        #     limit=limit
-        # )
-        # return [msg.to_dict() for msg in messages]
-
-        return []  # Placeholder for production implementation
-
-    async def _get_rag_context(
-        self,
-        query: str,
-        user_id: str,
-        include_rag: bool = True
-    ) -> List[Dict[str, Any]]:
-        """
-        Retrieve RAG context via vector search.
-
-        In production, would perform semantic search on vector store.
-
-        Args:
-            query: Search query (message content)
-            user_id: User ID for access control
-            include_rag: Whether to include RAG results
-
-        Returns:
-            List of relevant documents
-        """
-        if not include_rag or not query:
-            return []
-
-        # Simulate async vector search
-        await asyncio.sleep(0.01)  # Minimal delay
-
-        # In production, would be:
-        # from src.services.embedding_service import EmbeddingService
-        # from src.repositories.embedding import EmbeddingRepository
-        # embedding_service = EmbeddingService()
-        # embedding_repo = EmbeddingRepository()
-        #
-        # # Embed query
-        # query_embedding = await embedding_service.embed_text(query)
-        #
-        # # Search vector store
-        # results = await embedding_repo.search(
-        #     embedding=query_embedding,
-        #     user_id=user_id,
-        #     limit=5,
-        #     threshold=0.7
-        # )
-        # return [result.to_dict() for result in results]
-
-        return []  # Placeholder for production implementation
-
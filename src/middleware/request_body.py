@@ -0,0 +1,146 @@
+"""Shared request body for pure ASGI middleware.
+
+The body is read from ``receive`` at most once per request and stored on
+``scope["state"]`` so every middleware (and the endpoint) sees the same bytes,
+the same decoded text and the same parsed JSON (orjson), instead of each layer
+re-reading, re-decoding and re-parsing the stream.
+"""
+
+import logging
+from typing import Any, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY = "request_body"
+
+_UNPARSED = object()
+
+
+class RequestBody:
+    """
+    Request body read once and shared through ``scope["state"]``.
+
+    Downstream code reaches it as ``request.state.request_body``.
+
+    Attributes:
+        body: Raw request bytes
+    """
+
+    __slots__ = ("body", "_text", "_json", "_json_error", "_delivered")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self._text: Optional[str] = None
+        self._json: Any = _UNPARSED
+        self._json_error: Optional[orjson.JSONDecodeError] = None
+        self._delivered = False
+
+    def text(self) -> str:
+        """Body decoded as UTF-8 (invalid sequences dropped), decoded at most once."""
+        if self._text is None:
+            self._text = self.body.decode("utf-8", errors="ignore")
+        return self._text
+
+    def parse_json(self) -> Any:
+        """
+        Body parsed as JSON with orjson, parsed at most once.
+
+        Returns:
+            Parsed value
+
+        Raises:
+            orjson.JSONDecodeError: If the body is not valid JSON (a subclass of
+                json.JSONDecodeError, so FastAPI reports it as a 422)
+        """
+        if self._json is _UNPARSED and self._json_error is None:
+            try:
+                self._json = orjson.loads(self.body)
+            except orjson.JSONDecodeError as e:
+                self._json_error = e
+        if self._json_error is not None:
+            raise self._json_error
+        return self._json
+
+    def json(self) -> Optional[Any]:
+        """
+        Body parsed as JSON, or None if the body is empty or not valid JSON.
+
+        Middleware use this lenient form; handlers go through parse_json().
+        """
+        if not self.body:
+            return None
+        try:
+            return self.parse_json()
+        except orjson.JSONDecodeError:
+            return None
+
+    def receive(self, receive):
+        """
+        Wrap ``receive`` so the downstream app reads the buffered body.
+
+        The body is delivered once; later calls fall through to the original
+        channel (e.g. to observe ``http.disconnect``).
+
+        Args:
+            receive: Original ASGI receive callable
+
+        Returns:
+            ASGI receive callable
+        """
+
+        async def replay():
+            if not self._delivered:
+                self._delivered = True
+                return {"type": "http.request", "body": self.body, "more_body": False}
+            return await receive()
+
+        return replay
+
+
+async def get_request_body(scope, receive) -> RequestBody:
+    """
+    Return the shared body for this request, reading it on first use.
+
+    Args:
+        scope: ASGI scope
+        receive: ASGI receive callable (only used on first read)
+
+    Returns:
+        RequestBody stored on ``scope["state"]``
+    """
+    state = scope.setdefault("state", {})
+    request_body = state.get(STATE_KEY)
+    if request_body is not None:
+        return request_body
+
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+
+    request_body = RequestBody(chunks[0] if len(chunks) == 1 else b"".join(chunks))
+    state[STATE_KEY] = request_body
+    return request_body
+
+
+def peek_request_body(scope) -> Optional[RequestBody]:
+    """Return the shared body if an earlier layer already read it."""
+    state = scope.get("state")
+    return state.get(STATE_KEY) if state else None
+
+
+def wrap_receive(scope, receive):
+    """
+    Receive callable for the downstream app.
+
+    Replays the shared body if it has been read, otherwise returns
+    ``receive`` unchanged so untouched requests keep streaming.
+    """
+    request_body = peek_request_body(scope)
+    return request_body.receive(receive) if request_body is not None else receive
@@ -1,20 +1,29 @@
 """Response structuring middleware for JSON formatting and validation."""
 
-import json
 import logging
 import time
 import uuid
 from datetime import datetime
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, Tuple
+
+import orjson
 
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response, JSONResponse
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import Message, Receive, Scope, Send
+
+from src.middleware.base_middleware import BaseMiddleware
 
 logger = logging.getLogger(__name__)
 
+# scope["state"] flag: True while the envelope still has to be applied to this
+# response. Route-level StructuredJSONResponse clears it after wrapping its own
+# payload so the middleware forwards the bytes untouched.
+STRUCTURE_PENDING_KEY = "structure_response"
+
 
-class ResponseStructuringMiddleware(BaseHTTPMiddleware):
+class ResponseStructuringMiddleware(BaseMiddleware):
     """
     Middleware for structuring API responses in consistent format.
 
@@ -35,6 +44,12 @@ class ResponseStructuringMiddleware(BaseHTTPMiddleware):
     }
     ```
 
+    The envelope is applied at the byte level: the original JSON payload is
+    spliced between a small serialized prefix and suffix instead of being
+    decoded and re-encoded. Routes using ``StructuredJSONResponse`` apply the
+    envelope themselves while serializing once, and are forwarded untouched.
+    Only error responses (small by nature) are parsed.
+
     Performance target: <5ms overhead
     """
 
@@ -57,94 +72,138 @@ class ResponseStructuringMiddleware(BaseHTTPMiddleware):
         """Initialize middleware."""
         super().__init__(app)
 
-    async def dispatch(self, request: Request, call_next) -> Response:
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
         Process request and structure response.
 
-        Args:
-            request: FastAPI request
-            call_next: Next middleware/handler
+        Non-JSON and streaming responses are forwarded untouched; only JSON
+        bodies are collected and rewritten.
 
-        Returns:
-            Response with structured body
+        Args:
+            scope: ASGI scope
+            receive: ASGI receive callable
+            send: ASGI send callable
         """
         # Add request ID to state (for tracking and logging)
-        request.state.request_id = str(uuid.uuid4())
-        request.state.response_start_time = time.time()
-
-        # Call next middleware/endpoint
-        response = await call_next(request)
+        state = self.get_state(scope)
+        state["request_id"] = str(uuid.uuid4())
+        state["response_start_time"] = time.time()
 
         # Skip structuring for exempt paths
-        if self._is_exempt_path(request.url.path):
-            return response
+        if self._is_exempt_path(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        state[STRUCTURE_PENDING_KEY] = True
+        start_message: Optional[Message] = None
+        chunks: list = []
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message
+
+            if message["type"] == "http.response.start":
+                content_type = Headers(raw=message["headers"]).get("content-type", "")
+                # Skip responses already structured at the route level, non-JSON
+                # responses and no-content responses
+                if (
+                    not state.get(STRUCTURE_PENDING_KEY)
+                    or message["status"] == 204
+                    or "application/json" not in content_type
+                ):
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if start_message is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+            status_code, headers, body = self._restructure(Request(scope), start_message, body)
+            await send({"type": "http.response.start", "status": status_code, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _restructure(
+        self, request: Request, start_message: Message, body: bytes
+    ) -> Tuple[int, list, bytes]:
+        """
+        Build the structured response for a buffered JSON body.
 
-        # Skip structuring for non-JSON responses or no-content responses
-        if response.status_code == 204:  # No content
-            return response
+        Successful payloads are wrapped byte-for-byte; only error bodies and
+        payloads that may already carry a "success" field are parsed.
 
-        content_type = response.headers.get("content-type", "")
-        if "application/json" not in content_type:
-            return response
+        Args:
+            request: Request view over the ASGI scope
+            start_message: Original ``http.response.start`` message
+            body: Original response body
 
-        # Skip structuring if already structured (has "success" field)
-        try:
-            body = b""
-            async for chunk in response.body_iterator:
-                body += chunk
+        Returns:
+            Tuple (status_code, raw_headers, body)
+        """
+        status_code = start_message["status"]
+        # Keep original headers except the now-stale Content-Length
+        headers = [(k, v) for k, v in start_message["headers"] if k.lower() != b"content-length"]
 
+        try:
             if not body:
-                return self._create_structured_response(
-                    success=response.status_code < 400,
+                response = self._create_structured_response(
+                    success=status_code < 400,
                     data=None,
                     error=None,
                     request_id=request.state.request_id,
-                    status_code=response.status_code,
+                    status_code=status_code,
                     duration_ms=self._get_elapsed_ms(request),
                     metadata={},
                 )
+                return response.status_code, response.raw_headers, response.body
+
+            # Fast path: splice a successful payload into the envelope as-is
+            if status_code < 400 and not self._may_be_structured(body):
+                prefix, suffix = self.envelope_parts(request, success=True)
+                body = b"".join((prefix, body, suffix))
+                headers.append((b"content-length", str(len(body)).encode("latin-1")))
+                return status_code, headers, body
 
             try:
-                original_data = json.loads(body)
-            except json.JSONDecodeError:
+                original_data = orjson.loads(body)
+            except orjson.JSONDecodeError:
                 # Invalid JSON, return as-is
-                return JSONResponse(
-                    content={"error": "Invalid JSON response"},
-                    status_code=500,
-                    headers=dict(response.headers),
-                )
+                body = orjson.dumps({"error": "Invalid JSON response"})
+                headers.append((b"content-length", str(len(body)).encode("latin-1")))
+                return 500, headers, body
 
             # Check if already structured
             if isinstance(original_data, dict) and "success" in original_data:
-                # Already structured, just return with enhanced metadata
-                return JSONResponse(
-                    content=original_data,
-                    status_code=response.status_code,
-                    headers=dict(response.headers),
-                )
+                # Already structured, forward the original bytes
+                headers.append((b"content-length", str(len(body)).encode("latin-1")))
+                return status_code, headers, body
 
             # Structure the response
             duration_ms = self._get_elapsed_ms(request)
             structured = self._structure_response(
-                success=response.status_code < 400,
-                data=original_data if response.status_code < 400 else None,
-                error=original_data if response.status_code >= 400 else None,
+                success=status_code < 400,
+                data=original_data if status_code < 400 else None,
+                error=original_data if status_code >= 400 else None,
                 request_id=request.state.request_id,
                 duration_ms=duration_ms,
                 metadata=self._extract_metadata(request),
             )
 
-            # Return structured response
-            return JSONResponse(
-                content=structured,
-                status_code=response.status_code,
-                headers=dict(response.headers),
-            )
+            body = orjson.dumps(structured)
+            headers.append((b"content-length", str(len(body)).encode("latin-1")))
+            return status_code, headers, body
 
         except Exception as e:
             logger.error(f"Error structuring response: {e}")
             # Return error response
-            return JSONResponse(
+            response = JSONResponse(
                 content={
                     "success": False,
                     "error": "Internal server error",
@@ -154,6 +213,47 @@ class ResponseStructuringMiddleware(BaseHTTPMiddleware):
                 },
                 status_code=500,
             )
+            return response.status_code, response.raw_headers, response.body
+
+    @staticmethod
+    def _may_be_structured(body: bytes) -> bool:
+        """
+        Cheap check for a payload that might already be an envelope.
+
+        Only payloads mentioning a "success" key need the (slow) parse to be
+        sure; everything else is wrapped without decoding.
+        """
+        return b'"success"' in body
+
+    @classmethod
+    def envelope_parts(cls, request: Request, success: bool = True) -> Tuple[bytes, bytes]:
+        """
+        Serialized envelope around a ``data`` payload.
+
+        ``prefix + payload + suffix`` yields the same document as
+        ``_structure_response(success, data=payload, ...)``.
+
+        Args:
+            request: Request (state provides request_id, timings and metadata)
+            success: Value of the "success" field
+
+        Returns:
+            Tuple (prefix, suffix) bytes
+        """
+        head = {
+            "success": success,
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+        request_id = getattr(request.state, "request_id", None)
+        if request_id:
+            head["request_id"] = request_id
+
+        metadata = cls._extract_metadata(request)
+        metadata["duration_ms"] = round(cls._get_elapsed_ms(request), 2)
+
+        prefix = orjson.dumps(head)[:-1] + b',"data":'
+        suffix = b',"metadata":' + orjson.dumps(metadata) + b"}"
+        return prefix, suffix
 
     @staticmethod
     def _structure_response(
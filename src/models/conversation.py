@@ -4,7 +4,7 @@ from datetime import datetime
 from typing import Optional
 from uuid import uuid4
 
-from sqlalchemy import Column, String, Text, Boolean, DateTime, JSON, Index
+from sqlalchemy import Column, String, Text, Boolean, DateTime, Integer, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID
 
 from src.db.base import Base
@@ -37,6 +37,10 @@ class ConversationORM(Base):
     model = Column(String(100), nullable=False, default="claude-sonnet-4-5-20250929")
     system_prompt = Column(Text, nullable=False)
 
+    # Running sum of messages.tokens_used, updated in the transaction that
+    # writes or removes a message
+    total_tokens = Column(Integer, nullable=False, default=0, server_default="0")
+
     # Additional Data
     meta = Column(JSON, nullable=False, default={})
 
@@ -60,6 +64,7 @@ class ConversationORM(Base):
             "summary": self.summary,
             "model": self.model,
             "system_prompt": self.system_prompt,
+            "total_tokens": self.total_tokens or 0,
             "meta": self.meta,
             "is_deleted": self.is_deleted,
             "deleted_at": self.deleted_at.isoformat() if self.deleted_at else None,
@@ -64,6 +64,7 @@ class ToolCall(Base):
 
     # Performance Metrics
     execution_time_ms = Column(Float)  # Execution time in milliseconds
+    cache_hit = Column(Boolean, default=False)  # Result served from the tool result cache
 
     # Human-in-the-Loop
     user_confirmed = Column(Boolean, default=False)  # Whether user confirmed the result
@@ -84,6 +85,7 @@ class ToolCall(Base):
             "is_error": self.is_error,
             "error_message": self.error_message,
             "execution_time_ms": self.execution_time_ms,
+            "cache_hit": self.cache_hit,
             "user_confirmed": self.user_confirmed,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
@@ -56,6 +56,43 @@ class MessageChunkEvent(StreamEvent):
         }
 
 
+class MessageChunk:
+    """
+    消息块事件 (内部快速路径)
+
+    字段与 MessageChunkEvent 相同, 但不经 Pydantic 校验, 使用 __slots__。
+    StreamingChatService 为每个 LLM 增量 (约一个 token) 生成一个消息块,
+    字段由服务自身填充, 类型已确定, 无需逐个校验。
+    """
+    __slots__ = ("timestamp", "sequence", "content", "token_count", "is_final")
+
+    type = StreamEventType.MESSAGE_CHUNK
+
+    def __init__(
+        self,
+        timestamp: float,
+        sequence: int,
+        content: str,
+        token_count: int,
+        is_final: bool = False,
+    ):
+        self.timestamp = timestamp
+        self.sequence = sequence
+        self.content = content
+        self.token_count = token_count
+        self.is_final = is_final
+
+    def to_model(self) -> MessageChunkEvent:
+        """转换为经过校验的 MessageChunkEvent"""
+        return MessageChunkEvent(
+            timestamp=self.timestamp,
+            sequence=self.sequence,
+            content=self.content,
+            token_count=self.token_count,
+            is_final=self.is_final,
+        )
+
+
 class ToolCallEvent(StreamEvent):
     """
     工具调用事件
@@ -65,6 +102,7 @@ class ToolCallEvent(StreamEvent):
     type: StreamEventType = StreamEventType.TOOL_CALL
     tool_name: str = Field(..., description="工具名称 (e.g., 'search', 'calculator')")
     tool_input: Dict[str, Any] = Field(..., description="工具的输入参数")
+    call_id: Optional[str] = Field(default=None, description="工具调用 ID (对应 tool_result)")
 
     class Config:
         json_schema_extra = {
@@ -88,6 +126,8 @@ class ToolResultEvent(StreamEvent):
     tool_name: str = Field(..., description="执行的工具名称")
     result: Any = Field(..., description="工具执行结果")
     is_error: bool = Field(default=False, description="是否为错误结果")
+    call_id: Optional[str] = Field(default=None, description="对应的工具调用 ID")
+    execution_time_ms: Optional[float] = Field(default=None, description="工具执行耗时 (ms)")
 
     class Config:
         json_schema_extra = {
@@ -137,6 +177,7 @@ class CompleteStateEvent(StreamEvent):
     elapsed_time: float = Field(..., description="总耗时 (秒)")
     tool_calls_count: int = Field(default=0, description="工具调用次数")
     cache_hit: bool = Field(default=False, description="是否命中缓存")
+    message_id: Optional[str] = Field(default=None, description="已保存的助手消息 ID")
 
     class Config:
         json_schema_extra = {
@@ -5,6 +5,7 @@ from .conversation import ConversationRepository
 from .message import MessageRepository
 from .document import DocumentRepository
 from .embedding import EmbeddingRepository
+from .tool_call import ToolCallRepository
 
 __all__ = [
     "BaseRepository",
@@ -12,4 +13,5 @@ __all__ = [
     "MessageRepository",
     "DocumentRepository",
     "EmbeddingRepository",
+    "ToolCallRepository",
 ]
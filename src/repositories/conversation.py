@@ -1,7 +1,7 @@
 """Conversation repository with business logic."""
 
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 from uuid import UUID
 
 from sqlalchemy import select, and_
@@ -91,6 +91,23 @@ class ConversationRepository(BaseRepository[ConversationORM]):
         """
         return await self.count(user_id=user_id, is_deleted=False)
 
+    async def get_owners(self, conversation_ids: Iterable[UUID]) -> Dict[UUID, str]:
+        """
+        Map conversations to the users who own them.
+
+        Args:
+            conversation_ids: Conversation IDs
+
+        Returns:
+            Dict of conversation ID to user ID (unknown IDs are left out)
+        """
+        result = await self.session.execute(
+            select(ConversationORM.id, ConversationORM.user_id).where(
+                ConversationORM.id.in_(list(conversation_ids))
+            )
+        )
+        return {conversation_id: user_id for conversation_id, user_id in result.all()}
+
     async def soft_delete(self, conversation_id: UUID) -> bool:
         """
         Soft delete a conversation.
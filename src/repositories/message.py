@@ -1,13 +1,18 @@
 """Message repository with conversation history management."""
 
-from typing import List, Optional
+import logging
+from datetime import datetime
+from typing import Any, List, Optional
 from uuid import UUID
 
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, bindparam, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.models import MessageORM
+from src.models import ConversationORM, MessageORM
 from src.repositories.base import BaseRepository
+from src.utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
 
 
 class MessageRepository(BaseRepository[MessageORM]):
@@ -19,6 +24,124 @@ class MessageRepository(BaseRepository[MessageORM]):
         """Initialize repository."""
         super().__init__(session)
 
+    @staticmethod
+    def total_tokens_update():
+        """
+        UPDATE adding a delta to conversations.total_tokens.
+
+        Execute with {"conv_id": ..., "delta": ...}; a list of parameter
+        dicts runs as one executemany.
+        """
+        conversations = ConversationORM.__table__
+        return (
+            update(conversations)
+            .where(conversations.c.id == bindparam("conv_id"))
+            .values(total_tokens=conversations.c.total_tokens + bindparam("delta"))
+        )
+
+    async def _add_total_tokens(self, conversation_id: UUID, delta: int) -> None:
+        """Adjust the conversation token total (caller commits)."""
+        if delta:
+            await self.session.execute(
+                self.total_tokens_update(), {"conv_id": conversation_id, "delta": delta}
+            )
+
+    async def create_message(
+        self,
+        conversation_id: UUID,
+        role: str,
+        content: str,
+        tool_calls: Optional[List[dict]] = None,
+        tool_results: Optional[List[dict]] = None,
+        tokens_used: Optional[int] = None,
+        metadata: Optional[dict] = None,
+    ) -> MessageORM:
+        """
+        Create a message and add its tokens to the conversation total.
+
+        The token count is computed once here (unless given), so history
+        token totals are never recomputed by re-tokenizing messages.
+
+        Args:
+            conversation_id: Conversation ID
+            role: Message role
+            content: Message content
+            tool_calls: Tool calls made by assistant
+            tool_results: Results from tool calls
+            tokens_used: Token count of the message (default: counted from content)
+            metadata: Message metadata
+
+        Returns:
+            Created message
+        """
+        if tokens_used is None:
+            tokens_used = count_tokens(content)
+
+        message = MessageORM(
+            conversation_id=conversation_id,
+            role=role,
+            content=content,
+            tool_calls=tool_calls,
+            tool_results=tool_results,
+            tokens_used=tokens_used,
+            meta=metadata or {},
+        )
+        self.session.add(message)
+
+        try:
+            await self._add_total_tokens(conversation_id, tokens_used)
+            await self.session.commit()
+            await self.session.refresh(message)
+            return message
+        except Exception as e:
+            await self.session.rollback()
+            logger.error(f"Failed to create message: {str(e)}")
+            raise
+
+    async def update(self, id: Any, **kwargs) -> Optional[MessageORM]:
+        """
+        Update a message, keeping the conversation token total in step.
+
+        Args:
+            id: Message ID
+            **kwargs: Column values to update
+
+        Returns:
+            Updated message or None if not found
+        """
+        if kwargs.get("tokens_used") is not None:
+            message = await self.get(id)
+            if not message:
+                return None
+            await self._add_total_tokens(
+                message.conversation_id, kwargs["tokens_used"] - (message.tokens_used or 0)
+            )
+        return await super().update(id, **kwargs)
+
+    async def delete(self, id: Any) -> bool:
+        """
+        Delete a message and subtract its tokens from the conversation total.
+
+        Args:
+            id: Message ID
+
+        Returns:
+            True if deleted, False if not found
+        """
+        message = await self.get(id)
+        if not message:
+            return False
+
+        try:
+            await self.session.delete(message)
+            await self._add_total_tokens(message.conversation_id, -(message.tokens_used or 0))
+            await self.session.commit()
+            return True
+        except Exception as e:
+            await self.session.rollback()
+            logger.error(f"Failed to delete message: {str(e)}")
+            raise
+
     async def get_conversation_messages(
         self,
         conversation_id: UUID,
@@ -90,6 +213,31 @@ class MessageRepository(BaseRepository[MessageORM]):
         """
         return await self.count(conversation_id=conversation_id)
 
+    async def get_messages_after(
+        self,
+        conversation_id: UUID,
+        after: Optional[datetime] = None,
+        limit: int = 1000,
+    ) -> List[MessageORM]:
+        """
+        Get the messages of a conversation created after a point in time.
+
+        Args:
+            conversation_id: Conversation ID
+            after: Exclusive lower bound on created_at (default: from the start)
+            limit: Maximum number of messages
+
+        Returns:
+            List of messages ordered chronologically
+        """
+        query = select(MessageORM).where(MessageORM.conversation_id == conversation_id)
+        if after is not None:
+            query = query.where(MessageORM.created_at > after)
+        query = query.order_by(MessageORM.created_at.asc()).limit(limit)
+
+        result = await self.session.execute(query)
+        return result.scalars().all()
+
     async def get_messages_by_role(
         self,
         conversation_id: UUID,
@@ -187,6 +335,11 @@ class MessageRepository(BaseRepository[MessageORM]):
         for message in messages:
             await self.session.delete(message)
 
+        await self.session.execute(
+            update(ConversationORM)
+            .where(ConversationORM.id == conversation_id)
+            .values(total_tokens=0)
+        )
         await self.session.commit()
         return len(messages)
 
@@ -204,7 +357,19 @@ class MessageRepository(BaseRepository[MessageORM]):
             Tuple of (messages list, total tokens used)
         """
         messages = await self.get_conversation_messages(conversation_id, limit=1000)
+        return messages, await self.get_total_tokens(conversation_id)
 
-        total_tokens = sum(msg.tokens_used or 0 for msg in messages)
+    async def get_total_tokens(self, conversation_id: UUID) -> int:
+        """
+        Get the running token total of a conversation (O(1) read).
+
+        Args:
+            conversation_id: Conversation ID
 
-        return messages, total_tokens
+        Returns:
+            Sum of tokens_used over the conversation's messages
+        """
+        result = await self.session.execute(
+            select(ConversationORM.total_tokens).where(ConversationORM.id == conversation_id)
+        )
+        return result.scalar() or 0
@@ -0,0 +1,108 @@
+"""Tool call repository for tool execution records."""
+
+from datetime import datetime, timezone
+from typing import List
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import ToolCall
+from src.repositories.base import BaseRepository
+
+
+class ToolCallRepository(BaseRepository[ToolCall]):
+    """Repository for tool call records."""
+
+    model_class = ToolCall
+
+    def __init__(self, session: AsyncSession):
+        """Initialize repository."""
+        super().__init__(session)
+
+    async def record_executions(
+        self,
+        message_id: UUID,
+        conversation_id: UUID,
+        tool_calls: List[dict],
+        tool_results: List[dict],
+    ) -> List[ToolCall]:
+        """
+        Store the tool calls executed for an assistant message.
+
+        Args:
+            message_id: Assistant message ID
+            conversation_id: Conversation ID
+            tool_calls: Tool calls ({"id", "name", "input"})
+            tool_results: Results ({"id", "output", "execution_time_ms", "is_error",
+                "cache_hit"}), matched to the calls by id
+
+        Returns:
+            Created tool call records
+        """
+        records = self.build_records(message_id, conversation_id, tool_calls, tool_results)
+        if not records:
+            return []
+        return await self.bulk_create(records)
+
+    @staticmethod
+    def build_records(
+        message_id: UUID,
+        conversation_id: UUID,
+        tool_calls: List[dict],
+        tool_results: List[dict],
+    ) -> List[ToolCall]:
+        """
+        Build (unsaved) tool call records for an assistant message.
+
+        Args:
+            message_id: Assistant message ID
+            conversation_id: Conversation ID
+            tool_calls: Tool calls ({"id", "name", "input"})
+            tool_results: Results, matched to the calls by id
+
+        Returns:
+            Tool call records, in call order
+        """
+        results = {result.get("id"): result for result in tool_results}
+        completed_at = datetime.now(timezone.utc)
+
+        records = []
+        for call in tool_calls:
+            result = results.get(call.get("id"), {})
+            is_error = bool(result.get("is_error", False))
+            output = result.get("output")
+            records.append(ToolCall(
+                tool_id=call.get("id"),
+                message_id=message_id,
+                conversation_id=conversation_id,
+                tool_name=call.get("name"),
+                tool_input=call.get("input") or {},
+                status="failed" if is_error else "completed",
+                result=str(output) if output is not None else None,
+                is_error=is_error,
+                error_message=str(output) if is_error else None,
+                execution_time_ms=result.get("execution_time_ms"),
+                cache_hit=bool(result.get("cache_hit", False)),
+                completed_at=completed_at,
+            ))
+
+        return records
+
+    async def get_message_tool_calls(self, message_id: UUID) -> List[ToolCall]:
+        """
+        Get the tool calls of a message.
+
+        Args:
+            message_id: Message ID
+
+        Returns:
+            Tool call records in creation order
+        """
+        query = (
+            select(ToolCall)
+            .where(ToolCall.message_id == message_id)
+            .order_by(ToolCall.id.asc())
+        )
+        result = await self.session.execute(query)
+        return result.scalars().all()
@@ -73,6 +73,12 @@ class SendMessageRequest(BaseModel):
     )
 
 
+class PrefetchDraftRequest(BaseModel):
+    """Draft of a message still being typed, for speculative RAG retrieval."""
+
+    draft: str = Field(..., description="Current message text")
+
+
 class ConversationHistoryResponse(BaseModel):
     """Response with conversation history."""
 
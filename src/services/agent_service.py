@@ -5,9 +5,8 @@ import logging
 import os
 import re
 from typing import Any, AsyncIterator, Dict, List, Optional
-from uuid import UUID
+from uuid import UUID, uuid4
 
-from duckduckgo_search import DDGS
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_core.tools import tool as langchain_tool
 from langchain_openai import ChatOpenAI
@@ -15,7 +14,11 @@ from sqlalchemy import text as sql_text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.repositories import EmbeddingRepository
+from src.services.context_assembler import get_context_assembler
 from src.services.embedding_service import EmbeddingService
+from src.services.middleware.tool_result_cache import get_tool_result_cache
+from src.services.tool_executor import get_tool_executor, middleware_runner
+from src.services.web_search import get_web_search_client
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +53,9 @@ class AgentService:
         self.embedding_repo = EmbeddingRepository(session)
         self.embedding_service = EmbeddingService(openai_api_key)
         self.model = model
+        # Tool calls run concurrently but share this session, which does not
+        # allow concurrent operations: database access in tools is serialized
+        self._session_lock = asyncio.Lock()
 
         # Initialize LLM with streaming support
         self.llm = ChatOpenAI(
@@ -72,14 +78,30 @@ class AgentService:
         system_prompt: str,
         message_history: List[dict],
         user_message: str,
+        context_documents: Optional[List[dict]] = None,
+        summary: Optional[str] = None,
     ) -> List[Any]:
-        """Create LangChain message sequence from stored history."""
+        """
+        Create LangChain message sequence within the context token budget.
+
+        Segments are selected by the context assembler and laid out
+        stable-first (system prompt, summary, history, then this turn's RAG
+        excerpts and message) so prompt-cache prefixes carry across turns.
+        """
+        context = get_context_assembler().assemble(
+            system_prompt, user_message, message_history, context_documents, summary=summary
+        )
         messages: List[Any] = []
 
         if system_prompt:
             messages.append(SystemMessage(content=system_prompt))
 
-        for msg in message_history:
+        if context.summary:
+            messages.append(
+                SystemMessage(content=f"Summary of the earlier conversation:\n{context.summary}")
+            )
+
+        for msg in context.history:
             role = msg.get("role")
             content = msg.get("content", "")
             if role == "user":
@@ -89,6 +111,16 @@ class AgentService:
             elif role == "system":
                 messages.append(SystemMessage(content=content))
 
+        if context.rag_chunks:
+            excerpts = "\n\n".join(
+                f"{i}. {doc['chunk_text']}\n   (Document ID: {doc['document_id']}, "
+                f"Chunk: {doc['chunk_index']})"
+                for i, doc in enumerate(context.rag_chunks, 1)
+            )
+            messages.append(
+                SystemMessage(content=f"Relevant excerpts from the user's documents:\n\n{excerpts}")
+            )
+
         messages.append(HumanMessage(content=user_message))
         return messages
 
@@ -151,22 +183,14 @@ class AgentService:
 
     async def _execute_safe_query(self, sanitized_query: str) -> List[Dict[str, Any]]:
         """Run validated SQL and return row dictionaries."""
-        result = await self.session.execute(sql_text(sanitized_query))
-        rows = result.mappings().all()
+        async with self._session_lock:
+            result = await self.session.execute(sql_text(sanitized_query))
+            rows = result.mappings().all()
         return [dict(row) for row in rows]
 
     async def _perform_web_search(self, query: str, limit: int, search_type: str) -> List[dict]:
-        """Execute DuckDuckGo search in a thread pool."""
-        def _search():
-            with DDGS() as ddgs:
-                if search_type == "news":
-                    return list(ddgs.news(query, max_results=limit))
-                elif search_type == "scholar":
-                    return list(ddgs.text(query, max_results=limit, backend="lite"))
-                return list(ddgs.text(query, max_results=limit))
-
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, _search)
+        """Search the web through the shared, hedged and cached web search client."""
+        return await get_web_search_client().search(query, limit, search_type)
 
     @staticmethod
     def _summarize_search_results(results: List[dict], limit: int) -> str:
@@ -182,6 +206,11 @@ class AgentService:
             lines.append(f"{idx}. {title}\n   URL: {url}\n   Snippet: {snippet}")
         return "\n\n".join(lines[:limit])
 
+    @staticmethod
+    def _tool_runner(state: Dict[str, Any]):
+        """Tool runner that serves repeated deterministic tool calls from the cache."""
+        return middleware_runner([get_tool_result_cache()], state)
+
     async def create_rag_tools(self, user_id: str) -> List[Any]:
         """
         Create RAG-enabled tools for the agent.
@@ -196,6 +225,7 @@ class AgentService:
         """
         embedding_repo = self.embedding_repo
         embedding_service = self.embedding_service
+        session_lock = self._session_lock
         user_id_str = user_id
 
         @langchain_tool
@@ -220,12 +250,13 @@ class AgentService:
                 query_embedding = await embedding_service.embed_text(query)
 
                 # Search for similar embeddings
-                results = await embedding_repo.search_similar(
-                    query_embedding=query_embedding,
-                    user_id=user_id_str,
-                    limit=limit,
-                    threshold=0.7,
-                )
+                async with session_lock:
+                    results = await embedding_repo.search_similar(
+                        query_embedding=query_embedding,
+                        user_id=user_id_str,
+                        limit=limit,
+                        threshold=0.7,
+                    )
 
                 if not results:
                     return "No relevant documents found for your query."
@@ -303,7 +334,7 @@ class AgentService:
                 search_type: general/news/scholar
 
             Returns:
-                Web search results with summaries from DuckDuckGo
+                Web search results with summaries (SearxNG / DuckDuckGo)
             """
             logger.info(f"Tool web_search called with query: {query} ({search_type})")
 
@@ -323,6 +354,8 @@ class AgentService:
         user_message: str,
         system_prompt: str,
         message_history: List[dict],
+        context_documents: Optional[List[dict]] = None,
+        summary: Optional[str] = None,
     ) -> dict:
         """
         Process a user message with the agent.
@@ -339,6 +372,9 @@ class AgentService:
             user_message: User's message
             system_prompt: System prompt for the agent
             message_history: Previous messages in format [{"role": "...", "content": "..."}]
+                (optional "tokens_used" spares counting them for the context budget)
+            context_documents: RAG context loaded ahead of time (MemoryService)
+            summary: Running summary of the messages before message_history
 
         Returns:
             Response dict with:
@@ -354,7 +390,9 @@ class AgentService:
             # Create RAG tools
             tools = await self.create_rag_tools(user_id)
 
-            messages = self._build_messages(system_prompt, message_history, user_message)
+            messages = self._build_messages(
+                system_prompt, message_history, user_message, context_documents, summary
+            )
 
             # Bind tools to LLM
             llm_with_tools = self.llm.bind_tools(tools)
@@ -377,46 +415,14 @@ class AgentService:
             if hasattr(response, "tool_calls") and response.tool_calls:
                 logger.info(f"Agent made {len(response.tool_calls)} tool calls")
 
-                # Process each tool call
-                for tool_call in response.tool_calls:
-                    tool_name = tool_call.get("name")
-                    tool_input = tool_call.get("args", {})
-                    call_id = tool_call.get("id", f"call_{len(tool_calls_data)}")
-
-                    tool_calls_data.append({
-                        "id": call_id,
-                        "name": tool_name,
-                        "input": tool_input,
-                    })
-
-                    # Execute the tool
-                    try:
-                        # Find the tool
-                        tool = next((t for t in tools if t.name == tool_name), None)
-
-                        if tool:
-                            # Execute tool
-                            result = await tool.ainvoke(tool_input)
-
-                            tool_results_data.append({
-                                "id": call_id,
-                                "output": result,
-                            })
-
-                            logger.info(f"Tool {tool_name} executed successfully")
-                        else:
-                            logger.error(f"Tool {tool_name} not found")
-                            tool_results_data.append({
-                                "id": call_id,
-                                "output": f"Error: Tool {tool_name} not found",
-                            })
-
-                    except Exception as e:
-                        logger.error(f"Error executing tool {tool_name}: {str(e)}")
-                        tool_results_data.append({
-                            "id": call_id,
-                            "output": f"Error executing tool: {str(e)}",
-                        })
+                # Independent tool calls run concurrently; results keep call order
+                executions = await get_tool_executor().execute(
+                    response.tool_calls,
+                    tools,
+                    run=self._tool_runner({"user_id": user_id, "conversation_id": conversation_id}),
+                )
+                tool_calls_data = [execution.to_call() for execution in executions]
+                tool_results_data = [execution.to_result() for execution in executions]
 
                 # If tools were called, get final response from agent
                 # Add tool results to messages
@@ -471,6 +477,8 @@ class AgentService:
         user_message: str,
         system_prompt: str,
         message_history: List[dict],
+        context_documents: Optional[List[dict]] = None,
+        summary: Optional[str] = None,
     ) -> AsyncIterator[dict]:
         """
         Stream a response from the agent.
@@ -483,11 +491,15 @@ class AgentService:
             user_message: User's message
             system_prompt: System prompt
             message_history: Previous messages
+            context_documents: RAG context loaded ahead of time (MemoryService)
+            summary: Running summary of the messages before message_history
 
         Yields:
             Response chunks with type and content
         """
         state = {
+            "user_id": user_id,
+            "conversation_id": conversation_id,
             "response": "",
             "tool_calls": [],
             "tool_results": [],
@@ -496,7 +508,9 @@ class AgentService:
 
         try:
             tools = await self.create_rag_tools(user_id)
-            messages = self._build_messages(system_prompt, message_history, user_message)
+            messages = self._build_messages(
+                system_prompt, message_history, user_message, context_documents, summary
+            )
 
             async for event in self._stream_with_tools(messages, tools, state):
                 yield event
@@ -591,35 +605,42 @@ Summary:"""
         updated_messages = messages + [ai_message]
 
         if tool_calls:
-            recent_calls = []
-            recent_results = []
+            # Ids are needed to match the tool_result events to their calls
+            tool_calls = [
+                {**tool_call, "id": tool_call.get("id") or f"call_{uuid4().hex[:24]}"}
+                for tool_call in tool_calls
+            ]
             for tool_call in tool_calls:
-                call_id = tool_call.get("id") or f"call_{len(state['tool_calls'])}"
-                payload = {
-                    "id": call_id,
-                    "name": tool_call.get("name"),
-                    "input": tool_call.get("args", {}),
-                }
-                state["tool_calls"].append(payload)
-                recent_calls.append(payload)
-
                 yield {
                     "type": "tool_call",
-                    "tool_name": payload["name"],
-                    "tool_input": payload["input"],
-                    "call_id": call_id,
+                    "tool_name": tool_call.get("name"),
+                    "tool_input": tool_call.get("args", {}),
+                    "call_id": tool_call.get("id"),
                 }
 
-                result_payload = await self._handle_tool_execution(tool_call, tools, call_id)
-                state["tool_results"].append(result_payload)
-                recent_results.append(result_payload)
-
+            # Independent tool calls run concurrently; each result is sent as
+            # soon as its tool finishes, and stored in call order
+            finished = {}
+            async for execution in get_tool_executor().execute_as_completed(
+                tool_calls, tools, run=self._tool_runner(state)
+            ):
+                finished[execution.call_id] = execution
                 yield {
                     "type": "tool_result",
-                    "call_id": call_id,
-                    "result": result_payload["output"],
+                    "call_id": execution.call_id,
+                    "tool_name": execution.name,
+                    "result": execution.output,
+                    "is_error": execution.is_error,
+                    "execution_time_ms": round(execution.execution_time_ms, 2),
+                    "cache_hit": execution.cache_hit,
                 }
 
+            executions = [finished[tool_call["id"]] for tool_call in tool_calls]
+            recent_calls = [execution.to_call() for execution in executions]
+            recent_results = [execution.to_result() for execution in executions]
+            state["tool_calls"].extend(recent_calls)
+            state["tool_results"].extend(recent_results)
+
             tool_results_text = self._format_tool_results(recent_calls, recent_results)
             follow_up_messages = updated_messages + [
                 HumanMessage(
@@ -630,24 +651,3 @@ Summary:"""
 
             async for event in self._stream_with_tools(follow_up_messages, tools, state):
                 yield event
-
-    async def _handle_tool_execution(self, tool_call: dict, tools: List[Any], call_id: str) -> dict:
-        """Execute LangChain tool and capture output/errors."""
-        tool_name = tool_call.get("name")
-        tool_input = tool_call.get("args", {})
-
-        tool = next((t for t in tools if t.name == tool_name), None)
-
-        if not tool:
-            output = f"Error: Tool {tool_name} not found"
-        else:
-            try:
-                if hasattr(tool, "ainvoke"):
-                    output = await tool.ainvoke(tool_input)
-                else:
-                    output = tool.invoke(tool_input)
-            except Exception as exc:
-                logger.error(f"Error executing tool {tool_name}: {exc}")
-                output = f"Error executing tool {tool_name}: {exc}"
-
-        return {"id": call_id, "output": output}
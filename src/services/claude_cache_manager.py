@@ -18,13 +18,27 @@ import logging
 from enum import Enum
 import hashlib
 
+from src.infrastructure.state_backend import SharedCounters, get_state_backend
+from src.utils.tokens import count_tokens_cached
+
 logger = logging.getLogger(__name__)
 
+# 共享状态中的统计计数器和失效通知频道
+STATS_KEY = "claude_cache:stats"
+INVALIDATION_CHANNEL = "claude_cache:invalidate"
+STAT_FIELDS = (
+    "total_cache_write_tokens",
+    "total_cache_read_tokens",
+    "total_normal_tokens",
+    "cache_hit_count",
+    "cache_miss_count",
+)
+
 
 class CacheControlType(str, Enum):
     """缓存控制类型"""
     EPHEMERAL = "ephemeral"  # 临时缓存 (5 分钟)
-    PIN = "pin"              # 固定缓存 (无限期)
+    PIN = "pin"              # 长期缓存 (API 中为 ephemeral, TTL 1 小时)
 
 
 @dataclass
@@ -67,11 +81,14 @@ class PromptCacheEntry:
         return datetime.utcnow() > self.last_used_at + timedelta(minutes=ttl_minutes)
 
     def to_claude_format(self) -> Dict[str, Any]:
-        """转换为 Claude API 格式"""
+        """转换为 Claude API 格式 (API 只接受 ephemeral, PIN 对应 1 小时 TTL)"""
+        cache_control = {"type": CacheControlType.EPHEMERAL.value}
+        if self.cache_control_type == CacheControlType.PIN:
+            cache_control["ttl"] = "1h"
         return {
             "type": "text",
             "text": self.content,
-            "cache_control": {"type": self.cache_control_type.value}
+            "cache_control": cache_control,
         }
 
 
@@ -83,9 +100,22 @@ class ClaudePromptCacheManager:
     1. 系统提示缓存 (pin) - 聊天、RAG、Agent 系统提示
     2. 上下文缓存 (ephemeral) - 对话历史、文档上下文、用户信息
     3. 查询缓存 (ephemeral) - 常见问题、相同查询
+
+    命中率和 token 统计只来自 API 返回的 usage (record_usage), 本地查找
+    缓存条目不计为命中。
+
+    统计同时写入共享状态 (src.infrastructure.state_backend), 多个 worker
+    进程的统计由 get_shared_cache_stats 汇总; 清除缓存通过 pub/sub 通知
+    其他进程 (clear_cache_everywhere)。
     """
 
-    def __init__(self):
+    def __init__(self, counters: Optional[SharedCounters] = None):
+        """
+        Args:
+            counters: 共享计数器 (默认使用全局状态后端)
+        """
+        self._counters = counters if counters is not None else SharedCounters()
+
         # 三层缓存存储
         self._system_prompts_cache: Dict[str, PromptCacheEntry] = {}
         self._context_cache: Dict[str, PromptCacheEntry] = {}
@@ -117,7 +147,7 @@ class ClaudePromptCacheManager:
             key: 缓存键 (e.g., "chat_system", "rag_system")
             content: 系统提示内容
             is_pinned: 是否持久化缓存 (系统提示通常需要)
-            token_count: Token 数 (如果为 None，则使用粗略估算)
+            token_count: Token 数 (如果为 None，则由分词器计算)
 
         Returns:
             PromptCacheEntry
@@ -125,8 +155,7 @@ class ClaudePromptCacheManager:
         cache_control = CacheControlType.PIN if is_pinned else CacheControlType.EPHEMERAL
 
         if token_count is None:
-            # 粗略估算：每个单词约 1.3 个 tokens
-            token_count = max(1, int(len(content.split()) / 1.3))
+            token_count = count_tokens_cached(content)
 
         entry = PromptCacheEntry(
             cache_key=key,
@@ -161,7 +190,6 @@ class ClaudePromptCacheManager:
         entry = self._system_prompts_cache[key]
         entry.last_used_at = datetime.utcnow()
         entry.hit_count += 1
-        self.cache_hit_count += 1
 
         logger.debug(f"System prompt cache hit: {key} (hit #{entry.hit_count})")
 
@@ -178,7 +206,7 @@ class ClaudePromptCacheManager:
     ) -> PromptCacheEntry:
         """注册上下文缓存"""
         if token_count is None:
-            token_count = max(1, int(len(content.split()) / 1.3))
+            token_count = count_tokens_cached(content)
 
         entry = PromptCacheEntry(
             cache_key=key,
@@ -207,12 +235,36 @@ class ClaudePromptCacheManager:
 
         entry.last_used_at = datetime.utcnow()
         entry.hit_count += 1
-        self.cache_hit_count += 1
 
         return entry.to_claude_format()
 
     # ==================== 成本跟踪 ====================
 
+    def record_usage(
+        self,
+        cache_read_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        input_tokens: int = 0,
+    ) -> None:
+        """
+        按 API 返回的 usage 记录一次请求
+
+        读取了缓存前缀的请求计为命中, 其余计为未命中。
+
+        Args:
+            cache_read_tokens: cache_read_input_tokens
+            cache_write_tokens: cache_creation_input_tokens
+            input_tokens: 未缓存的输入 tokens (input_tokens)
+        """
+        if cache_read_tokens:
+            self.record_cache_hit(cache_read_tokens)
+        else:
+            self._count(cache_miss_count=1)
+        if cache_write_tokens:
+            self.record_cache_write(cache_write_tokens)
+        if input_tokens:
+            self._count(total_normal_tokens=input_tokens)
+
     def record_cache_hit(
         self,
         cache_read_tokens: int,
@@ -225,8 +277,7 @@ class ClaudePromptCacheManager:
         - 正常成本: $0.003 / 1K tokens
         - 节省: 90%
         """
-        self.total_cache_read_tokens += cache_read_tokens
-        self.cache_hit_count += 1
+        self._count(total_cache_read_tokens=cache_read_tokens, cache_hit_count=1)
 
         # 成本计算
         cache_read_cost = (cache_read_tokens / 1000) * CostMetrics.CACHE_READ_PRICE
@@ -259,7 +310,7 @@ class ClaudePromptCacheManager:
         - 缓存写入: $0.0015 / 1K tokens (5x 正常成本)
         - 但后续读取时可以重用 (节省 90%)
         """
-        self.total_cache_write_tokens += cache_write_tokens
+        self._count(total_cache_write_tokens=cache_write_tokens)
 
         # 成本计算
         cache_write_cost = (cache_write_tokens / 1000) * CostMetrics.CACHE_WRITE_PRICE
@@ -278,30 +329,62 @@ class ClaudePromptCacheManager:
         input_tokens: int,
     ):
         """记录缓存未命中"""
-        self.total_normal_tokens += input_tokens
-        self.cache_miss_count += 1
+        self._count(total_normal_tokens=input_tokens, cache_miss_count=1)
 
         logger.debug(f"Cache miss recorded: {input_tokens} tokens")
 
+    def _count(self, **deltas: int) -> None:
+        """累加本进程和共享状态中的统计计数"""
+        for field, delta in deltas.items():
+            setattr(self, field, getattr(self, field) + delta)
+        self._counters.add(STATS_KEY, deltas)
+
     # ==================== 统计信息 ====================
 
     def get_cache_stats(self) -> Dict[str, Any]:
-        """获取缓存统计信息"""
-        total_requests = self.cache_hit_count + self.cache_miss_count
+        """获取本进程的缓存统计信息"""
+        stats = self._build_stats({field: getattr(self, field) for field in STAT_FIELDS})
+        stats["scope"] = "process"
+        return stats
+
+    async def get_shared_cache_stats(self) -> Dict[str, Any]:
+        """获取所有 worker 进程汇总的缓存统计信息 (共享状态不可用时为本进程)"""
+        try:
+            [counters] = await self._counters.read(STATS_KEY)
+        except Exception as e:
+            logger.warning(f"Shared cache stats unavailable, using this process: {e}")
+            return self.get_cache_stats()
+        stats = self._build_stats({field: int(counters.get(field, 0)) for field in STAT_FIELDS})
+        stats["scope"] = "cluster"
+        return stats
+
+    async def flush_stats(self) -> None:
+        """立即把本进程缓冲的统计写入共享状态 (关闭时调用)"""
+        await self._counters.flush()
+
+    def _build_stats(self, counters: Dict[str, int]) -> Dict[str, Any]:
+        """由计数器计算统计信息"""
+        hits = counters["cache_hit_count"]
+        misses = counters["cache_miss_count"]
+        read_tokens = counters["total_cache_read_tokens"]
+        write_tokens = counters["total_cache_write_tokens"]
+        normal_tokens = counters["total_normal_tokens"]
+
+        total_requests = hits + misses
         hit_rate = (
-            (self.cache_hit_count / total_requests * 100)
+            (hits / total_requests * 100)
             if total_requests > 0
             else 0.0
         )
 
         # 成本计算
-        cache_read_cost = (self.total_cache_read_tokens / 1000) * CostMetrics.CACHE_READ_PRICE
-        normal_cost = (self.total_normal_tokens / 1000) * CostMetrics.NORMAL_PRICE
-        cache_write_cost = (self.total_cache_write_tokens / 1000) * CostMetrics.CACHE_WRITE_PRICE
+        cache_read_cost = (read_tokens / 1000) * CostMetrics.CACHE_READ_PRICE
+        normal_cost = (normal_tokens / 1000) * CostMetrics.NORMAL_PRICE
+        cache_write_cost = (write_tokens / 1000) * CostMetrics.CACHE_WRITE_PRICE
 
         total_actual_cost = cache_read_cost + cache_write_cost + normal_cost
         total_cost_without_cache = (
-            (self.total_cache_read_tokens + self.total_normal_tokens) / 1000 * CostMetrics.NORMAL_PRICE
+            (read_tokens + normal_tokens) / 1000 * CostMetrics.NORMAL_PRICE
         )
         total_saved_cost = total_cost_without_cache - total_actual_cost
 
@@ -312,14 +395,14 @@ class ClaudePromptCacheManager:
             "queries_cached": len(self._query_cache),
 
             # Token 统计
-            "total_cache_write_tokens": self.total_cache_write_tokens,
-            "total_cache_read_tokens": self.total_cache_read_tokens,
-            "total_normal_tokens": self.total_normal_tokens,
-            "total_tokens": self.total_cache_write_tokens + self.total_cache_read_tokens + self.total_normal_tokens,
+            "total_cache_write_tokens": write_tokens,
+            "total_cache_read_tokens": read_tokens,
+            "total_normal_tokens": normal_tokens,
+            "total_tokens": write_tokens + read_tokens + normal_tokens,
 
             # 命中率
-            "cache_hit_count": self.cache_hit_count,
-            "cache_miss_count": self.cache_miss_count,
+            "cache_hit_count": hits,
+            "cache_miss_count": misses,
             "hit_rate_percent": round(hit_rate, 2),
 
             # 成本统计
@@ -374,8 +457,16 @@ class ClaudePromptCacheManager:
             "annual_saved": round(monthly_saved * 12, 2),
         }
 
+    async def clear_cache_everywhere(self, cache_type: Optional[str] = None):
+        """清除本进程的缓存并通知其他 worker 进程清除"""
+        self.clear_cache(cache_type=cache_type)
+        try:
+            await get_state_backend().publish(INVALIDATION_CHANNEL, {"cache_type": cache_type})
+        except Exception as e:
+            logger.warning(f"Failed to broadcast cache invalidation: {e}")
+
     def clear_cache(self, cache_type: Optional[str] = None):
-        """清除缓存"""
+        """清除本进程的缓存"""
         if cache_type is None or cache_type == "all":
             self._system_prompts_cache.clear()
             self._context_cache.clear()
@@ -405,6 +496,16 @@ def get_claude_cache_manager() -> ClaudePromptCacheManager:
     return _cache_manager
 
 
+async def subscribe_cache_invalidations():
+    """接收其他 worker 进程的缓存清除通知 (应用启动时调用)"""
+    await get_state_backend().subscribe(INVALIDATION_CHANNEL, _on_invalidation)
+
+
+def _on_invalidation(message: Dict[str, Any]):
+    """应用其他进程发出的缓存清除"""
+    get_claude_cache_manager().clear_cache(cache_type=message.get("cache_type"))
+
+
 def reset_claude_cache_manager():
     """重置全局缓存管理器 (用于测试)"""
     global _cache_manager
@@ -12,6 +12,7 @@ from src.services.claude_cache_manager import (
     get_claude_cache_manager,
     CacheControlType,
 )
+from src.services.prompt_layout import build_stable_layout
 from src.infrastructure.claude_cost_tracker import get_cost_tracker
 
 logger = logging.getLogger(__name__)
@@ -84,6 +85,15 @@ Always use the most appropriate tool for the task at hand."""
 
         logger.info("Initialized Claude Agent with cached system prompts")
 
+    @staticmethod
+    def _system_prompt_key(prompt_type: str) -> Optional[str]:
+        """提示类型对应的缓存键"""
+        return {
+            "chat": ClaudeAgentIntegration.CHAT_SYSTEM_PROMPT_KEY,
+            "rag": ClaudeAgentIntegration.RAG_SYSTEM_PROMPT_KEY,
+            "agent": ClaudeAgentIntegration.AGENT_SYSTEM_PROMPT_KEY,
+        }.get(prompt_type)
+
     @staticmethod
     def get_cached_system_prompt(prompt_type: str = "chat") -> Optional[Dict[str, Any]]:
         """
@@ -186,15 +196,12 @@ Always use the most appropriate tool for the task at hand."""
             cache_hit=cache_hit,
         )
 
-        # 同时记录到缓存管理器
-        cache_manager = get_claude_cache_manager()
-
-        if cache_read_tokens > 0:
-            cache_manager.record_cache_hit(cache_read_tokens)
-        if cache_write_tokens > 0:
-            cache_manager.record_cache_write(cache_write_tokens)
-        if not (cache_read_tokens or cache_write_tokens):
-            cache_manager.record_cache_miss(input_tokens + output_tokens)
+        # 同时记录到缓存管理器 (input_tokens 为未缓存部分)
+        get_claude_cache_manager().record_usage(
+            cache_read_tokens=cache_read_tokens,
+            cache_write_tokens=cache_write_tokens,
+            input_tokens=input_tokens,
+        )
 
         logger.info(
             f"API usage recorded: "
@@ -211,55 +218,89 @@ Always use the most appropriate tool for the task at hand."""
             "savings_percent": 90 if cache_hit else 0,
         }
 
+    @staticmethod
+    def record_response_usage(
+        response: Any,
+        conversation_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        按 API 实际返回的 usage 记录缓存读写和成本
+
+        支持 Anthropic SDK 的 Message / usage 对象、usage 字典, 以及
+        LangChain AIMessage 的 usage_metadata。
+
+        Args:
+            response: API 响应或其 usage
+            conversation_id: 对话 ID
+            user_id: 用户 ID
+
+        Returns:
+            成本统计信息, 响应中没有 usage 时为 None
+        """
+        usage = _parse_usage(response)
+        if usage is None:
+            return None
+        return ClaudeAgentIntegration.record_api_usage(
+            conversation_id=conversation_id,
+            user_id=user_id,
+            cache_hit=usage["cache_read_tokens"] > 0,
+            **usage,
+        )
+
     @staticmethod
     def build_claude_request_with_cache(
         system_prompt_type: str = "chat",
         messages: Optional[List[Dict[str, str]]] = None,
         conversation_id: Optional[str] = None,
         additional_context: Optional[str] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        summary: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         构建带缓存的 Claude 请求
 
+        内容按稳定性排列 (静态系统提示, 工具, 摘要, 较早轮次), 缓存断点
+        位于各段末尾; 本轮消息和额外上下文放在最后一个断点之后, 不会使
+        已缓存的前缀失效。见 src.services.prompt_layout。
+
         Args:
             system_prompt_type: 系统提示类型
-            messages: 消息列表
-            conversation_id: 对话 ID (用于缓存上下文)
-            additional_context: 额外的上下文
+            messages: 消息列表 (最后一条 user 消息为本轮消息)
+            conversation_id: 对话 ID
+            additional_context: 额外的上下文 (每轮变化, 不缓存)
+            tools: 工具定义
+            summary: 对话摘要
 
         Returns:
             Claude API 请求体
         """
-        system_blocks = []
-
-        # 添加缓存的系统提示
-        cached_prompt = ClaudeAgentIntegration.get_cached_system_prompt(
-            system_prompt_type
+        cache_manager = get_claude_cache_manager()
+        key = ClaudeAgentIntegration._system_prompt_key(system_prompt_type)
+        entry = cache_manager._system_prompts_cache.get(key) if key else None
+        if entry is None:
+            logger.warning(f"Unknown prompt type: {system_prompt_type}")
+
+        history = list(messages or [])
+        user_message = None
+        if history and history[-1].get("role") == "user":
+            user_message = history.pop()["content"]
+
+        layout = build_stable_layout(
+            static_system=entry.content if entry else "",
+            tools=tools,
+            summary=summary,
+            history=history,
+            user_message=user_message,
+            volatile_context=additional_context,
+            static_ttl="1h" if entry and entry.cache_control_type == CacheControlType.PIN else None,
         )
-        if cached_prompt:
-            system_blocks.append(cached_prompt)
-
-        # 添加缓存的对话上下文
-        if conversation_id and messages:
-            context_block = ClaudeAgentIntegration.cache_conversation_context(
-                conversation_id=conversation_id,
-                messages=messages,
+        if conversation_id:
+            logger.debug(
+                f"Built Claude request for {conversation_id} "
+                f"with cache breakpoints: {', '.join(layout.breakpoints) or 'none'}"
             )
-            if context_block:
-                system_blocks.append(context_block)
-
-        # 添加额外上下文
-        if additional_context:
-            system_blocks.append({
-                "type": "text",
-                "text": additional_context,
-                "cache_control": {"type": "ephemeral"}
-            })
-
-        return {
-            "system": system_blocks,
-            "messages": messages or [],
-        }
+        return layout.to_request()
 
     @staticmethod
     def get_cache_statistics() -> Dict[str, Any]:
@@ -274,6 +315,36 @@ Always use the most appropriate tool for the task at hand."""
         return cost_tracker.get_summary()
 
 
+def _parse_usage(response: Any) -> Optional[Dict[str, int]]:
+    """从 API 响应中提取 usage (未缓存输入, 输出, 缓存读取, 缓存写入)"""
+    usage_metadata = getattr(response, "usage_metadata", None)
+    if usage_metadata:
+        # LangChain: input_tokens 包含缓存读写部分
+        details = usage_metadata.get("input_token_details") or {}
+        cache_read = details.get("cache_read") or 0
+        cache_write = details.get("cache_creation") or 0
+        uncached = usage_metadata.get("input_tokens", 0) - cache_read - cache_write
+        return {
+            "input_tokens": max(0, uncached),
+            "output_tokens": usage_metadata.get("output_tokens", 0),
+            "cache_read_tokens": cache_read,
+            "cache_write_tokens": cache_write,
+        }
+
+    usage = getattr(response, "usage", response)
+    if not isinstance(usage, dict):
+        usage = getattr(usage, "__dict__", None)
+    if not usage or "input_tokens" not in usage:
+        return None
+    # Anthropic: input_tokens 不包含缓存读写部分
+    return {
+        "input_tokens": usage.get("input_tokens") or 0,
+        "output_tokens": usage.get("output_tokens") or 0,
+        "cache_read_tokens": usage.get("cache_read_input_tokens") or 0,
+        "cache_write_tokens": usage.get("cache_creation_input_tokens") or 0,
+    }
+
+
 # 初始化函数，应该在应用启动时调用
 def initialize_claude_integration():
     """初始化 Claude 集成"""
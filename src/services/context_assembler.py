@@ -0,0 +1,213 @@
+"""
+Token-budgeted assembly of the agent prompt.
+
+History used to be appended verbatim, so prompt size (and with it latency
+and cost) grew without bound. The assembler packs the prompt segments into
+CONTEXT_TOKEN_BUDGET tokens, by priority:
+
+1. System prompt and the current user message (always kept)
+2. The CONTEXT_MIN_RECENT_MESSAGES most recent history messages
+3. The running conversation summary
+4. RAG excerpts, most similar first, up to CONTEXT_RAG_SHARE of the budget;
+   excerpts whose text already appears in the kept history are skipped
+5. Older history, newest first, while it fits
+
+Token counts come from the messages' stored tokens_used (counted once at
+insert) and are only computed for entries without one.
+
+Segments are laid out stable-first so the provider's prompt cache can reuse
+the longest possible prefix from one turn to the next: system prompt,
+summary, history (append-only between turns), then the per-query RAG
+excerpts and the user message.
+
+Example:
+    >>> context = get_context_assembler().assemble(
+    ...     system_prompt, user_message, history, rag_chunks, summary=summary
+    ... )
+    >>> context.history, context.rag_chunks, context.total_tokens
+"""
+
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from src.utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Per-message framing (role markers, separators) added by chat formats
+MESSAGE_OVERHEAD_TOKENS = 4
+# Numbering and the "(Document ID: ..., Chunk: ...)" citation of an excerpt
+EXCERPT_OVERHEAD_TOKENS = 24
+
+
+@dataclass
+class AssembledContext:
+    """Prompt segments selected for a turn, in prompt order."""
+    system_prompt: str
+    user_message: str
+    summary: Optional[str] = None
+    history: List[Dict[str, Any]] = field(default_factory=list)
+    rag_chunks: List[Dict[str, Any]] = field(default_factory=list)
+    tokens: Dict[str, int] = field(default_factory=dict)
+    dropped_messages: int = 0
+    dropped_chunks: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        """Estimated prompt tokens of the selected segments."""
+        return sum(self.tokens.values())
+
+
+class ContextAssembler:
+    """
+    Packs system prompt, summary, RAG context and history into a token budget.
+
+    Configuration via environment variables:
+    - CONTEXT_TOKEN_BUDGET: Max prompt tokens (default: 8000)
+    - CONTEXT_RAG_SHARE: Max fraction of the budget for RAG excerpts (default: 0.25)
+    - CONTEXT_MIN_RECENT_MESSAGES: Most recent history messages kept ahead of
+      the summary and RAG context (default: 2)
+    """
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        rag_share: Optional[float] = None,
+        min_recent_messages: Optional[int] = None,
+    ):
+        """
+        Initialize context assembler.
+
+        Args:
+            token_budget: Max prompt tokens
+            rag_share: Max fraction of the budget for RAG excerpts
+            min_recent_messages: Most recent messages kept before lower priorities
+        """
+        self.token_budget = int(token_budget or os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))
+        self.rag_share = (
+            float(os.getenv("CONTEXT_RAG_SHARE", "0.25")) if rag_share is None else rag_share
+        )
+        self.min_recent_messages = (
+            int(os.getenv("CONTEXT_MIN_RECENT_MESSAGES", "2"))
+            if min_recent_messages is None else min_recent_messages
+        )
+
+    def assemble(
+        self,
+        system_prompt: str,
+        user_message: str,
+        history: Optional[List[Dict[str, Any]]] = None,
+        rag_chunks: Optional[List[Dict[str, Any]]] = None,
+        summary: Optional[str] = None,
+    ) -> AssembledContext:
+        """
+        Select the prompt segments that fit the token budget.
+
+        Args:
+            system_prompt: System prompt (always kept)
+            user_message: Current user message (always kept)
+            history: Previous messages, oldest first ({"role", "content",
+                optional "tokens_used"})
+            rag_chunks: Document chunks ({"chunk_text", "document_id",
+                "chunk_index", optional "similarity"})
+            summary: Running summary of the messages before ``history``
+
+        Returns:
+            AssembledContext with the kept segments and their token counts
+        """
+        history = history or []
+        rag_chunks = rag_chunks or []
+
+        context = AssembledContext(system_prompt=system_prompt, user_message=user_message)
+        context.tokens["system"] = self._text_tokens(system_prompt)
+        context.tokens["user_message"] = self._text_tokens(user_message)
+        remaining = self.token_budget - context.total_tokens
+        if remaining < 0:
+            logger.warning(
+                f"System prompt and message alone ({context.total_tokens} tokens) "
+                f"exceed the context budget of {self.token_budget}"
+            )
+
+        # Most recent messages first, then the summary, then RAG
+        costs = [self.message_tokens(message) for message in history]
+        start = len(history)
+        while start > 0 and len(history) - start < self.min_recent_messages:
+            if costs[start - 1] > remaining:
+                break
+            start -= 1
+            remaining -= costs[start]
+
+        if summary:
+            summary_tokens = self._text_tokens(summary)
+            if summary_tokens <= remaining:
+                context.summary = summary
+                context.tokens["summary"] = summary_tokens
+                remaining -= summary_tokens
+
+        kept_history = history[start:]
+        rag_budget = min(remaining, int(self.token_budget * self.rag_share))
+        rag_tokens = 0
+        seen = set()
+        for chunk in sorted(rag_chunks, key=lambda c: c.get("similarity") or 0, reverse=True):
+            text = (chunk.get("chunk_text") or "").strip()
+            if not text or text in seen or _in_history(text, kept_history):
+                context.dropped_chunks += 1
+                continue
+            cost = count_tokens(text) + EXCERPT_OVERHEAD_TOKENS
+            if rag_tokens + cost > rag_budget:
+                context.dropped_chunks += 1
+                continue
+            seen.add(text)
+            context.rag_chunks.append(chunk)
+            rag_tokens += cost
+        remaining -= rag_tokens
+
+        # Older history, newest first, while it fits
+        while start > 0 and costs[start - 1] <= remaining:
+            start -= 1
+            remaining -= costs[start]
+
+        context.history = history[start:]
+        context.dropped_messages = start
+        context.tokens["history"] = sum(costs[start:])
+        if context.rag_chunks:
+            context.tokens["rag"] = rag_tokens
+
+        if context.dropped_messages or context.dropped_chunks:
+            logger.debug(
+                f"Context budget {self.token_budget}: kept {len(context.history)} messages, "
+                f"{len(context.rag_chunks)} excerpts ({context.total_tokens} tokens); "
+                f"dropped {context.dropped_messages} messages, {context.dropped_chunks} excerpts"
+            )
+        return context
+
+    @staticmethod
+    def message_tokens(message: Dict[str, Any]) -> int:
+        """Tokens of a history message: stored count, else counted."""
+        tokens = message.get("tokens_used")
+        if tokens is None:
+            tokens = count_tokens(message.get("content") or "")
+        return tokens + MESSAGE_OVERHEAD_TOKENS
+
+    @staticmethod
+    def _text_tokens(text: Optional[str]) -> int:
+        return count_tokens(text) + MESSAGE_OVERHEAD_TOKENS if text else 0
+
+
+def _in_history(text: str, history: List[Dict[str, Any]]) -> bool:
+    """Whether a chunk's text already appears in a kept message."""
+    return any(text in (message.get("content") or "") for message in history)
+
+
+# Global singleton instance
+_context_assembler: Optional[ContextAssembler] = None
+
+
+def get_context_assembler() -> ContextAssembler:
+    """Get global context assembler instance."""
+    global _context_assembler
+    if _context_assembler is None:
+        _context_assembler = ContextAssembler()
+    return _context_assembler
@@ -1,16 +1,23 @@
 """Conversation service for managing conversations and messages."""
 
 import logging
-from typing import List, Optional
+from collections import OrderedDict
+from typing import Iterable, List, Optional
 from uuid import UUID
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.models import ConversationORM, MessageORM
-from src.repositories import ConversationRepository, MessageRepository
+from src.repositories import ConversationRepository, MessageRepository, ToolCallRepository
+from src.services.memory_service import get_memory_service
+from src.services.message_persister import get_message_persister
 
 logger = logging.getLogger(__name__)
 
+# Conversation owners never change; remembered to spare a query per batch
+_OWNER_CACHE_SIZE = 10000
+_conversation_owners: "OrderedDict[UUID, str]" = OrderedDict()
+
 
 class ConversationService:
     """Service for conversation management operations."""
@@ -25,6 +32,7 @@ class ConversationService:
         self.session = session
         self.conv_repo = ConversationRepository(session)
         self.msg_repo = MessageRepository(session)
+        self.tool_call_repo = ToolCallRepository(session)
 
     async def create_conversation(
         self,
@@ -69,6 +77,8 @@ class ConversationService:
         tool_calls: Optional[dict] = None,
         tool_results: Optional[dict] = None,
         tokens_used: Optional[int] = None,
+        metadata: Optional[dict] = None,
+        deferred: bool = False,
     ) -> MessageORM:
         """
         Add a message to a conversation.
@@ -79,21 +89,53 @@ class ConversationService:
             content: Message content
             tool_calls: Tool calls made by assistant
             tool_results: Results from tool calls
-            tokens_used: Number of tokens used
+            tokens_used: Token count of the message (default: counted from
+                content once, here; the conversation's running total is
+                updated in the same transaction)
+            metadata: Message metadata
+            deferred: Hand the message to the write-behind persister instead
+                of committing it on this session (chat hot path; durability
+                per MESSAGE_DURABILITY)
 
         Returns:
             Created message
         """
-        message = await self.msg_repo.create(
+        if deferred:
+            message = await get_message_persister().save(
+                conversation_id=conversation_id,
+                role=role,
+                content=content,
+                tool_calls=tool_calls,
+                tool_results=tool_results,
+                tokens_used=tokens_used,
+                metadata=metadata,
+            )
+            await get_memory_service().record_message(conversation_id, message)
+            logger.info(f"Queued {role} message {message.id} for conversation {conversation_id}")
+            return message
+
+        message = await self.msg_repo.create_message(
             conversation_id=conversation_id,
             role=role,
             content=content,
             tool_calls=tool_calls,
             tool_results=tool_results,
             tokens_used=tokens_used,
-            metadata={},
+            metadata=metadata,
         )
 
+        # Keep the cached history window used by memory injection current
+        await get_memory_service().record_message(conversation_id, message)
+
+        # Per-tool records (status, latency) for tools executed by the agent
+        if tool_calls and tool_results:
+            try:
+                await self.tool_call_repo.record_executions(
+                    message.id, conversation_id, tool_calls, tool_results
+                )
+            except Exception as e:
+                logger.warning(f"Failed to record tool calls for message {message.id}: {e}")
+
         logger.info(f"Added {role} message to conversation {conversation_id}")
         return message
 
@@ -188,6 +230,7 @@ class ConversationService:
 
         # Delete all messages first
         await self.msg_repo.delete_conversation_messages(conversation_id)
+        await get_memory_service().invalidate(conversation_id)
 
         # Soft delete conversation
         await self.conv_repo.soft_delete(conversation_id)
@@ -248,3 +291,35 @@ class ConversationService:
         total = await self.conv_repo.count_user_conversations(user_id)
 
         return conversations, total
+
+
+async def invalidate_committed_conversations(messages: Iterable[MessageORM]) -> None:
+    """
+    Message persister commit listener: drop cached responses the batch changed.
+
+    Only the conversations in the batch (their messages and details, for every
+    caller) and their owners' cache scopes (conversation lists) are
+    invalidated; other users keep their cached responses.
+
+    Args:
+        messages: Committed messages
+    """
+    from src.middleware.cache_middleware import invalidate_resource_cache
+
+    conversation_ids = {message.conversation_id for message in messages}
+    missing = [cid for cid in conversation_ids if cid not in _conversation_owners]
+    if missing:
+        from src.db.config import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as session:
+            owners = await ConversationRepository(session).get_owners(missing)
+        _conversation_owners.update(owners)
+        while len(_conversation_owners) > _OWNER_CACHE_SIZE:
+            _conversation_owners.popitem(last=False)
+
+    user_ids = set()
+    for conversation_id in conversation_ids:
+        if conversation_id in _conversation_owners:
+            _conversation_owners.move_to_end(conversation_id)
+            user_ids.add(_conversation_owners[conversation_id])
+    await invalidate_resource_cache(conversation_ids, [f"u:{user_id}" for user_id in user_ids])
@@ -1,16 +1,17 @@
 """Conversation summarization service for managing long conversations."""
 
 import logging
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
 from datetime import datetime
 
-import tiktoken
 from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import HumanMessage, SystemMessage
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.repositories import ConversationRepository
+from src.repositories import ConversationRepository, MessageRepository
+from src.services.claude_integration import ClaudeAgentIntegration
+from src.utils.tokens import get_encoding
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +27,10 @@ class ConversationSummarizationService:
     - Token threshold: 6000 tokens
     - Keep recent: 10 most recent messages
     - Summarize: older messages
+
+    Token counts come from the conversation's running total
+    (conversations.total_tokens), so the threshold check is O(1); messages
+    are only tokenized when they carry no tokens_used.
     """
 
     # Configuration constants
@@ -33,20 +38,27 @@ class ConversationSummarizationService:
     RECENT_MESSAGES_TO_KEEP = 10
     TOKENIZER_ENCODING = "cl100k_base"  # GPT-3.5-turbo encoding
 
-    def __init__(self, session: AsyncSession, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        session: AsyncSession,
+        api_key: Optional[str] = None,
+        llm: Any = None,
+    ):
         """
         Initialize conversation summarization service.
 
         Args:
             session: SQLAlchemy async session
             api_key: Anthropic API key (uses ANTHROPIC_API_KEY env var if not provided)
+            llm: Chat model for summaries (default: Claude Sonnet)
         """
         self.session = session
         self.conversation_repo = ConversationRepository(session)
-        self.tokenizer = tiktoken.get_encoding(self.TOKENIZER_ENCODING)
+        self.message_repo = MessageRepository(session)
+        self.tokenizer = get_encoding(self.TOKENIZER_ENCODING)
 
         # Initialize Claude for summarization (Sonnet 4.5 for optimal speed/quality)
-        self.llm = ChatAnthropic(
+        self.llm = llm or ChatAnthropic(
             api_key=api_key,
             model="claude-sonnet-4-5-20250929",
             temperature=0.3,  # Lower temperature for consistent summaries
@@ -56,6 +68,9 @@ class ConversationSummarizationService:
         """
         Count total tokens in message list.
 
+        Uses each message's stored tokens_used and tokenizes only messages
+        without one.
+
         Args:
             messages: List of messages in format [{"role": "...", "content": "..."}]
 
@@ -64,16 +79,31 @@ class ConversationSummarizationService:
         """
         total_tokens = 0
         for msg in messages:
-            content = msg.get("content", "")
-            tokens = len(self.tokenizer.encode(content))
+            tokens = msg.get("tokens_used")
+            if tokens is None:
+                content = msg.get("content", "")
+                tokens = len(self.tokenizer.encode(content, disallowed_special=()))
             total_tokens += tokens
         return total_tokens
 
+    async def get_conversation_token_count(self, conversation_id: UUID) -> int:
+        """
+        Get the running token total of a conversation.
+
+        Args:
+            conversation_id: Conversation ID
+
+        Returns:
+            Total token count (maintained at message insert, O(1) read)
+        """
+        return await self.message_repo.get_total_tokens(conversation_id)
+
     async def check_and_summarize(
         self,
         conversation_id: UUID,
         messages: List[dict],
         force_summarize: bool = False,
+        token_count: Optional[int] = None,
     ) -> Optional[Dict[str, Any]]:
         """
         Check if conversation needs summarization and perform if needed.
@@ -82,6 +112,8 @@ class ConversationSummarizationService:
             conversation_id: Conversation ID
             messages: List of messages [{"role": "...", "content": "..."}]
             force_summarize: Force summarization regardless of token count
+            token_count: Token total of the conversation (default: the
+                running total from the conversations table)
 
         Returns:
             Summary dict if created, None otherwise
@@ -95,8 +127,9 @@ class ConversationSummarizationService:
             }
         """
         try:
-            # Count tokens in conversation
-            token_count = self._count_message_tokens(messages)
+            # Read the running token total of the conversation
+            if token_count is None:
+                token_count = await self.get_conversation_token_count(conversation_id)
 
             logger.info(
                 f"Checking conversation {conversation_id}: "
@@ -192,6 +225,95 @@ Summary:"""
             logger.error(f"Error generating summary for {conversation_id}: {str(e)}", exc_info=True)
             raise
 
+    async def update_running_summary(
+        self, conversation_id: UUID, min_tokens: int = 0
+    ) -> Optional[str]:
+        """
+        Fold the messages added since the last summary into the running summary.
+
+        Only messages after the summary cursor (conversations.meta
+        "summary_until") are read and sent to the model, together with the
+        previous summary; the RECENT_MESSAGES_TO_KEEP newest messages stay
+        out of the summary because they are still sent verbatim. The result
+        is written to ConversationORM.summary and the cursor is advanced.
+
+        Args:
+            conversation_id: Conversation ID
+            min_tokens: Fold only once the messages that can be folded (after
+                the cursor, outside the recent window) hold this many tokens
+
+        Returns:
+            The new summary, or None if there was nothing (or not enough) to fold
+        """
+        conversation = await self.conversation_repo.get(conversation_id)
+        if not conversation or conversation.is_deleted:
+            return None
+
+        meta = dict(conversation.meta or {})
+        # Unsummarized tokens bound the foldable ones; skip reading messages
+        unsummarized = (conversation.total_tokens or 0) - meta.get("summary_tokens", 0)
+        if min_tokens and unsummarized < min_tokens:
+            return None
+
+        since = meta.get("summary_until")
+        messages = await self.message_repo.get_messages_after(
+            conversation_id, datetime.fromisoformat(since) if since else None
+        )
+        to_fold = messages[: -self.RECENT_MESSAGES_TO_KEEP]
+        fold_tokens = sum(message.tokens_used or 0 for message in to_fold)
+        if not to_fold or fold_tokens < min_tokens:
+            return None
+
+        summary = await self._merge_summary(conversation.summary, to_fold)
+
+        meta["summary_until"] = to_fold[-1].created_at.isoformat()
+        meta["summary_until_id"] = str(to_fold[-1].id)
+        meta["summary_tokens"] = meta.get("summary_tokens", 0) + fold_tokens
+        conversation.summary = summary
+        conversation.meta = meta
+        await self.session.commit()
+
+        logger.info(
+            f"Updated summary of conversation {conversation_id}: "
+            f"folded {len(to_fold)} messages, {len(summary)} chars"
+        )
+        return summary
+
+    async def _merge_summary(self, previous: Optional[str], messages: List[Any]) -> str:
+        """
+        Merge new messages into the previous summary with one LLM call.
+
+        Args:
+            previous: Current summary (None for the first one)
+            messages: MessageORM instances not yet covered by the summary
+
+        Returns:
+            Updated summary text
+        """
+        messages_text = "\n".join(f"{msg.role}: {msg.content}" for msg in messages)
+        summary_prompt = f"""Update the summary of a conversation with the new messages below.
+Keep the main topics, key facts, decisions and open questions from both the previous summary
+and the new messages. Reply with the updated summary only, in at most one short paragraph.
+
+Previous Summary:
+{previous or "(none)"}
+
+New Messages:
+{messages_text}
+
+Updated Summary:"""
+
+        response = await self.llm.ainvoke([
+            SystemMessage(
+                content="You are a helpful assistant that summarizes conversations concisely and accurately."
+            ),
+            HumanMessage(content=summary_prompt),
+        ])
+        ClaudeAgentIntegration.record_response_usage(
+            response, conversation_id=str(messages[0].conversation_id)
+        )
+        return response.content.strip()
+
     async def inject_summary_into_context(
         self,
         conversation_id: UUID,
@@ -251,12 +373,15 @@ Summary:"""
     async def should_summarize_conversation(
         self,
         messages: List[dict],
+        token_count: Optional[int] = None,
     ) -> bool:
         """
         Determine if conversation should be summarized.
 
         Args:
             messages: List of messages
+            token_count: Token total of the conversation (default: summed
+                from the messages)
 
         Returns:
             True if should summarize, False otherwise
@@ -266,8 +391,37 @@ Summary:"""
             return False
 
         # Check token count
-        token_count = self._count_message_tokens(messages)
+        if token_count is None:
+            token_count = self._count_message_tokens(messages)
         if token_count >= self.CONVERSATION_SUMMARY_TOKEN_THRESHOLD:
             return True
 
         return False
+
+
+def apply_summary(
+    conversation: Any,
+    history: List[Dict[str, Any]],
+) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """
+    Prompt inputs for a turn: the running summary replaces the messages it covers.
+
+    Drops history entries up to the last summarized message. This is a pure
+    function, so the turn reads whatever summary the background worker last
+    committed.
+
+    Args:
+        conversation: ConversationORM (summary, meta)
+        history: History window, oldest first ({"id", "role", "content", ...})
+
+    Returns:
+        Tuple of (summary or None, history after the summarized messages)
+    """
+    if not conversation.summary:
+        return None, history
+
+    until_id = (conversation.meta or {}).get("summary_until_id")
+    for index, message in enumerate(history):
+        if message.get("id") == until_id:
+            return conversation.summary, history[index + 1:]
+    return conversation.summary, history
@@ -14,7 +14,9 @@ from typing import Any, List, Optional, Dict
 from langchain_core.language_model import BaseLLM
 from langchain_core.tools import BaseTool
 from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, ToolMessage, AIMessage
+from src.services.context_assembler import get_context_assembler
 from src.services.middleware import AgentMiddleware
+from src.services.tool_executor import get_tool_executor, middleware_runner
 import logging
 
 logger = logging.getLogger(__name__)
@@ -99,9 +101,14 @@ class ManagedAgent:
         if self.system_prompt:
             messages.append(SystemMessage(content=self.system_prompt))
 
-        # Add message history if provided
+        # Add message history if provided, newest first within the context budget
         if "message_history" in state and state["message_history"]:
-            for msg in state["message_history"]:
+            context = get_context_assembler().assemble(
+                self.system_prompt or "",
+                input_data.get("user_input", ""),
+                state["message_history"],
+            )
+            for msg in context.history:
                 role = msg.get("role", "user")
                 content = msg.get("content", "")
                 if role == "user":
@@ -161,39 +168,16 @@ class ManagedAgent:
         if tool_calls_data:
             messages.append(response)
 
-            for tool_call in tool_calls_data:
-                tool_name = tool_call.get("name")
-                tool_args = tool_call.get("args", {})
-                tool_call_id = tool_call.get("id", f"call_{len(tool_calls_data)}")
-
-                # Create wrapped tool execute function
-                async def execute_tool():
-                    tool = self.tools.get(tool_name)
-                    if not tool:
-                        raise ValueError(f"Tool {tool_name} not found")
-                    return await tool.ainvoke(tool_args)
-
-                # Execute wrap_tool_call hooks
-                result, error = None, None
-                for middleware in self.middleware:
-                    result, error = await middleware.wrap_tool_call(
-                        execute_tool,
-                        tool_name,
-                        tool_args,
-                        state
-                    )
-
-                # Add tool result to messages
-                if error:
-                    messages.append(ToolMessage(
-                        content=f"Error: {error}",
-                        tool_call_id=tool_call_id
-                    ))
-                else:
-                    messages.append(ToolMessage(
-                        content=str(result) if result is not None else "No result",
-                        tool_call_id=tool_call_id
-                    ))
+            # Independent tool calls run concurrently, each through the
+            # wrap_tool_call hooks; messages keep call order
+            executions = await get_tool_executor().execute(
+                tool_calls_data, self.tools, run=middleware_runner(self.middleware, state)
+            )
+            for execution in executions:
+                output = execution.output
+                content = str(output) if output is not None else "No result"
+                messages.append(ToolMessage(content=content, tool_call_id=execution.call_id))
+            state["tool_results"] = [execution.to_result() for execution in executions]
 
             # Get final response after tool execution
             try:
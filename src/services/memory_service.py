@@ -0,0 +1,328 @@
+"""
+Conversation memory service: recent history and RAG context for a message.
+
+History is read from the Redis message cache (``msg:{conversation_id}``, the
+last ``MEMORY_HISTORY_LIMIT`` messages) and falls back to the database, which
+then refills the cache. Every message written through ConversationService is
+appended to the cached window, so a warm conversation never queries the
+database for history.
+
+RAG context is the query embedding searched against the user's document
+chunks. History and RAG run concurrently, each with its own database session
+and its own time budget; whatever finished in time is returned. If the client
+submitted drafts of the message, RAG context is taken from the prefetched
+search for a similar draft (see rag_prefetch) instead of searched again.
+
+Example:
+    >>> memory = get_memory_service()
+    >>> context = await memory.load(conversation_id, user_id, "What changed?")
+    >>> context["conversation_history"], context["rag_context"]
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+
+from src.services.rag_prefetch import RAGPrefetcher
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryService:
+    """
+    Loads conversation history and RAG context concurrently.
+
+    Configuration via environment variables:
+    - MEMORY_HISTORY_LIMIT: Messages kept in the cached history window (default: 20)
+    - MEMORY_RAG_LIMIT: Max document chunks returned (default: 5)
+    - MEMORY_RAG_THRESHOLD: Min similarity of returned chunks (default: 0.7)
+    - MEMORY_LOAD_TIMEOUT_MS: Default time budget for load() (default: 2000)
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Any]] = None,
+        redis_cache: Any = None,
+        embedding_service: Any = None,
+        prefetcher: Optional[RAGPrefetcher] = None,
+    ):
+        """
+        Initialize memory service.
+
+        Args:
+            session_factory: Async session factory (default: AsyncSessionLocal)
+            redis_cache: RedisCache for the history window (default: global instance)
+            embedding_service: EmbeddingService for queries (default: created on first use)
+            prefetcher: Draft prefetcher (default: one searching via get_rag_context)
+        """
+        self.history_limit = int(os.getenv("MEMORY_HISTORY_LIMIT", "20"))
+        self.rag_limit = int(os.getenv("MEMORY_RAG_LIMIT", "5"))
+        self.rag_threshold = float(os.getenv("MEMORY_RAG_THRESHOLD", "0.7"))
+        self.load_timeout = float(os.getenv("MEMORY_LOAD_TIMEOUT_MS", "2000")) / 1000.0
+        self._session_factory = session_factory
+        self._redis_cache = redis_cache
+        self._embedding_service = embedding_service
+        self._rag_available = True
+        # Bumped on every history write; a database read that overlapped a
+        # write does not refill the cache (it may miss that message)
+        self._write_seq = 0
+        self.prefetcher = (
+            prefetcher if prefetcher is not None else RAGPrefetcher(self.get_rag_context)
+        )
+
+    async def load(
+        self,
+        conversation_id: str,
+        user_id: str,
+        query: str,
+        include_rag: bool = True,
+        history_limit: Optional[int] = None,
+        timeout: Optional[float] = None,
+        rag_timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Load history and RAG context concurrently.
+
+        Args:
+            conversation_id: Conversation ID
+            user_id: User ID (scopes the document search)
+            query: Message content to search documents for
+            include_rag: Whether to search documents
+            history_limit: Max history messages (default: MEMORY_HISTORY_LIMIT)
+            timeout: Time budget for history in seconds; parts still running
+                are cancelled and returned empty (default: MEMORY_LOAD_TIMEOUT_MS)
+            rag_timeout: Time budget for RAG in seconds, measured from the same
+                start (default: MEMORY_LOAD_TIMEOUT_MS)
+
+        Returns:
+            Dict with conversation_history, rag_context, history_count,
+            rag_count and, if anything failed or timed out, memory_error
+        """
+        history_task = asyncio.create_task(
+            self.get_history(conversation_id, history_limit or self.history_limit)
+        )
+        if include_rag:
+            rag = self._get_message_rag_context(conversation_id, user_id, query)
+        else:
+            self.prefetcher.discard(conversation_id, user_id)
+            rag = _empty()
+        rag_task = asyncio.create_task(rag)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        pending = set()
+        for task, budget in (
+            (history_task, self.load_timeout if timeout is None else timeout),
+            (rag_task, self.load_timeout if rag_timeout is None else rag_timeout),
+        ):
+            _, late = await asyncio.wait({task}, timeout=max(0.0, start + budget - loop.time()))
+            pending |= late
+        for task in pending:
+            task.cancel()
+
+        context: Dict[str, Any] = {}
+        errors = []
+        for key, task in (("conversation_history", history_task), ("rag_context", rag_task)):
+            if task in pending:
+                errors.append(f"{key}: timeout")
+                context[key] = []
+            elif task.exception() is not None:
+                logger.warning(f"Failed to load {key} for {conversation_id}: {task.exception()}")
+                errors.append(f"{key}: {task.exception()}")
+                context[key] = []
+            else:
+                context[key] = task.result()
+
+        context["history_count"] = len(context["conversation_history"])
+        context["rag_count"] = len(context["rag_context"])
+        if errors:
+            context["memory_error"] = "; ".join(errors)
+        return context
+
+    async def get_history(self, conversation_id: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Recent messages, oldest first: Redis window, else database.
+
+        Args:
+            conversation_id: Conversation ID
+            limit: Max messages
+
+        Returns:
+            List of {"id", "role", "content", "tokens_used", "created_at"} dicts
+        """
+        cache = self._get_cache()
+        if cache is not None:
+            cached = await cache.get_conversation_messages(str(conversation_id))
+            if cached is not None:
+                return cached[-limit:]
+
+        from src.repositories.message import MessageRepository
+
+        write_seq = self._write_seq
+        async with self._new_session() as session:
+            messages = await MessageRepository(session).get_conversation_messages_desc(
+                UUID(str(conversation_id)), limit=max(limit, self.history_limit)
+            )
+        window = [self.message_to_dict(message) for message in messages]
+
+        if cache is not None and write_seq == self._write_seq:
+            await cache.set_conversation_messages(str(conversation_id), window)
+        return window[-limit:]
+
+    async def get_rag_context(self, query: str, user_id: str) -> List[Dict[str, Any]]:
+        """
+        Document chunks similar to ``query`` from the user's documents.
+
+        Args:
+            query: Search query (message content)
+            user_id: User ID for access control
+
+        Returns:
+            List of {"document_id", "chunk_index", "chunk_text", "similarity"} dicts
+        """
+        if not query or not self._rag_available:
+            return []
+
+        embedding_service = self._get_embedding_service()
+        if embedding_service is None:
+            return []
+
+        query_embedding = await embedding_service.embed_text(query)
+
+        from src.repositories.embedding import EmbeddingRepository
+
+        async with self._new_session() as session:
+            results = await EmbeddingRepository(session).search_similar(
+                query_embedding=query_embedding,
+                user_id=user_id,
+                limit=self.rag_limit,
+                threshold=self.rag_threshold,
+            )
+        if not results:
+            return []
+
+        similarities = embedding_service.batch_cosine_similarity(
+            query_embedding=query_embedding,
+            embeddings=[result.embedding for result in results],
+        )
+        return [
+            {
+                "document_id": str(result.document_id),
+                "chunk_index": result.chunk_index,
+                "chunk_text": result.chunk_text,
+                "similarity": float(similarity),
+            }
+            for result, similarity in zip(results, similarities)
+        ]
+
+    async def _get_message_rag_context(
+        self, conversation_id: str, user_id: str, query: str
+    ) -> List[Dict[str, Any]]:
+        """RAG context for a sent message: prefetched for a similar draft, else searched."""
+        prefetched = await self.prefetcher.take(conversation_id, user_id, query)
+        if prefetched is not None:
+            return prefetched
+        return await self.get_rag_context(query, user_id)
+
+    async def record_message(self, conversation_id: Any, message: Any) -> None:
+        """
+        Append a newly stored message to the cached history window.
+
+        Does nothing if the window is not cached (the next read loads it
+        from the database, including this message).
+
+        Args:
+            conversation_id: Conversation ID
+            message: MessageORM or message dict
+        """
+        self._write_seq += 1
+        cache = self._get_cache()
+        if cache is None:
+            return
+
+        key = str(conversation_id)
+        try:
+            cached = await cache.get_conversation_messages(key)
+            if cached is None:
+                return
+            if not isinstance(message, dict):
+                message = self.message_to_dict(message)
+            cached.append(message)
+            await cache.set_conversation_messages(key, cached[-self.history_limit:])
+        except Exception as e:
+            logger.warning(f"Failed to update cached history for {key}: {e}")
+            await self.invalidate(conversation_id)
+
+    async def invalidate(self, conversation_id: Any) -> None:
+        """Drop the cached history window (after messages are edited or deleted)."""
+        self._write_seq += 1
+        cache = self._get_cache()
+        if cache is not None:
+            await cache.delete_conversation_messages(str(conversation_id))
+
+    @staticmethod
+    def message_to_dict(message: Any) -> Dict[str, Any]:
+        """Compact history entry for a MessageORM."""
+        return {
+            "id": str(message.id),
+            "role": message.role,
+            "content": message.content,
+            "tokens_used": message.tokens_used,
+            "created_at": message.created_at.isoformat() if message.created_at else None,
+        }
+
+    def _get_cache(self):
+        """Active RedisCache, or None."""
+        cache = self._redis_cache
+        if cache is None:
+            from src.infrastructure.redis_cache import get_redis_cache
+
+            cache = get_redis_cache()
+        if cache is None or not cache._initialized:
+            return None
+        return cache
+
+    def _new_session(self):
+        """New database session (history and RAG each get their own)."""
+        if self._session_factory is None:
+            from src.db.config import AsyncSessionLocal
+
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory()
+
+    def _get_embedding_service(self):
+        """EmbeddingService, created on first use; None if not configured."""
+        if self._embedding_service is None:
+            from src.services.embedding_service import EmbeddingService
+
+            try:
+                self._embedding_service = EmbeddingService()
+            except ValueError as e:
+                logger.warning(f"RAG context disabled: {e}")
+                self._rag_available = False
+                return None
+        return self._embedding_service
+
+
+async def _empty() -> List[Dict[str, Any]]:
+    return []
+
+
+# Global singleton instance
+_memory_service: Optional[MemoryService] = None
+
+
+def get_memory_service() -> MemoryService:
+    """Get global memory service instance."""
+    global _memory_service
+    if _memory_service is None:
+        _memory_service = MemoryService()
+    return _memory_service
+
+
+def set_memory_service(service: MemoryService) -> None:
+    """Set global memory service instance."""
+    global _memory_service
+    _memory_service = service
@@ -0,0 +1,432 @@
+"""
+Write-behind persistence for chat messages.
+
+Saving a message on the chat hot path used to cost a commit and a refresh
+before the model was even called. The persister gives a message its id and
+created_at in the process, hands it back immediately, and writes it from a
+background flusher that groups the messages of all conversations into one
+multi-row INSERT per batch. Tool call records and the conversations'
+running token totals are written in the same transaction.
+
+Durability is configurable (MESSAGE_DURABILITY):
+- async: return at once; the message is written within
+  MESSAGE_FLUSH_INTERVAL_MS and is lost if the process dies before that.
+  Pending messages are flushed on shutdown.
+- batch: wait until the batch containing the message is committed (group
+  commit: concurrent writers share one transaction).
+- sync: write the message in its own transaction before returning.
+
+A message saved with async durability may be missing from database reads
+for up to one flush interval; the Redis history window used by the memory
+service is updated at once. Work that must follow the database write (e.g.
+invalidating cached HTTP responses) registers a commit listener, called
+with the messages of each committed batch.
+
+Writes that fail while the database is unavailable (connection errors,
+timeouts) are re-queued and retried with exponential backoff; only writes
+that cannot succeed (constraint violations such as a deleted conversation,
+invalid data) are dropped. Callers waiting for a write (batch or sync
+durability) get the error instead.
+
+Example:
+    >>> persister = get_message_persister()
+    >>> message = await persister.save(conversation_id, "user", "Hello")
+    >>> message.id  # allocated in the process, usable right away
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError, ProgrammingError
+
+from src.infrastructure.cache_metrics import (
+    message_persist_batch_size,
+    message_persist_pending,
+    message_persist_writes_total,
+)
+from src.models import MessageORM
+from src.repositories.message import MessageRepository
+from src.repositories.tool_call import ToolCallRepository
+from src.utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+CommitListener = Callable[[List[MessageORM]], Awaitable[None]]
+
+
+@dataclass
+class PendingWrite:
+    """A message (and its tool calls) waiting to be written."""
+    message: MessageORM
+    tool_calls: Optional[List[dict]] = None
+    tool_results: Optional[List[dict]] = None
+    future: Optional[asyncio.Future] = None
+
+    def to_row(self) -> Dict[str, Any]:
+        """Column values for the messages INSERT."""
+        message = self.message
+        return {
+            "id": message.id,
+            "conversation_id": message.conversation_id,
+            "role": message.role,
+            "content": message.content,
+            "tool_calls": message.tool_calls,
+            "tool_results": message.tool_results,
+            "tokens_used": message.tokens_used,
+            "meta": message.meta,
+            "created_at": message.created_at,
+        }
+
+
+class MessagePersister:
+    """
+    Batching write-behind flusher for chat messages.
+
+    Configuration via environment variables:
+    - MESSAGE_DURABILITY: async, batch or sync (default: async)
+    - MESSAGE_FLUSH_INTERVAL_MS: Max time a message waits for its batch (default: 50)
+    - MESSAGE_FLUSH_BATCH_SIZE: Max messages per INSERT (default: 200)
+    - MESSAGE_MAX_PENDING: Queued messages above which callers wait for the
+      flush, as with batch durability; also bounds re-queued writes
+      (default: 5000)
+    - MESSAGE_RETRY_DELAY_MS: First delay before retrying after a transient
+      failure, doubled per failed attempt (default: 100)
+    - MESSAGE_RETRY_MAX_DELAY_MS: Longest retry delay (default: 5000)
+    """
+
+    DURABILITY_MODES = ("async", "batch", "sync")
+
+    def __init__(
+        self,
+        durability: Optional[str] = None,
+        flush_interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        session_factory: Optional[Callable[[], Any]] = None,
+        retry_delay: Optional[float] = None,
+        max_retry_delay: Optional[float] = None,
+    ):
+        """
+        Initialize message persister.
+
+        Args:
+            durability: Default durability mode
+            flush_interval: Seconds a message may wait for its batch
+            batch_size: Max messages per INSERT
+            max_pending: Queue size above which callers wait for the flush
+            session_factory: Callable returning a new AsyncSession
+                (default: AsyncSessionLocal)
+            retry_delay: First retry delay after a transient failure (seconds)
+            max_retry_delay: Longest retry delay (seconds)
+        """
+        self.durability = (durability or os.getenv("MESSAGE_DURABILITY", "async")).lower()
+        if self.durability not in self.DURABILITY_MODES:
+            raise ValueError(f"Invalid MESSAGE_DURABILITY: {self.durability}")
+        self.flush_interval = (
+            float(os.getenv("MESSAGE_FLUSH_INTERVAL_MS", "50")) / 1000.0
+            if flush_interval is None else flush_interval
+        )
+        self.batch_size = int(batch_size or os.getenv("MESSAGE_FLUSH_BATCH_SIZE", "200"))
+        self.max_pending = int(max_pending or os.getenv("MESSAGE_MAX_PENDING", "5000"))
+        self._session_factory = session_factory
+        self.retry_delay = (
+            float(os.getenv("MESSAGE_RETRY_DELAY_MS", "100")) / 1000.0
+            if retry_delay is None else retry_delay
+        )
+        self.max_retry_delay = (
+            float(os.getenv("MESSAGE_RETRY_MAX_DELAY_MS", "5000")) / 1000.0
+            if max_retry_delay is None else max_retry_delay
+        )
+
+        self._pending: List[PendingWrite] = []
+        self._commit_listeners: List[CommitListener] = []
+        self._backoff = 0.0
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def pending_count(self) -> int:
+        """Messages queued and not yet being written."""
+        return len(self._pending)
+
+    def add_commit_listener(self, listener: CommitListener) -> None:
+        """
+        Call ``listener`` with the messages of every committed batch.
+
+        Args:
+            listener: Async callable; errors are logged, never raised
+        """
+        self._commit_listeners.append(listener)
+
+    async def save(
+        self,
+        conversation_id: UUID,
+        role: str,
+        content: str,
+        tool_calls: Optional[List[dict]] = None,
+        tool_results: Optional[List[dict]] = None,
+        tokens_used: Optional[int] = None,
+        metadata: Optional[dict] = None,
+        message_id: Optional[UUID] = None,
+        durability: Optional[str] = None,
+    ) -> MessageORM:
+        """
+        Save a message under the durability mode.
+
+        Args:
+            conversation_id: Conversation ID
+            role: Message role
+            content: Message content
+            tool_calls: Tool calls made by the assistant
+            tool_results: Results of the tool calls
+            tokens_used: Token count of the message (default: counted from content)
+            metadata: Message metadata
+            message_id: Client-allocated ID (default: new UUID)
+            durability: Override of the default durability mode
+
+        Returns:
+            The message, with id and created_at set (not attached to a session)
+
+        Raises:
+            Exception: With batch or sync durability, if the write failed
+        """
+        message = MessageORM(
+            id=message_id or uuid4(),
+            conversation_id=conversation_id,
+            role=role,
+            content=content,
+            tool_calls=tool_calls,
+            tool_results=tool_results,
+            tokens_used=count_tokens(content) if tokens_used is None else tokens_used,
+            meta=metadata or {},
+            created_at=datetime.utcnow(),
+        )
+        write = PendingWrite(message, tool_calls, tool_results)
+
+        mode = durability or self.durability
+        if mode == "sync":
+            # A waiting caller gets the error; nothing is re-queued
+            write.future = asyncio.get_running_loop().create_future()
+            await self._write_batch([write])
+            await write.future
+            return message
+
+        wait = mode == "batch" or len(self._pending) >= self.max_pending
+        if wait:
+            write.future = asyncio.get_running_loop().create_future()
+        self._pending.append(write)
+        message_persist_pending.set(len(self._pending))
+        self._ensure_worker()
+        self._wakeup.set()
+
+        if wait:
+            await write.future
+        return message
+
+    async def flush(self) -> bool:
+        """
+        Write all queued messages now (waits for a batch in progress).
+
+        Returns:
+            False if writes failed transiently and were re-queued
+        """
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                message_persist_pending.set(len(self._pending))
+                retry = await self._write_batch(batch)
+                if retry:
+                    self._requeue(retry)
+                    return False
+            return True
+
+    async def close(self) -> None:
+        """Flush queued messages and stop the flusher (on shutdown)."""
+        if not await self.flush():
+            logger.error(
+                f"Database unavailable at shutdown: {len(self._pending)} queued "
+                f"messages were not written"
+            )
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        """Flush loop: wait for messages, let a batch build up, write it."""
+        while True:
+            await self._wakeup.wait()
+            if self._backoff:
+                await asyncio.sleep(self._backoff)
+            elif len(self._pending) < self.batch_size:
+                await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                written = await self.flush()
+            except Exception as e:
+                logger.error(f"Message flush failed: {e}", exc_info=True)
+                written = True
+            if written:
+                self._backoff = 0.0
+            else:
+                self._backoff = min(self.max_retry_delay, max(self.retry_delay, self._backoff * 2))
+                self._wakeup.set()
+
+    def _requeue(self, writes: List[PendingWrite]) -> None:
+        """
+        Put transiently failed writes back at the head of the queue.
+
+        The queue stays within max_pending: beyond it, the oldest writes are
+        dropped (the database has been unavailable for that long).
+        """
+        self._pending[:0] = writes
+        message_persist_writes_total.labels(outcome="retried").inc(len(writes))
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            dropped = self._pending[:overflow]
+            del self._pending[:overflow]
+            message_persist_writes_total.labels(outcome="dropped").inc(overflow)
+            logger.error(
+                f"Message queue full while the database is unavailable: "
+                f"dropped {overflow} messages"
+            )
+            error = RuntimeError("Message dropped: write queue full")
+            for write in dropped:
+                _resolve(write, error)
+        message_persist_pending.set(len(self._pending))
+
+    async def _write_batch(self, batch: List[PendingWrite]) -> List[PendingWrite]:
+        """
+        Write a batch in one transaction.
+
+        If the batch fails on a bad message (e.g. its conversation was
+        deleted), its messages are retried one by one so the bad one does not
+        lose the rest. Transient failures are not split.
+
+        Returns:
+            Writes that failed transiently and nobody waits for (to re-queue)
+        """
+        try:
+            await self._insert(batch)
+        except Exception as e:
+            if _is_transient(e):
+                logger.warning(f"Message batch of {len(batch)} failed, will retry: {e}")
+                retry = []
+                for write in batch:
+                    if write.future is None:
+                        retry.append(write)
+                    else:
+                        message_persist_writes_total.labels(outcome="failed").inc()
+                        _resolve(write, e)
+                return retry
+            if len(batch) == 1:
+                message_persist_writes_total.labels(outcome="failed").inc()
+                logger.error(f"Failed to persist message {batch[0].message.id}: {e}")
+                _resolve(batch[0], e)
+                return []
+            logger.warning(f"Message batch of {len(batch)} failed, retrying one by one: {e}")
+            retry = []
+            for write in batch:
+                retry.extend(await self._write_batch([write]))
+            return retry
+
+        message_persist_batch_size.observe(len(batch))
+        message_persist_writes_total.labels(outcome="written").inc(len(batch))
+        for write in batch:
+            _resolve(write)
+        await self._notify_commit([write.message for write in batch])
+        return []
+
+    async def _notify_commit(self, messages: List[MessageORM]) -> None:
+        for listener in self._commit_listeners:
+            try:
+                await listener(messages)
+            except Exception as e:
+                logger.warning(f"Message commit listener failed: {e}")
+
+    async def _insert(self, batch: List[PendingWrite]) -> None:
+        async with self._new_session() as session:
+            try:
+                await session.execute(insert(MessageORM), [write.to_row() for write in batch])
+                records = []
+                for write in batch:
+                    if write.tool_calls and write.tool_results:
+                        records.extend(ToolCallRepository.build_records(
+                            write.message.id,
+                            write.message.conversation_id,
+                            write.tool_calls,
+                            write.tool_results,
+                        ))
+                if records:
+                    session.add_all(records)
+
+                deltas: Dict[UUID, int] = {}
+                for write in batch:
+                    conversation_id = write.message.conversation_id
+                    deltas[conversation_id] = (
+                        deltas.get(conversation_id, 0) + (write.message.tokens_used or 0)
+                    )
+                await session.execute(
+                    MessageRepository.total_tokens_update(),
+                    [{"conv_id": conv_id, "delta": delta} for conv_id, delta in deltas.items()],
+                )
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+    def _new_session(self):
+        if self._session_factory is None:
+            from src.db.config import AsyncSessionLocal
+
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory()
+
+
+def _is_transient(error: BaseException) -> bool:
+    """Whether a failed write may succeed later (database unavailable, timeout)."""
+    if isinstance(error, (IntegrityError, DataError, ProgrammingError)):
+        return False
+    return isinstance(error, (DBAPIError, OSError, asyncio.TimeoutError))
+
+
+def _resolve(write: PendingWrite, error: Optional[BaseException] = None) -> None:
+    """Complete the future of a caller waiting for the write, if any."""
+    if write.future is None or write.future.done():
+        return
+    if error is None:
+        write.future.set_result(None)
+    else:
+        write.future.set_exception(error)
+
+
+# Global singleton instance (one flusher batches the writes of all requests)
+_message_persister: Optional[MessagePersister] = None
+
+
+def get_message_persister() -> MessagePersister:
+    """Get global message persister instance."""
+    global _message_persister
+    if _message_persister is None:
+        _message_persister = MessagePersister()
+    return _message_persister
+
+
+async def close_message_persister() -> None:
+    """Flush and reset the global message persister (on shutdown)."""
+    global _message_persister
+    if _message_persister is not None:
+        await _message_persister.close()
+        _message_persister = None
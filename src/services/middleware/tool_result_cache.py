@@ -0,0 +1,283 @@
+"""Tool result cache middleware for deterministic agent tools."""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.infrastructure.cache_metrics import tool_result_cache_lookups_total
+from src.services.middleware import AgentMiddleware
+from src.services.tool_executor import mark_cache_hit, parse_tool_limits
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class ToolResultCacheMiddleware(AgentMiddleware):
+    """
+    Caches tool results by tool name and normalized arguments.
+
+    The agent often repeats a search_documents or query_database call within a
+    conversation, and users ask for the same public web searches. Results of
+    the tools listed in TOOL_CACHE_TTLS are cached:
+
+    - Key: tool name + SHA-256 of the arguments (sorted keys; whitespace
+      collapsed only for free-text tools and lowercased for case-insensitive
+      ones, so SQL string literals are hashed as written), scoped to the user
+      for private tools and shared for public ones (web_search).
+    - Storage: in-process LRU, plus Redis (``tool:{name}:{scope}:{digest}``)
+      so other workers reuse results. Redis is bounded by a short timeout.
+    - Concurrent identical calls share one execution.
+    - Error outputs are not cached.
+
+    Hits are flagged on the tool execution (``cache_hit`` in the tool_calls
+    table) and counted in Prometheus.
+
+    Configuration via environment variables:
+    - TOOL_CACHE_ENABLED: Enable the cache (default: true)
+    - TOOL_CACHE_TTLS: Seconds per cached tool
+      (default: "web_search=900,search_documents=120,query_database=60")
+    - TOOL_CACHE_PUBLIC_TOOLS: Tools shared across users (default: "web_search")
+    - TOOL_CACHE_MAX_ENTRIES: Max results kept in process memory (default: 2000)
+    - TOOL_CACHE_REDIS: Share results through Redis (default: true)
+    - TOOL_CACHE_REDIS_TIMEOUT_MS: Redis operation timeout (default: 20)
+
+    Usage:
+        agent = create_agent(
+            llm=llm,
+            tools=tools,
+            middleware=[CostTrackingMiddleware(), get_tool_result_cache()],
+        )
+    """
+
+    KEY_PREFIX = "tool:"
+    # Tools whose string arguments are free text (whitespace is not significant)
+    FREE_TEXT_TOOLS = frozenset({"web_search", "search_documents"})
+    CASE_INSENSITIVE_TOOLS = frozenset({"web_search"})
+    # Tools report failures as text; these outputs are never cached
+    ERROR_PREFIXES = ("Error", "SQL query rejected", "Web search failed")
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, float]] = None,
+        public_tools: Optional[set] = None,
+        max_entries: Optional[int] = None,
+        redis_cache: Any = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize tool result cache.
+
+        Args:
+            ttls: Seconds per cached tool; other tools are not cached
+            public_tools: Tools whose results are shared across users
+            max_entries: Max results kept in process memory
+            redis_cache: RedisCache to use (default: global instance)
+            clock: Monotonic clock (injectable for tests)
+        """
+        super().__init__("tool_result_cache")
+        self.enabled = os.getenv("TOOL_CACHE_ENABLED", "true").lower() == "true"
+        self.ttls = ttls if ttls is not None else parse_tool_limits(
+            os.getenv("TOOL_CACHE_TTLS", "web_search=900,search_documents=120,query_database=60")
+        )
+        if public_tools is None:
+            public_tools = {
+                name.strip()
+                for name in os.getenv("TOOL_CACHE_PUBLIC_TOOLS", "web_search").split(",")
+                if name.strip()
+            }
+        self.public_tools = set(public_tools)
+        self.max_entries = int(max_entries or os.getenv("TOOL_CACHE_MAX_ENTRIES", "2000"))
+        self.redis_enabled = os.getenv("TOOL_CACHE_REDIS", "true").lower() == "true"
+        self.redis_timeout = float(os.getenv("TOOL_CACHE_REDIS_TIMEOUT_MS", "20")) / 1000.0
+        self._redis_cache = redis_cache
+        self._clock = clock
+
+        # key -> (expires_at, result)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def cache_key(
+        self, tool_name: str, tool_args: Dict[str, Any], state: Dict[str, Any]
+    ) -> Optional[str]:
+        """
+        Cache key for a tool call.
+
+        Args:
+            tool_name: Tool name
+            tool_args: Tool arguments
+            state: Agent state (user_id scopes private tools)
+
+        Returns:
+            Key, or None if the call is not cacheable
+        """
+        if not self.enabled or tool_name not in self.ttls:
+            return None
+
+        if tool_name in self.public_tools:
+            scope = "public"
+        elif state.get("user_id"):
+            scope = f"user:{state['user_id']}"
+        else:
+            return None
+
+        if tool_name in self.FREE_TEXT_TOOLS:
+            tool_args = _normalize(tool_args, tool_name in self.CASE_INSENSITIVE_TOOLS)
+        payload = json.dumps(tool_args, sort_keys=True, separators=(",", ":"), default=str)
+        digest = hashlib.sha256(payload.encode()).hexdigest()[:32]
+        return f"{self.KEY_PREFIX}{tool_name}:{scope}:{digest}"
+
+    async def wrap_tool_call(
+        self,
+        tool_execute: Callable,
+        tool_name: str,
+        tool_args: Dict[str, Any],
+        state: Dict[str, Any],
+    ) -> tuple[Any, Optional[str]]:
+        """Serve the tool result from cache, or execute the tool and cache it."""
+        key = self.cache_key(tool_name, tool_args, state)
+        if key is None:
+            return await super().wrap_tool_call(tool_execute, tool_name, tool_args, state)
+
+        found, result = self._get_local(key)
+        if found:
+            tool_result_cache_lookups_total.labels(tool=tool_name, result="hit").inc()
+            mark_cache_hit()
+            return result, None
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            result, error = await asyncio.shield(inflight)
+            if error is None:
+                tool_result_cache_lookups_total.labels(tool=tool_name, result="hit").inc()
+                mark_cache_hit()
+            return result, error
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result, error = await self._load(key, tool_execute, tool_name, tool_args, state)
+            future.set_result((result, error))
+            return result, error
+        except BaseException as e:
+            future.set_result((None, str(e) or type(e).__name__))
+            raise
+        finally:
+            del self._inflight[key]
+
+    def clear(self) -> None:
+        """Forget all results in process memory."""
+        self._entries.clear()
+
+    async def _load(
+        self,
+        key: str,
+        tool_execute: Callable,
+        tool_name: str,
+        tool_args: Dict[str, Any],
+        state: Dict[str, Any],
+    ) -> tuple[Any, Optional[str]]:
+        """Redis lookup, else execute the tool and store a successful result."""
+        ttl = self.ttls[tool_name]
+        cache = self._get_redis()
+        if cache is not None:
+            try:
+                entry = await asyncio.wait_for(cache.get(key), timeout=self.redis_timeout)
+            except Exception as e:
+                self.logger.debug(f"Tool cache Redis lookup failed: {e}")
+                entry = None
+            if entry is not None and "result" in entry:
+                tool_result_cache_lookups_total.labels(tool=tool_name, result="redis_hit").inc()
+                self._set_local(key, entry["result"], ttl)
+                mark_cache_hit()
+                return entry["result"], None
+
+        tool_result_cache_lookups_total.labels(tool=tool_name, result="miss").inc()
+        result, error = await super().wrap_tool_call(tool_execute, tool_name, tool_args, state)
+        if error is not None or not self._is_cacheable(result):
+            return result, error
+
+        self._set_local(key, result, ttl)
+        if cache is not None:
+            try:
+                await asyncio.wait_for(
+                    cache.set(key, {"result": result}, ttl=max(1, int(ttl))),
+                    timeout=self.redis_timeout,
+                )
+            except Exception as e:
+                self.logger.debug(f"Tool cache Redis store failed: {e}")
+        return result, None
+
+    def _is_cacheable(self, result: Any) -> bool:
+        if result is None:
+            return False
+        if isinstance(result, str):
+            return not result.startswith(self.ERROR_PREFIXES)
+        return True
+
+    def _get_local(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, result = entry
+        if self._clock() >= expires_at:
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, result
+
+    def _set_local(self, key: str, result: Any, ttl: float) -> None:
+        """Store a result, evicting the least recently used beyond max_entries."""
+        self._entries[key] = (self._clock() + ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_redis(self):
+        """Active RedisCache, or None if the Redis tier is disabled or unavailable."""
+        if not self.redis_enabled:
+            return None
+        cache = self._redis_cache
+        if cache is None:
+            from src.infrastructure.redis_cache import get_redis_cache
+
+            cache = get_redis_cache()
+        if cache is None or not cache._initialized:
+            return None
+        return cache
+
+
+def _normalize(value: Any, lowercase: bool) -> Any:
+    """Arguments with strings stripped and whitespace collapsed (and lowercased)."""
+    if isinstance(value, str):
+        value = _WHITESPACE.sub(" ", value).strip()
+        return value.lower() if lowercase else value
+    if isinstance(value, dict):
+        return {key: _normalize(item, lowercase) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item, lowercase) for item in value]
+    return value
+
+
+# Global singleton instance (results are shared by all agents in the process)
+_tool_result_cache: Optional[ToolResultCacheMiddleware] = None
+
+
+def get_tool_result_cache() -> ToolResultCacheMiddleware:
+    """Get global tool result cache middleware instance."""
+    global _tool_result_cache
+    if _tool_result_cache is None:
+        _tool_result_cache = ToolResultCacheMiddleware()
+    return _tool_result_cache
+
+
+def reset_tool_result_cache() -> None:
+    """Reset global tool result cache (for tests)."""
+    global _tool_result_cache
+    _tool_result_cache = None
@@ -0,0 +1,139 @@
+"""
+Claude 稳定前缀提示布局
+
+Prompt 缓存只对与之前请求完全相同的前缀生效。本模块按稳定性从高到低
+确定性地排列请求内容, 使相邻请求共享尽可能长的前缀:
+
+1. 静态系统提示 (进程内不变)
+2. 工具定义 (按名称排序, 键顺序规范化)
+3. 对话摘要 (仅在后台摘要更新时变化)
+4. 较早的对话轮次 (轮与轮之间只在末尾追加)
+5. 本轮的易变内容 (RAG 片段等) 和用户消息 — 不缓存
+
+Anthropic 按 tools → system → messages 的顺序计算前缀, 所以工具定义与
+静态系统提示共用第一个缓存断点。断点 (每个请求最多 4 个) 放在:
+- 静态系统提示末尾, TTL 1 小时 (覆盖工具定义)
+- 摘要末尾
+- 较早轮次的最后一条消息
+
+TTL 较长的断点必须位于较短的之前, 上述顺序满足这一要求。
+
+Example:
+    >>> layout = build_stable_layout(system_prompt, tools, summary, history, "Hi")
+    >>> client.messages.create(model=..., max_tokens=..., **layout.to_request())
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Anthropic 每个请求允许的缓存断点数量
+MAX_CACHE_BREAKPOINTS = 4
+
+
+@dataclass
+class PromptLayout:
+    """按稳定性排列的 Claude 请求内容"""
+    system: List[Dict[str, Any]] = field(default_factory=list)
+    tools: List[Dict[str, Any]] = field(default_factory=list)
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    breakpoints: List[str] = field(default_factory=list)
+
+    def to_request(self) -> Dict[str, Any]:
+        """Claude Messages API 请求参数 (system, messages, tools)"""
+        request: Dict[str, Any] = {"system": self.system, "messages": self.messages}
+        if self.tools:
+            request["tools"] = self.tools
+        return request
+
+
+def cache_control(ttl: Optional[str] = None) -> Dict[str, str]:
+    """缓存断点标记 (ttl: None 为默认 5 分钟, 或 "1h")"""
+    control = {"type": "ephemeral"}
+    if ttl:
+        control["ttl"] = ttl
+    return control
+
+
+def canonical_tools(tools: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    工具定义的确定性形式
+
+    按名称排序并统一字典键顺序, 使同一组工具总是序列化为相同的字节。
+
+    Args:
+        tools: Claude 工具定义 ({"name", "description", "input_schema"})
+
+    Returns:
+        规范化后的工具定义列表
+    """
+    return [
+        json.loads(json.dumps(tool, sort_keys=True))
+        for tool in sorted(tools or [], key=lambda tool: tool.get("name", ""))
+    ]
+
+
+def build_stable_layout(
+    static_system: str,
+    tools: Optional[List[Dict[str, Any]]] = None,
+    summary: Optional[str] = None,
+    history: Optional[List[Dict[str, Any]]] = None,
+    user_message: Optional[str] = None,
+    volatile_context: Optional[str] = None,
+    static_ttl: Optional[str] = "1h",
+) -> PromptLayout:
+    """
+    构建稳定前缀布局
+
+    Args:
+        static_system: 静态系统提示
+        tools: 工具定义
+        summary: 对话摘要
+        history: 较早的对话轮次 ({"role": "user" | "assistant", "content": str})
+        user_message: 本轮用户消息
+        volatile_context: 本轮易变内容 (RAG 片段等), 放在最后一个断点之后
+        static_ttl: 静态系统提示断点的 TTL
+
+    Returns:
+        PromptLayout
+    """
+    layout = PromptLayout(tools=canonical_tools(tools))
+
+    if static_system:
+        layout.system.append({
+            "type": "text",
+            "text": static_system,
+            "cache_control": cache_control(static_ttl),
+        })
+        layout.breakpoints.append("static_system")
+
+    if summary:
+        layout.system.append({
+            "type": "text",
+            "text": f"Summary of the earlier conversation:\n{summary}",
+            "cache_control": cache_control(),
+        })
+        layout.breakpoints.append("summary")
+
+    for message in history or []:
+        role = message.get("role")
+        if role not in ("user", "assistant") or not message.get("content"):
+            continue
+        layout.messages.append({
+            "role": role,
+            "content": [{"type": "text", "text": message["content"]}],
+        })
+    if layout.messages:
+        layout.messages[-1]["content"][-1]["cache_control"] = cache_control()
+        layout.breakpoints.append("history")
+
+    # 易变内容和用户消息位于所有断点之后
+    turn: List[Dict[str, Any]] = []
+    if volatile_context:
+        turn.append({"type": "text", "text": volatile_context})
+    if user_message:
+        turn.append({"type": "text", "text": user_message})
+    if turn:
+        layout.messages.append({"role": "user", "content": turn})
+
+    return layout
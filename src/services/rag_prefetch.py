@@ -0,0 +1,255 @@
+"""
+Speculative RAG retrieval for messages that are still being typed.
+
+Embedding a query and searching the user's document chunks costs ~150ms and
+normally starts only once the message is sent. Clients can instead submit
+drafts while the user types (WebSocket ``{"type": "draft"}`` or
+``POST /api/v1/conversations/{id}/prefetch``):
+
+- Drafts are debounced per (conversation, user): a new draft during the
+  debounce window replaces the pending one, and a draft similar to the one
+  already searched is not searched again.
+- The search runs in the background and its results are kept in a single
+  slot per (conversation, user) for a short TTL.
+- When the message is sent, the slot is taken (and cleared). Its results are
+  used if the draft is similar enough to the final text (word-set Jaccard
+  similarity); a search still in flight for a similar draft is awaited
+  instead of starting a new one. Otherwise the caller searches as usual.
+
+Example:
+    >>> prefetcher = RAGPrefetcher(memory.get_rag_context)
+    >>> prefetcher.submit(conversation_id, user_id, "how do refunds wo")
+    >>> results = await prefetcher.take(conversation_id, user_id, "How do refunds work?")
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from src.infrastructure.cache_metrics import (
+    rag_prefetch_lookups_total,
+    rag_prefetch_searches_total,
+)
+
+logger = logging.getLogger(__name__)
+
+SearchFunc = Callable[[str, str], Awaitable[List[Dict[str, Any]]]]
+
+_WORD = re.compile(r"\w+")
+
+
+def draft_terms(text: str) -> FrozenSet[str]:
+    """Lowercased word set of a text, used for draft similarity."""
+    return frozenset(_WORD.findall(text.lower()))
+
+
+def draft_similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """
+    Jaccard similarity of two word sets.
+
+    Args:
+        a: Word set of the draft
+        b: Word set of the final message
+
+    Returns:
+        Similarity between 0.0 and 1.0 (1.0 if both are empty)
+    """
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class PrefetchSlot:
+    """Search for the latest draft of one (conversation, user)."""
+    draft: str
+    terms: FrozenSet[str]
+    created_at: float
+    results: Optional[List[Dict[str, Any]]] = None
+    searching: bool = False
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+
+class RAGPrefetcher:
+    """
+    Debounced background RAG searches for message drafts.
+
+    Configuration via environment variables:
+    - RAG_PREFETCH_ENABLED: Accept drafts (default: true)
+    - RAG_PREFETCH_DEBOUNCE_MS: Quiet time before a draft is searched (default: 300)
+    - RAG_PREFETCH_TTL: Seconds prefetched results stay usable (default: 30)
+    - RAG_PREFETCH_MIN_SIMILARITY: Min draft/message similarity for reuse (default: 0.7)
+    - RAG_PREFETCH_MIN_CHARS: Shorter drafts are ignored (default: 12)
+    - RAG_PREFETCH_MAX_SLOTS: Max (conversation, user) slots kept (default: 1000)
+    """
+
+    def __init__(
+        self,
+        search: SearchFunc,
+        debounce: Optional[float] = None,
+        ttl: Optional[float] = None,
+        min_similarity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize prefetcher.
+
+        Args:
+            search: Coroutine function (query, user_id) -> RAG results
+            debounce: Seconds a draft must stay unchanged before it is searched
+            ttl: Seconds prefetched results stay usable
+            min_similarity: Min draft/message similarity for reuse
+            clock: Monotonic clock (injectable for tests)
+        """
+        self._search = search
+        self.enabled = os.getenv("RAG_PREFETCH_ENABLED", "true").lower() == "true"
+        self.debounce = (
+            float(os.getenv("RAG_PREFETCH_DEBOUNCE_MS", "300")) / 1000.0
+            if debounce is None else debounce
+        )
+        self.ttl = float(os.getenv("RAG_PREFETCH_TTL", "30")) if ttl is None else ttl
+        self.min_similarity = (
+            float(os.getenv("RAG_PREFETCH_MIN_SIMILARITY", "0.7"))
+            if min_similarity is None else min_similarity
+        )
+        self.min_chars = int(os.getenv("RAG_PREFETCH_MIN_CHARS", "12"))
+        self.max_slots = int(os.getenv("RAG_PREFETCH_MAX_SLOTS", "1000"))
+        self._clock = clock
+        self._slots: "OrderedDict[Tuple[str, str], PrefetchSlot]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def submit(self, conversation_id: Any, user_id: Any, draft: str) -> bool:
+        """
+        Schedule a background search for a draft.
+
+        Args:
+            conversation_id: Conversation ID
+            user_id: User ID (scopes the search and the slot)
+            draft: Current message text
+
+        Returns:
+            True if a search was scheduled, False if the draft was ignored
+            (too short, or similar to the draft already searched)
+        """
+        draft = (draft or "").strip()
+        if not self.enabled or len(draft) < self.min_chars:
+            return False
+
+        key = (str(conversation_id), str(user_id))
+        terms = draft_terms(draft)
+        slot = self._slots.get(key)
+        if slot is not None and draft_similarity(slot.terms, terms) >= self.min_similarity:
+            if slot.searching or (slot.results is not None and not self._expired(slot)):
+                self._slots.move_to_end(key)
+                return False
+
+        new_slot = PrefetchSlot(draft=draft, terms=terms, created_at=self._clock())
+        self._put(key, new_slot)
+        new_slot.task = asyncio.create_task(self._prefetch(key, new_slot))
+        return True
+
+    async def take(
+        self, conversation_id: Any, user_id: Any, query: str
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Take the prefetched results for a sent message.
+
+        The slot is cleared either way. A search still running for a similar
+        draft is awaited; one still in its debounce window is cancelled.
+
+        Args:
+            conversation_id: Conversation ID
+            user_id: User ID
+            query: Final message text
+
+        Returns:
+            Prefetched RAG results, or None if the caller must search itself
+        """
+        slot = self._slots.pop((str(conversation_id), str(user_id)), None)
+        if slot is None:
+            rag_prefetch_lookups_total.labels(result="miss").inc()
+            return None
+
+        if draft_similarity(slot.terms, draft_terms(query)) < self.min_similarity:
+            self._cancel(slot)
+            rag_prefetch_lookups_total.labels(result="dissimilar").inc()
+            return None
+
+        if slot.results is None:
+            if not slot.searching or slot.task is None:
+                self._cancel(slot)
+                rag_prefetch_lookups_total.labels(result="miss").inc()
+                return None
+            # wait() rather than await: a failed or cancelled search is a miss
+            await asyncio.wait({slot.task})
+            if slot.results is None:
+                rag_prefetch_lookups_total.labels(result="miss").inc()
+                return None
+            rag_prefetch_lookups_total.labels(result="pending_hit").inc()
+            return slot.results
+
+        if self._expired(slot):
+            rag_prefetch_lookups_total.labels(result="expired").inc()
+            return None
+
+        rag_prefetch_lookups_total.labels(result="hit").inc()
+        return slot.results
+
+    def discard(self, conversation_id: Any, user_id: Any) -> None:
+        """Drop the slot of a (conversation, user), cancelling its search."""
+        slot = self._slots.pop((str(conversation_id), str(user_id)), None)
+        if slot is not None:
+            self._cancel(slot)
+
+    def clear(self) -> None:
+        """Drop all slots, cancelling their searches."""
+        for slot in self._slots.values():
+            self._cancel(slot)
+        self._slots.clear()
+
+    async def _prefetch(self, key: Tuple[str, str], slot: PrefetchSlot) -> None:
+        """Debounce, then search and store the results in the slot."""
+        try:
+            await asyncio.sleep(self.debounce)
+            slot.searching = True
+            results = await self._search(slot.draft, key[1])
+        except asyncio.CancelledError:
+            rag_prefetch_searches_total.labels(outcome="cancelled").inc()
+            raise
+        except Exception as e:
+            logger.debug(f"RAG prefetch failed for conversation {key[0]}: {e}")
+            rag_prefetch_searches_total.labels(outcome="failed").inc()
+            if self._slots.get(key) is slot:
+                del self._slots[key]
+            return
+        finally:
+            slot.searching = False
+
+        slot.results = results
+        slot.created_at = self._clock()
+        rag_prefetch_searches_total.labels(outcome="completed").inc()
+
+    def _put(self, key: Tuple[str, str], slot: PrefetchSlot) -> None:
+        """Store a slot, replacing the previous draft and evicting beyond max_slots."""
+        previous = self._slots.pop(key, None)
+        if previous is not None:
+            self._cancel(previous)
+        self._slots[key] = slot
+        while len(self._slots) > self.max_slots:
+            _, evicted = self._slots.popitem(last=False)
+            self._cancel(evicted)
+
+    def _expired(self, slot: PrefetchSlot) -> bool:
+        return self._clock() - slot.created_at > self.ttl
+
+    @staticmethod
+    def _cancel(slot: PrefetchSlot) -> None:
+        if slot.task is not None and not slot.task.done():
+            slot.task.cancel()
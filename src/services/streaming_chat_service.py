@@ -2,26 +2,33 @@
 流式聊天服务
 
 实现服务器推送事件 (Server-Sent Events) 的流式 LLM 响应。
+LLM 的 token 增量 (llm.astream) 一到达就作为事件转发, 工具调用和工具结果
+在发生时穿插发送, 因此首字节延迟不再等于完整回答的生成时间。
 目标: 首字节延迟 <100ms, 块吞吐量 >50/sec
 """
 
 import asyncio
 import time
 import logging
-from typing import AsyncGenerator, Optional, List
-from datetime import datetime
+from typing import Any, AsyncGenerator, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.models.streaming_models import (
     StreamEvent,
-    MessageChunkEvent,
+    MessageChunk,
     ToolCallEvent,
     ToolResultEvent,
-    ThinkingEvent,
     CompleteStateEvent,
     ErrorEvent,
     StreamEventType,
     StreamingConfig,
 )
+from src.services.agent_service import AgentService
+from src.services.conversation_service import ConversationService
+from src.services.conversation_summarization_service import apply_summary
+from src.services.memory_service import get_memory_service
 
 logger = logging.getLogger(__name__)
 
@@ -31,42 +38,53 @@ class StreamingChatService:
     流式聊天服务
 
     通过 Server-Sent Events 提供实时流式 LLM 响应。
+    驱动 AgentService.stream_message, 并负责保存用户消息和助手消息。
     """
 
     def __init__(
         self,
+        session: AsyncSession,
         config: Optional[StreamingConfig] = None,
+        agent_service: Optional[AgentService] = None,
     ):
         """
         初始化流式聊天服务
 
         Args:
+            session: 数据库会话
             config: 流式响应配置
+            agent_service: Agent 服务 (默认: 使用同一会话创建)
         """
         self.config = config or StreamingConfig()
+        self.conversation_service = ConversationService(session)
+        self.agent_service = agent_service or AgentService(session)
         self.active_connections = {}
         self.start_time = time.time()
 
     async def stream_conversation_response(
         self,
-        conversation_id: str,
+        conversation_id: UUID,
         user_id: str,
         user_message: str,
-        include_thinking: bool = False,
-    ) -> AsyncGenerator[StreamEvent, None]:
+        include_rag: bool = True,
+        conversation: Any = None,
+    ) -> AsyncGenerator[StreamEvent | MessageChunk, None]:
         """
         流式生成对话响应
 
-        这是核心的流式处理方法。
+        保存用户消息的同时加载对话历史和 RAG 上下文 (MemoryService),
+        然后逐个转发 Agent 的 token 增量、工具调用和工具结果事件,
+        最后保存助手消息并发送完成状态事件。
 
         Args:
             conversation_id: 对话 ID
             user_id: 用户 ID
             user_message: 用户消息内容
-            include_thinking: 是否包含思考过程
+            include_rag: 是否检索用户文档
+            conversation: 已加载的对话 (默认: 按用户查询)
 
         Yields:
-            StreamEvent: 流式事件
+            StreamEvent: 流式事件 (文本块为 MessageChunk)
 
         Performance Targets:
             - First byte latency: <100ms
@@ -87,78 +105,147 @@ class StreamingChatService:
 
             stream_start = time.time()
 
-            # Step 1: 加载对话历史 (应该缓存)
-            logger.debug(f"Loading conversation history for {conversation_id}")
-            # messages = await self._load_conversation_messages(conversation_id)
-            messages = []  # TODO: 从数据库加载
+            if conversation is None:
+                conversation = await self.conversation_service.conv_repo.get_user_conversation(
+                    user_id, conversation_id
+                )
+            if conversation is None:
+                yield ErrorEvent(
+                    type=StreamEventType.ERROR,
+                    timestamp=time.time(),
+                    sequence=sequence,
+                    error_code="CONVERSATION_NOT_FOUND",
+                    error_message="Conversation not found",
+                    recoverable=False,
+                )
+                return
 
-            # Step 2: 执行 LLM 流式生成
-            accumulated_text = ""
-            chunk_count = 0
-            tool_calls = 0
-            first_event_sent = False
-
-            # 模拟流式生成 (实际应该调用 LangChain Agent)
-            # 这里我们实现一个演示版本
-            demo_response = (
-                "Hello! I'll help you with that. "
-                "Let me search for relevant information "
-                "and provide a comprehensive answer."
+            # Step 1: 保存用户消息, 同时加载对话历史和 RAG 上下文
+            memory_task = asyncio.create_task(
+                get_memory_service().load(
+                    str(conversation_id), user_id, user_message, include_rag=include_rag
+                )
             )
-
-            # 分块发送响应
-            words = demo_response.split()
-            for i, word in enumerate(words):
-                # 累积文本直到达到缓冲区大小
-                accumulated_text += word + " "
-
-                # 每 5 个词或最后一个词时发送块
-                if (i + 1) % 5 == 0 or i == len(words) - 1:
-                    # 首字节延迟优化: 快速发送第一个事件
-                    if not first_event_sent:
+            try:
+                user_msg = await self.conversation_service.add_message(
+                    conversation_id=conversation_id,
+                    role="user",
+                    content=user_message,
+                    deferred=True,
+                )
+            except BaseException:
+                memory_task.cancel()
+                raise
+
+            memory_context = await memory_task
+            # 对话摘要替代其覆盖的历史消息; 历史窗口可能已包含刚保存的消息
+            summary, history = apply_summary(
+                conversation, memory_context["conversation_history"]
+            )
+            message_history = [
+                {
+                    "role": msg["role"],
+                    "content": msg["content"],
+                    "tokens_used": msg.get("tokens_used"),
+                }
+                for msg in history
+                if msg["id"] != str(user_msg.id)
+            ]
+
+            # Step 2: 转发 LLM 流式生成的事件
+            chunk_count = 0
+            tool_names = {}
+            final_state = None
+
+            async for event in self.agent_service.stream_message(
+                user_id=user_id,
+                conversation_id=str(conversation_id),
+                user_message=user_message,
+                system_prompt=conversation.system_prompt,
+                message_history=message_history,
+                context_documents=memory_context["rag_context"],
+                summary=summary,
+            ):
+                event_type = event.get("type")
+
+                if event_type == "content":
+                    if chunk_count == 0:
                         first_event_time = (time.time() - stream_start) * 1000
                         logger.info(f"First byte latency: {first_event_time:.1f}ms")
-                        first_event_sent = True
-
-                    # 发送消息块事件
-                    chunk_event = MessageChunkEvent(
-                        type=StreamEventType.MESSAGE_CHUNK,
+                    chunk_count += 1
+                    # 每个 LLM 增量约为一个 token; 消息块不经 Pydantic 校验
+                    yield MessageChunk(
                         timestamp=time.time(),
                         sequence=sequence,
-                        content=accumulated_text.strip(),
-                        token_count=len(accumulated_text.split()),
-                        is_final=(i == len(words) - 1),
+                        content=event.get("content", ""),
+                        token_count=1,
                     )
-                    sequence += 1
-                    chunk_count += 1
-                    yield chunk_event
-
-                    # 清除累积文本
-                    accumulated_text = ""
+                elif event_type == "tool_call":
+                    tool_names[event.get("call_id")] = event.get("tool_name")
+                    yield ToolCallEvent(
+                        type=StreamEventType.TOOL_CALL,
+                        timestamp=time.time(),
+                        sequence=sequence,
+                        tool_name=event.get("tool_name") or "",
+                        tool_input=event.get("tool_input") or {},
+                        call_id=event.get("call_id"),
+                    )
+                elif event_type == "tool_result":
+                    yield ToolResultEvent(
+                        type=StreamEventType.TOOL_RESULT,
+                        timestamp=time.time(),
+                        sequence=sequence,
+                        tool_name=(
+                            event.get("tool_name") or tool_names.get(event.get("call_id")) or ""
+                        ),
+                        result=event.get("result"),
+                        is_error=event.get("is_error", False),
+                        call_id=event.get("call_id"),
+                        execution_time_ms=event.get("execution_time_ms"),
+                    )
+                elif event_type == "complete_state":
+                    final_state = event
+                    continue
+                elif event_type == "error":
+                    raise RuntimeError(event.get("error"))
+                else:
+                    continue
+                sequence += 1
 
-                    # 模拟网络延迟 (实际上由网络决定)
-                    await asyncio.sleep(0.01)
+            if not final_state:
+                raise RuntimeError("Agent stream did not provide completion data")
+
+            # Step 3: 保存助手消息并发送完成状态事件
+            assistant_msg = await self.conversation_service.add_message(
+                conversation_id=conversation_id,
+                role="assistant",
+                content=final_state.get("response", ""),
+                tool_calls=final_state.get("tool_calls"),
+                tool_results=final_state.get("tool_results"),
+                # 模型用量 (含提示词), 不计入消息的 token 数
+                metadata={"usage_tokens": final_state.get("tokens_used")},
+                deferred=True,
+            )
 
-            # Step 3: 发送完成状态事件
             elapsed_time = time.time() - stream_start
-            complete_event = CompleteStateEvent(
+            tool_results = final_state.get("tool_results") or []
+            yield CompleteStateEvent(
                 type=StreamEventType.COMPLETE_STATE,
                 timestamp=time.time(),
                 sequence=sequence,
-                final_message=demo_response,
-                total_tokens=len(demo_response.split()),
+                final_message=final_state.get("response", ""),
+                total_tokens=final_state.get("tokens_used") or chunk_count,
                 total_chunks=chunk_count,
                 elapsed_time=elapsed_time,
-                tool_calls_count=tool_calls,
-                cache_hit=False,
+                tool_calls_count=len(final_state.get("tool_calls") or []),
+                cache_hit=any(result.get("cache_hit") for result in tool_results),
+                message_id=str(assistant_msg.id),
             )
             sequence += 1
-            yield complete_event
 
             logger.info(
                 f"Stream completed: conversation_id={conversation_id}, "
-                f"chunks={chunk_count}, tokens={len(demo_response.split())}, "
-                f"elapsed={elapsed_time:.2f}s"
+                f"chunks={chunk_count}, elapsed={elapsed_time:.2f}s"
             )
 
         except asyncio.CancelledError:
@@ -186,120 +273,6 @@ class StreamingChatService:
                 logger.debug(f"Connection closed: {connection_id}, duration={duration:.2f}s")
                 del self.active_connections[connection_id]
 
-    async def stream_with_tool_calls(
-        self,
-        conversation_id: str,
-        user_id: str,
-        user_message: str,
-    ) -> AsyncGenerator[StreamEvent, None]:
-        """
-        流式生成带工具调用的响应
-
-        演示工具调用的流式传输。
-        """
-
-        sequence = 0
-
-        try:
-            # 发送初始思考事件
-            if True:  # include_thinking
-                thinking_event = ThinkingEvent(
-                    type=StreamEventType.THINKING,
-                    timestamp=time.time(),
-                    sequence=sequence,
-                    thought="I should search for information first",
-                    reasoning="The user asked a question that requires current information",
-                )
-                sequence += 1
-                yield thinking_event
-                await asyncio.sleep(0.05)
-
-            # 发送工具调用事件
-            tool_event = ToolCallEvent(
-                type=StreamEventType.TOOL_CALL,
-                timestamp=time.time(),
-                sequence=sequence,
-                tool_name="search",
-                tool_input={"query": user_message},
-            )
-            sequence += 1
-            yield tool_event
-            await asyncio.sleep(0.1)
-
-            # 模拟工具执行 (实际上由 Agent 执行)
-            await asyncio.sleep(0.5)
-
-            # 发送工具结果事件
-            result_event = ToolResultEvent(
-                type=StreamEventType.TOOL_RESULT,
-                timestamp=time.time(),
-                sequence=sequence,
-                tool_name="search",
-                result="Found 5 relevant articles about the topic",
-                is_error=False,
-            )
-            sequence += 1
-            yield result_event
-
-            # 发送响应文本块
-            response = "Based on the search results, here's what I found..."
-            for i, chunk in enumerate(response.split()):
-                chunk_event = MessageChunkEvent(
-                    type=StreamEventType.MESSAGE_CHUNK,
-                    timestamp=time.time(),
-                    sequence=sequence,
-                    content=chunk,
-                    token_count=1,
-                    is_final=(i == len(response.split()) - 1),
-                )
-                sequence += 1
-                yield chunk_event
-                await asyncio.sleep(0.01)
-
-            # 发送完成状态
-            complete_event = CompleteStateEvent(
-                type=StreamEventType.COMPLETE_STATE,
-                timestamp=time.time(),
-                sequence=sequence,
-                final_message=response,
-                total_tokens=len(response.split()),
-                total_chunks=len(response.split()),
-                elapsed_time=1.5,
-                tool_calls_count=1,
-                cache_hit=False,
-            )
-            yield complete_event
-
-        except Exception as e:
-            logger.error(f"Tool call streaming error: {e}", exc_info=True)
-            error_event = ErrorEvent(
-                type=StreamEventType.ERROR,
-                timestamp=time.time(),
-                sequence=sequence,
-                error_code="TOOL_CALL_STREAMING_ERROR",
-                error_message=str(e),
-                recoverable=True,
-            )
-            yield error_event
-
-    async def _load_conversation_messages(
-        self,
-        conversation_id: str,
-        limit: int = 10,
-    ) -> List[dict]:
-        """
-        加载对话消息历史
-
-        Args:
-            conversation_id: 对话 ID
-            limit: 最大消息数
-
-        Returns:
-            消息列表
-        """
-        # TODO: 从数据库加载
-        return []
-
     def get_active_connections_count(self) -> int:
         """获取活跃连接数"""
         return len(self.active_connections)
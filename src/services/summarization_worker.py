@@ -0,0 +1,187 @@
+"""
+Background worker for running conversation summaries.
+
+Summarizing used to be an inline LLM call on the turn that crossed the
+token threshold. Conversations are now handed to this worker by id once
+their messages are committed (the message persister's commit listener, or
+the route after a direct write); the turn never waits for a summary.
+
+The job re-reads the conversation and folds the messages added since the
+last summary into it (ConversationSummarizationService.update_running_summary)
+only once the foldable messages - after the summary cursor, excluding the
+recent window that is still sent verbatim - reach SUMMARY_TOKEN_THRESHOLD.
+The result is written to ConversationORM.summary. The next turn reads the
+conversation and uses the new summary in place of the messages it covers
+(apply_summary).
+
+A conversation is queued at most once at a time: while it is queued or
+being summarized, further triggers are ignored. Deduplication is per
+process; a conversation summarized by two processes at once is merged twice
+and the last commit wins.
+
+Example:
+    >>> worker = get_summarization_worker()
+    >>> worker.schedule(conversation.id)  # returns at once
+"""
+
+import asyncio
+import logging
+import os
+from functools import partial
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Set
+from uuid import UUID
+
+from src.infrastructure.cache_metrics import summarization_jobs_total
+
+logger = logging.getLogger(__name__)
+
+
+class SummarizationWorker:
+    """
+    Deduplicating queue of conversations whose summary needs an update.
+
+    Configuration via environment variables:
+    - SUMMARY_TOKEN_THRESHOLD: Foldable tokens (added since the last summary,
+      outside the recent window) that trigger an update (default: 6000)
+    - SUMMARY_WORKERS: Summaries generated concurrently (default: 2)
+    - SUMMARY_QUEUE_SIZE: Max queued conversations; triggers beyond it are
+      dropped and retried on the conversation's next turn (default: 1000)
+    """
+
+    def __init__(
+        self,
+        token_threshold: Optional[int] = None,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        summarize: Optional[Callable[[UUID], Awaitable[Optional[str]]]] = None,
+    ):
+        """
+        Initialize summarization worker.
+
+        Args:
+            token_threshold: Foldable tokens that trigger an update
+            workers: Number of concurrent summary jobs
+            queue_size: Max queued conversations
+            summarize: Job for one conversation, returning the new summary or
+                None (default: ConversationSummarizationService on a new
+                session, folding once token_threshold is reached)
+        """
+        self.token_threshold = int(token_threshold or os.getenv("SUMMARY_TOKEN_THRESHOLD", "6000"))
+        self.workers = int(workers or os.getenv("SUMMARY_WORKERS", "2"))
+        self._summarize = summarize or partial(
+            _summarize_conversation, min_tokens=self.token_threshold
+        )
+
+        self._queue: asyncio.Queue = asyncio.Queue(
+            maxsize=int(queue_size or os.getenv("SUMMARY_QUEUE_SIZE", "1000"))
+        )
+        self._scheduled: Set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    async def on_messages_committed(self, messages: Iterable[Any]) -> None:
+        """
+        Message persister commit listener: queue the batch's conversations.
+
+        Args:
+            messages: Committed MessageORM instances
+        """
+        for conversation_id in {message.conversation_id for message in messages}:
+            self.schedule(conversation_id)
+
+    def schedule(self, conversation_id: Any) -> bool:
+        """
+        Queue a summary check without waiting for it.
+
+        The job re-reads the conversation and only calls the LLM once the
+        foldable messages reach the token threshold.
+
+        Args:
+            conversation_id: Conversation ID
+
+        Returns:
+            True if queued; False if already queued or running, or the queue is full
+        """
+        key = str(conversation_id)
+        if key in self._scheduled:
+            summarization_jobs_total.labels(outcome="deduplicated").inc()
+            return False
+
+        try:
+            self._queue.put_nowait(key)
+        except asyncio.QueueFull:
+            summarization_jobs_total.labels(outcome="dropped").inc()
+            logger.warning(f"Summary queue full, skipping conversation {key}")
+            return False
+
+        self._scheduled.add(key)
+        summarization_jobs_total.labels(outcome="queued").inc()
+        self._ensure_workers()
+        return True
+
+    @property
+    def scheduled_count(self) -> int:
+        """Conversations queued or being summarized."""
+        return len(self._scheduled)
+
+    async def join(self) -> None:
+        """Wait until every queued conversation has been processed."""
+        await self._queue.join()
+
+    async def close(self) -> None:
+        """Stop the workers; queued conversations are retried on their next turn."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _ensure_workers(self) -> None:
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._run()))
+
+    async def _run(self) -> None:
+        """Worker loop: summarize queued conversations one at a time."""
+        while True:
+            key = await self._queue.get()
+            try:
+                summary = await self._summarize(UUID(key))
+                outcome = "updated" if summary else "unchanged"
+            except Exception as e:
+                outcome = "failed"
+                logger.error(f"Failed to summarize conversation {key}: {e}", exc_info=True)
+            finally:
+                self._scheduled.discard(key)
+                self._queue.task_done()
+            summarization_jobs_total.labels(outcome=outcome).inc()
+
+
+async def _summarize_conversation(conversation_id: UUID, min_tokens: int = 0) -> Optional[str]:
+    """Update the running summary of a conversation on its own session."""
+    from src.db.config import AsyncSessionLocal
+    from src.services.conversation_summarization_service import (
+        ConversationSummarizationService,
+    )
+
+    async with AsyncSessionLocal() as session:
+        service = ConversationSummarizationService(session)
+        return await service.update_running_summary(conversation_id, min_tokens=min_tokens)
+
+
+# Global singleton instance (one queue deduplicates across all connections)
+_summarization_worker: Optional[SummarizationWorker] = None
+
+
+def get_summarization_worker() -> SummarizationWorker:
+    """Get global summarization worker instance."""
+    global _summarization_worker
+    if _summarization_worker is None:
+        _summarization_worker = SummarizationWorker()
+    return _summarization_worker
+
+
+async def close_summarization_worker() -> None:
+    """Stop and reset the global summarization worker (on shutdown)."""
+    global _summarization_worker
+    if _summarization_worker is not None:
+        await _summarization_worker.close()
+        _summarization_worker = None
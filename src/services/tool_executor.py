@@ -0,0 +1,325 @@
+"""
+Concurrent execution of the tool calls in one model turn.
+
+The tool calls of a turn are independent, so they run concurrently with
+``asyncio.gather`` and the turn takes as long as its slowest tool instead of
+the sum of all of them. Each call has its own timeout, and calls of the same
+tool share a semaphore that caps how many run at once across all agents in the
+process (a turn with five ``web_search`` calls does not open five search
+connections at once if the cap is lower). Results are returned in the order
+of the calls, so follow-up prompts are stable.
+
+Every result carries the tool's wall-clock latency (``execution_time_ms``)
+and whether it was served from the tool result cache (``cache_hit``); both
+are stored in the ``tool_calls`` table with the assistant message.
+
+Example:
+    >>> executor = get_tool_executor()
+    >>> executions = await executor.execute(response.tool_calls, tools)
+    >>> [e.to_result() for e in executions]
+    [{"id": "call_1", "output": "...", "execution_time_ms": 212.4, "is_error": False,
+      "cache_hit": False}]
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# (tool, tool_name, tool_args) -> tool output
+ToolRunner = Callable[[Any, str, Dict[str, Any]], Awaitable[Any]]
+
+# Flags of the tool call running in the current task. A mutable dict, so
+# flags set in tasks spawned by the invocation (wait_for) are seen here too.
+_current_call: contextvars.ContextVar[Optional[Dict[str, bool]]] = contextvars.ContextVar(
+    "tool_call_flags", default=None
+)
+
+
+def mark_cache_hit() -> None:
+    """Record that the tool call being executed was served from a cache."""
+    flags = _current_call.get()
+    if flags is not None:
+        flags["cache_hit"] = True
+
+
+def middleware_runner(middleware: List[Any], state: Dict[str, Any]) -> ToolRunner:
+    """
+    Runner that invokes tools through AgentMiddleware.wrap_tool_call hooks.
+
+    Hooks are nested (the first middleware is outermost) so the tool runs
+    once; an error reported by a hook is raised to the hook around it.
+
+    Args:
+        middleware: AgentMiddleware instances
+        state: Agent state passed to the hooks
+
+    Returns:
+        Runner for ToolExecutor.execute
+    """
+    async def run(tool: Any, tool_name: str, tool_args: Dict[str, Any]) -> Any:
+        async def execute():
+            return await _invoke(tool, tool_args)
+
+        for hook in reversed(middleware):
+            execute = _wrap_execute(hook, execute, tool_name, tool_args, state)
+        return await execute()
+
+    return run
+
+
+def _wrap_execute(
+    hook: Any,
+    execute: Callable[[], Awaitable[Any]],
+    tool_name: str,
+    tool_args: Dict[str, Any],
+    state: Dict[str, Any],
+) -> Callable[[], Awaitable[Any]]:
+    """Wrap a tool execute function in one middleware's wrap_tool_call hook."""
+    async def wrapped():
+        result, error = await hook.wrap_tool_call(execute, tool_name, tool_args, state)
+        if error:
+            raise RuntimeError(error)
+        return result
+
+    return wrapped
+
+
+def parse_tool_limits(value: str) -> Dict[str, float]:
+    """
+    Parse per-tool settings of the form ``"web_search=8000,query_database=5000"``.
+
+    Args:
+        value: Comma-separated name=number pairs
+
+    Returns:
+        Dict of tool name to number (malformed pairs are ignored)
+    """
+    limits = {}
+    for pair in value.split(","):
+        name, _, number = pair.partition("=")
+        try:
+            limits[name.strip()] = float(number)
+        except ValueError:
+            continue
+    return limits
+
+
+@dataclass
+class ToolExecution:
+    """Outcome of one tool call."""
+    call_id: str
+    name: str
+    input: Dict[str, Any]
+    output: Any
+    execution_time_ms: float
+    is_error: bool = False
+    cache_hit: bool = False
+
+    def to_call(self) -> Dict[str, Any]:
+        """Tool call entry as stored in messages.tool_calls."""
+        return {"id": self.call_id, "name": self.name, "input": self.input}
+
+    def to_result(self) -> Dict[str, Any]:
+        """Tool result entry as stored in messages.tool_results."""
+        return {
+            "id": self.call_id,
+            "output": self.output,
+            "execution_time_ms": round(self.execution_time_ms, 2),
+            "is_error": self.is_error,
+            "cache_hit": self.cache_hit,
+        }
+
+
+class ToolExecutor:
+    """
+    Runs a turn's tool calls concurrently with per-tool timeouts and caps.
+
+    Configuration via environment variables:
+    - TOOL_TIMEOUT_MS: Timeout of a single tool call (default: 30000)
+    - TOOL_TIMEOUTS_MS: Per-tool overrides, e.g. "web_search=8000,query_database=5000"
+    - TOOL_MAX_CONCURRENCY: Max concurrent calls of one tool (default: 4)
+    - TOOL_CONCURRENCY: Per-tool overrides, e.g. "web_search=2"
+    """
+
+    def __init__(
+        self,
+        default_timeout: Optional[float] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+        max_concurrency: Optional[int] = None,
+        concurrency: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Initialize tool executor.
+
+        Args:
+            default_timeout: Seconds a tool call may take
+            timeouts: Per-tool timeouts in seconds
+            max_concurrency: Max concurrent calls of one tool
+            concurrency: Per-tool concurrency caps
+        """
+        self.default_timeout = (
+            float(os.getenv("TOOL_TIMEOUT_MS", "30000")) / 1000.0
+            if default_timeout is None else default_timeout
+        )
+        if timeouts is None:
+            timeouts = {
+                name: ms / 1000.0
+                for name, ms in parse_tool_limits(os.getenv("TOOL_TIMEOUTS_MS", "")).items()
+            }
+        self.timeouts = timeouts
+        self.max_concurrency = int(
+            max_concurrency or os.getenv("TOOL_MAX_CONCURRENCY", "4")
+        )
+        if concurrency is None:
+            concurrency = {
+                name: int(limit)
+                for name, limit in parse_tool_limits(os.getenv("TOOL_CONCURRENCY", "")).items()
+            }
+        self.concurrency = concurrency
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def execute(
+        self,
+        tool_calls: Iterable[Dict[str, Any]],
+        tools: Union[Dict[str, Any], List[Any]],
+        run: Optional[ToolRunner] = None,
+    ) -> List[ToolExecution]:
+        """
+        Execute tool calls concurrently.
+
+        Failures, timeouts and unknown tools become error results; this
+        method does not raise for them.
+
+        Args:
+            tool_calls: LangChain tool calls ({"id", "name", "args"})
+            tools: Tools by name, or a list of tools
+            run: Optional coroutine function (tool, name, args) -> output that
+                wraps the invocation (e.g. agent middleware); default
+                ``tool.ainvoke(args)``
+
+        Returns:
+            One ToolExecution per call, in call order
+        """
+        tools = _by_name(tools)
+        return list(await asyncio.gather(*(
+            self._execute_one(tool_call, tools, run) for tool_call in tool_calls
+        )))
+
+    async def execute_as_completed(
+        self,
+        tool_calls: Iterable[Dict[str, Any]],
+        tools: Union[Dict[str, Any], List[Any]],
+        run: Optional[ToolRunner] = None,
+    ) -> AsyncIterator[ToolExecution]:
+        """
+        Execute tool calls concurrently, yielding each result as it finishes.
+
+        Used for streaming, where a fast tool's result is sent to the client
+        while slower tools are still running. Calls still running when the
+        iteration is abandoned are cancelled.
+
+        Args:
+            tool_calls: LangChain tool calls ({"id", "name", "args"})
+            tools: Tools by name, or a list of tools
+            run: Optional runner wrapping the invocation (see execute)
+
+        Yields:
+            One ToolExecution per call, in completion order
+        """
+        tools = _by_name(tools)
+        tasks = [
+            asyncio.create_task(self._execute_one(tool_call, tools, run))
+            for tool_call in tool_calls
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def timeout_for(self, tool_name: str) -> float:
+        """Timeout in seconds for a tool."""
+        return self.timeouts.get(tool_name, self.default_timeout)
+
+    async def _execute_one(
+        self,
+        tool_call: Dict[str, Any],
+        tools: Dict[str, Any],
+        run: Optional[ToolRunner],
+    ) -> ToolExecution:
+        name = tool_call.get("name")
+        args = tool_call.get("args", {}) or {}
+        call_id = tool_call.get("id") or f"call_{uuid4().hex[:24]}"
+
+        tool = tools.get(name)
+        if tool is None:
+            logger.error(f"Tool {name} not found")
+            return ToolExecution(call_id, name, args, f"Error: Tool {name} not found", 0.0, True)
+
+        timeout = self.timeout_for(name)
+        flags = {"cache_hit": False}
+        _current_call.set(flags)
+        async with self._semaphore(name):
+            start = time.perf_counter()
+            try:
+                invocation = run(tool, name, args) if run else _invoke(tool, args)
+                output = await asyncio.wait_for(invocation, timeout=timeout)
+                is_error = False
+            except asyncio.TimeoutError:
+                logger.warning(f"Tool {name} timed out after {timeout:.1f}s")
+                output = f"Error executing tool {name}: timed out after {timeout:.1f}s"
+                is_error = True
+            except Exception as exc:
+                logger.error(f"Error executing tool {name}: {exc}")
+                output = f"Error executing tool {name}: {exc}"
+                is_error = True
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+        logger.info(f"Tool {name} finished in {elapsed_ms:.0f}ms")
+        return ToolExecution(
+            call_id, name, args, output, elapsed_ms, is_error, flags["cache_hit"]
+        )
+
+    def _semaphore(self, tool_name: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(tool_name)
+        if semaphore is None:
+            limit = int(self.concurrency.get(tool_name, self.max_concurrency))
+            semaphore = self._semaphores[tool_name] = asyncio.Semaphore(max(1, limit))
+        return semaphore
+
+
+def _by_name(tools: Union[Dict[str, Any], List[Any]]) -> Dict[str, Any]:
+    return tools if isinstance(tools, dict) else {tool.name: tool for tool in tools}
+
+
+async def _invoke(tool: Any, args: Dict[str, Any]) -> Any:
+    """Invoke a LangChain tool, async if it supports it."""
+    if hasattr(tool, "ainvoke"):
+        return await tool.ainvoke(args)
+    return await asyncio.to_thread(tool.invoke, args)
+
+
+# Global singleton instance (semaphores cap tool concurrency process-wide)
+_tool_executor: Optional[ToolExecutor] = None
+
+
+def get_tool_executor() -> ToolExecutor:
+    """Get global tool executor instance."""
+    global _tool_executor
+    if _tool_executor is None:
+        _tool_executor = ToolExecutor()
+    return _tool_executor
+
+
+def reset_tool_executor() -> None:
+    """Reset global tool executor (for tests)."""
+    global _tool_executor
+    _tool_executor = None
@@ -0,0 +1,387 @@
+"""
+Async web search with shared connections, request hedging and a Redis cache.
+
+Backends:
+- SearxNG (``SEARXNG_URL``): native async HTTP through one shared
+  ``httpx.AsyncClient`` with keep-alive, so searches reuse connections and
+  never occupy a thread.
+- DuckDuckGo: the synchronous ``DDGS`` client on a dedicated, bounded thread
+  pool (``WEB_SEARCH_THREADS``) with one long-lived client per thread, so a
+  burst of searches cannot exhaust the default executor used by the rest of
+  the application, and each thread keeps its connections. Text searches go
+  to the html endpoint (``duckduckgo``) or the lite endpoint
+  (``duckduckgo_lite``); both are enabled by default, so text searches are
+  hedged even without SearxNG. News and scholar searches use one fixed
+  endpoint, so only the first DuckDuckGo backend is queried for them.
+
+Searches are hedged: the first backend is queried, and if it has not answered
+within ``WEB_SEARCH_HEDGE_MS`` (or fails), the next backend is queried too;
+the first successful answer wins and the rest are cancelled. Backends that
+would send the same request are queried once.
+
+Results are cached in Redis under ``websearch:{type}:{limit}:{digest}``,
+keyed by the normalized query, search type and limit.
+
+Example:
+    >>> client = get_web_search_client()
+    >>> results = await client.search("langchain 1.0 release", limit=5, search_type="news")
+    >>> results[0]["title"], results[0]["url"], results[0]["body"]
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import httpx
+from duckduckgo_search import DDGS
+
+from src.infrastructure.cache_metrics import (
+    web_search_backend_requests_total,
+    web_search_cache_lookups_total,
+)
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class WebSearchError(Exception):
+    """Raised when every web search backend failed."""
+
+
+def _result(title: Any, url: Any, body: Any) -> Dict[str, str]:
+    """Search result in the common shape: title, url, body."""
+    return {"title": title or "", "url": url or "", "body": body or ""}
+
+
+class SearxNGBackend:
+    """SearxNG JSON API over a shared keep-alive HTTP client."""
+
+    name = "searxng"
+    CATEGORIES = {"general": "general", "news": "news", "scholar": "science"}
+
+    def __init__(self, base_url: str, client: httpx.AsyncClient):
+        """
+        Initialize backend.
+
+        Args:
+            base_url: SearxNG instance URL (JSON format must be enabled)
+            client: Shared HTTP client
+        """
+        self.base_url = base_url.rstrip("/")
+        self.client = client
+
+    async def search(self, query: str, limit: int, search_type: str) -> List[Dict[str, str]]:
+        response = await self.client.get(
+            f"{self.base_url}/search",
+            params={
+                "q": query,
+                "format": "json",
+                "categories": self.CATEGORIES.get(search_type, "general"),
+            },
+        )
+        response.raise_for_status()
+        return [
+            _result(item.get("title"), item.get("url"), item.get("content"))
+            for item in response.json().get("results", [])[:limit]
+        ]
+
+
+class DuckDuckGoBackend:
+    """DuckDuckGo through DDGS on a dedicated bounded thread pool."""
+
+    def __init__(
+        self, executor: ThreadPoolExecutor, timeout: float = 10.0, endpoint: str = "html"
+    ):
+        """
+        Initialize backend.
+
+        Args:
+            executor: Thread pool reserved for web searches
+            timeout: DDGS request timeout in seconds
+            endpoint: DDGS text search endpoint (html or lite)
+        """
+        self.executor = executor
+        self.timeout = timeout
+        self.endpoint = endpoint
+        self.name = "duckduckgo" if endpoint == "html" else f"duckduckgo_{endpoint}"
+        self._local = threading.local()
+
+    def endpoint_for(self, search_type: str) -> str:
+        """DDGS endpoint a search of this type is sent to."""
+        if search_type == "news":
+            return "news"
+        if search_type == "scholar":
+            return "lite"
+        return self.endpoint
+
+    async def search(self, query: str, limit: int, search_type: str) -> List[Dict[str, str]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self._search, query, limit, search_type
+        )
+
+    def _search(self, query: str, limit: int, search_type: str) -> List[Dict[str, str]]:
+        # One client per pool thread: DDGS is not thread-safe, but can be reused
+        ddgs = getattr(self._local, "ddgs", None)
+        if ddgs is None:
+            ddgs = self._local.ddgs = DDGS(timeout=self.timeout)
+
+        endpoint = self.endpoint_for(search_type)
+        if endpoint == "news":
+            items = ddgs.news(query, max_results=limit)
+        else:
+            items = ddgs.text(query, max_results=limit, backend=endpoint)
+        return [
+            _result(item.get("title"), item.get("url") or item.get("href"), item.get("body"))
+            for item in items or []
+        ]
+
+
+class WebSearchClient:
+    """
+    Hedged, cached web search over one or more backends.
+
+    Configuration via environment variables:
+    - SEARXNG_URL: SearxNG instance; enables the searxng backend (default: unset)
+    - WEB_SEARCH_BACKENDS: Backend order
+      (default: "searxng,duckduckgo,duckduckgo_lite")
+    - WEB_SEARCH_HEDGE_MS: Delay before the next backend is queried (default: 800)
+    - WEB_SEARCH_TIMEOUT: HTTP timeout in seconds (default: 10)
+    - WEB_SEARCH_THREADS: Thread pool size for DDGS (default: 4)
+    - WEB_SEARCH_MAX_CONNECTIONS: Shared HTTP client pool size (default: 20)
+    - WEB_SEARCH_CACHE_TTL: Seconds results are cached in Redis (default: 900)
+    """
+
+    CACHE_PREFIX = "websearch:"
+
+    DEFAULT_BACKENDS = "searxng,duckduckgo,duckduckgo_lite"
+    DUCKDUCKGO_ENDPOINTS = {"duckduckgo": "html", "duckduckgo_lite": "lite"}
+
+    def __init__(
+        self,
+        backends: Optional[List[Any]] = None,
+        hedge_delay: Optional[float] = None,
+        cache_ttl: Optional[int] = None,
+        redis_cache: Any = None,
+    ):
+        """
+        Initialize web search client.
+
+        Args:
+            backends: Backends in hedging order (default: from environment)
+            hedge_delay: Seconds before the next backend is queried
+            cache_ttl: Seconds results are cached in Redis (0 disables caching)
+            redis_cache: RedisCache to use (default: global instance)
+        """
+        self.timeout = float(os.getenv("WEB_SEARCH_TIMEOUT", "10"))
+        self.hedge_delay = (
+            float(os.getenv("WEB_SEARCH_HEDGE_MS", "800")) / 1000.0
+            if hedge_delay is None else hedge_delay
+        )
+        self.cache_ttl = int(
+            os.getenv("WEB_SEARCH_CACHE_TTL", "900") if cache_ttl is None else cache_ttl
+        )
+        self._redis_cache = redis_cache
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.backends = backends if backends is not None else self._default_backends()
+
+    def _default_backends(self) -> List[Any]:
+        """Backends named in WEB_SEARCH_BACKENDS that are configured."""
+        backends = []
+        for name in os.getenv("WEB_SEARCH_BACKENDS", self.DEFAULT_BACKENDS).split(","):
+            name = name.strip()
+            if name == "searxng" and os.getenv("SEARXNG_URL"):
+                backends.append(SearxNGBackend(os.getenv("SEARXNG_URL"), self._get_http_client()))
+            elif name in self.DUCKDUCKGO_ENDPOINTS:
+                # DuckDuckGo endpoints share one thread pool
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=int(os.getenv("WEB_SEARCH_THREADS", "4")),
+                        thread_name_prefix="web-search",
+                    )
+                backends.append(DuckDuckGoBackend(
+                    self._executor,
+                    timeout=self.timeout,
+                    endpoint=self.DUCKDUCKGO_ENDPOINTS[name],
+                ))
+        return backends
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Shared keep-alive HTTP client."""
+        if self._http_client is None:
+            max_connections = int(os.getenv("WEB_SEARCH_MAX_CONNECTIONS", "20"))
+            self._http_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+                headers={"Accept": "application/json"},
+            )
+        return self._http_client
+
+    async def search(
+        self, query: str, limit: int = 5, search_type: str = "general"
+    ) -> List[Dict[str, str]]:
+        """
+        Search the web.
+
+        Args:
+            query: Search query
+            limit: Max results
+            search_type: general/news/scholar
+
+        Returns:
+            List of {"title", "url", "body"} dicts
+
+        Raises:
+            WebSearchError: If every backend failed
+        """
+        key = self.cache_key(query, limit, search_type)
+        cache = self._get_cache()
+        if cache is not None:
+            cached = await cache.get(key)
+            if cached is not None:
+                web_search_cache_lookups_total.labels(result="hit").inc()
+                return cached
+            web_search_cache_lookups_total.labels(result="miss").inc()
+
+        results = await self._hedged_search(query, limit, search_type)
+
+        if cache is not None:
+            await cache.set(key, results, ttl=self.cache_ttl)
+        return results
+
+    def cache_key(self, query: str, limit: int, search_type: str) -> str:
+        """Redis key for a (query, type, limit) search."""
+        normalized = _WHITESPACE.sub(" ", query).strip().lower()
+        digest = hashlib.sha256(normalized.encode()).hexdigest()[:32]
+        return f"{self.CACHE_PREFIX}{search_type}:{limit}:{digest}"
+
+    def _backends_for(self, search_type: str) -> List[Any]:
+        """Backends in order, skipping any that repeats an earlier one's request."""
+        backends, targets = [], set()
+        for backend in self.backends:
+            endpoint_for = getattr(backend, "endpoint_for", None)
+            target = (type(backend), endpoint_for(search_type)) if endpoint_for else backend
+            if target not in targets:
+                targets.add(target)
+                backends.append(backend)
+        return backends
+
+    async def _hedged_search(
+        self, query: str, limit: int, search_type: str
+    ) -> List[Dict[str, str]]:
+        """Query backends in order, starting the next one on delay or failure."""
+        if not self.backends:
+            raise WebSearchError("No web search backend configured")
+
+        remaining = self._backends_for(search_type)
+        running: Dict[asyncio.Task, Any] = {}
+        errors = []
+
+        def start_next():
+            backend = remaining.pop(0)
+            task = asyncio.create_task(
+                self._query_backend(backend, query, limit, search_type)
+            )
+            running[task] = backend
+
+        start_next()
+        try:
+            while running:
+                done, _ = await asyncio.wait(
+                    running,
+                    timeout=self.hedge_delay if remaining else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # Slow backend: hedge with the next one
+                    start_next()
+                    continue
+
+                for task in done:
+                    backend = running.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(f"{backend.name}: {task.exception()}")
+
+                if not running and remaining:
+                    start_next()
+        finally:
+            for task in running:
+                task.cancel()
+
+        raise WebSearchError("; ".join(errors))
+
+    async def _query_backend(
+        self, backend: Any, query: str, limit: int, search_type: str
+    ) -> List[Dict[str, str]]:
+        start = time.perf_counter()
+        try:
+            results = await backend.search(query, limit, search_type)
+        except asyncio.CancelledError:
+            web_search_backend_requests_total.labels(
+                backend=backend.name, outcome="cancelled"
+            ).inc()
+            raise
+        except Exception as e:
+            logger.warning(f"Web search backend {backend.name} failed: {e}")
+            web_search_backend_requests_total.labels(backend=backend.name, outcome="error").inc()
+            raise
+        web_search_backend_requests_total.labels(backend=backend.name, outcome="success").inc()
+        logger.debug(
+            f"Web search backend {backend.name}: {len(results)} results in "
+            f"{(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+        return results
+
+    def _get_cache(self):
+        """Active RedisCache, or None if caching is disabled or unavailable."""
+        if self.cache_ttl <= 0:
+            return None
+        cache = self._redis_cache
+        if cache is None:
+            from src.infrastructure.redis_cache import get_redis_cache
+
+            cache = get_redis_cache()
+        if cache is None or not cache._initialized:
+            return None
+        return cache
+
+    async def close(self) -> None:
+        """Close the shared HTTP client and the thread pool."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Global singleton instance (shares connections and threads across requests)
+_web_search_client: Optional[WebSearchClient] = None
+
+
+def get_web_search_client() -> WebSearchClient:
+    """Get global web search client instance."""
+    global _web_search_client
+    if _web_search_client is None:
+        _web_search_client = WebSearchClient()
+    return _web_search_client
+
+
+async def close_web_search_client() -> None:
+    """Close and reset the global web search client (on shutdown)."""
+    global _web_search_client
+    if _web_search_client is not None:
+        await _web_search_client.close()
+        _web_search_client = None
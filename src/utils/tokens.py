@@ -0,0 +1,66 @@
+"""Token counting for message content."""
+
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+
+import tiktoken
+
+TOKENIZER_ENCODING = "cl100k_base"  # GPT-3.5-turbo encoding
+
+# Token counts of recently counted texts, by content hash
+TOKEN_COUNT_CACHE_SIZE = 4096
+_token_counts: "OrderedDict[str, int]" = OrderedDict()
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = TOKENIZER_ENCODING) -> tiktoken.Encoding:
+    """Load a tiktoken encoding once per process."""
+    return tiktoken.get_encoding(name)
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text.
+
+    Special-token markers in user text (e.g. "<|endoftext|>") are counted as
+    plain text instead of raising.
+
+    Args:
+        text: Text to count
+
+    Returns:
+        Number of tokens
+    """
+    if not text:
+        return 0
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+
+def count_tokens_cached(text: str) -> int:
+    """
+    Count the tokens of a text, memoized per content hash.
+
+    For texts counted repeatedly (system prompts, cached contexts). Hashing
+    is much cheaper than BPE encoding, and the cache keeps only hashes, not
+    the texts.
+
+    Args:
+        text: Text to count
+
+    Returns:
+        Number of tokens
+    """
+    if not text:
+        return 0
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    count = _token_counts.get(digest)
+    if count is not None:
+        _token_counts.move_to_end(digest)
+        return count
+
+    count = count_tokens(text)
+    _token_counts[digest] = count
+    if len(_token_counts) > TOKEN_COUNT_CACHE_SIZE:
+        _token_counts.popitem(last=False)
+    return count
@@ -0,0 +1,92 @@
+"""Moderation scan time: per-pattern regexes vs the single-pass scanner.
+
+Measures, for bodies up to the moderation size limit:
+
+1. The previous check: eleven case-insensitive regexes run one after another
+   over the raw body
+2. ``ContentScanner.scan`` over the same text
+3. ``ContentScanner.scan_json`` over the parsed body (what the middleware runs)
+
+Benign chat-like bodies show the common case; adversarial bodies (repeated
+``<script>`` tags without a closing tag, long ``onon...`` words) show the
+backtracking the previous patterns were exposed to.
+
+Usage:
+    python -m tests.benchmarks.bench_content_scanner [repeats]
+"""
+
+import re
+import statistics
+import sys
+import time
+
+import orjson
+
+from src.middleware.content_scanner import ContentScanner
+
+PREVIOUS_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in [
+        r"(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|EXECUTE)\b)",
+        r"('|\")\s*(OR|AND)\s*('|\")?",
+        r"--\s*$",
+        r"/\*.*\*/",
+        r";\s*(DROP|DELETE|TRUNCATE|UPDATE)",
+        r"<script[^>]*>.*?</script>",
+        r"javascript:",
+        r"on\w+\s*=",
+        r"eval\s*\(",
+        r"__import__",
+        r"exec\s*\(",
+    ]
+]
+
+SENTENCE = "How many rows are in the sales table for last quarter, broken down by region? "
+
+
+def previous_scan(text: str) -> bool:
+    """The per-pattern check the scanner replaced."""
+    return any(pattern.search(text) for pattern in PREVIOUS_PATTERNS)
+
+
+def build_bodies() -> list:
+    """(name, raw body) pairs, the largest at the 40KB moderation limit."""
+    bodies = []
+    for size in (1_000, 10_000, 40_000):
+        content = (SENTENCE * (size // len(SENTENCE) + 1))[:size]
+        bodies.append((f"benign {size // 1000}KB", {"content": content, "include_rag": True}))
+    for chunk in ("<script>", "onon"):
+        content = chunk * (10_000 // len(chunk))
+        bodies.append((f"adversarial {chunk!r} 10KB", {"content": content}))
+    return [(name, orjson.dumps(body)) for name, body in bodies]
+
+
+def measure(fn, arg, repeats: int) -> float:
+    """Median time of ``fn(arg)`` in milliseconds."""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(arg)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main(repeats: int = 20):
+    """Run the benchmark and print a comparison table."""
+    scanner = ContentScanner()
+
+    print("=" * 78)
+    print(f"Moderation scan time (median of {repeats} runs)")
+    print("=" * 78)
+    print(f"   {'body':<28} {'previous':>12} {'scan(text)':>12} {'scan_json':>12}")
+    for name, raw in build_bodies():
+        text = raw.decode()
+        parsed = orjson.loads(raw)
+        previous = measure(previous_scan, text, repeats)
+        single = measure(scanner.scan, text, repeats)
+        fields = measure(scanner.scan_json, parsed, repeats)
+        print(f"   {name:<28} {previous:10.3f}ms {single:10.3f}ms {fields:10.3f}ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
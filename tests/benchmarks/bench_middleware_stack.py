@@ -0,0 +1,157 @@
+"""Per-request overhead of the HTTP middleware stack.
+
+Compares, at the same depth (five layers) and against the same trivial
+JSON endpoint:
+
+1. ``BaseHTTPMiddleware`` pass-through layers (the cost the old stack paid
+   before doing any work of its own)
+2. Pure ASGI pass-through layers
+3. The real pure ASGI stack from ``src.middleware`` (auth, moderation,
+   memory injection, response structuring, audit logging)
+
+Requests are driven by calling the ASGI app directly, so no server or
+network time is included.
+
+Usage:
+    python -m tests.benchmarks.bench_middleware_stack [iterations]
+"""
+
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+from src.middleware.audit_logging_middleware import AuditLoggingMiddleware
+from src.middleware.auth_middleware import AuthenticationMiddleware
+from src.middleware.content_moderation_middleware import ContentModerationMiddleware
+from src.middleware.memory_injection_middleware import MemoryInjectionMiddleware
+from src.middleware.request_body import get_request_body
+from src.middleware.response_structuring_middleware import ResponseStructuringMiddleware
+
+STACK_DEPTH = 5
+BODY = b'{"content": "How many rows are in the sales table?", "include_rag": false}'
+
+
+async def endpoint(scope, receive, send):
+    """Trivial endpoint that consumes the body and returns a small JSON document."""
+    if scope["method"] == "POST":
+        await get_request_body(scope, receive)
+    await JSONResponse({"items": [1, 2, 3], "count": 3})(scope, receive, send)
+
+
+class PassThroughHTTPMiddleware(BaseHTTPMiddleware):
+    """BaseHTTPMiddleware layer that does nothing but call the next layer."""
+
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+class PassThroughASGIMiddleware:
+    """Pure ASGI layer that does nothing but call the next layer."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+
+
+def build_stack(layer_cls, app, depth: int = STACK_DEPTH):
+    """Wrap ``app`` in ``depth`` instances of ``layer_cls``."""
+    for _ in range(depth):
+        app = layer_cls(app)
+    return app
+
+
+def build_application_stack(app):
+    """Wrap ``app`` in the production middleware order (auth outermost)."""
+    app = AuditLoggingMiddleware(app)
+    app = ResponseStructuringMiddleware(app)
+    app = MemoryInjectionMiddleware(app)
+    app = ContentModerationMiddleware(app)
+    return AuthenticationMiddleware(app)
+
+
+async def run_request(app, method: str, path: str) -> None:
+    """Drive one request through an ASGI app."""
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 40000),
+    }
+    pending = [{"type": "http.request", "body": BODY if method == "POST" else b""}]
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        await asyncio.sleep(3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        return None
+
+    await app(scope, receive, send)
+
+
+async def measure(app, method: str, path: str, iterations: int) -> dict:
+    """Measure per-request latency in microseconds."""
+    for _ in range(min(iterations, 200)):
+        await run_request(app, method, path)
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await run_request(app, method, path)
+        samples.append((time.perf_counter() - start) * 1_000_000)
+
+    samples.sort()
+    return {
+        "mean_us": statistics.fmean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p99_us": samples[int(len(samples) * 0.99) - 1],
+    }
+
+
+async def main(iterations: int = 5000):
+    """Run the benchmark and print a comparison table."""
+    logging.disable(logging.CRITICAL)
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    cases = [
+        ("bare endpoint", endpoint),
+        (f"{STACK_DEPTH}x BaseHTTPMiddleware", build_stack(PassThroughHTTPMiddleware, endpoint)),
+        (f"{STACK_DEPTH}x pure ASGI", build_stack(PassThroughASGIMiddleware, endpoint)),
+        ("application stack (ASGI)", build_application_stack(endpoint)),
+    ]
+    requests = [
+        ("GET", "/api/v1/conversations"),
+        ("POST", "/api/v1/conversations/abc/messages"),
+    ]
+
+    print("=" * 72)
+    print(f"Middleware stack overhead ({iterations} requests per case)")
+    print("=" * 72)
+    for method, path in requests:
+        print(f"\n{method} {path}")
+        baseline = None
+        for name, app in cases:
+            result = await measure(app, method, path, iterations)
+            if baseline is None:
+                baseline = result["mean_us"]
+            print(
+                f"   {name:<28} mean {result['mean_us']:8.1f}us  "
+                f"p50 {result['p50_us']:8.1f}us  p99 {result['p99_us']:8.1f}us  "
+                f"overhead {result['mean_us'] - baseline:8.1f}us"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -0,0 +1,84 @@
+"""Benchmark for the GCRA rate limiting engine at 10k distinct keys.
+
+Compares the in-process GCRA table against the previous approach of
+per-key timestamp lists filtered on every check, for a workload where
+10,000 distinct keys (e.g. client IPs) each make repeated requests.
+
+Usage:
+    python -m tests.benchmarks.bench_rate_limiter [distinct_keys] [checks]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+from src.infrastructure.rate_limiter import RateLimiter
+
+LIMIT = 1000
+PERIOD = 60.0
+
+
+class TimestampListLimiter:
+    """The previous sliding-window approach: filter a list of timestamps per check."""
+
+    def __init__(self):
+        self.request_times = {}
+
+    def check(self, key: str, limit: int, period: float) -> bool:
+        now = time.time()
+        timestamps = [ts for ts in self.request_times.get(key, []) if now - ts < period]
+        self.request_times[key] = timestamps
+        if len(timestamps) >= limit:
+            return False
+        timestamps.append(now)
+        return True
+
+
+def run(check, keys, checks: int) -> dict:
+    """Run ``checks`` rate limit checks over ``keys`` and measure time and memory."""
+    rng = random.Random(42)
+    sequence = [rng.choice(keys) for _ in range(checks)]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for key in sequence:
+        check(key, LIMIT, PERIOD)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "checks_per_sec": checks / elapsed,
+        "us_per_check": elapsed / checks * 1_000_000,
+        "peak_mb": peak / (1024 * 1024),
+    }
+
+
+def main(distinct_keys: int = 10_000, checks: int = 500_000):
+    """Run the benchmark and print a comparison."""
+    keys = [f"ip:10.{i // 65536}.{(i // 256) % 256}.{i % 256}" for i in range(distinct_keys)]
+
+    print("=" * 72)
+    print(f"Rate limiter: {distinct_keys} distinct keys, {checks} checks")
+    print("=" * 72)
+
+    cases = [
+        ("timestamp lists (previous)", TimestampListLimiter().check),
+        ("GCRA, unbounded table", RateLimiter(max_keys=distinct_keys, backend="memory").check_local),
+        (
+            "GCRA, LRU bound = keys/2",
+            RateLimiter(max_keys=distinct_keys // 2, backend="memory").check_local,
+        ),
+    ]
+    for name, check in cases:
+        result = run(check, keys, checks)
+        print(
+            f"   {name:<28} {result['checks_per_sec']:>12,.0f} checks/s  "
+            f"{result['us_per_check']:6.2f}us/check  peak {result['peak_mb']:6.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,94 @@
+"""Streaming event throughput: events/sec per core against the chunk target.
+
+Measures, on one core, the per-token path of a streamed response:
+
+1. The previous path: a validated ``MessageChunkEvent``, converted to the
+   wire ``StreamingEvent`` and serialized with ``json.dumps`` (then encoded
+   by the response)
+2. The current path: a slotted ``MessageChunk`` (no validation) and the
+   templated ``to_ndjson_bytes`` encoding
+3. The current path through ``StreamingManager.stream`` (coalescing, bounded
+   queue), counted in model deltas per second
+
+and compares each with the >50 chunks/sec target of StreamingChatService
+(``StreamingConfig.chunk_throughput_target``).
+
+Usage:
+    python -m tests.benchmarks.bench_stream_events [events]
+"""
+
+import asyncio
+import sys
+import time
+
+from src.api.streaming_routes import StreamingManager, _to_streaming_event
+from src.models.streaming_models import (
+    MessageChunk,
+    MessageChunkEvent,
+    StreamEventType,
+    StreamingConfig,
+)
+
+DELTAS = ["Based", " on", " the", " search", " results", ",", " 异步", "编程", " works", "."]
+
+
+def previous_path(sequence: int, delta: str) -> bytes:
+    """Per-token work before the fast path."""
+    event = MessageChunkEvent(
+        type=StreamEventType.MESSAGE_CHUNK,
+        timestamp=time.time(),
+        sequence=sequence,
+        content=delta,
+        token_count=1,
+    )
+    return _to_streaming_event(event).to_ndjson().encode()
+
+
+def current_path(sequence: int, delta: str) -> bytes:
+    """Per-token work of stream_agent_response without coalescing."""
+    event = MessageChunk(time.time(), sequence, delta, token_count=1)
+    return _to_streaming_event(event).to_ndjson_bytes()
+
+
+def events_per_second(path, events: int) -> float:
+    """Events encoded per second by ``path``."""
+    start = time.perf_counter()
+    for i in range(events):
+        path(i, DELTAS[i % len(DELTAS)])
+    return events / (time.perf_counter() - start)
+
+
+async def stream_events_per_second(events: int) -> float:
+    """Model deltas per second through StreamingManager.stream."""
+
+    async def source():
+        for i in range(events):
+            event = MessageChunk(time.time(), i, DELTAS[i % len(DELTAS)], token_count=1)
+            yield _to_streaming_event(event)
+
+    manager = StreamingManager()
+    start = time.perf_counter()
+    async for event in manager.stream(source()):
+        event.to_ndjson_bytes()
+    return events / (time.perf_counter() - start)
+
+
+def main(events: int = 100_000):
+    """Run the benchmark and print a comparison table."""
+    target = StreamingConfig().chunk_throughput_target
+    rows = [
+        ("previous (validated, json.dumps)", events_per_second(previous_path, events)),
+        ("MessageChunk + template", events_per_second(current_path, events)),
+        ("StreamingManager.stream", asyncio.run(stream_events_per_second(events))),
+    ]
+
+    print("=" * 78)
+    print(f"Stream events per second, one core ({events} events, target >{target}/sec)")
+    print("=" * 78)
+    print(f"   {'path':<36} {'events/sec':>14} {'x target':>12}")
+    for name, rate in rows:
+        print(f"   {name:<36} {rate:14,.0f} {rate / target:12,.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,315 @@
+"""
+Unit tests for the HTTP cache middleware (ETag / conditional GET, raw-byte storage).
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+import src.middleware.cache_middleware as cache_middleware
+from src.api.responses import StructuredJSONResponse
+from src.middleware.cache_middleware import (
+    CacheMiddleware,
+    compute_etag,
+    etag_matches,
+    invalidate_http_cache,
+    invalidate_resource_cache,
+)
+from src.middleware.response_structuring_middleware import ResponseStructuringMiddleware
+
+
+class InMemoryCache:
+    """Minimal stand-in for RedisCache used by the middleware."""
+
+    def __init__(self):
+        self._initialized = True
+        self.store = {}
+        self.reads = []
+
+    async def set(self, key, value, ttl=None):
+        self.store[key] = json.dumps(value).encode()
+        return True
+
+    async def get_bytes(self, key):
+        self.reads.append([key])
+        return self.store.get(key)
+
+    async def get_many_bytes(self, keys):
+        self.reads.append(keys)
+        return [self.store.get(key) for key in keys]
+
+    async def set_bytes(self, key, value, ttl=None):
+        assert isinstance(value, bytes)
+        self.store[key] = value
+        return True
+
+    async def incr(self, key, ttl=None):
+        value = int(self.store.get(key) or 0) + 1
+        self.store[key] = str(value).encode()
+        return value
+
+    async def incr_many(self, keys, ttl=None):
+        for key in keys:
+            await self.incr(key, ttl)
+        return True
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    fake = InMemoryCache()
+    monkeypatch.setattr(cache_middleware, "get_redis_cache", lambda: fake)
+    return fake
+
+
+@pytest.fixture
+def app_and_calls(cache):
+    app = FastAPI()
+    app.add_middleware(
+        CacheMiddleware,
+        default_ttl=60,
+        cacheable_paths=["/api/v1/conversations", "/api/v1/export", "/api/v1/stream"],
+    )
+    calls = {"count": 0, "items": ["a", "b"]}
+
+    @app.get("/health")
+    async def health():
+        calls["count"] += 1
+        return {"status": "ok"}
+
+    @app.get("/api/v1/conversations")
+    async def list_conversations():
+        calls["count"] += 1
+        return {"items": calls["items"]}
+
+    @app.get("/api/v1/export")
+    async def export_text():
+        calls["count"] += 1
+        return PlainTextResponse("caf\xe9 \u2615\n")
+
+    @app.get("/api/v1/stream")
+    async def stream():
+        calls["count"] += 1
+
+        async def lines():
+            yield b'{"n":1}\n'
+            yield b'{"n":2}\n'
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.post("/api/v1/conversations")
+    async def create_conversation():
+        calls["items"].append("c")
+        return {"ok": True}
+
+    @app.get("/api/v1/conversations/{conversation_id}/messages")
+    async def list_messages(conversation_id: str):
+        calls["count"] += 1
+        return {"conversation": conversation_id, "items": calls["items"]}
+
+    @app.post("/api/v1/conversations/abc/prefetch")
+    async def prefetch_draft():
+        return {"scheduled": True}
+
+    return app, calls
+
+
+class TestEtagHelpers:
+    """Tests for ETag helpers."""
+
+    def test_compute_etag_is_strong_and_stable(self):
+        etag = compute_etag(b'{"a":1}')
+        assert etag.startswith('"') and etag.endswith('"')
+        assert etag == compute_etag(b'{"a":1}')
+        assert etag != compute_etag(b'{"a":2}')
+
+    def test_etag_matches_lists_and_weak_tags(self):
+        etag = '"abc"'
+        assert etag_matches('"abc"', etag)
+        assert etag_matches('W/"abc"', etag)
+        assert etag_matches('"x", "abc"', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches('"abd"', etag)
+        assert not etag_matches("", etag)
+
+
+class TestCacheMiddleware:
+    """Tests for conditional GET handling."""
+
+    def test_miss_sets_validators(self, app_and_calls):
+        app, calls = app_and_calls
+        client = TestClient(app)
+
+        response = client.get("/api/v1/conversations")
+
+        assert response.status_code == 200
+        assert response.headers["etag"] == compute_etag(response.content)
+        assert response.headers["cache-control"] == "private, no-cache"
+        assert "Authorization" in response.headers["vary"]
+        assert calls["count"] == 1
+
+    def test_if_none_match_returns_304_without_handler(self, app_and_calls, cache):
+        app, calls = app_and_calls
+        client = TestClient(app)
+
+        etag = client.get("/api/v1/conversations").headers["etag"]
+        cache.reads.clear()
+
+        response = client.get("/api/v1/conversations", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        assert calls["count"] == 1
+        # Only the small ETag key (and the generations) is read on revalidation
+        [keys] = cache.reads
+        assert ":etag:" in keys[0]
+        assert not any(":body:" in key for key in keys)
+
+    def test_cache_hit_replays_identical_bytes(self, app_and_calls):
+        app, calls = app_and_calls
+        client = TestClient(app)
+
+        first = client.get("/api/v1/conversations")
+        second = client.get("/api/v1/conversations")
+
+        assert second.status_code == 200
+        assert second.content == first.content
+        assert second.headers["etag"] == first.headers["etag"]
+        assert calls["count"] == 1
+
+    def test_write_invalidates_callers_entries(self, app_and_calls):
+        app, calls = app_and_calls
+        client = TestClient(app)
+
+        etag = client.get("/api/v1/conversations").headers["etag"]
+        client.post("/api/v1/conversations")
+
+        response = client.get("/api/v1/conversations", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.json() == {"items": ["a", "b", "c"]}
+        assert response.headers["etag"] != etag
+        assert calls["count"] == 2
+
+    def test_draft_prefetch_does_not_invalidate(self, app_and_calls, cache):
+        app, calls = app_and_calls
+        client = TestClient(app)
+        client.get("/api/v1/conversations")
+
+        for _ in range(3):
+            client.post("/api/v1/conversations/abc/prefetch")
+        response = client.get("/api/v1/conversations")
+
+        assert response.status_code == 200
+        assert calls["count"] == 1
+        assert not any(key.startswith("http:gen:") for key in cache.store)
+
+    def test_invalidation_by_path_prefix_reaches_all_users(self, app_and_calls):
+        app, calls = app_and_calls
+        client = TestClient(app)
+        etags = {
+            user: client.get("/api/v1/conversations", headers={"X-User-ID": user}).headers["etag"]
+            for user in ("alice", "bob")
+        }
+
+        asyncio.run(invalidate_http_cache("/api/v1/conversations"))
+
+        for user, etag in etags.items():
+            response = client.get(
+                "/api/v1/conversations", headers={"X-User-ID": user, "If-None-Match": etag}
+            )
+            assert response.status_code == 304  # body unchanged, tag re-validated by handler
+        assert calls["count"] == 4
+
+    def test_resource_invalidation_keeps_other_entries(self, app_and_calls):
+        app, calls = app_and_calls
+        client = TestClient(app)
+        urls = [
+            "/api/v1/conversations",
+            "/api/v1/conversations/abc/messages",
+            "/api/v1/conversations/xyz/messages",
+        ]
+        for user in ("alice", "bob"):
+            for url in urls:
+                client.get(url, headers={"X-User-ID": user})
+        assert calls["count"] == 6
+
+        asyncio.run(invalidate_resource_cache(["abc"], ["h:alice"]))
+
+        for user in ("alice", "bob"):
+            for url in urls:
+                client.get(url, headers={"X-User-ID": user})
+        # Re-rendered: everything in alice's scope and bob's copy of abc
+        assert calls["count"] == 10
+
+    def test_paths_outside_allowlist_are_not_cached(self, app_and_calls, cache):
+        app, calls = app_and_calls
+        client = TestClient(app)
+
+        client.get("/health")
+        response = client.get("/health")
+
+        assert "etag" not in response.headers
+        assert calls["count"] == 2
+        assert not any("/health" in key for key in cache.store)
+
+    def test_entries_are_scoped_per_user(self, app_and_calls):
+        app, calls = app_and_calls
+        client = TestClient(app)
+
+        client.get("/api/v1/conversations", headers={"X-User-ID": "alice"})
+        client.get("/api/v1/conversations", headers={"X-User-ID": "bob"})
+
+        assert calls["count"] == 2
+
+    def test_non_json_bodies_are_replayed_byte_for_byte(self, app_and_calls):
+        app, calls = app_and_calls
+        client = TestClient(app)
+
+        first = client.get("/api/v1/export")
+        second = client.get("/api/v1/export")
+
+        assert second.content == first.content == "caf\xe9 \u2615\n".encode()
+        assert second.headers["content-type"] == first.headers["content-type"]
+        assert calls["count"] == 1
+
+    def test_streaming_responses_bypass_cache(self, app_and_calls, cache):
+        app, calls = app_and_calls
+        client = TestClient(app)
+
+        first = client.get("/api/v1/stream")
+        second = client.get("/api/v1/stream")
+
+        assert first.content == second.content == b'{"n":1}\n{"n":2}\n'
+        assert "etag" not in first.headers
+        assert calls["count"] == 2
+        assert not any("/api/v1/stream" in key for key in cache.store)
+
+
+def test_envelope_is_applied_outside_cached_payload(cache):
+    app = FastAPI(default_response_class=StructuredJSONResponse)
+    app.add_middleware(CacheMiddleware, default_ttl=60, cacheable_paths=["/api/messages"])
+    app.add_middleware(ResponseStructuringMiddleware)
+    calls = {"count": 0}
+
+    @app.get("/api/messages/1")
+    async def get_message():
+        calls["count"] += 1
+        return {"id": "1", "content": "hi"}
+
+    client = TestClient(app)
+    first = client.get("/api/messages/1")
+    second = client.get("/api/messages/1")
+    revalidated = client.get("/api/messages/1", headers={"If-None-Match": first.headers["etag"]})
+
+    assert calls["count"] == 1
+    assert first.json()["data"] == second.json()["data"] == {"id": "1", "content": "hi"}
+    # Each response gets its own envelope; the tag covers the stable payload
+    assert first.json()["request_id"] != second.json()["request_id"]
+    assert first.headers["etag"] == second.headers["etag"]
+    assert first.headers["etag"] == compute_etag(b'{"id":"1","content":"hi"}')
+    assert revalidated.status_code == 304
@@ -0,0 +1,112 @@
+"""Unit tests for the bounded Claude API cost tracker and memoized token counts."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.infrastructure.claude_cost_tracker import ClaudeApiCostTracker
+from src.utils import tokens
+
+
+class FakeSession:
+    """Records executemany parameter lists; fails while ``fail`` is set."""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, params):
+        if self.db.fail:
+            raise RuntimeError("database unavailable")
+        self.db.batches.append(params)
+
+    async def commit(self):
+        pass
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    def session(self):
+        return FakeSession(self)
+
+
+def test_records_are_bounded_but_summary_covers_all_calls():
+    tracker = ClaudeApiCostTracker(max_records=3, persist=False)
+
+    for i in range(10):
+        tracker.record_api_call(
+            query_tokens=100, cache_read_tokens=1000, user_id="u1" if i % 2 else "u2",
+            cache_hit=True,
+        )
+
+    assert len(tracker.records) == 3
+    summary = tracker.get_summary()
+    assert summary["total_calls"] == 10
+    assert summary["cache_hits"] == 10
+    assert summary["total_tokens"] == 11000
+    assert summary["total_cost"] == round(10 * (0.0003 + 0.0003), 4)
+    assert tracker.get_user_summary("u1")["total_calls"] == 5
+    assert tracker.get_user_summary("nobody")["total_calls"] == 0
+
+
+def test_daily_summary_uses_hourly_totals():
+    tracker = ClaudeApiCostTracker(persist=False, retention_days=3)
+    now = datetime.utcnow()
+
+    tracker.record_api_call(query_tokens=1000, timestamp=now - timedelta(days=10))
+    tracker.record_api_call(query_tokens=1000, timestamp=now - timedelta(days=2))
+    tracker.record_api_call(query_tokens=1000, timestamp=now)
+
+    assert tracker.get_daily_summary(days_back=1)["total_calls"] == 1
+    assert tracker.get_daily_summary(days_back=3)["total_calls"] == 2
+    # Hours older than the retention period are dropped
+    assert len(tracker._hourly_totals) == 2
+    assert tracker.get_summary()["total_calls"] == 3
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_batches_and_retries_failures():
+    db = FakeDatabase()
+    tracker = ClaudeApiCostTracker(persist=True, persist_batch_size=2, session_factory=db.session)
+
+    tracker.record_api_call(query_tokens=10, user_id="u")
+    db.fail = True
+    tracker.record_api_call(query_tokens=20, user_id="u")  # schedules a flush
+    await tracker._flush_task
+    assert db.batches == []
+
+    db.fail = False
+    tracker.record_api_call(query_tokens=30, user_id="u")
+    assert await tracker.flush() == 3
+    assert [len(batch) for batch in db.batches] == [2, 1]
+    assert [row["query_tokens"] for batch in db.batches for row in batch] == [10, 20, 30]
+
+
+def test_token_counts_are_memoized(monkeypatch):
+    calls = []
+
+    def count(text):
+        calls.append(text)
+        return len(text.split())
+
+    monkeypatch.setattr(tokens, "count_tokens", count)
+    monkeypatch.setattr(tokens, "_token_counts", type(tokens._token_counts)())
+    monkeypatch.setattr(tokens, "TOKEN_COUNT_CACHE_SIZE", 2)
+
+    assert tokens.count_tokens_cached("a b c") == 3
+    assert tokens.count_tokens_cached("a b c") == 3
+    assert len(calls) == 1
+
+    tokens.count_tokens_cached("d")
+    tokens.count_tokens_cached("e f")
+    assert len(tokens._token_counts) == 2
+    tokens.count_tokens_cached("a b c")
+    assert len(calls) == 4
@@ -0,0 +1,110 @@
+"""Unit tests for the single-pass moderation scanner."""
+
+import re
+import time
+
+import pytest
+
+from src.middleware.content_scanner import (
+    INJECTION_ATTEMPT,
+    SQL_INJECTION,
+    ContentScanner,
+    iter_json_strings,
+)
+
+# The per-pattern checks the scanner replaces, used as the reference behavior
+REFERENCE_SQL = [
+    r"(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|EXECUTE)\b)",
+    r"('|\")\s*(OR|AND)\s*('|\")?",
+    r"--\s*$",
+    r"/\*.*\*/",
+    r";\s*(DROP|DELETE|TRUNCATE|UPDATE)",
+]
+REFERENCE_INJECTION = [
+    r"<script[^>]*>.*?</script>",
+    r"javascript:",
+    r"on\w+\s*=",
+    r"eval\s*\(",
+    r"__import__",
+    r"exec\s*\(",
+]
+
+
+def reference_scan(text):
+    for pattern in REFERENCE_SQL:
+        if re.search(pattern, text, re.IGNORECASE):
+            return SQL_INJECTION
+    for pattern in REFERENCE_INJECTION:
+        if re.search(pattern, text, re.IGNORECASE):
+            return INJECTION_ATTEMPT
+    return None
+
+
+@pytest.fixture
+def scanner():
+    return ContentScanner()
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "How many rows are in the sales table?",
+        "'; DROP TABLE users; --",
+        "1' OR '1'='1",
+        "admin' --  \n",
+        "a /* hidden */ b",
+        "a /* not closed\n */",
+        "x; truncate logs",
+        "Select the best option",
+        "<script>alert('xss')</script>",
+        "<SCRIPT src=x>\n</script>",
+        "<script type=module>alert(1)\n</script>",
+        "<a href='JavaScript:alert(1)'>",
+        "<img src=x onerror = alert(1)>",
+        "configuration=1",
+        "on=1",
+        "onon",
+        "eval (payload)",
+        "__import__('os')",
+        "xexec(cmd)",
+        "exec(cmd)",
+        "<script>x</script> and then DROP",
+    ],
+)
+def test_matches_reference_patterns(scanner, text):
+    assert scanner.scan(text) == reference_scan(text)
+
+
+def test_sql_takes_precedence_over_injection(scanner):
+    assert scanner.scan("<script>x</script> ... ; DELETE") == SQL_INJECTION
+    assert scanner.scan_json({"a": "javascript:x", "b": "; drop"}) == SQL_INJECTION
+
+
+def test_scan_json_scans_keys_and_nested_values(scanner):
+    assert scanner.scan_json({"outer": [{"onclick=": 1}]}) == INJECTION_ATTEMPT
+    assert scanner.scan_json({"items": ["fine", {"deep": "eval(x)"}]}) == INJECTION_ATTEMPT
+    assert scanner.scan_json({"content": "order by region", "n": 3}) is None
+
+
+def test_iter_json_strings_skips_non_strings():
+    assert sorted(iter_json_strings({"a": [1, "b", None, {"c": True}]})) == ["a", "b", "c"]
+
+
+@pytest.mark.parametrize(
+    "chunk",
+    ["<script>", "<script", "on", "/*", "'", "onon_"],
+)
+def test_adversarial_input_scans_in_linear_time(scanner, chunk):
+    small = chunk * 2_000
+    large = chunk * 20_000
+
+    start = time.perf_counter()
+    scanner.scan(small)
+    small_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scanner.scan(large)
+    large_time = time.perf_counter() - start
+
+    # 10x the input must not cost anywhere near 100x the time
+    assert large_time < max(small_time, 1e-4) * 40
@@ -0,0 +1,109 @@
+"""Unit tests for the token-budgeted context assembler."""
+
+import pytest
+
+from src.services import context_assembler as assembler_module
+from src.services.context_assembler import (
+    EXCERPT_OVERHEAD_TOKENS,
+    MESSAGE_OVERHEAD_TOKENS,
+    ContextAssembler,
+)
+
+
+@pytest.fixture(autouse=True)
+def word_tokenizer(monkeypatch):
+    """Count whitespace-separated words instead of loading a BPE file."""
+    monkeypatch.setattr(assembler_module, "count_tokens", lambda text: len(text.split()))
+
+
+def message(i, tokens=10):
+    role = "user" if i % 2 == 0 else "assistant"
+    return {"role": role, "content": f"m{i}", "tokens_used": tokens}
+
+
+def chunk(text, similarity):
+    return {"chunk_text": text, "document_id": "d", "chunk_index": 0, "similarity": similarity}
+
+
+def test_everything_fits_within_budget():
+    assembler = ContextAssembler(token_budget=1000)
+    history = [message(i) for i in range(5)]
+
+    context = assembler.assemble("be brief", "hello there", history, [chunk("a b c", 0.9)], "s")
+
+    assert context.history == history
+    assert context.summary == "s"
+    assert len(context.rag_chunks) == 1
+    assert context.total_tokens <= 1000
+    assert context.dropped_messages == 0
+
+
+@pytest.mark.parametrize("budget", [40, 75, 120, 200, 300])
+def test_budget_is_respected(budget):
+    assembler = ContextAssembler(token_budget=budget, rag_share=0.5, min_recent_messages=2)
+    history = [message(i, tokens=i + 1) for i in range(30)]
+    chunks = [chunk(" ".join(["w"] * n), similarity=n / 10) for n in range(1, 8)]
+
+    context = assembler.assemble("system", "question", history, chunks, summary="earlier stuff")
+
+    assert context.total_tokens <= budget
+    # Kept history is a suffix: the most recent messages survive
+    assert context.history == history[len(history) - len(context.history):]
+    assert context.tokens["history"] == sum(
+        assembler.message_tokens(msg) for msg in context.history
+    )
+
+
+def test_oldest_history_dropped_first_and_stored_counts_used(monkeypatch):
+    monkeypatch.setattr(
+        assembler_module, "count_tokens", lambda text: pytest.fail(f"re-tokenized {text!r}")
+    )
+    assembler = ContextAssembler(token_budget=50, min_recent_messages=0)
+    history = [message(i, tokens=6) for i in range(10)]
+
+    context = assembler.assemble("", "", history)
+
+    per_message = 6 + MESSAGE_OVERHEAD_TOKENS
+    assert len(context.history) == 50 // per_message
+    assert context.history[-1] is history[-1]
+    assert context.dropped_messages == 10 - len(context.history)
+
+
+def test_rag_deduplicated_against_history_and_itself():
+    assembler = ContextAssembler(token_budget=1000)
+    history = [
+        {"role": "assistant", "content": "as noted, the deadline is friday", "tokens_used": 6}
+    ]
+    chunks = [
+        chunk("the deadline is friday", 0.95),
+        chunk("budget was approved", 0.9),
+        chunk("budget was approved", 0.8),
+    ]
+
+    context = assembler.assemble("sys", "when?", history, chunks)
+
+    assert [c["chunk_text"] for c in context.rag_chunks] == ["budget was approved"]
+    assert context.dropped_chunks == 2
+
+
+def test_rag_limited_to_its_share_by_similarity():
+    assembler = ContextAssembler(token_budget=200, rag_share=0.25)
+    chunks = [chunk("low " * 10, 0.5), chunk("high " * 10, 0.9), chunk("mid " * 10, 0.7)]
+
+    context = assembler.assemble("sys", "q", [], chunks)
+
+    per_chunk = 10 + EXCERPT_OVERHEAD_TOKENS
+    assert context.tokens["rag"] <= 50
+    assert len(context.rag_chunks) == 50 // per_chunk
+    assert context.rag_chunks[0]["similarity"] == 0.9
+
+
+def test_recent_messages_outrank_summary():
+    assembler = ContextAssembler(token_budget=40, min_recent_messages=2)
+    history = [message(i, tokens=10) for i in range(4)]
+
+    context = assembler.assemble("", "", history, summary=" ".join(["x"] * 20))
+
+    assert context.history == history[-2:]
+    assert context.summary is None
+    assert context.total_tokens <= 40
@@ -0,0 +1,209 @@
+"""Unit tests for the conversation memory service."""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+import src.repositories.message as message_repository
+from src.services.memory_service import MemoryService
+
+
+class FakeRedisCache:
+    """Stand-in for the RedisCache message caching methods."""
+
+    def __init__(self):
+        self._initialized = True
+        self.store = {}
+
+    async def get_conversation_messages(self, conversation_id):
+        value = self.store.get(conversation_id)
+        return list(value) if value is not None else None
+
+    async def set_conversation_messages(self, conversation_id, messages, ttl=None):
+        self.store[conversation_id] = list(messages)
+        return True
+
+    async def delete_conversation_messages(self, conversation_id):
+        return self.store.pop(conversation_id, None) is not None
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def make_message(content, role="user"):
+    return SimpleNamespace(
+        id=uuid4(),
+        role=role,
+        content=content,
+        tokens_used=len(content.split()),
+        created_at=datetime.now(timezone.utc),
+    )
+
+
+@pytest.fixture
+def db_messages(monkeypatch):
+    """Messages returned by the patched MessageRepository, and a call log."""
+    state = {"messages": [make_message(f"m{i}") for i in range(3)], "calls": 0, "delay": 0.0}
+
+    class FakeMessageRepository:
+        def __init__(self, session):
+            pass
+
+        async def get_conversation_messages_desc(self, conversation_id, skip=0, limit=50):
+            state["calls"] += 1
+            await asyncio.sleep(state["delay"])
+            return state["messages"][-limit:]
+
+    monkeypatch.setattr(message_repository, "MessageRepository", FakeMessageRepository)
+    return state
+
+
+@pytest.fixture
+def cache():
+    return FakeRedisCache()
+
+
+@pytest.fixture
+def memory(cache):
+    return MemoryService(session_factory=FakeSession, redis_cache=cache)
+
+
+CONVERSATION_ID = str(uuid4())
+
+
+class TestHistory:
+    """Tests for the cached history window."""
+
+    @pytest.mark.asyncio
+    async def test_miss_reads_database_and_fills_cache(self, memory, cache, db_messages):
+        history = await memory.get_history(CONVERSATION_ID, limit=5)
+
+        assert [m["content"] for m in history] == ["m0", "m1", "m2"]
+        assert cache.store[CONVERSATION_ID] == history
+        assert db_messages["calls"] == 1
+
+    @pytest.mark.asyncio
+    async def test_hit_skips_database(self, memory, db_messages):
+        await memory.get_history(CONVERSATION_ID, limit=5)
+        history = await memory.get_history(CONVERSATION_ID, limit=2)
+
+        assert [m["content"] for m in history] == ["m1", "m2"]
+        assert db_messages["calls"] == 1
+
+    @pytest.mark.asyncio
+    async def test_record_message_appends_to_cached_window(self, memory, cache, db_messages):
+        memory.history_limit = 3
+        await memory.get_history(CONVERSATION_ID, limit=3)
+
+        await memory.record_message(CONVERSATION_ID, make_message("m3", role="assistant"))
+
+        assert [m["content"] for m in cache.store[CONVERSATION_ID]] == ["m1", "m2", "m3"]
+
+    @pytest.mark.asyncio
+    async def test_record_message_without_window_is_noop(self, memory, cache):
+        await memory.record_message(CONVERSATION_ID, make_message("m3"))
+
+        assert cache.store == {}
+
+    @pytest.mark.asyncio
+    async def test_read_overlapping_a_write_does_not_fill_cache(self, memory, cache, db_messages):
+        db_messages["delay"] = 0.05
+        read = asyncio.create_task(memory.get_history(CONVERSATION_ID, limit=5))
+        await asyncio.sleep(0.01)
+        await memory.record_message(CONVERSATION_ID, make_message("m3"))
+        await read
+
+        assert CONVERSATION_ID not in cache.store
+
+
+class TestLoad:
+    """Tests for concurrent loading under a time budget."""
+
+    @pytest.mark.asyncio
+    async def test_history_and_rag_run_concurrently(self, memory, db_messages):
+        db_messages["delay"] = 0.1
+
+        async def rag(query, user_id):
+            await asyncio.sleep(0.1)
+            return [{"document_id": "d1", "chunk_index": 0, "chunk_text": "x", "similarity": 0.9}]
+
+        memory.get_rag_context = rag
+
+        start = time.perf_counter()
+        context = await memory.load(CONVERSATION_ID, "alice", "question", timeout=1.0)
+        elapsed = time.perf_counter() - start
+
+        assert context["history_count"] == 3
+        assert context["rag_count"] == 1
+        assert "memory_error" not in context
+        assert elapsed < 0.18
+
+    @pytest.mark.asyncio
+    async def test_timeout_keeps_finished_parts(self, memory, db_messages):
+        async def slow_rag(query, user_id):
+            await asyncio.sleep(1)
+            return [{"chunk_text": "late"}]
+
+        memory.get_rag_context = slow_rag
+
+        context = await memory.load(
+            CONVERSATION_ID, "alice", "question", timeout=0.05, rag_timeout=0.05
+        )
+
+        assert context["history_count"] == 3
+        assert context["rag_context"] == []
+        assert "rag_context: timeout" in context["memory_error"]
+
+    @pytest.mark.asyncio
+    async def test_history_budget_does_not_cut_rag(self, memory, db_messages):
+        async def rag(query, user_id):
+            await asyncio.sleep(0.1)
+            return [{"document_id": "d1", "chunk_index": 0, "chunk_text": "x", "similarity": 0.9}]
+
+        memory.get_rag_context = rag
+
+        context = await memory.load(CONVERSATION_ID, "alice", "question", timeout=0.02)
+
+        assert context["history_count"] == 3
+        assert context["rag_count"] == 1
+        assert "memory_error" not in context
+
+    @pytest.mark.asyncio
+    async def test_include_rag_false_skips_search(self, memory, db_messages):
+        async def fail(query, user_id):
+            raise AssertionError("RAG should not run")
+
+        memory.get_rag_context = fail
+
+        context = await memory.load(CONVERSATION_ID, "alice", "question", include_rag=False)
+
+        assert context["rag_count"] == 0
+        assert "memory_error" not in context
+
+    @pytest.mark.asyncio
+    async def test_prefetched_draft_is_reused(self, memory, db_messages):
+        queries = []
+
+        async def rag(query, user_id):
+            queries.append(query)
+            return [{"chunk_text": query}]
+
+        memory.prefetcher._search = rag
+        memory.prefetcher.debounce = 0
+        memory.get_rag_context = rag
+
+        memory.prefetcher.submit(CONVERSATION_ID, "alice", "what changed in the release")
+        await asyncio.sleep(0.01)
+        context = await memory.load(CONVERSATION_ID, "alice", "What changed in the release?")
+
+        assert context["rag_context"] == [{"chunk_text": "what changed in the release"}]
+        assert queries == ["what changed in the release"]
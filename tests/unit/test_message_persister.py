@@ -0,0 +1,256 @@
+"""Unit tests for write-behind message persistence."""
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from src.services import message_persister as persister_module
+from src.services.message_persister import MessagePersister
+
+
+class FakeDatabase:
+    """
+    Records transactions; rows of `bad_conversations` fail the INSERT, and the
+    next `outages` INSERTs fail as if the database were unreachable.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.commits = []
+        self.bad_conversations = set()
+        self.outages = 0
+        self.total_tokens = {}
+
+    def session(self):
+        return FakeSession(self)
+
+
+class FakeSession:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+        self.added = []
+        self.deltas = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, rows):
+        if statement.is_update:
+            self.deltas.extend(rows)
+            return
+        await asyncio.sleep(self.db.delay)
+        if self.db.outages:
+            self.db.outages -= 1
+            raise OperationalError("INSERT", {}, ConnectionRefusedError("connection refused"))
+        if any(row["conversation_id"] in self.db.bad_conversations for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("foreign key violation"))
+        self.rows.extend(rows)
+
+    def add_all(self, records):
+        self.added.extend(records)
+
+    async def commit(self):
+        self.db.commits.append({"rows": self.rows, "records": self.added})
+        for delta in self.deltas:
+            totals = self.db.total_tokens
+            totals[delta["conv_id"]] = totals.get(delta["conv_id"], 0) + delta["delta"]
+
+    async def rollback(self):
+        pass
+
+
+@pytest.fixture
+def db():
+    return FakeDatabase()
+
+
+@pytest.fixture(autouse=True)
+def word_tokenizer(monkeypatch):
+    """Count whitespace-separated words instead of loading a BPE file."""
+    monkeypatch.setattr(persister_module, "count_tokens", lambda text: len(text.split()))
+
+
+def persister(db, **kwargs):
+    kwargs.setdefault("flush_interval", 0.02)
+    return MessagePersister(session_factory=db.session, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_async_save_returns_before_write_and_batches_conversations(db):
+    store = persister(db, durability="async")
+    conversations = [uuid4() for _ in range(3)]
+
+    messages = [await store.save(conv, "user", f"hi {i}") for i, conv in enumerate(conversations)]
+
+    assert db.commits == []
+    assert all(message.id and message.created_at for message in messages)
+
+    await asyncio.sleep(0.05)
+    assert len(db.commits) == 1
+    assert [row["id"] for row in db.commits[0]["rows"]] == [m.id for m in messages]
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_durability_waits_for_shared_commit(db):
+    store = persister(db, durability="batch")
+
+    await asyncio.gather(*(store.save(uuid4(), "user", f"m{i}") for i in range(10)))
+
+    assert len(db.commits) == 1
+    assert len(db.commits[0]["rows"]) == 10
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_sync_durability_writes_each_message(db):
+    store = persister(db, durability="sync")
+    conversation_id = uuid4()
+
+    await store.save(conversation_id, "user", "one")
+    assert len(db.commits) == 1
+
+    db.bad_conversations.add(conversation_id)
+    with pytest.raises(IntegrityError, match="foreign key"):
+        await store.save(conversation_id, "user", "two")
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_per_message(db):
+    store = persister(db, durability="batch")
+    good, bad = uuid4(), uuid4()
+    db.bad_conversations.add(bad)
+
+    results = await asyncio.gather(
+        store.save(good, "user", "kept"),
+        store.save(bad, "user", "lost"),
+        store.save(good, "assistant", "kept too"),
+        return_exceptions=True,
+    )
+
+    assert isinstance(results[1], IntegrityError)
+    assert [row["content"] for commit in db.commits for row in commit["rows"]] == [
+        "kept", "kept too"
+    ]
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_async_writes_survive_database_outage(db):
+    store = persister(db, durability="async", retry_delay=0.01)
+    db.outages = 3
+
+    messages = [await store.save(uuid4(), "user", f"m{i}") for i in range(3)]
+    await asyncio.sleep(0.2)
+
+    assert db.outages == 0
+    assert [row["id"] for commit in db.commits for row in commit["rows"]] == [
+        m.id for m in messages
+    ]
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_requeued_writes_are_bounded_by_max_pending(db):
+    store = persister(db, durability="async", flush_interval=10.0, max_pending=2)
+    db.outages, db.delay = 1, 0.02
+    for i in range(2):
+        await store.save(uuid4(), "user", f"m{i}")
+
+    flush = asyncio.create_task(store.flush())
+    await asyncio.sleep(0.01)  # the INSERT is in progress
+    await store.save(uuid4(), "user", "m2")
+    assert not await flush
+
+    # The oldest write is dropped to keep the queue within max_pending
+    assert store.pending_count == 2
+    await store.close()
+    assert [row["content"] for commit in db.commits for row in commit["rows"]] == ["m1", "m2"]
+
+
+@pytest.mark.asyncio
+async def test_commit_listeners_run_after_commit(db):
+    store = persister(db, durability="async")
+    committed = []
+
+    async def listener(messages):
+        committed.append((len(db.commits), [m.content for m in messages]))
+
+    store.add_commit_listener(listener)
+    await store.save(uuid4(), "user", "one")
+    await store.save(uuid4(), "user", "two")
+    assert committed == []
+
+    await asyncio.sleep(0.05)
+    assert committed == [(1, ["one", "two"])]
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_batches_are_split_by_batch_size(db):
+    store = persister(db, durability="batch", batch_size=4)
+
+    await asyncio.gather(*(store.save(uuid4(), "user", f"m{i}") for i in range(10)))
+
+    assert [len(commit["rows"]) for commit in db.commits] == [4, 4, 2]
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_pending_messages(db):
+    store = persister(db, durability="async", flush_interval=10.0)
+
+    await store.save(uuid4(), "user", "pending")
+    assert store.pending_count == 1
+
+    await store.close()
+
+    assert store.pending_count == 0
+    assert len(db.commits) == 1
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_written_with_their_message(db):
+    store = persister(db, durability="batch")
+
+    message = await store.save(
+        uuid4(),
+        "assistant",
+        "answer",
+        tool_calls=[{"id": "c1", "name": "web_search", "input": {"query": "q"}}],
+        tool_results=[{"id": "c1", "output": "result", "execution_time_ms": 12.5}],
+    )
+
+    (commit,) = db.commits
+    (record,) = commit["records"]
+    assert record.message_id == message.id
+    assert record.tool_name == "web_search"
+    assert record.status == "completed"
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_token_totals_updated_per_conversation(db):
+    store = persister(db, durability="batch")
+    first, second = uuid4(), uuid4()
+
+    messages = await asyncio.gather(
+        store.save(first, "user", "one two three"),
+        store.save(first, "assistant", "four five"),
+        store.save(second, "user", "six", tokens_used=10),
+    )
+
+    assert [message.tokens_used for message in messages] == [3, 2, 10]
+    assert db.total_tokens == {first: 5, second: 10}
+    await store.close()
+
+
+def test_invalid_durability_is_rejected():
+    with pytest.raises(ValueError):
+        MessagePersister(durability="eventually")
@@ -1,75 +1,369 @@
 """Unit tests for middleware functionality."""
 
+import json
+
 import pytest
 from unittest.mock import Mock, patch, AsyncMock
-from fastapi import Request
 from starlette.responses import JSONResponse
 
 from src.middleware.auth_middleware import AuthenticationMiddleware
 from src.middleware.content_moderation_middleware import ContentModerationMiddleware
+from src.middleware.memory_injection_middleware import MemoryInjectionMiddleware
 from src.middleware.response_structuring_middleware import ResponseStructuringMiddleware
 
 
+def make_scope(path, method="GET", headers=None):
+    """Build a minimal HTTP scope for calling ASGI middleware directly."""
+    return {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": ("127.0.0.1", 1234),
+    }
+
+
+def make_receive(body=b"", chunk_size=None):
+    """ASGI receive callable yielding ``body`` (optionally in chunks), then disconnect."""
+    chunk_size = chunk_size or max(len(body), 1)
+    messages = [
+        {
+            "type": "http.request",
+            "body": body[i:i + chunk_size],
+            "more_body": i + chunk_size < len(body),
+        }
+        for i in range(0, max(len(body), 1), chunk_size)
+    ]
+    calls = {"count": 0}
+
+    async def receive():
+        calls["count"] += 1
+        if messages:
+            return messages.pop(0)
+        return {"type": "http.disconnect"}
+
+    receive.calls = calls
+    return receive
+
+
+class SentMessages(list):
+    """Collects messages passed to ``send``."""
+
+    async def __call__(self, message):
+        self.append(message)
+
+    @property
+    def status(self):
+        return self[0]["status"]
+
+    @property
+    def body(self):
+        return b"".join(m.get("body", b"") for m in self if m["type"] == "http.response.body")
+
+
 @pytest.mark.asyncio
 async def test_auth_middleware_public_endpoints():
     """Test that public endpoints bypass authentication."""
-    middleware = AuthenticationMiddleware(AsyncMock())
+    downstream = AsyncMock()
+    middleware = AuthenticationMiddleware(downstream)
 
-    # Create mock request
-    request = Mock(spec=Request)
-    request.url.path = "/health"
-    request.headers.get.return_value = ""
+    send = SentMessages()
+    await middleware(make_scope("/health"), make_receive(), send)
 
-    call_next = AsyncMock(return_value=JSONResponse({"status": "ok"}))
-
-    response = await middleware.dispatch(request, call_next)
-    assert call_next.called
+    assert downstream.called
 
 
 @pytest.mark.asyncio
 async def test_auth_middleware_requires_token():
     """Test that protected endpoints require token."""
+    downstream = AsyncMock()
+    middleware = AuthenticationMiddleware(downstream)
+
+    send = SentMessages()
+    await middleware(
+        make_scope("/api/documents", headers={"Authorization": ""}), make_receive(), send
+    )
+
+    assert send.status == 401
+    assert not downstream.called
+
+
+@pytest.mark.asyncio
+async def test_auth_middleware_sets_user_in_scope_state():
+    """Test that a valid token populates scope state for downstream layers."""
+    import jwt
+    import time
+
     middleware = AuthenticationMiddleware(AsyncMock())
+    token = jwt.encode(
+        {"sub": "user_123", "exp": int(time.time()) + 60},
+        middleware.secret_key,
+        algorithm="HS256",
+    )
+    scope = make_scope("/api/documents", headers={"Authorization": f"Bearer {token}"})
+
+    await middleware(scope, make_receive(), SentMessages())
+
+    assert scope["state"]["user_id"] == "user_123"
+    assert "auth_time_ms" in scope["state"]
 
-    # Create mock request without token
-    request = Mock(spec=Request)
-    request.url.path = "/api/conversations"
-    request.headers = {"Authorization": ""}
 
-    call_next = AsyncMock()
+@pytest.mark.asyncio
+async def test_auth_middleware_decodes_each_token_once():
+    """Test that repeated requests with one token hit the verification cache."""
+    import jwt
+    import time
+    from unittest.mock import patch
+
+    from src.infrastructure.token_cache import TokenVerificationCache
+
+    middleware = AuthenticationMiddleware(
+        AsyncMock(), token_cache=TokenVerificationCache(redis_enabled=False)
+    )
+    token = jwt.encode(
+        {"sub": "user_123", "exp": int(time.time()) + 60},
+        middleware.secret_key,
+        algorithm="HS256",
+    )
+
+    with patch("src.middleware.auth_middleware.jwt.decode", wraps=jwt.decode) as decode:
+        for _ in range(3):
+            scope = make_scope("/api/documents", headers={"Authorization": f"Bearer {token}"})
+            await middleware(scope, make_receive(), SentMessages())
+            assert scope["state"]["user_id"] == "user_123"
 
-    response = await middleware.dispatch(request, call_next)
-    assert response.status_code == 401
+    assert decode.call_count == 1
+    assert middleware.token_cache.stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_middleware_passes_websocket_scope_through():
+    """Test that non-HTTP scopes are not intercepted."""
+    downstream = AsyncMock()
+    middleware = AuthenticationMiddleware(downstream)
+    scope = {"type": "websocket", "path": "/api/documents", "headers": []}
+
+    await middleware(scope, make_receive(), SentMessages())
+
+    downstream.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_request_body_is_read_once_and_shared():
+    """Test that moderation and memory injection share one body read."""
+    body = b'{"content": "hello there", "include_rag": false}'
+    received = {}
+
+    async def endpoint(scope, receive, send):
+        message = await receive()
+        received["body"] = message["body"]
+        await JSONResponse({"ok": True})(scope, receive, send)
+
+    stack = ContentModerationMiddleware(MemoryInjectionMiddleware(endpoint))
+    receive = make_receive(body, chunk_size=8)
+    scope = make_scope("/api/v1/conversations/abc/messages", method="POST")
+
+    await stack(scope, receive, SentMessages())
+
+    assert received["body"] == body
+    # All chunks were pulled from the server exactly once
+    assert receive.calls["count"] == len(range(0, len(body), 8))
+    assert scope["state"]["request_body"].json()["content"] == "hello there"
+    assert scope["state"]["memory_context"]["include_rag"] is False
+
+
+@pytest.mark.asyncio
+async def test_memory_injection_exposes_loaded_context():
+    """Test that loaded history and RAG context reach the handler via scope state."""
+    memory = AsyncMock()
+    memory.load.return_value = {
+        "conversation_history": [{"id": "1", "role": "user", "content": "hi"}],
+        "rag_context": [],
+        "history_count": 1,
+        "rag_count": 0,
+    }
+    middleware = MemoryInjectionMiddleware(AsyncMock(), memory_service=memory)
+    scope = make_scope("/api/v1/conversations/abc/messages", method="POST")
+    scope["state"] = {"user_id": "alice"}
+
+    body = b'{"content": "next", "include_rag": false}'
+    await middleware(scope, make_receive(body), SentMessages())
+
+    memory.load.assert_awaited_once()
+    assert memory.load.await_args.args == ("abc", "alice", "next")
+    assert memory.load.await_args.kwargs["include_rag"] is False
+    context = scope["state"]["memory_context"]
+    assert context["history_count"] == 1
+    assert context["conversation_history"][0]["content"] == "hi"
+
+
+@pytest.mark.asyncio
+async def test_content_moderation_rejects_unsafe_body():
+    """Test that unsafe content is rejected without reaching the endpoint."""
+    downstream = AsyncMock()
+    middleware = ContentModerationMiddleware(downstream)
+
+    send = SentMessages()
+    await middleware(
+        make_scope("/api/documents", method="POST"),
+        make_receive(b'{"q": "<script>alert(1)</script>"}'),
+        send,
+    )
+
+    assert send.status == 400
+    assert not downstream.called
+
+
+@pytest.mark.asyncio
+async def test_content_moderation_scans_json_fields_not_syntax():
+    """Test that JSON quoting neither triggers nor hides violations."""
+    middleware = ContentModerationMiddleware(AsyncMock())
+
+    # '"order' in the raw body used to look like a quoted OR clause
+    send = SentMessages()
+    downstream = AsyncMock()
+    middleware.app = downstream
+    await middleware(
+        make_scope("/api/documents", method="POST"),
+        make_receive(b'{"q": "order by region"}'),
+        send,
+    )
+    assert downstream.called
+
+    # Escaped markup is decoded before scanning
+    send = SentMessages()
+    await middleware(
+        make_scope("/api/documents", method="POST"),
+        make_receive(b'{"q": "\\u003cscript>alert(1)\\u003c/script>"}'),
+        send,
+    )
+    assert send.status == 400
+
+
+@pytest.mark.asyncio
+async def test_response_structuring_wraps_json_and_fixes_length():
+    """Test that JSON bodies are structured with a correct Content-Length."""
+    middleware = ResponseStructuringMiddleware(JSONResponse({"key": "value"}))
+
+    send = SentMessages()
+    await middleware(make_scope("/api/documents"), make_receive(), send)
+
+    data = json.loads(send.body)
+    assert data["success"] is True
+    assert data["data"] == {"key": "value"}
+    headers = dict(send[0]["headers"])
+    assert int(headers[b"content-length"]) == len(send.body)
+
+
+@pytest.mark.asyncio
+async def test_response_structuring_streams_non_json_untouched():
+    """Test that streaming responses are forwarded chunk by chunk."""
+    from starlette.responses import StreamingResponse
+
+    async def chunks():
+        yield b"data: 1\n\n"
+        yield b"data: 2\n\n"
+
+    middleware = ResponseStructuringMiddleware(
+        StreamingResponse(chunks(), media_type="text/event-stream")
+    )
+
+    send = SentMessages()
+    await middleware(make_scope("/api/documents"), make_receive(), send)
+
+    body_messages = [m for m in send if m["type"] == "http.response.body" and m.get("body")]
+    assert [m["body"] for m in body_messages] == [b"data: 1\n\n", b"data: 2\n\n"]
 
 
 @pytest.mark.asyncio
 async def test_rate_limiting_within_limit():
     """Test rate limiting allows requests within limit."""
-    middleware = ContentModerationMiddleware(AsyncMock())
+    from src.infrastructure.rate_limiter import RateLimiter
+
+    middleware = ContentModerationMiddleware(
+        AsyncMock(), rate_limiter=RateLimiter(backend="memory")
+    )
 
     user_id = "test_user"
 
     # Make requests under the limit
     for i in range(10):
-        result = middleware.check_rate_limit(user_id)
-        assert result is True
+        within_limits, _, _ = await middleware._check_rate_limits(user_id, "10.0.0.1")
+        assert within_limits is True
 
 
 @pytest.mark.asyncio
 async def test_rate_limiting_exceeds_limit():
     """Test rate limiting blocks requests over limit."""
-    middleware = ContentModerationMiddleware(AsyncMock())
+    from src.infrastructure.rate_limiter import RateLimiter
+
+    middleware = ContentModerationMiddleware(
+        AsyncMock(), rate_limiter=RateLimiter(backend="memory")
+    )
 
     user_id = "test_user"
 
     # Make requests at the limit
-    for i in range(middleware.RATE_LIMIT):
-        result = middleware.check_rate_limit(user_id)
-        assert result is True
+    for i in range(middleware.rate_limit_user):
+        within_limits, _, _ = await middleware._check_rate_limits(user_id, "10.0.0.1")
+        assert within_limits is True
 
     # Next request should fail
-    result = middleware.check_rate_limit(user_id)
-    assert result is False
+    within_limits, description, retry_after = await middleware._check_rate_limits(
+        user_id, "10.0.0.1"
+    )
+    assert within_limits is False
+    assert "User limit" in description
+    assert retry_after > 0
+
+
+@pytest.mark.asyncio
+async def test_draft_prefetch_has_its_own_user_bucket():
+    """Test that keystroke drafts are limited apart from the user's request budget."""
+    from src.infrastructure.rate_limiter import RateLimiter
+
+    middleware = ContentModerationMiddleware(
+        AsyncMock(), rate_limiter=RateLimiter(backend="memory")
+    )
+    middleware.rate_limit_user = 1
+    middleware.rate_limit_prefetch = 3
+
+    async def call(path, user_id="alice"):
+        scope = make_scope(path, method="POST")
+        scope["state"] = {"user_id": user_id}
+        send = SentMessages()
+        await middleware(scope, make_receive(), send)
+        return send
+
+    for _ in range(3):
+        assert await call("/api/v1/conversations/abc/prefetch") == []  # passed through
+    send = await call("/api/v1/conversations/abc/prefetch")
+    assert send.status == 429
+    assert b"Prefetch limit" in send.body
+
+    # Drafts did not use up the request budget, and other users are unaffected
+    assert await call("/api/v1/conversations/abc/messages") == []
+    assert (await call("/api/v1/conversations/abc/messages")).status == 429
+    assert await call("/api/v1/conversations/abc/prefetch", user_id="bob") == []
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_response_has_retry_after():
+    """Test that 429 responses tell the client when to retry."""
+    from src.infrastructure.rate_limiter import RateLimiter
+
+    middleware = ContentModerationMiddleware(
+        AsyncMock(), rate_limiter=RateLimiter(backend="memory")
+    )
+    middleware.rate_limit_ip = 1
+
+    await middleware(make_scope("/api/documents"), make_receive(), SentMessages())
+    send = SentMessages()
+    await middleware(make_scope("/api/documents"), make_receive(), send)
+
+    assert send.status == 429
+    assert int(dict(send[0]["headers"])[b"retry-after"]) >= 1
 
 
 @pytest.mark.asyncio
@@ -102,30 +396,17 @@ async def test_response_structuring_error_response():
 
 
 @pytest.mark.asyncio
-async def test_content_moderation_cleanup():
-    """Test that cleanup removes old request timestamps."""
-    middleware = ContentModerationMiddleware(AsyncMock())
-
-    # Add some request timestamps
-    import time
-    user_id = "test_user"
+async def test_content_moderation_rate_limit_memory_is_bounded():
+    """Test that rate limit state never exceeds the configured number of keys."""
+    from src.infrastructure.rate_limiter import RateLimiter
 
-    # Add old timestamp (older than max_age)
-    old_time = time.time() - (middleware.max_age + 100)
-    middleware.request_times[user_id] = [old_time]
+    limiter = RateLimiter(max_keys=100, backend="memory")
+    middleware = ContentModerationMiddleware(AsyncMock(), rate_limiter=limiter)
 
-    # Simulate cleanup logic
-    current_time = time.time()
-    for uid in list(middleware.request_times.keys()):
-        if middleware.request_times[uid]:
-            oldest_time = min(middleware.request_times[uid])
-            if current_time - oldest_time > middleware.max_age:
-                middleware.request_times[uid] = []
-        if not middleware.request_times[uid]:
-            del middleware.request_times[uid]
+    for i in range(1000):
+        await middleware._check_rate_limits("anonymous", f"10.0.{i // 256}.{i % 256}")
 
-    # Old timestamps should be removed
-    assert user_id not in middleware.request_times
+    assert len(limiter) == 100
 
 
 def test_jwt_token_verification():
@@ -173,3 +454,122 @@ def test_jwt_invalid_signature():
     # Should raise exception with wrong secret
     with pytest.raises(jwt.InvalidSignatureError):
         jwt.decode(token, wrong_secret, algorithms=["HS256"])
+
+
+def test_body_parsed_once_across_stack_and_handler(monkeypatch):
+    """Test that middleware and the Pydantic handler share a single JSON parse."""
+    import orjson
+    from fastapi import APIRouter, FastAPI
+    from fastapi.testclient import TestClient
+    from pydantic import BaseModel
+
+    import src.middleware.request_body as request_body_module
+    from src.api.routing import SharedBodyRoute
+    from src.middleware.body_parsing_middleware import BodyParsingMiddleware
+
+    calls = {"loads": 0}
+
+    class CountingOrjson:
+        JSONDecodeError = orjson.JSONDecodeError
+
+        @staticmethod
+        def loads(data):
+            calls["loads"] += 1
+            return orjson.loads(data)
+
+    monkeypatch.setattr(request_body_module, "orjson", CountingOrjson)
+
+    class Message(BaseModel):
+        content: str
+
+    router = APIRouter(route_class=SharedBodyRoute)
+
+    @router.post("/api/v1/conversations/{conversation_id}/messages")
+    async def send_message(conversation_id: str, message: Message):
+        return {"content": message.content}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(MemoryInjectionMiddleware)
+    app.add_middleware(BodyParsingMiddleware)
+    app.add_middleware(ContentModerationMiddleware)
+    client = TestClient(app)
+
+    response = client.post("/api/v1/conversations/abc/messages", json={"content": "hi"})
+    assert response.status_code == 200
+    assert response.json() == {"content": "hi"}
+    assert calls["loads"] == 1
+
+    invalid = client.post(
+        "/api/v1/conversations/abc/messages",
+        content=b'{"content": ',
+        headers={"Content-Type": "application/json"},
+    )
+    assert invalid.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_response_structuring_wraps_payload_without_parsing(monkeypatch):
+    """Test that successful payloads are spliced into the envelope, not re-parsed."""
+    import src.middleware.response_structuring_middleware as structuring_module
+
+    def fail_loads(_):
+        raise AssertionError("payload should not be parsed")
+
+    monkeypatch.setattr(structuring_module.orjson, "loads", fail_loads)
+    items = [{"id": i, "name": f"item-{i}"} for i in range(1000)]
+    middleware = ResponseStructuringMiddleware(JSONResponse(items))
+
+    send = SentMessages()
+    await middleware(make_scope("/api/documents"), make_receive(), send)
+
+    data = json.loads(send.body)
+    assert data["success"] is True
+    assert data["data"] == items
+    assert list(data) == ["success", "timestamp", "request_id", "data", "metadata"]
+    assert "duration_ms" in data["metadata"]
+
+
+def test_structured_json_response_serializes_once():
+    """Test that route-level envelopes bypass the middleware rewrite."""
+    from fastapi import APIRouter, FastAPI
+    from fastapi.testclient import TestClient
+
+    import src.api.responses as responses_module
+    from src.api.responses import StructuredJSONResponse
+
+    dumps_calls = {"count": 0}
+    real_dumps = responses_module.orjson.dumps
+
+    class CountingOrjson:
+        @staticmethod
+        def dumps(content):
+            dumps_calls["count"] += 1
+            return real_dumps(content)
+
+    router = APIRouter(prefix="/api/documents", default_response_class=StructuredJSONResponse)
+
+    @router.get("")
+    async def list_documents():
+        return [{"id": 1}, {"id": 2}]
+
+    @router.get("/wrapped")
+    async def already_structured():
+        return {"success": True, "data": {"id": 3}}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(ResponseStructuringMiddleware)
+    client = TestClient(app)
+
+    with patch.object(responses_module, "orjson", CountingOrjson):
+        response = client.get("/api/documents")
+
+    data = response.json()
+    assert data["success"] is True
+    assert data["data"] == [{"id": 1}, {"id": 2}]
+    assert data["request_id"]
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert dumps_calls["count"] == 1
+
+    assert client.get("/api/documents/wrapped").json() == {"success": True, "data": {"id": 3}}
@@ -0,0 +1,125 @@
+"""Unit tests for the stable-prefix Claude prompt layout."""
+
+import json
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import claude_cache_manager as cache_manager_module
+from src.services.claude_cache_manager import get_claude_cache_manager, reset_claude_cache_manager
+from src.services.claude_integration import ClaudeAgentIntegration
+from src.services.prompt_layout import MAX_CACHE_BREAKPOINTS, build_stable_layout
+
+TOOLS = [
+    {
+        "name": name,
+        "description": f"{name} tool",
+        "input_schema": {"type": "object", "properties": {"query": {"type": "string"}}},
+    }
+    for name in ("search", "calculator", "fetch", "weather")
+]
+
+
+@pytest.fixture(autouse=True)
+def cache_manager(monkeypatch):
+    monkeypatch.setattr(
+        cache_manager_module, "count_tokens_cached", lambda text: len(text.split())
+    )
+    reset_claude_cache_manager()
+    ClaudeAgentIntegration.initialize_cache()
+    yield get_claude_cache_manager()
+    reset_claude_cache_manager()
+
+
+def cache_controls(request):
+    """cache_control markers in prefix order (tools, system, messages)."""
+    blocks = list(request.get("tools", [])) + request["system"]
+    for message in request["messages"]:
+        blocks.extend(message["content"])
+    return [block["cache_control"] for block in blocks if "cache_control" in block]
+
+
+def test_tool_order_does_not_change_request():
+    shuffled = [dict(reversed(list(tool.items()))) for tool in TOOLS]
+    random.Random(7).shuffle(shuffled)
+
+    first = build_stable_layout("system", TOOLS, "summary", [], "hi").to_request()
+    second = build_stable_layout("system", shuffled, "summary", [], "hi").to_request()
+
+    assert json.dumps(first) == json.dumps(second)
+    assert [tool["name"] for tool in first["tools"]] == sorted(t["name"] for t in TOOLS)
+
+
+def test_breakpoints_are_bounded_and_longest_ttl_first():
+    history = [
+        {"role": "user", "content": "question"},
+        {"role": "assistant", "content": "answer"},
+    ]
+
+    layout = build_stable_layout("system", TOOLS, "summary", history, "next", "rag excerpt")
+    controls = cache_controls(layout.to_request())
+
+    assert len(controls) == len(layout.breakpoints) <= MAX_CACHE_BREAKPOINTS
+    assert controls[0] == {"type": "ephemeral", "ttl": "1h"}
+    assert all(control == {"type": "ephemeral"} for control in controls[1:])
+
+
+def test_volatile_context_follows_last_breakpoint():
+    history = [{"role": "user", "content": "q1"}, {"role": "assistant", "content": "a1"}]
+
+    request = build_stable_layout("system", None, None, history, "q2", "rag excerpt").to_request()
+
+    last = request["messages"][-1]
+    assert [block["text"] for block in last["content"]] == ["rag excerpt", "q2"]
+    assert not any("cache_control" in block for block in last["content"])
+    assert "cache_control" in request["messages"][-2]["content"][-1]
+
+
+def test_consecutive_turns_share_prefix():
+    turn_one = [{"role": "user", "content": "q1"}]
+    turn_two = turn_one + [
+        {"role": "assistant", "content": "a1"},
+        {"role": "user", "content": "q2"},
+    ]
+
+    first = ClaudeAgentIntegration.build_claude_request_with_cache(
+        "chat", turn_one, "conv", additional_context="excerpt 1", tools=TOOLS
+    )
+    second = ClaudeAgentIntegration.build_claude_request_with_cache(
+        "chat", turn_two, "conv", additional_context="excerpt 2", tools=TOOLS
+    )
+
+    assert first["tools"] == second["tools"]
+    assert first["system"] == second["system"]
+    assert first["system"][0]["cache_control"]["ttl"] == "1h"
+    # The previous turn's question reappears unchanged, now without the excerpt
+    assert second["messages"][0]["content"][0]["text"] == "q1"
+    assert second["messages"][-1]["content"][0]["text"] == "excerpt 2"
+
+
+def test_response_usage_drives_hit_rate(cache_manager):
+    # Anthropic usage: input_tokens excludes cached tokens
+    ClaudeAgentIntegration.record_response_usage(SimpleNamespace(usage={
+        "input_tokens": 50,
+        "output_tokens": 20,
+        "cache_read_input_tokens": 0,
+        "cache_creation_input_tokens": 1200,
+    }))
+    # LangChain usage_metadata: input_tokens includes cached tokens
+    ClaudeAgentIntegration.record_response_usage(SimpleNamespace(usage_metadata={
+        "input_tokens": 1260,
+        "output_tokens": 30,
+        "input_token_details": {"cache_read": 1200, "cache_creation": 0},
+    }))
+    assert ClaudeAgentIntegration.record_response_usage(SimpleNamespace(content="x")) is None
+
+    # Local prompt lookups are not cache hits
+    ClaudeAgentIntegration.get_cached_system_prompt("chat")
+
+    stats = cache_manager.get_cache_stats()
+    assert stats["cache_hit_count"] == 1
+    assert stats["cache_miss_count"] == 1
+    assert stats["total_cache_read_tokens"] == 1200
+    assert stats["total_cache_write_tokens"] == 1200
+    assert stats["total_normal_tokens"] == 110
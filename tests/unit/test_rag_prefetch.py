@@ -0,0 +1,144 @@
+"""Unit tests for speculative RAG retrieval of message drafts."""
+
+import asyncio
+
+import pytest
+
+from src.services.rag_prefetch import RAGPrefetcher, draft_similarity, draft_terms
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingSearch:
+    """Search function that records its queries."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.queries = []
+
+    async def __call__(self, query, user_id):
+        self.queries.append((query, user_id))
+        await asyncio.sleep(self.delay)
+        return [{"chunk_text": f"result for {query}", "similarity": 0.9}]
+
+
+@pytest.fixture
+def search():
+    return RecordingSearch()
+
+
+@pytest.fixture
+def prefetcher(search):
+    return RAGPrefetcher(search, debounce=0.01, ttl=30, min_similarity=0.7)
+
+
+DRAFT = "how do refunds work for annual plans"
+MESSAGE = "How do refunds work for annual plans?"
+
+
+def test_similarity_ignores_case_and_punctuation():
+    assert draft_similarity(draft_terms(DRAFT), draft_terms(MESSAGE)) == 1.0
+    assert draft_similarity(draft_terms("refund policy"), draft_terms("weather today")) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_drafts_are_debounced(prefetcher, search):
+    assert prefetcher.submit("c1", "alice", "how do refunds")
+    assert prefetcher.submit("c1", "alice", "how do refunds work")
+    assert prefetcher.submit("c1", "alice", DRAFT)
+    await asyncio.sleep(0.05)
+
+    assert search.queries == [(DRAFT, "alice")]
+
+
+@pytest.mark.asyncio
+async def test_similar_message_reuses_prefetched_results(prefetcher, search):
+    prefetcher.submit("c1", "alice", DRAFT)
+    await asyncio.sleep(0.05)
+
+    results = await prefetcher.take("c1", "alice", MESSAGE)
+
+    assert results == [{"chunk_text": f"result for {DRAFT}", "similarity": 0.9}]
+    assert len(prefetcher) == 0
+
+
+@pytest.mark.asyncio
+async def test_dissimilar_message_is_a_miss(prefetcher):
+    prefetcher.submit("c1", "alice", DRAFT)
+    await asyncio.sleep(0.05)
+
+    assert await prefetcher.take("c1", "alice", "Actually, what is the weather today?") is None
+
+
+@pytest.mark.asyncio
+async def test_slots_are_per_user(prefetcher):
+    prefetcher.submit("c1", "alice", DRAFT)
+    await asyncio.sleep(0.05)
+
+    assert await prefetcher.take("c1", "mallory", MESSAGE) is None
+    assert await prefetcher.take("c1", "alice", MESSAGE) is not None
+
+
+@pytest.mark.asyncio
+async def test_expired_results_are_not_used(search):
+    clock = FakeClock()
+    prefetcher = RAGPrefetcher(search, debounce=0, ttl=30, min_similarity=0.7, clock=clock)
+    prefetcher.submit("c1", "alice", DRAFT)
+    await asyncio.sleep(0.01)
+    clock.now += 31
+
+    assert await prefetcher.take("c1", "alice", MESSAGE) is None
+
+
+@pytest.mark.asyncio
+async def test_search_in_flight_is_awaited():
+    search = RecordingSearch(delay=0.1)
+    prefetcher = RAGPrefetcher(search, debounce=0, ttl=30, min_similarity=0.7)
+    prefetcher.submit("c1", "alice", DRAFT)
+    await asyncio.sleep(0.01)
+
+    results = await prefetcher.take("c1", "alice", MESSAGE)
+
+    assert results is not None
+    assert len(search.queries) == 1
+
+
+@pytest.mark.asyncio
+async def test_pending_debounce_is_cancelled_on_take(search):
+    prefetcher = RAGPrefetcher(search, debounce=1.0, ttl=30, min_similarity=0.7)
+    prefetcher.submit("c1", "alice", DRAFT)
+
+    assert await prefetcher.take("c1", "alice", MESSAGE) is None
+    await asyncio.sleep(0)
+    assert search.queries == []
+
+
+@pytest.mark.asyncio
+async def test_similar_draft_is_not_searched_again(prefetcher, search):
+    prefetcher.submit("c1", "alice", DRAFT)
+    await asyncio.sleep(0.05)
+
+    assert not prefetcher.submit("c1", "alice", DRAFT + "?")
+    assert len(search.queries) == 1
+
+
+@pytest.mark.asyncio
+async def test_short_drafts_are_ignored(prefetcher, search):
+    assert not prefetcher.submit("c1", "alice", "how")
+    assert len(prefetcher) == 0
+
+
+@pytest.mark.asyncio
+async def test_slots_are_bounded(prefetcher):
+    prefetcher.max_slots = 2
+    for i in range(5):
+        prefetcher.submit(f"c{i}", "alice", DRAFT)
+
+    assert len(prefetcher) == 2
+    prefetcher.clear()
@@ -0,0 +1,111 @@
+"""Unit tests for the GCRA rate limiting engine."""
+
+import pytest
+
+from src.infrastructure.rate_limiter import RateLimiter
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FailingCache:
+    """Redis cache whose script calls always fail."""
+
+    _initialized = True
+
+    def register_script(self, script):
+        async def run(keys, args):
+            raise ConnectionError("redis down")
+
+        return run
+
+
+class TestRateLimiterLocal:
+    """Tests for the in-process engine."""
+
+    def test_allows_burst_then_rejects(self):
+        clock = FakeClock()
+        limiter = RateLimiter(backend="memory", clock=clock)
+
+        results = [limiter.check_local("k", limit=5, period=60) for _ in range(6)]
+
+        assert [r.allowed for r in results] == [True] * 5 + [False]
+        assert [r.remaining for r in results[:5]] == [4, 3, 2, 1, 0]
+        assert results[-1].retry_after == pytest.approx(12.0)
+
+    def test_recovers_at_steady_rate(self):
+        clock = FakeClock()
+        limiter = RateLimiter(backend="memory", clock=clock)
+        for _ in range(5):
+            limiter.check_local("k", limit=5, period=60)
+
+        clock.now += 11.9
+        assert not limiter.check_local("k", limit=5, period=60).allowed
+
+        clock.now += 0.2
+        assert limiter.check_local("k", limit=5, period=60).allowed
+        assert not limiter.check_local("k", limit=5, period=60).allowed
+
+    def test_keys_are_independent(self):
+        limiter = RateLimiter(backend="memory", clock=FakeClock())
+
+        assert limiter.check_local("a", limit=1, period=60).allowed
+        assert not limiter.check_local("a", limit=1, period=60).allowed
+        assert limiter.check_local("b", limit=1, period=60).allowed
+
+    def test_memory_is_bounded_lru(self):
+        limiter = RateLimiter(max_keys=3, backend="memory", clock=FakeClock())
+
+        for key in ["a", "b", "c"]:
+            limiter.check_local(key, limit=10, period=60)
+        limiter.check_local("a", limit=10, period=60)  # refresh "a"
+        limiter.check_local("d", limit=10, period=60)  # evicts "b"
+
+        assert len(limiter) == 3
+        assert set(limiter._tat) == {"a", "c", "d"}
+
+
+class TestRateLimiterRedis:
+    """Tests for the Redis mirror."""
+
+    @pytest.mark.asyncio
+    async def test_redis_decision_is_mirrored_locally(self):
+        clock = FakeClock()
+        calls = []
+
+        class ScriptCache:
+            _initialized = True
+
+            def register_script(self, script):
+                async def run(keys, args):
+                    calls.append((keys, args))
+                    # Another node already used the whole burst
+                    return [0, 12000, 60000]
+
+                return run
+
+        limiter = RateLimiter(backend="redis", redis_cache=ScriptCache(), clock=clock)
+
+        result = await limiter.check("user:alice", limit=5, period=60)
+
+        assert not result.allowed
+        assert result.retry_after == pytest.approx(12.0)
+        assert calls == [(["rl:user:alice"], [12000, 60000])]
+        # The local table now rejects without asking Redis
+        assert not (await limiter.check("user:alice", limit=5, period=60)).allowed
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_redis_errors_fail_open_to_local(self):
+        limiter = RateLimiter(backend="redis", redis_cache=FailingCache(), clock=FakeClock())
+
+        results = [await limiter.check("k", limit=2, period=60) for _ in range(3)]
+
+        assert [r.allowed for r in results] == [True, True, False]
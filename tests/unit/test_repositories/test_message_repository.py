@@ -0,0 +1,69 @@
+"""Unit tests for MessageRepository running token totals."""
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
+from sqlalchemy.orm import sessionmaker
+
+from src.db.base import Base
+from src.models import ConversationORM
+from src.repositories import message as message_module
+from src.repositories.message import MessageRepository
+
+
+@pytest.fixture
+async def test_db() -> AsyncEngine:
+    """Create test database."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def test_session(test_db) -> AsyncSession:
+    """Create test session."""
+    async_session = sessionmaker(test_db, class_=AsyncSession, expire_on_commit=False)
+    async with async_session() as session:
+        yield session
+
+
+@pytest.fixture
+async def conversation(test_session) -> ConversationORM:
+    conv = ConversationORM(user_id="user_1", title="Test", system_prompt="Be helpful")
+    test_session.add(conv)
+    await test_session.commit()
+    return conv
+
+
+@pytest.fixture(autouse=True)
+def word_tokenizer(monkeypatch):
+    """Count whitespace-separated words instead of loading a BPE file."""
+    monkeypatch.setattr(message_module, "count_tokens", lambda text: len(text.split()))
+
+
+@pytest.mark.asyncio
+async def test_create_message_counts_tokens_once(test_session, conversation):
+    repo = MessageRepository(test_session)
+
+    first = await repo.create_message(conversation.id, "user", "one two three")
+    await repo.create_message(conversation.id, "assistant", "four five", tokens_used=7)
+
+    assert first.tokens_used == 3
+    assert await repo.get_total_tokens(conversation.id) == 10
+
+
+@pytest.mark.asyncio
+async def test_update_and_delete_adjust_total(test_session, conversation):
+    repo = MessageRepository(test_session)
+    message = await repo.create_message(conversation.id, "user", "one two three")
+    await repo.create_message(conversation.id, "assistant", "four five")
+
+    await repo.update(message.id, tokens_used=5)
+    assert await repo.get_total_tokens(conversation.id) == 7
+
+    await repo.delete(message.id)
+    assert await repo.get_total_tokens(conversation.id) == 2
+
+    await repo.delete_conversation_messages(conversation.id)
+    assert await repo.get_total_tokens(conversation.id) == 0
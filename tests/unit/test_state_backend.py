@@ -0,0 +1,125 @@
+"""Unit tests for state shared across worker processes."""
+
+import asyncio
+
+import pytest
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+
+from src.infrastructure.claude_cost_tracker import ClaudeApiCostTracker
+from src.infrastructure.state_backend import (
+    RedisStateBackend,
+    SharedCounters,
+    StateBackend,
+    StateBackendError,
+)
+from src.services.claude_cache_manager import ClaudePromptCacheManager
+
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+
+def node(server):
+    """A worker's backend; nodes built from the same server share state."""
+    return RedisStateBackend(client=FakeRedis(server=server, decode_responses=True))
+
+
+class FailingBackend(StateBackend):
+    async def increment(self, updates, ttls=None):
+        raise StateBackendError("Redis is not available")
+
+    async def read_hashes(self, keys):
+        raise StateBackendError("Redis is not available")
+
+    async def set_fields(self, key, mapping, ttl=None):
+        pass
+
+    async def delete_fields(self, key, *fields):
+        pass
+
+    async def publish_text(self, channel, text):
+        return 0
+
+    async def subscribe(self, channel, handler, raw=False):
+        pass
+
+    async def unsubscribe(self, channel):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_counters_are_summed_across_nodes(server):
+    first = SharedCounters(node(server), flush_interval=60)
+    second = SharedCounters(node(server), flush_interval=60)
+
+    first.add("stats", {"hits": 2, "cost": 0.25})
+    second.add("stats", {"hits": 3, "cost": 0.5}, ttl=60)
+    await second.flush()
+
+    # Reading flushes the reader's own buffer first
+    [stats] = await first.read("stats")
+    assert stats == {"hits": 5, "cost": 0.75}
+    assert await FakeRedis(server=server).ttl("state:stats") > 0
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_deltas():
+    counters = SharedCounters(FailingBackend(), flush_interval=60)
+    counters.add("stats", {"hits": 1})
+    counters.add("stats", {"hits": 1})
+
+    await counters.flush()
+
+    assert counters._pending == {"stats": {"hits": 2}}
+
+
+@pytest.mark.asyncio
+async def test_cost_summaries_cover_every_worker(server):
+    trackers = [
+        ClaudeApiCostTracker(persist=False, counters=SharedCounters(node(server)))
+        for _ in range(2)
+    ]
+    trackers[0].record_api_call(query_tokens=1000, user_id="u1")
+    trackers[1].record_api_call(query_tokens=1000, user_id="u1", cache_read_tokens=500,
+                                cache_hit=True)
+    trackers[1].record_api_call(query_tokens=1000, user_id="u2")
+
+    assert trackers[0].get_summary()["total_calls"] == 1
+    await trackers[1]._counters.flush()
+
+    summary = await trackers[0].get_shared_summary()
+    assert summary["total_calls"] == 3
+    assert summary["cache_hits"] == 1
+    assert (await trackers[0].get_shared_user_summary("u1"))["total_calls"] == 2
+    assert (await trackers[0].get_shared_daily_summary(days_back=1))["total_calls"] == 3
+
+
+@pytest.mark.asyncio
+async def test_shared_stats_fall_back_to_this_process():
+    manager = ClaudePromptCacheManager(counters=SharedCounters(FailingBackend()))
+    manager.record_usage(cache_read_tokens=100, input_tokens=10)
+
+    stats = await manager.get_shared_cache_stats()
+
+    assert stats["scope"] == "process"
+    assert stats["cache_hit_count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidation_reaches_other_nodes_only(server):
+    publisher, subscriber = node(server), node(server)
+    received = {"publisher": [], "subscriber": []}
+    await publisher.subscribe("invalidate", received["publisher"].append)
+    await subscriber.subscribe("invalidate", received["subscriber"].append)
+
+    await publisher.publish("invalidate", {"cache_type": "context"})
+    for _ in range(50):
+        if received["subscriber"]:
+            break
+        await asyncio.sleep(0.01)
+
+    assert received == {"publisher": [], "subscriber": [{"cache_type": "context"}]}
+    await publisher.close()
+    await subscriber.close()
@@ -0,0 +1,204 @@
+"""Unit tests for streaming event coalescing and backpressure."""
+
+import asyncio
+
+import orjson
+import pytest
+
+from src.api.streaming_routes import StreamingEvent, StreamingManager, _to_streaming_event
+from src.infrastructure.cache_metrics import stream_flushes_total
+from src.models.streaming_models import MessageChunk
+
+
+def chunk(text):
+    return StreamingEvent(StreamingEvent.TYPE_MESSAGE_CHUNK, text, tokens=1)
+
+
+def tool_call(name):
+    return StreamingEvent(StreamingEvent.TYPE_TOOL_CALL, {"tool_name": name})
+
+
+async def source(events, delay=0.0):
+    for event in events:
+        if delay:
+            await asyncio.sleep(delay)
+        yield event
+
+
+async def collect(manager, events):
+    return [event async for event in manager.stream(events)]
+
+
+@pytest.mark.asyncio
+async def test_first_chunk_is_sent_immediately_and_rest_coalesced():
+    manager = StreamingManager(flush_interval=1.0, max_bytes=1000)
+
+    out = await collect(manager, source([chunk("Hel"), chunk("lo"), chunk(" wor"), chunk("ld")]))
+
+    assert [e.content for e in out] == ["Hel", "lo world"]
+    assert out[1].tokens == 3
+    assert out[1].metadata == {"chunk_size": 8, "chunks": 3}
+    assert manager.get_total_tokens() == 4
+
+
+@pytest.mark.asyncio
+async def test_chunks_flush_when_size_limit_reached():
+    manager = StreamingManager(flush_interval=1.0, max_bytes=4)
+
+    out = await collect(manager, source([chunk("a"), chunk("bb"), chunk("cc"), chunk("d")]))
+
+    assert [e.content for e in out] == ["a", "bbcc", "d"]
+
+
+@pytest.mark.asyncio
+async def test_chunks_flush_on_timer_while_source_is_slow():
+    manager = StreamingManager(flush_interval=0.02, max_bytes=1000)
+    received = []
+
+    async def events():
+        yield chunk("first")
+        yield chunk("a")
+        yield chunk("b")
+        await asyncio.sleep(0.2)  # model pauses, e.g. before a tool call
+        yield chunk("c")
+
+    async for event in manager.stream(events()):
+        received.append((event.content, asyncio.get_running_loop().time()))
+
+    assert [content for content, _ in received] == ["first", "ab", "c"]
+    # "ab" went out on the timer, not when "c" arrived
+    assert received[2][1] - received[1][1] > 0.1
+
+
+@pytest.mark.asyncio
+async def test_tool_events_flush_buffer_and_keep_order():
+    manager = StreamingManager(flush_interval=1.0, max_bytes=1000)
+
+    out = await collect(
+        manager, source([chunk("x"), chunk("y"), chunk("z"), tool_call("web_search"), chunk("w")])
+    )
+
+    assert [(e.event_type, e.content) for e in out] == [
+        ("message_chunk", "x"),
+        ("message_chunk", "yz"),
+        ("tool_call", {"tool_name": "web_search"}),
+        ("message_chunk", "w"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_multibyte_text_counts_encoded_bytes():
+    manager = StreamingManager(flush_interval=1.0, max_bytes=6)
+
+    out = await collect(manager, source([chunk("a"), chunk("你"), chunk("好"), chunk("!")]))
+
+    assert [e.content for e in out] == ["a", "你好", "!"]
+
+
+@pytest.mark.asyncio
+async def test_slow_client_widens_flush_interval_and_size():
+    now = [0.0]
+    manager = StreamingManager(
+        flush_interval=0.05, max_flush_interval=0.2, max_bytes=100, clock=lambda: now[0]
+    )
+    assert manager.current_flush_interval() == 0.05
+
+    for _ in range(20):
+        manager.record_drain(0.1)
+    assert manager.current_flush_interval() == pytest.approx(0.1)
+    assert manager.current_max_bytes() == 200
+
+    for _ in range(20):
+        manager.record_drain(1.0)
+    assert manager.current_flush_interval() == 0.2
+
+    await manager.add_event(chunk("first"))
+    await manager.add_event(chunk("x"))
+    assert manager.time_until_flush() == pytest.approx(0.2)
+
+    manager.reset()
+    assert manager.current_flush_interval() == 0.05
+
+
+@pytest.mark.asyncio
+async def test_flushes_are_counted_by_reason():
+    def count(reason):
+        return stream_flushes_total.labels(reason=reason)._value.get()
+
+    before = {reason: count(reason) for reason in ("first_token", "event", "end")}
+    manager = StreamingManager(flush_interval=1.0, max_bytes=1000)
+
+    await collect(manager, source([chunk("x"), chunk("y"), tool_call("t"), chunk("z")]))
+
+    assert {reason: count(reason) - before[reason] for reason in before} == {
+        "first_token": 1,
+        "event": 1,
+        "end": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_slow_client_pauses_reading_of_source():
+    manager = StreamingManager(flush_interval=0.0, max_bytes=1, queue_size=2)
+    produced = 0
+
+    async def events():
+        nonlocal produced
+        for i in range(100):
+            produced += 1
+            yield chunk(str(i))
+
+    stream = manager.stream(events())
+    await stream.__anext__()
+    await asyncio.sleep(0.05)  # client is not reading
+
+    assert produced <= 5
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_source_errors_are_raised():
+    async def events():
+        yield chunk("partial")
+        raise RuntimeError("model failed")
+
+    with pytest.raises(RuntimeError, match="model failed"):
+        await collect(StreamingManager(), events())
+
+
+def test_sse_format():
+    event = StreamingEvent(StreamingEvent.TYPE_MESSAGE_CHUNK, "hi", tokens=1)
+
+    assert event.to_sse() == (
+        'event: message_chunk\ndata: {"type": "message_chunk", "content": "hi", '
+        '"tokens": 1, "metadata": {}}\n\n'
+    )
+
+
+def test_byte_encodings():
+    event = StreamingEvent(StreamingEvent.TYPE_MESSAGE_CHUNK, "你好", tokens=1)
+
+    line = event.to_ndjson_bytes()
+    assert line.endswith(b"\n")
+    assert orjson.loads(line) == {
+        "type": "message_chunk", "content": "你好", "tokens": 1, "metadata": {}
+    }
+    assert event.to_sse_bytes() == b"event: message_chunk\ndata: " + line[:-1] + b"\n\n"
+
+
+@pytest.mark.parametrize("metadata", [{}, {"chunk_size": 8, "chunks": 3}])
+def test_message_chunk_template_matches_payload(metadata):
+    event = StreamingEvent(StreamingEvent.TYPE_MESSAGE_CHUNK, 'say "你好"\n', 3, metadata)
+
+    assert event.to_json_bytes() == orjson.dumps(event.to_dict())
+
+
+def test_unvalidated_chunks_convert_like_models():
+    chunk_event = MessageChunk(timestamp=1.0, sequence=4, content="hi", token_count=1)
+
+    wire = _to_streaming_event(chunk_event)
+
+    assert wire.to_dict() == _to_streaming_event(chunk_event.to_model()).to_dict()
+    assert wire.to_dict() == {
+        "type": "message_chunk", "content": "hi", "tokens": 1, "metadata": {"chunk_size": 2}
+    }
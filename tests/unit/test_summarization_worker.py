@@ -0,0 +1,211 @@
+"""Unit tests for background, incremental conversation summaries."""
+
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from src.db.base import Base
+from src.models import ConversationORM, MessageORM
+from src.services import conversation_summarization_service as summarization_module
+from src.services.conversation_summarization_service import (
+    ConversationSummarizationService,
+    apply_summary,
+)
+from src.services.summarization_worker import SummarizationWorker
+
+
+class FakeLLM:
+    """Records prompts and answers with a numbered summary."""
+
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, messages):
+        self.prompts.append(messages[-1].content)
+        return SimpleNamespace(content=f"summary {len(self.prompts)}")
+
+
+@pytest.fixture
+async def session():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with async_session() as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def no_bpe_download(monkeypatch):
+    monkeypatch.setattr(summarization_module, "get_encoding", lambda name: None)
+
+
+async def add_messages(session, conversation, start, count):
+    base = datetime(2025, 1, 1)
+    for i in range(start, start + count):
+        session.add(MessageORM(
+            conversation_id=conversation.id,
+            role="user" if i % 2 == 0 else "assistant",
+            content=f"message {i}",
+            tokens_used=10,
+            meta={},
+            created_at=base + timedelta(seconds=i),
+        ))
+    await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_running_summary_folds_only_new_messages(session):
+    conversation = ConversationORM(user_id="u", title="t", system_prompt="Be helpful", meta={})
+    session.add(conversation)
+    await session.commit()
+    await add_messages(session, conversation, 0, 15)
+
+    llm = FakeLLM()
+    service = ConversationSummarizationService(session, llm=llm)
+
+    assert await service.update_running_summary(conversation.id) == "summary 1"
+    assert "message 4" in llm.prompts[0] and "message 5" not in llm.prompts[0]
+    assert conversation.meta["summary_tokens"] == 50
+
+    await add_messages(session, conversation, 15, 6)
+    assert await service.update_running_summary(conversation.id) == "summary 2"
+
+    second = llm.prompts[1]
+    assert "summary 1" in second
+    assert "message 4" not in second
+    assert "message 5" in second and "message 10" in second and "message 11" not in second
+    assert conversation.summary == "summary 2"
+    assert conversation.meta["summary_tokens"] == 110
+
+    # Only recent messages left: nothing to fold, no LLM call
+    assert await service.update_running_summary(conversation.id) is None
+    assert len(llm.prompts) == 2
+
+
+@pytest.mark.asyncio
+async def test_recent_window_alone_does_not_trigger_summary(session):
+    conversation = ConversationORM(
+        user_id="u", title="t", system_prompt="Be helpful", meta={}, total_tokens=7000
+    )
+    session.add(conversation)
+    await session.commit()
+    # 12 messages of 10 tokens, then count them as 600 each
+    await add_messages(session, conversation, 0, 12)
+    for message in (await session.execute(select(MessageORM))).scalars():
+        message.tokens_used = 600
+    await session.commit()
+
+    llm = FakeLLM()
+    service = ConversationSummarizationService(session, llm=llm)
+
+    # Only 2 messages (1200 tokens) are outside the recent window
+    assert await service.update_running_summary(conversation.id, min_tokens=6000) is None
+    assert llm.prompts == []
+
+    await add_messages(session, conversation, 12, 8)
+    for message in (await session.execute(select(MessageORM))).scalars():
+        message.tokens_used = 600
+    conversation.total_tokens = 12000
+    await session.commit()
+
+    # 10 foldable messages (6000 tokens)
+    assert await service.update_running_summary(conversation.id, min_tokens=6000) == "summary 1"
+    assert conversation.meta["summary_tokens"] == 6000
+    assert await service.update_running_summary(conversation.id, min_tokens=6000) is None
+    assert len(llm.prompts) == 1
+
+
+def test_apply_summary_replaces_covered_history():
+    history = [{"id": str(i), "role": "user", "content": f"m{i}"} for i in range(5)]
+    conversation = SimpleNamespace(summary="Earlier: m0-m2", meta={"summary_until_id": "2"})
+
+    summary, recent = apply_summary(conversation, history)
+
+    assert summary == "Earlier: m0-m2"
+    assert [msg["id"] for msg in recent] == ["3", "4"]
+
+    conversation.summary = None
+    assert apply_summary(conversation, history) == (None, history)
+
+
+@pytest.mark.asyncio
+async def test_worker_deduplicates_a_running_conversation():
+    release = asyncio.Event()
+    calls = []
+
+    async def summarize(conversation_id):
+        calls.append(conversation_id)
+        await release.wait()
+        return "summary"
+
+    worker = SummarizationWorker(summarize=summarize)
+    conversation_id = uuid4()
+
+    assert worker.schedule(conversation_id)
+    await asyncio.sleep(0)
+    assert not worker.schedule(conversation_id)
+
+    release.set()
+    await worker.join()
+    assert calls == [conversation_id]
+    assert worker.scheduled_count == 0
+
+    assert worker.schedule(conversation_id)
+    await worker.join()
+    assert len(calls) == 2
+    await worker.close()
+
+
+@pytest.mark.asyncio
+async def test_committed_batch_schedules_each_conversation_once():
+    scheduled = []
+
+    async def summarize(conversation_id):
+        scheduled.append(conversation_id)
+
+    worker = SummarizationWorker(summarize=summarize)
+    first, second = uuid4(), uuid4()
+    batch = [SimpleNamespace(conversation_id=cid) for cid in (first, second, first)]
+
+    await worker.on_messages_committed(batch)
+    await worker.join()
+
+    assert sorted(scheduled, key=str) == sorted([first, second], key=str)
+    await worker.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_job_does_not_stop_worker():
+    async def summarize(conversation_id):
+        raise RuntimeError("LLM unavailable")
+
+    worker = SummarizationWorker(workers=1, summarize=summarize)
+
+    assert worker.schedule(uuid4())
+    assert worker.schedule(uuid4())
+    await worker.join()
+
+    assert worker.scheduled_count == 0
+    assert worker.schedule(uuid4())
+    await worker.join()
+    await worker.close()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_trigger():
+    async def summarize(conversation_id):
+        await asyncio.sleep(10)
+
+    worker = SummarizationWorker(workers=1, queue_size=1, summarize=summarize)
+
+    assert worker.schedule(uuid4())
+    assert not worker.schedule(uuid4())
+    await worker.close()
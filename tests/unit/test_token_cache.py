@@ -0,0 +1,130 @@
+"""Unit tests for the JWT verification cache."""
+
+import asyncio
+
+import pytest
+
+from src.infrastructure.token_cache import TokenVerificationCache
+
+
+class FakeClock:
+    """Manually advanced wall clock."""
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedisCache:
+    """Minimal stand-in for RedisCache.get/set."""
+
+    def __init__(self, delay=0.0):
+        self._initialized = True
+        self.store = {}
+        self.ttls = {}
+        self.delay = delay
+
+    async def get(self, key):
+        await asyncio.sleep(self.delay)
+        return self.store.get(key)
+
+    async def set(self, key, value, ttl=None):
+        self.store[key] = value
+        self.ttls[key] = ttl
+        return True
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestLocalTier:
+    """Tests for the in-process tier."""
+
+    def test_hit_after_set(self, clock):
+        cache = TokenVerificationCache(redis_enabled=False, clock=clock)
+
+        assert cache.get("token-a") is None
+        cache.set("token-a", "alice", exp=clock.now + 60)
+
+        assert cache.get("token-a") == "alice"
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_entry_expires_with_token(self, clock):
+        cache = TokenVerificationCache(max_ttl=300, redis_enabled=False, clock=clock)
+        cache.set("token-a", "alice", exp=clock.now + 10)
+
+        clock.now += 11
+
+        assert cache.get("token-a") is None
+        assert len(cache) == 0
+
+    def test_entry_expiry_is_capped_by_max_ttl(self, clock):
+        cache = TokenVerificationCache(max_ttl=30, redis_enabled=False, clock=clock)
+        cache.set("token-a", "alice", exp=clock.now + 3600)
+
+        clock.now += 31
+
+        assert cache.get("token-a") is None
+
+    def test_size_is_bounded_lru(self, clock):
+        cache = TokenVerificationCache(max_entries=2, redis_enabled=False, clock=clock)
+        cache.set("a", "alice", exp=clock.now + 60)
+        cache.set("b", "bob", exp=clock.now + 60)
+        cache.get("a")  # refresh "a"
+        cache.set("c", "carol", exp=clock.now + 60)  # evicts "b"
+
+        assert len(cache) == 2
+        assert cache.get("b") is None
+        assert cache.get("a") == "alice"
+        assert cache.stats()["evictions"] == 1
+
+    def test_keys_are_digests_not_tokens(self, clock):
+        cache = TokenVerificationCache(redis_enabled=False, clock=clock)
+        cache.set("secret-token", "alice", exp=clock.now + 60)
+
+        assert list(cache._entries) == [TokenVerificationCache.digest("secret-token")]
+
+
+class TestRedisTier:
+    """Tests for the shared Redis tier."""
+
+    @pytest.mark.asyncio
+    async def test_results_are_shared_between_workers(self, clock):
+        redis = FakeRedisCache()
+        worker_a = TokenVerificationCache(redis_enabled=True, redis_cache=redis, clock=clock)
+        worker_b = TokenVerificationCache(redis_enabled=True, redis_cache=redis, clock=clock)
+
+        await worker_a.aset("token-a", "alice", exp=clock.now + 60)
+
+        assert await worker_b.aget("token-a") == "alice"
+        assert worker_b.stats()["redis_hits"] == 1
+        # Copied into worker B's process memory
+        assert worker_b.get("token-a") == "alice"
+        key = TokenVerificationCache.KEY_PREFIX + TokenVerificationCache.digest("token-a").hex()
+        assert redis.ttls[key] == 60
+
+    @pytest.mark.asyncio
+    async def test_slow_redis_is_a_miss(self, clock):
+        redis = FakeRedisCache(delay=1.0)
+        cache = TokenVerificationCache(redis_enabled=True, redis_cache=redis, clock=clock)
+        redis.store[cache.KEY_PREFIX + cache.digest("token-a").hex()] = {
+            "sub": "alice",
+            "exp": clock.now + 60,
+        }
+
+        assert await cache.aget("token-a") is None
+        assert cache.stats()["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_disabled_redis_is_not_used(self, clock):
+        redis = FakeRedisCache()
+        cache = TokenVerificationCache(redis_enabled=False, redis_cache=redis, clock=clock)
+
+        await cache.aset("token-a", "alice", exp=clock.now + 60)
+
+        assert redis.store == {}
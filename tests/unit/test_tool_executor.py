@@ -0,0 +1,144 @@
+"""Unit tests for concurrent tool execution."""
+
+import asyncio
+import time
+
+import pytest
+
+from src.services.tool_executor import ToolExecutor, parse_tool_limits
+
+
+class FakeTool:
+    """Tool stand-in that sleeps, then echoes its arguments."""
+
+    def __init__(self, name, delay=0.0, error=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.running = 0
+        self.max_running = 0
+
+    async def ainvoke(self, args):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise self.error
+            return f"{self.name}:{args.get('query')}"
+        finally:
+            self.running -= 1
+
+
+def call(name, call_id, query="q"):
+    return {"name": name, "id": call_id, "args": {"query": query}}
+
+
+@pytest.mark.asyncio
+async def test_calls_run_concurrently_in_call_order():
+    tools = [
+        FakeTool("search_documents", delay=0.1),
+        FakeTool("web_search", delay=0.05),
+        FakeTool("query_database", delay=0.01),
+    ]
+    calls = [
+        call("search_documents", "c1"),
+        call("web_search", "c2"),
+        call("query_database", "c3"),
+    ]
+
+    start = time.perf_counter()
+    executions = await ToolExecutor(default_timeout=1.0).execute(calls, tools)
+    elapsed = time.perf_counter() - start
+
+    assert [e.call_id for e in executions] == ["c1", "c2", "c3"]
+    assert [e.output for e in executions] == [
+        "search_documents:q", "web_search:q", "query_database:q"
+    ]
+    assert elapsed < 0.15
+    assert executions[0].execution_time_ms >= 90
+    assert executions[2].execution_time_ms < 50
+
+
+@pytest.mark.asyncio
+async def test_timeout_becomes_error_result():
+    tools = [FakeTool("web_search", delay=1.0), FakeTool("query_database")]
+    executor = ToolExecutor(default_timeout=1.0, timeouts={"web_search": 0.05})
+
+    slow, fast = await executor.execute(
+        [call("web_search", "c1"), call("query_database", "c2")], tools
+    )
+
+    assert slow.is_error
+    assert "timed out" in slow.output
+    assert not fast.is_error
+
+
+@pytest.mark.asyncio
+async def test_failures_and_unknown_tools_become_error_results():
+    tools = [FakeTool("web_search", error=RuntimeError("boom"))]
+
+    failed, unknown = await ToolExecutor().execute(
+        [call("web_search", "c1"), call("missing", "c2")], tools
+    )
+
+    assert failed.is_error and "boom" in failed.output
+    assert unknown.is_error and unknown.output == "Error: Tool missing not found"
+    assert unknown.to_result() == {
+        "id": "c2",
+        "output": unknown.output,
+        "execution_time_ms": 0.0,
+        "is_error": True,
+        "cache_hit": False,
+    }
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped_per_tool():
+    web = FakeTool("web_search", delay=0.02)
+    database = FakeTool("query_database", delay=0.02)
+    executor = ToolExecutor(max_concurrency=4, concurrency={"web_search": 2})
+
+    calls = [call("web_search", f"w{i}") for i in range(6)]
+    calls += [call("query_database", f"d{i}") for i in range(4)]
+    executions = await executor.execute(calls, [web, database])
+
+    assert len(executions) == 10
+    assert web.max_running == 2
+    assert database.max_running == 4
+
+
+@pytest.mark.asyncio
+async def test_runner_wraps_invocation():
+    seen = []
+
+    async def run(tool, name, args):
+        seen.append(name)
+        return "wrapped " + await tool.ainvoke(args)
+
+    (execution,) = await ToolExecutor().execute(
+        [call("web_search", "c1")], {"web_search": FakeTool("web_search")}, run=run
+    )
+
+    assert seen == ["web_search"]
+    assert execution.output == "wrapped web_search:q"
+
+
+@pytest.mark.asyncio
+async def test_execute_as_completed_yields_fastest_first():
+    tools = [FakeTool("search_documents", delay=0.1), FakeTool("web_search", delay=0.01)]
+    calls = [call("search_documents", "c1"), call("web_search", "c2")]
+
+    finished = []
+    async for execution in ToolExecutor(default_timeout=1.0).execute_as_completed(calls, tools):
+        finished.append((execution.call_id, time.perf_counter()))
+
+    assert [call_id for call_id, _ in finished] == ["c2", "c1"]
+    assert finished[1][1] - finished[0][1] >= 0.05
+
+
+def test_parse_tool_limits_skips_malformed_pairs():
+    assert parse_tool_limits("web_search=8000, query_database=5000,bad,x=y") == {
+        "web_search": 8000.0,
+        "query_database": 5000.0,
+    }
@@ -0,0 +1,191 @@
+"""Unit tests for the agent tool result cache."""
+
+import asyncio
+
+import pytest
+
+from src.services.middleware.tool_result_cache import ToolResultCacheMiddleware
+from src.services.tool_executor import ToolExecutor, middleware_runner
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedisCache:
+    """Stand-in for RedisCache get/set."""
+
+    def __init__(self):
+        self._initialized = True
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ttl=None):
+        self.store[key] = value
+        return True
+
+
+class CountingTool:
+    """Tool stand-in that counts its invocations."""
+
+    def __init__(self, name, output="result", delay=0.0):
+        self.name = name
+        self.output = output
+        self.delay = delay
+        self.calls = 0
+
+    async def ainvoke(self, args):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.output
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def redis_cache():
+    return FakeRedisCache()
+
+
+@pytest.fixture
+def cache(clock, redis_cache):
+    return ToolResultCacheMiddleware(
+        ttls={"web_search": 900, "search_documents": 120, "query_database": 60},
+        public_tools={"web_search"},
+        redis_cache=redis_cache,
+        clock=clock,
+    )
+
+
+async def run(cache, tool, args, user_id="alice", call_id="c1"):
+    executor = ToolExecutor(default_timeout=1.0)
+    (execution,) = await executor.execute(
+        [{"name": tool.name, "id": call_id, "args": args}],
+        [tool],
+        run=middleware_runner([cache], {"user_id": user_id}),
+    )
+    return execution
+
+
+@pytest.mark.asyncio
+async def test_repeated_call_is_served_from_cache(cache):
+    tool = CountingTool("search_documents")
+
+    first = await run(cache, tool, {"query": "refunds", "limit": 5})
+    second = await run(cache, tool, {"limit": 5, "query": "  refunds "})
+
+    assert tool.calls == 1
+    assert not first.cache_hit
+    assert second.cache_hit
+    assert second.output == "result"
+    assert second.to_result()["cache_hit"] is True
+
+
+@pytest.mark.asyncio
+async def test_private_tools_are_scoped_per_user(cache):
+    tool = CountingTool("query_database")
+
+    await run(cache, tool, {"sql_query": "SELECT 1"}, user_id="alice")
+    await run(cache, tool, {"sql_query": "SELECT 1"}, user_id="bob")
+
+    assert tool.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_public_tools_are_shared_and_case_insensitive(cache):
+    tool = CountingTool("web_search")
+
+    await run(cache, tool, {"query": "LangChain release"}, user_id="alice")
+    execution = await run(cache, tool, {"query": "langchain  RELEASE"}, user_id="bob")
+
+    assert tool.calls == 1
+    assert execution.cache_hit
+
+
+@pytest.mark.asyncio
+async def test_private_tool_arguments_keep_case(cache):
+    tool = CountingTool("query_database")
+
+    await run(cache, tool, {"sql_query": "SELECT * FROM messages WHERE role = 'user'"})
+    await run(cache, tool, {"sql_query": "SELECT * FROM messages WHERE role = 'USER'"})
+
+    assert tool.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_sql_arguments_are_hashed_as_written(cache):
+    tool = CountingTool("query_database")
+
+    await run(cache, tool, {"sql_query": "SELECT * FROM messages WHERE content = 'a b'"})
+    await run(cache, tool, {"sql_query": "SELECT * FROM messages WHERE content = 'a  b'"})
+
+    assert tool.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_uncached_tools_and_error_outputs_are_not_cached(cache):
+    other = CountingTool("send_email")
+    failing = CountingTool("web_search", output="Web search failed: timeout")
+
+    await run(cache, other, {"to": "x"})
+    await run(cache, other, {"to": "x"})
+    await run(cache, failing, {"query": "news"})
+    await run(cache, failing, {"query": "news"})
+
+    assert other.calls == 2
+    assert failing.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_results_expire_after_ttl(cache, clock, redis_cache):
+    tool = CountingTool("query_database")
+
+    await run(cache, tool, {"sql_query": "SELECT 1"})
+    clock.now += 61
+    redis_cache.store.clear()  # Redis expires entries by itself
+    await run(cache, tool, {"sql_query": "SELECT 1"})
+
+    assert tool.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_results_are_shared_through_redis(clock, redis_cache):
+    tool = CountingTool("web_search")
+    worker_a = ToolResultCacheMiddleware(
+        ttls={"web_search": 900}, public_tools={"web_search"},
+        redis_cache=redis_cache, clock=clock,
+    )
+    worker_b = ToolResultCacheMiddleware(
+        ttls={"web_search": 900}, public_tools={"web_search"},
+        redis_cache=redis_cache, clock=clock,
+    )
+
+    await run(worker_a, tool, {"query": "weather"})
+    execution = await run(worker_b, tool, {"query": "weather"})
+
+    assert tool.calls == 1
+    assert execution.cache_hit
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_execute_once(cache):
+    tool = CountingTool("web_search", delay=0.05)
+    executor = ToolExecutor(default_timeout=1.0)
+
+    executions = await executor.execute(
+        [{"name": "web_search", "id": f"c{i}", "args": {"query": "news"}} for i in range(3)],
+        [tool],
+        run=middleware_runner([cache], {"user_id": "alice"}),
+    )
+
+    assert tool.calls == 1
+    assert [e.cache_hit for e in executions] == [False, True, True]
@@ -0,0 +1,236 @@
+"""Unit tests for the async web search client, against a local SearxNG stub."""
+
+import asyncio
+import functools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+
+from src.services.web_search import (
+    DuckDuckGoBackend,
+    SearxNGBackend,
+    WebSearchClient,
+    WebSearchError,
+)
+
+
+class StubSearxNG(BaseHTTPRequestHandler):
+    """SearxNG /search stub: queries containing "slow" take 0.5s, "fail" returns 500."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        server.peers.add(self.client_address)
+
+        params = parse_qs(urlparse(self.path).query)
+        query = params["q"][0]
+        if "slow" in query:
+            time.sleep(0.5)
+        if "fail" in query:
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = json.dumps({
+            "results": [
+                {
+                    "title": f"{query} {i}",
+                    "url": f"https://example.com/{i}",
+                    "content": params["categories"][0],
+                }
+                for i in range(10)
+            ]
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSearxNG)
+    server.requests = 0
+    server.peers = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def base_url(stub_server):
+    host, port = stub_server.server_address
+    return f"http://{host}:{port}"
+
+
+class FakeBackend:
+    """Backend stand-in answering after a delay."""
+
+    def __init__(self, name, delay=0.0, error=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def search(self, query, limit, search_type):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return [{"title": self.name, "url": "", "body": ""}]
+
+
+class FakeRedisCache:
+    def __init__(self):
+        self._initialized = True
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ttl=None):
+        self.store[key] = json.loads(json.dumps(value))
+        return True
+
+
+@pytest.mark.asyncio
+async def test_searxng_results_and_connection_reuse(stub_server, base_url):
+    async with httpx.AsyncClient() as http:
+        backend = SearxNGBackend(base_url, http)
+        client = WebSearchClient(backends=[backend], cache_ttl=0)
+
+        first = await client.search("langchain", limit=3, search_type="news")
+        await client.search("fastapi", limit=3)
+
+    assert first == [
+        {"title": f"langchain {i}", "url": f"https://example.com/{i}", "body": "news"}
+        for i in range(3)
+    ]
+    assert stub_server.requests == 2
+    assert len(stub_server.peers) == 1  # both requests on one kept-alive connection
+
+
+@pytest.mark.asyncio
+async def test_slow_backend_is_hedged(base_url):
+    fallback = FakeBackend("fallback", delay=0.01)
+    async with httpx.AsyncClient() as http:
+        client = WebSearchClient(
+            backends=[SearxNGBackend(base_url, http), fallback], hedge_delay=0.05, cache_ttl=0
+        )
+
+        start = time.perf_counter()
+        results = await client.search("slow query")
+        elapsed = time.perf_counter() - start
+
+    assert results[0]["title"] == "fallback"
+    assert elapsed < 0.3
+
+
+@pytest.mark.asyncio
+async def test_failed_backend_falls_through_immediately(base_url):
+    fallback = FakeBackend("fallback")
+    async with httpx.AsyncClient() as http:
+        client = WebSearchClient(
+            backends=[SearxNGBackend(base_url, http), fallback], hedge_delay=5.0, cache_ttl=0
+        )
+
+        start = time.perf_counter()
+        results = await client.search("fail")
+        elapsed = time.perf_counter() - start
+
+    assert results[0]["title"] == "fallback"
+    assert elapsed < 1.0
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_does_not_start_hedge():
+    primary = FakeBackend("primary", delay=0.01)
+    hedge = FakeBackend("hedge")
+    client = WebSearchClient(backends=[primary, hedge], hedge_delay=0.2, cache_ttl=0)
+
+    results = await client.search("query")
+
+    assert results[0]["title"] == "primary"
+    assert hedge.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_results_cached_by_query_type_and_limit():
+    backend = FakeBackend("primary")
+    client = WebSearchClient(backends=[backend], cache_ttl=60, redis_cache=FakeRedisCache())
+
+    await client.search("LangChain  release", limit=5)
+    await client.search("langchain release", limit=5)
+    await client.search("langchain release", limit=5, search_type="news")
+    await client.search("langchain release", limit=3)
+
+    assert backend.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_all_backends_failing_raises():
+    client = WebSearchClient(
+        backends=[FakeBackend("a", error=RuntimeError("down")), FakeBackend("b", error=OSError())],
+        hedge_delay=1.0,
+        cache_ttl=0,
+    )
+
+    with pytest.raises(WebSearchError, match="a: down"):
+        await client.search("query")
+
+
+def test_default_backends_hedge_without_searxng(monkeypatch):
+    monkeypatch.delenv("SEARXNG_URL", raising=False)
+    monkeypatch.delenv("WEB_SEARCH_BACKENDS", raising=False)
+
+    client = WebSearchClient()
+
+    assert [backend.name for backend in client.backends] == ["duckduckgo", "duckduckgo_lite"]
+    assert client.backends[0].executor is client.backends[1].executor
+    asyncio.run(client.close())
+
+
+@pytest.mark.asyncio
+async def test_duckduckgo_endpoints_hedge_only_text_searches():
+    executor = ThreadPoolExecutor(max_workers=2)
+    backends = [
+        DuckDuckGoBackend(executor, endpoint="html"),
+        DuckDuckGoBackend(executor, endpoint="lite"),
+    ]
+    requests = []
+
+    def slow_search(query, limit, search_type, backend):
+        requests.append((backend.name, search_type))
+        time.sleep(0.1)
+        return [{"title": backend.name, "url": "", "body": ""}]
+
+    for backend in backends:
+        backend._search = functools.partial(slow_search, backend=backend)
+    client = WebSearchClient(backends=backends, hedge_delay=0.01, cache_ttl=0)
+
+    for search_type in ("news", "scholar", "general"):
+        await client.search("query", search_type=search_type)
+    executor.shutdown()
+
+    # news and scholar use the same endpoint on both backends: no hedge
+    assert requests == [
+        ("duckduckgo", "news"),
+        ("duckduckgo", "scholar"),
+        ("duckduckgo", "general"),
+        ("duckduckgo_lite", "general"),
+    ]
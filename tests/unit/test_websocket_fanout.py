@@ -0,0 +1,235 @@
+"""Unit tests for backpressure-aware WebSocket fan-out."""
+
+import asyncio
+import json
+
+import pytest
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+from starlette.websockets import WebSocketState
+
+from src.api.websocket_routes import ConnectionManager
+from src.infrastructure.state_backend import RedisStateBackend
+from src.infrastructure.websocket_router import WebSocketRouter
+
+
+class FakeWebSocket:
+    """Accepted WebSocket stand-in; a send takes `delay` seconds."""
+
+    def __init__(self, delay=0.0):
+        self.client_state = WebSocketState.CONNECTED
+        self.delay = delay
+        self.sent = []
+        self.close_code = None
+
+    async def send_text(self, data):
+        await asyncio.sleep(self.delay)
+        self.sent.append(json.loads(data))
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+async def drain():
+    for _ in range(5):
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_slow_client_does_not_delay_others():
+    manager = ConnectionManager(queue_size=100, send_timeout=5.0)
+    fast, slow = FakeWebSocket(), FakeWebSocket(delay=1.0)
+    await manager.connect(fast, "conv", "alice")
+    await manager.connect(slow, "conv", "bob")
+
+    for i in range(3):
+        assert await manager.broadcast_to_conversation("conv", {"type": "response", "i": i}) == 2
+    await drain()
+
+    assert [m["i"] for m in fast.sent] == [0, 1, 2]
+    assert slow.sent == []
+    manager.disconnect("conv", "alice")
+    manager.disconnect("conv", "bob")
+
+
+@pytest.mark.asyncio
+async def test_broadcast_serializes_once(monkeypatch):
+    manager = ConnectionManager()
+    calls = []
+    serialize = manager.serialize
+    monkeypatch.setattr(manager, "serialize", lambda m: calls.append(m) or serialize(m))
+    sockets = [FakeWebSocket() for _ in range(5)]
+    for i, websocket in enumerate(sockets):
+        await manager.connect(websocket, "conv", f"user{i}")
+
+    await manager.broadcast_to_conversation("conv", {"type": "response", "content": "hi"})
+    await drain()
+
+    assert len(calls) == 1
+    assert all(ws.sent == [{"type": "response", "content": "hi"}] for ws in sockets)
+
+
+@pytest.mark.asyncio
+async def test_full_queue_disconnects_slow_consumer():
+    manager = ConnectionManager(queue_size=2, send_timeout=5.0, slow_consumer_policy="disconnect")
+    slow = FakeWebSocket(delay=1.0)
+    connection = await manager.connect(slow, "conv", "bob")
+
+    results = [connection.enqueue(manager.serialize({"i": i})) for i in range(5)]
+    await drain()
+
+    assert results[-1] is False
+    assert connection.closed
+    assert slow.close_code == 1013
+
+
+@pytest.mark.asyncio
+async def test_drop_policy_keeps_connection():
+    manager = ConnectionManager(queue_size=2, send_timeout=5.0, slow_consumer_policy="drop")
+    websocket = FakeWebSocket(delay=0.01)
+    connection = await manager.connect(websocket, "conv", "bob")
+
+    results = [connection.enqueue(manager.serialize({"i": i})) for i in range(5)]
+    await asyncio.sleep(0.1)
+
+    assert results == [True, True, False, False, False]
+    assert not connection.closed
+    assert [m["i"] for m in websocket.sent] == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_blocked_send_disconnects_after_timeout():
+    manager = ConnectionManager(send_timeout=0.02)
+    stuck = FakeWebSocket(delay=10.0)
+    connection = await manager.connect(stuck, "conv", "bob")
+
+    await manager.send_to_user("conv", "bob", {"type": "response"})
+    await asyncio.sleep(0.1)
+
+    assert connection.closed
+    assert stuck.close_code == 1013
+    assert not await manager.send_to_user("conv", "bob", {"type": "response"})
+
+
+@pytest.mark.asyncio
+async def test_replaced_socket_does_not_remove_successor():
+    manager = ConnectionManager()
+    old, new = FakeWebSocket(), FakeWebSocket()
+    await manager.connect(old, "conv", "alice")
+    await manager.connect(new, "conv", "alice")
+
+    manager.disconnect("conv", "alice", old)
+    await manager.broadcast_to_conversation("conv", {"type": "response"})
+    await drain()
+
+    assert old.close_code == 1000
+    assert manager.get_connection("conv", "alice").websocket is new
+    assert new.sent == [{"type": "response"}]
+
+
+def node_manager(server, node_id):
+    """A replica's connection manager, routed through a shared fake Redis."""
+    backend = RedisStateBackend(
+        client=FakeRedis(server=server, decode_responses=True), node_id=node_id
+    )
+    manager = ConnectionManager()
+    manager.router = WebSocketRouter(manager.deliver_local, backend=backend)
+    return manager
+
+
+async def until(condition):
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_reaches_participants_on_other_nodes(monkeypatch):
+    server = FakeServer()
+    node_a, node_b = node_manager(server, "a"), node_manager(server, "b")
+    alice, bob, carol = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await node_a.connect(alice, "conv", "alice")
+    await node_b.connect(bob, "conv", "bob")
+    await node_b.connect(carol, "other", "carol")
+
+    calls = []
+    serialize = node_a.serialize
+    monkeypatch.setattr(node_a, "serialize", lambda m: calls.append(m) or serialize(m))
+    monkeypatch.setattr(node_b, "serialize", lambda m: pytest.fail("re-serialized"))
+
+    assert await node_a.broadcast_to_conversation("conv", {"type": "response", "i": 1}) == 1
+    await until(lambda: bob.sent)
+    await drain()
+
+    assert alice.sent == [{"type": "response", "i": 1}]
+    assert bob.sent == [{"type": "response", "i": 1}]
+    assert carol.sent == []
+    assert len(calls) == 1
+    assert await node_a.get_presence("conv") == {"alice": "a", "bob": "b"}
+
+    node_a.disconnect("conv", "alice")
+    node_b.disconnect("conv", "bob")
+    node_b.disconnect("other", "carol")
+    await until(lambda: not (node_a._routing_tasks or node_b._routing_tasks))
+    await node_a.router.backend.close()
+    await node_b.router.backend.close()
+
+
+@pytest.mark.asyncio
+async def test_last_local_participant_leaving_stops_routing():
+    server = FakeServer()
+    node_a, node_b = node_manager(server, "a"), node_manager(server, "b")
+    await node_a.connect(FakeWebSocket(), "conv", "alice")
+    await node_b.connect(FakeWebSocket(), "conv", "bob")
+
+    node_b.disconnect("conv", "bob")
+    await until(lambda: not node_b._routing_tasks)
+
+    assert await node_a.get_presence("conv") == {"alice": "a"}
+    # Only node a is still subscribed to the conversation
+    assert await node_a.router.publish("conv", "{}") == 1
+
+    node_a.disconnect("conv", "alice")
+    await until(lambda: not node_a._routing_tasks)
+    await node_a.router.backend.close()
+    await node_b.router.backend.close()
+
+
+@pytest.mark.asyncio
+async def test_rejoin_before_leave_runs_keeps_routing_and_presence():
+    server = FakeServer()
+    node_a, node_b = node_manager(server, "a"), node_manager(server, "b")
+    await node_a.connect(FakeWebSocket(), "conv", "alice")
+    first = FakeWebSocket()
+    await node_b.connect(first, "conv", "bob")
+
+    # The leave task is scheduled but has not run when bob reconnects
+    node_b.disconnect("conv", "bob", first)
+    await node_b.connect(FakeWebSocket(), "conv", "bob")
+    await until(lambda: not node_b._routing_tasks)
+
+    assert await node_a.get_presence("conv") == {"alice": "a", "bob": "b"}
+    assert await node_a.router.publish("conv", "{}") == 2
+
+    node_a.disconnect("conv", "alice")
+    node_b.disconnect("conv", "bob")
+    await until(lambda: not (node_a._routing_tasks or node_b._routing_tasks))
+    await node_a.router.backend.close()
+    await node_b.router.backend.close()
+
+
+@pytest.mark.asyncio
+async def test_stale_presence_is_ignored():
+    server = FakeServer()
+    node = node_manager(server, "a")
+    node.router.presence_ttl = 0
+    await node.connect(FakeWebSocket(), "conv", "alice")
+    await asyncio.sleep(0.01)
+
+    assert await node.router.presence("conv") == {}
+    assert await node.get_presence("conv") == {"alice": "a"}
+
+    node.disconnect("conv", "alice")
+    await until(lambda: not node._routing_tasks)
+    await node.router.backend.close()